@@ -0,0 +1,106 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.utils.benchmark import (
+    ENDPOINTS, DEFAULT_TOLERANCES, run_benchmarks, compare_results, load_results, save_results,
+)
+from api.utils.synthetic_tenant import (
+    SCALES, SyntheticTenantBuilder, find_synthetic_tenant, delete_synthetic_tenant,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic tenant with bulk_create and benchmark key endpoints '
+        '(latency, query count, peak memory) against a JSON baseline. '
+        'Run against a disposable database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                            help='Data volume preset (default: small)')
+        for key in SCALES['small']:
+            parser.add_argument(f"--{key.replace('_', '-')}", dest=key, type=int, default=None,
+                                help=f'Override the preset {key} count')
+        parser.add_argument('--tenant-name', type=str, default=None,
+                            help='Synthetic tenant name (default: "Benchmark <scale>")')
+        parser.add_argument('--reseed', action='store_true',
+                            help='Delete and regenerate the synthetic tenant if it exists')
+        parser.add_argument('--drop', action='store_true',
+                            help='Delete the synthetic tenant after the run')
+        parser.add_argument('--seed-only', action='store_true',
+                            help='Generate the data and exit without benchmarking')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--only', type=str, default='',
+                            help='Comma-separated endpoint names to run (default: all)')
+        parser.add_argument('--baseline', type=str, default=None,
+                            help='Baseline JSON (default: benchmarks/baseline-<scale>.json)')
+        parser.add_argument('--output', type=str, default=None,
+                            help='Also write this run\'s results to this JSON file')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store this run as the new baseline instead of comparing')
+        parser.add_argument('--latency-tolerance', type=float, default=DEFAULT_TOLERANCES['latency'])
+        parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_TOLERANCES['memory'])
+        parser.add_argument('--query-tolerance', type=int, default=DEFAULT_TOLERANCES['queries'])
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        name = options['tenant_name'] or f"Benchmark {scale}"
+        baseline_path = options['baseline'] or os.path.join(
+            settings.BASE_DIR, 'benchmarks', f"baseline-{scale}.json")
+
+        if options['reseed'] and delete_synthetic_tenant(name):
+            self.stdout.write(f'Deleted existing tenant "{name}"')
+
+        synthetic = find_synthetic_tenant(name)
+        if synthetic is None:
+            self.stdout.write(f'Generating tenant "{name}" ({scale})...')
+            builder = SyntheticTenantBuilder(
+                name, scale=scale, batch_size=options['batch_size'], log=self.stdout.write,
+                **{key: options[key] for key in SCALES[scale]},
+            )
+            synthetic = builder.build()
+            self.stdout.write(self.style.SUCCESS(f'Generated tenant "{name}" (id={synthetic.tenant.id})'))
+        else:
+            self.stdout.write(f'Reusing tenant "{name}" (id={synthetic.tenant.id})')
+
+        if options['seed_only']:
+            return
+
+        endpoints = ENDPOINTS
+        if options['only']:
+            wanted = {item.strip() for item in options['only'].split(',') if item.strip()}
+            unknown = wanted - {endpoint.name for endpoint in ENDPOINTS}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in wanted]
+
+        try:
+            results = run_benchmarks(synthetic, endpoints, iterations=options['iterations'],
+                                     warmup=options['warmup'], log=self.stdout.write)
+        finally:
+            if options['drop']:
+                delete_synthetic_tenant(name)
+                self.stdout.write(f'Deleted tenant "{name}"')
+
+        if options['output']:
+            save_results(options['output'], results)
+
+        if options['update_baseline'] or not os.path.exists(baseline_path):
+            save_results(baseline_path, results)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+
+        regressions = compare_results(load_results(baseline_path), results, {
+            'latency': options['latency_tolerance'],
+            'memory': options['memory_tolerance'],
+            'queries': options['query_tolerance'],
+        })
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} regression(s) against {baseline_path}')
+        self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline_path}'))
@@ -0,0 +1,61 @@
+import multiprocessing
+import signal
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.utils.jobs import Worker, queue_settings
+
+
+def _process_main(concurrency, poll_interval, burst):
+    import django
+    django.setup()
+    worker = Worker(concurrency=concurrency, poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run(burst=burst)
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers (email campaigns, PDFs, webhooks, menu sync, imports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Threads per worker process (default: 4)')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes, each with its own thread pool (default: 1)')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds between polls when the queue is empty')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once the queue is empty (cron / CI usage)')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        processes = max(1, options['processes'])
+        poll_interval = options['poll_interval'] or queue_settings()['POLL_INTERVAL']
+        burst = options['burst']
+
+        self.stdout.write(f'Starting {processes} worker process(es) x {concurrency} thread(s)')
+        if processes == 1:
+            _process_main(concurrency, poll_interval, burst)
+            return
+
+        # Connections must not be shared with forked children
+        connections.close_all()
+        children = [
+            multiprocessing.Process(target=_process_main, args=(concurrency, poll_interval, burst),
+                                    name=f'job-worker-{index}')
+            for index in range(processes)
+        ]
+        for child in children:
+            child.start()
+
+        def forward(signum, frame):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for child in children:
+            child.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
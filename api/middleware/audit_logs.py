@@ -1,14 +1,24 @@
-import json
+"""
+Audit log middleware.
+
+Builds a lightweight entry per authenticated request and hands it to the
+write-behind buffer in api.utils.audit_buffer; JSON decoding, sanitizing and
+the database insert all happen on the background flusher.
+"""
 import logging
-from django.utils import timezone
-from django.contrib.auth.models import AnonymousUser
-from api.models.audit_logs import AuditLog
+from django.http.request import RawPostDataException
+from api.utils.audit_buffer import get_audit_buffer, MAX_BODY_BYTES
+from api.utils.tenant_context import get_tenant_context
 
 logger = logging.getLogger(__name__)
 
 class AuditLogMiddleware:
+    # Skip logging for certain paths
+    SKIP_PATHS = ['/static/', '/media/', '/admin/jsi18n/', '/favicon.ico']
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.buffer = get_audit_buffer()
 
     def __call__(self, request):
         # Process request
@@ -21,45 +31,39 @@ class AuditLogMiddleware:
 
     def log_action(self, request, response):
         try:
-            # Skip logging for certain paths
-            skip_paths = ['/static/', '/media/', '/admin/jsi18n/', '/favicon.ico']
-            if any(path in request.path for path in skip_paths):
+            if any(path in request.path for path in self.SKIP_PATHS):
                 return
 
-            # Get user info
-            user = request.user
-            if isinstance(user, AnonymousUser):
+            # Get user info (DRF sets the authenticated user on the HttpRequest)
+            user = getattr(request, 'user', None)
+            if not user or not user.is_authenticated:
                 return
 
-            # Get tenant info
-            tenant = None
-            if hasattr(user, 'userprofile') and user.userprofile.tenant:
-                tenant = user.userprofile.tenant
-
-            # Determine action type
+            # Determine action type and apply the sampling policy before doing any work
             action_type = self.get_action_type(request)
-            
-            # Get request data (sanitized)
-            request_data = self.sanitize_request_data(request)
-            
-            # Get response status
-            status_code = response.status_code
-
-            # Create audit log entry
-            AuditLog.objects.create(
-                user=user,
-                tenant=tenant,
-                action_type=action_type,
-                resource_type=self.get_resource_type(request.path),
-                resource_id=self.get_resource_id(request.path),
-                request_method=request.method,
-                request_path=request.path,
-                request_data=request_data,
-                response_status=status_code,
-                ip_address=self.get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                timestamp=timezone.now()
-            )
+            if not self.buffer.should_record(action_type):
+                return
+
+            # Tenant context is memoized for the request, so this is normally free
+            context = get_tenant_context(request)
+            profile = context.profile if context else None
+
+            self.buffer.enqueue({
+                'user_id': user.id,
+                'user_profile_id': profile.id if profile else None,
+                'action': action_type,
+                'resource_type': self.get_resource_type(request.path),
+                'resource_id': self.get_resource_id(request.path),
+                'request_method': request.method,
+                'request_path': request.path[:500],
+                'response_status': response.status_code,
+                'success': response.status_code < 400,
+                'ip_address': self.get_client_ip(request),
+                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                # Raw payload; decoded and sanitized on the flusher thread
+                'query_params': dict(request.GET) if request.method == 'GET' else None,
+                'raw_body': self.get_raw_body(request),
+            })
 
         except Exception as e:
             logger.error(f"Error logging audit: {str(e)}")
@@ -101,38 +105,21 @@ class AuditLogMiddleware:
             return int(path_parts[2])
         return None
 
-    def sanitize_request_data(self, request):
-        """Sanitize sensitive data from request"""
-        data = {}
-        
-        # Get data from different sources
-        if request.method == 'GET':
-            data = dict(request.GET)
-        elif request.method in ['POST', 'PUT', 'PATCH']:
-            data = dict(request.POST)
-            # Also get JSON data if present
-            if request.content_type == 'application/json':
-                try:
-                    json_data = json.loads(request.body.decode('utf-8'))
-                    data.update(json_data)
-                except:
-                    pass
-
-        # Remove sensitive fields
-        sensitive_fields = ['password', 'token', 'secret', 'key', 'authorization']
-        sanitized_data = {}
-        
-        for key, value in data.items():
-            if not any(sensitive in key.lower() for sensitive in sensitive_fields):
-                sanitized_data[key] = value
-
-        return sanitized_data
+    def get_raw_body(self, request):
+        """Return the JSON body bytes for write methods (parsed later, off the request path)"""
+        if request.method not in ['POST', 'PUT', 'PATCH'] or request.content_type != 'application/json':
+            return None
+        try:
+            body = request.body
+        except RawPostDataException:
+            return None
+        return body if len(body) <= MAX_BODY_BYTES else None
 
     def get_client_ip(self, request):
         """Get client IP address"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
+            ip = x_forwarded_for.split(',')[0].strip()
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip 
\ No newline at end of file
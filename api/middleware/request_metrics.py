@@ -0,0 +1,61 @@
+"""
+Request metrics middleware: per-route latency, SQL query counts, DB time and
+N+1 detection (see api.utils.request_metrics).
+"""
+import logging
+import time
+from contextlib import ExitStack
+from django.db import connections
+from api.utils.request_metrics import QueryRecorder, metrics_settings, registry
+
+logger = logging.getLogger(__name__)
+
+class RequestMetricsMiddleware:
+    SKIP_PATHS = ['/static/', '/media/', '/metrics']
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = metrics_settings()
+        self.enabled = options['ENABLED']
+        self.response_headers = options['RESPONSE_HEADERS']
+        self.n_plus_one_threshold = options['N_PLUS_ONE_THRESHOLD']
+        self.log_n_plus_one = options['LOG_N_PLUS_ONE']
+
+    def __call__(self, request):
+        if not self.enabled or any(request.path.startswith(p) for p in self.SKIP_PATHS):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        latency = time.perf_counter() - started
+
+        try:
+            self.record(request, response, latency, recorder)
+        except Exception as e:
+            logger.error(f"Error recording request metrics: {str(e)}")
+        return response
+
+    def record(self, request, response, latency, recorder):
+        match = getattr(request, 'resolver_match', None)
+        route = '/' + match.route if match is not None and match.route else 'unmatched'
+        repeated = recorder.repeated(self.n_plus_one_threshold)
+        registry.record(route, request.method, response.status_code, latency, recorder, repeated)
+
+        if repeated and self.log_n_plus_one:
+            sql, count = repeated[0]
+            logger.warning(
+                f"Possible N+1 on {request.method} {route}: {recorder.count} queries, "
+                f"query repeated {count}x: {sql[:300]}"
+            )
+
+        if self.response_headers:
+            db_ms = recorder.duration * 1000
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-DB-Time-Ms'] = f"{db_ms:.1f}"
+            response['Server-Timing'] = f"db;dur={db_ms:.1f}, total;dur={latency * 1000:.1f}"
+            if repeated:
+                response['X-N-Plus-One'] = str(repeated[0][1])
@@ -1,11 +1,11 @@
 """
 Security middleware for rate limiting and request validation
 """
-from django.core.cache import cache
 from django.http import JsonResponse
 from django.utils import timezone
 import json
 import logging
+from api.utils.rate_limit import RateLimitRule, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +14,12 @@ class RateLimitMiddleware:
     Rate limiting middleware to prevent API abuse
     More lenient for authenticated users
     """
+    EXCEEDED_MESSAGES = {
+        'minute': 'Rate limit exceeded. Please try again later.',
+        'hour': 'Hourly rate limit exceeded. Please try again later.',
+        'day': 'Daily rate limit exceeded. Please contact support.',
+    }
+
     def __init__(self, get_response):
         self.get_response = get_response
         # Rate limits per IP - unauthenticated users
@@ -67,52 +73,25 @@ class RateLimitMiddleware:
         else:
             identifier = self.get_client_ip(request)
         
-        # Check per-minute limit
-        if not self.check_rate_limit(identifier, 'minute', minute_limit, 60):
-            logger.warning(f"Rate limit exceeded (minute) for {'user' if is_authenticated else 'IP'}: {identifier}")
-            return JsonResponse(
-                {
-                    'error': 'Rate limit exceeded. Please try again later.',
-                    'retry_after': 60
-                },
-                status=429
-            )
-        
-        # Check per-hour limit
-        if not self.check_rate_limit(identifier, 'hour', hour_limit, 3600):
-            logger.warning(f"Rate limit exceeded (hour) for {'user' if is_authenticated else 'IP'}: {identifier}")
-            return JsonResponse(
-                {
-                    'error': 'Hourly rate limit exceeded. Please try again later.',
-                    'retry_after': 3600
-                },
-                status=429
-            )
-        
-        # Check per-day limit (same for both)
-        if not self.check_rate_limit(identifier, 'day', self.rate_limit_per_day, 86400):
-            logger.warning(f"Rate limit exceeded (day) for {'user' if is_authenticated else 'IP'}: {identifier}")
+        # Check minute, hour and day limits in one atomic limiter call
+        result = get_rate_limiter().hit(identifier, [
+            RateLimitRule('minute', minute_limit, 60),
+            RateLimitRule('hour', hour_limit, 3600),
+            RateLimitRule('day', self.rate_limit_per_day, 86400),
+        ])
+        if not result.allowed:
+            period = result.exceeded.name
+            logger.warning(f"Rate limit exceeded ({period}) for {'user' if is_authenticated else 'IP'}: {identifier}")
             return JsonResponse(
                 {
-                    'error': 'Daily rate limit exceeded. Please contact support.',
-                    'retry_after': 86400
+                    'error': self.EXCEEDED_MESSAGES[period],
+                    'retry_after': result.retry_after
                 },
                 status=429
             )
         
         return self.get_response(request)
     
-    def check_rate_limit(self, ip, period, limit, timeout):
-        """Check if IP has exceeded rate limit for given period"""
-        key = f"ratelimit_{period}_{ip}"
-        count = cache.get(key, 0)
-        
-        if count >= limit:
-            return False
-        
-        cache.set(key, count + 1, timeout)
-        return True
-    
     def get_client_ip(self, request):
         """Extract client IP address from request"""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -6,6 +6,7 @@ from django.utils import timezone
 from rest_framework.response import Response
 from rest_framework import status
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_tenant_context
 
 class SubscriptionMiddleware:
     """
@@ -43,26 +44,28 @@ class SubscriptionMiddleware:
             return self.get_response(request)
         
         try:
-            profile = UserProfile.objects.get(user=request.user)
-            tenant = profile.tenant
+            context = get_tenant_context(request)
+            if context is None or context.profile is None:
+                raise UserProfile.DoesNotExist
+            features = context.features
             
-            # Check if subscription has expired
-            if tenant.is_subscription_expired():
-                if tenant.subscription_status == 'expired':
+            # Check if subscription has expired (cached subscription state, no DB hit)
+            if features.is_subscription_expired():
+                if features.subscription_status == 'expired':
                     # Block all access
                     return Response({
                         'error': 'Your plan has expired. Please renew to continue using the service.',
-                        'subscription_end_date': tenant.subscription_end_date.isoformat() if tenant.subscription_end_date else None,
+                        'subscription_end_date': features.subscription_end_date.isoformat() if features.subscription_end_date else None,
                         'action_url': '/admin/plans',
                         'renewal_required': True
                     }, status=status.HTTP_403_FORBIDDEN)
-                elif tenant.is_in_grace_period():
+                elif features.is_in_grace_period():
                     # Allow read-only access in grace period
                     if request.method not in self.READ_ONLY_METHODS:
                         return Response({
                             'error': 'Your plan has expired. You are in a grace period with read-only access. Please renew to restore full functionality.',
-                            'subscription_end_date': tenant.subscription_end_date.isoformat() if tenant.subscription_end_date else None,
-                            'grace_period_end': tenant.grace_period_end_date.isoformat() if tenant.grace_period_end_date else None,
+                            'subscription_end_date': features.subscription_end_date.isoformat() if features.subscription_end_date else None,
+                            'grace_period_end': features.grace_period_end_date.isoformat() if features.grace_period_end_date else None,
                             'action_url': '/admin/plans',
                             'renewal_required': True
                         }, status=status.HTTP_403_FORBIDDEN)
@@ -2,6 +2,7 @@ import uuid
 from django.utils import timezone
 
 from api.models import VisitorLead
+from api.utils.visitor_tracker import get_visitor_tracker, tracking_mode
 
 
 class VisitorLeadMiddleware:
@@ -12,8 +13,8 @@ class VisitorLeadMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # Do not track API/admin requests
-        if request.path.startswith('/admin/') or request.path.startswith('/api/'):
+        # Do not track API/admin requests or metrics scrapes
+        if request.path.startswith(('/admin/', '/api/', '/metrics')):
             return self.get_response(request)
 
         token = request.COOKIES.get(self.COOKIE_NAME)
@@ -23,7 +24,10 @@ class VisitorLeadMiddleware:
             new_token = True
 
         request.visitor_token = token
-        self.ensure_visit(request, token)
+        if tracking_mode() == 'coalesced':
+            self.track_visit(request, token, new_token)
+        else:
+            self.ensure_visit(request, token)
 
         response = self.get_response(request)
         if new_token:
@@ -36,8 +40,8 @@ class VisitorLeadMiddleware:
             )
         return response
 
-    def ensure_visit(self, request, token):
-        defaults = {
+    def visit_defaults(self, request):
+        return {
             'ip_address': self._get_client_ip(request),
             'user_agent': request.META.get('HTTP_USER_AGENT', '')[:512] or '',
             'landing_url': request.build_absolute_uri(),
@@ -47,8 +51,16 @@ class VisitorLeadMiddleware:
             'utm_campaign': request.GET.get('utm_campaign', '')[:128] or '',
             'utm_term': request.GET.get('utm_term', '')[:128] or '',
             'utm_content': request.GET.get('utm_content', '')[:128] or '',
-            'last_seen': timezone.now(),
         }
+
+    def track_visit(self, request, token, new_token):
+        """Coalesced mode: queue the visit for the tracker's periodic bulk writes"""
+        get_visitor_tracker().track(token, self.visit_defaults(request), new_token, timezone.now())
+
+    def ensure_visit(self, request, token):
+        """Immediate mode: write the visit synchronously"""
+        defaults = self.visit_defaults(request)
+        defaults['last_seen'] = timezone.now()
         lead, created = VisitorLead.objects.get_or_create(
             visitor_token=token,
             defaults=defaults,
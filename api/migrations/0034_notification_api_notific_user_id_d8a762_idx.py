@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-16 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at'], name='api_notific_user_id_d8a762_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated manually
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """Create the DatabaseCache table so `migrate` alone prepares a deploy (no-op for other backends)"""
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_notification_api_notific_user_id_d8a762_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, noop),
+    ]
@@ -10,12 +10,13 @@ from .email_marketing import (
     EmailSequence, EmailSequenceStep
 )
 from .visitor_lead import VisitorLead
+from .jobs import Job
 
 __all__ = ['Plan', 'UserProfile', 'Role', 'Tenant', 'PaymentTransaction', 'AuditLog',
            'Notification', 'NotificationPreference', 'NotificationTemplate', 'NotificationLog',
            'CustomServiceRequest', 'Contact', 'Company', 'ContactTag', 'Activity', 'Deal', 'DealStage',
            'EmailTemplate', 'ContactList', 'EmailCampaign', 'EmailActivity', 'EmailSequence', 'EmailSequenceStep',
-           'VisitorLead']
+           'VisitorLead', 'Job']
 from .plan import Plan
 from .user import UserProfile, Role, Tenant
 from .payments import PaymentTransaction
@@ -0,0 +1,50 @@
+from django.db import models
+from django.utils import timezone
+from api.models.user import Tenant, UserProfile
+
+
+class Job(models.Model):
+    """
+    Background job stored in the database and executed by `manage.py run_workers`.
+    See api.utils.jobs for enqueueing, claiming and retry behaviour.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    created_by = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    task = models.CharField(max_length=200, help_text="Dotted path of the task function")
+    payload = models.JSONField(default=dict, blank=True, help_text="Keyword arguments for the task")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.IntegerField(default=0, help_text="Higher runs first")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not claimed before this time (retry backoff)")
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True, help_text="Claim time, refreshed by progress updates")
+    progress = models.PositiveSmallIntegerField(default=0, help_text="0-100")
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='api_job_claim_idx'),
+            models.Index(fields=['tenant', 'status'], name='api_job_tenant_status_idx'),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def __str__(self):
+        return f"Job {self.id} {self.task} ({self.status})"
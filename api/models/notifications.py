@@ -74,6 +74,7 @@ class Notification(models.Model):
             models.Index(fields=['user', 'read', 'created_at']),
             models.Index(fields=['tenant', 'module', 'created_at']),
             models.Index(fields=['user', 'notification_type']),
+            models.Index(fields=['user', 'created_at']),
         ]
     
     def __str__(self):
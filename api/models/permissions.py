@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_tenant_context
 from rest_framework.response import Response
 
 
@@ -10,11 +11,8 @@ class IsTenantMember(BasePermission):
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        try:
-            profile = UserProfile.objects.get(user=request.user)
-            return profile.tenant is not None
-        except UserProfile.DoesNotExist:
-            return False
+        context = get_tenant_context(request)
+        return context is not None and context.tenant is not None
 
 
 def HasFeaturePermissionFactory(feature_name):
@@ -27,19 +25,17 @@ def HasFeaturePermissionFactory(feature_name):
             if not request.user or not request.user.is_authenticated:
                 return False
             try:
-                profile = UserProfile._default_manager.get(user=request.user)
-                tenant = profile.tenant
-                
-                if not tenant:
+                context = get_tenant_context(request)
+                if context is None or not context.tenant:
                     return False
                 
-                plan = tenant.plan
-                if not plan:
+                features = context.features
+                if not features.has_plan:
                     # No plan assigned
                     return False
                 
-                # Check if plan has the feature
-                has_feature = plan.has_feature(feature_name)
+                # Check if plan has the feature (in-memory lookup on the cached matrix)
+                has_feature = features.has_feature(feature_name)
                 
                 if not has_feature:
                     # Feature not available - return detailed error message
@@ -47,7 +43,7 @@ def HasFeaturePermissionFactory(feature_name):
                     feature_display_name = feature_name.replace('_', ' ').title()
                     
                     # Get plan name and suggest upgrade
-                    current_plan = plan.name
+                    current_plan = features.plan_name
                     error_message = (
                         f"{feature_display_name} module is not available in your current plan ({current_plan}). "
                         f"Please upgrade to a plan that includes {feature_display_name} to access this feature."
@@ -67,12 +63,11 @@ def HasFeaturePermissionFactory(feature_name):
         def get_error_message(self, request, view):
             """Get error message for when permission is denied"""
             try:
-                profile = UserProfile._default_manager.get(user=request.user)
-                tenant = profile.tenant
-                plan = tenant.plan if tenant else None
+                context = get_tenant_context(request)
+                features = context.features if context else None
                 
                 feature_display_name = feature_name.replace('_', ' ').title()
-                current_plan = plan.name if plan else "No Plan"
+                current_plan = features.plan_name if features and features.has_plan else "No Plan"
                 
                 return (
                     f"{feature_display_name} module is not available in your current plan ({current_plan}). "
@@ -87,8 +82,10 @@ def HasFeaturePermissionFactory(feature_name):
 def role_required(*roles):
     def decorator(view_func):
         def _wrapped_view(self, request, *args, **kwargs):
-            profile = UserProfile._default_manager.get(user=request.user)
-            if profile.role and profile.role.name in roles:
+            context = get_tenant_context(request)
+            if context is None or context.profile is None:
+                raise UserProfile.DoesNotExist("UserProfile matching query does not exist.")
+            if context.role_name in roles:
                 return view_func(self, request, *args, **kwargs)
             return Response({'error': 'Permission denied.'}, status=403)
         return _wrapped_view
@@ -97,8 +94,10 @@ def role_required(*roles):
 def role_exclude(*excluded_roles):
     def decorator(view_func):
         def _wrapped_view(self, request, *args, **kwargs):
-            profile = UserProfile._default_manager.get(user=request.user)
-            if profile.role and profile.role.name not in excluded_roles:
+            context = get_tenant_context(request)
+            if context is None or context.profile is None:
+                raise UserProfile.DoesNotExist("UserProfile matching query does not exist.")
+            if context.role and context.role.name not in excluded_roles:
                 return view_func(self, request, *args, **kwargs)
             return Response({'error': 'Permission denied.'}, status=403)
         return _wrapped_view
@@ -118,30 +117,16 @@ class IsPaidUser(BasePermission):
             return False
         
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
-            tenant = profile.tenant
-            
-            if not tenant:
+            context = get_tenant_context(request)
+            if context is None or context.profile is None:
                 return False
-            
-            # Check if tenant has a paid plan
-            plan = tenant.plan
-            if not plan:
+            if not context.tenant:
                 return False
             
-            # Check if plan is paid
+            # Check if tenant has a paid plan
             # Custom pricing (price is None) is considered paid
             # Free plan (price = 0) is not allowed
-            if plan.price is None:
-                # Custom pricing - considered paid
-                return True
-            
-            if plan.price is not None and plan.price > 0:
-                # Paid plan
-                return True
-            
-            # Free plan (price = 0) - not allowed
-            return False
+            return context.features.is_paid
             
         except UserProfile.DoesNotExist:
             return False
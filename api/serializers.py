@@ -566,7 +566,7 @@ class RetailSaleSerializer(serializers.ModelSerializer):
         # Generate invoice number if not provided
         if 'invoice_number' not in validated_data or not validated_data['invoice_number']:
             from datetime import datetime
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
             validated_data['invoice_number'] = f"RINV{timestamp}"
         
         sale = super().create(validated_data)
@@ -1081,4 +1081,27 @@ class CustomServiceRequestSerializer(serializers.ModelSerializer):
             'phone', 'company_name', 'description', 'budget_range', 'timeline',
             'status', 'status_display', 'notes', 'submitted_at', 'contacted_at'
         ]
-        read_only_fields = ['id', 'status', 'submitted_at', 'contacted_at'] 
\ No newline at end of file
+        read_only_fields = ['id', 'status', 'submitted_at', 'contacted_at'] 
+
+# Background Job Serializers
+from api.models.jobs import Job
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background job status"""
+    created_by_name = serializers.CharField(source='created_by.user.username', read_only=True, allow_null=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'task', 'status', 'priority', 'attempts', 'max_attempts', 'progress',
+            'progress_message', 'result', 'error', 'run_at', 'created_at', 'started_at',
+            'finished_at', 'created_by_name', 'download_url'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status == 'succeeded' and isinstance(obj.result, dict) and obj.result.get('file'):
+            from django.urls import reverse
+            return reverse('job-download', args=[obj.id])
+        return None
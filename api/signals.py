@@ -0,0 +1,151 @@
+"""
+Signal handlers for the api app.
+"""
+import logging
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db.models import DEFERRED
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from api.models.plan import Plan
+from api.models.user import Tenant, UserProfile
+from education.models import FeePayment, FeeStructure, OldBalance, Period, Student, Timetable
+from api.utils.fee_ledger import refresh_class_fee_balances, refresh_fee_balances
+from api.utils.pdf_cache import PDF_DOCUMENTS, invalidate_school_contact, purge_document
+from api.utils.plan_cache import TENANT_PLAN_FIELDS, invalidate_plan_features
+from api.utils.timetable_index import invalidate_timetable_index
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Plan)
+@receiver(post_delete, sender=Plan)
+def invalidate_plan_feature_cache(sender, **kwargs):
+    """Plan edits change the feature matrix of every tenant on the plan"""
+    invalidate_plan_features()
+
+
+@receiver(post_save, sender=Tenant)
+def invalidate_tenant_plan_features(sender, instance, update_fields=None, **kwargs):
+    """
+    Plan upgrades and subscription updates invalidate the tenant's feature
+    matrix. Saves limited to other fields (storage counters, logo) leave it alone.
+    """
+    if update_fields and not TENANT_PLAN_FIELDS.intersection(update_fields):
+        return
+    invalidate_plan_features(instance.id)
+
+
+@receiver(post_delete, sender=Tenant)
+def invalidate_deleted_tenant_plan_features(sender, instance, **kwargs):
+    invalidate_plan_features(instance.id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_school_contact(sender, instance, **kwargs):
+    """Admin profile edits change the contact details printed on PDFs"""
+    invalidate_school_contact(instance.tenant_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_school_contact(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    for tenant_id in UserProfile._default_manager.filter(user=instance).values_list('tenant_id', flat=True):
+        invalidate_school_contact(tenant_id)
+
+
+def purge_cached_pdfs(sender, instance, **kwargs):
+    """
+    Drop stored PDFs when their source row is deleted. Edits need no purge:
+    they change the version, and the next render replaces the stale file.
+    """
+    for doc_type in _documents_by_model.get(sender, ()):
+        try:
+            purge_document(doc_type, instance.tenant_id, instance.pk)
+        except Exception as e:
+            logger.error(f"Error purging cached {doc_type} PDFs for {instance.pk}: {str(e)}")
+
+
+_documents_by_model = {}
+for _doc_type, _label in PDF_DOCUMENTS.items():
+    _model = apps.get_model(_label)
+    _documents_by_model.setdefault(_model, []).append(_doc_type)
+    post_delete.connect(purge_cached_pdfs, sender=_model, dispatch_uid=f'pdf_cache:{_doc_type}:delete')
+
+
+def _deleted_with_student(origin):
+    # Rows removed along with their student or tenant take the ledger rows with them
+    return isinstance(origin, (Student, Tenant))
+
+
+@receiver(post_save, sender=FeePayment)
+@receiver(post_delete, sender=FeePayment)
+@receiver(post_save, sender=OldBalance)
+@receiver(post_delete, sender=OldBalance)
+def refresh_student_fee_balance(sender, instance, origin=None, **kwargs):
+    """Payments and old balances change one student's ledger rows"""
+    if _deleted_with_student(origin):
+        return
+    refresh_fee_balances(instance.tenant_id, [instance.student_id])
+
+
+def _fee_structure_scope(instance):
+    # Read through __dict__ so querysets that defer these fields stay lazy
+    return (instance.__dict__.get('class_obj_id', DEFERRED), instance.__dict__.get('academic_year', DEFERRED))
+
+
+@receiver(post_init, sender=FeeStructure)
+def remember_fee_structure_class(sender, instance, **kwargs):
+    instance._fee_ledger_scope = _fee_structure_scope(instance)
+
+
+@receiver(post_save, sender=FeeStructure)
+@receiver(post_delete, sender=FeeStructure)
+def refresh_class_fee_balance(sender, instance, origin=None, **kwargs):
+    """
+    Fee structures change the dues of every student in the class. A structure
+    moved to another class or year also refreshes the class it left.
+    """
+    if isinstance(origin, Tenant):
+        return
+    refresh_class_fee_balances(instance.tenant_id, instance.class_obj_id, instance.academic_year)
+    scope = _fee_structure_scope(instance)
+    old_class_id, old_year = instance._fee_ledger_scope
+    if (scope != instance._fee_ledger_scope and DEFERRED not in instance._fee_ledger_scope
+            and old_class_id is not None):
+        refresh_class_fee_balances(instance.tenant_id, old_class_id, old_year)
+    instance._fee_ledger_scope = scope
+
+
+@receiver(post_init, sender=Student)
+def remember_student_class(sender, instance, **kwargs):
+    # Read through __dict__ so querysets that defer the class stay lazy
+    instance._fee_ledger_class_id = instance.__dict__.get('assigned_class_id', DEFERRED)
+
+
+@receiver(post_save, sender=Student)
+def refresh_moved_student_fee_balance(sender, instance, created=False, **kwargs):
+    """A new student or a class change brings a different set of fee structures"""
+    class_id = instance.__dict__.get('assigned_class_id', DEFERRED)
+    if created or (class_id is not DEFERRED and class_id != instance._fee_ledger_class_id):
+        refresh_fee_balances(instance.tenant_id, [instance.id])
+    instance._fee_ledger_class_id = class_id
+
+
+@receiver(post_save, sender=Timetable)
+@receiver(post_delete, sender=Timetable)
+@receiver(post_save, sender=Period)
+@receiver(post_delete, sender=Period)
+def invalidate_timetable_occupancy(sender, instance, **kwargs):
+    """
+    Timetable writes invalidate the cached occupancy index. The version is
+    bumped again on commit so a read racing the transaction cannot leave an
+    index built from the old rows under the new version.
+    """
+    tenant_id = instance.tenant_id
+    invalidate_timetable_index(tenant_id)
+    transaction.on_commit(lambda: invalidate_timetable_index(tenant_id))
@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.core.files.storage import default_storage
-from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
@@ -13,7 +13,7 @@ class FileUploadView(APIView):
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         tenant = profile.tenant
         plan = tenant.plan
         if not plan:
@@ -31,5 +31,5 @@ class FileUploadView(APIView):
         default_storage.save(path, file_obj)
         # Update storage usage
         tenant.storage_used_mb += file_size_mb
-        tenant.save()
+        tenant.save(update_fields=['storage_used_mb'])
         return Response({"message": "File uploaded successfully.", "file": path, "storage_used_mb": tenant.storage_used_mb}, status=status.HTTP_201_CREATED) 
\ No newline at end of file
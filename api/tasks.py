@@ -0,0 +1,161 @@
+"""
+Background job tasks (see api.utils.jobs).
+
+Each task takes the Job as its first argument plus the JSON payload given to
+enqueue(), and returns a JSON-serializable result stored on the job. Raising
+marks the attempt failed and schedules a retry.
+"""
+import logging
+import tempfile
+import uuid
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+
+from api.models.user import Tenant, UserProfile
+from api.utils.jobs import set_progress
+
+logger = logging.getLogger(__name__)
+
+
+def store_job_file(job, filename, content, content_type):
+    """
+    Save generated output (bytes or a file object) for download through
+    /api/jobs/<id>/download/
+    """
+    content = ContentFile(content) if isinstance(content, bytes) else File(content)
+    path = default_storage.save(f"jobs/{job.tenant_id or 'global'}/{uuid.uuid4().hex}/{filename}", content)
+    return {'file': path, 'filename': filename, 'content_type': content_type, 'size': content.size}
+
+
+def send_email_campaign(job, campaign_id, user_profile_id):
+    from api.models.email_marketing import EmailCampaign
+    from api.views.email_marketing_views import deliver_campaign
+
+    campaign = EmailCampaign.objects.get(id=campaign_id)
+    user_profile = UserProfile._default_manager.select_related('tenant').get(id=user_profile_id)
+    return deliver_campaign(campaign, user_profile,
+                            progress=lambda percent, message: set_progress(job, percent, message))
+
+
+def deliver_order_webhook(job, integration_id, payload=None, order_id=None):
+    """POST the payload captured at enqueue time (jobs queued with only order_id rebuild it)"""
+    from restaurant.models import Order, ExternalAPIIntegration
+    from api.views.restaurant_views import order_webhook_payload, post_order_webhook
+
+    integration = ExternalAPIIntegration.objects.get(id=integration_id, is_active=True)
+    if payload is None:
+        payload = order_webhook_payload(Order.objects.get(id=order_id))
+    return {'status_code': post_order_webhook(payload, integration)}
+
+
+def sync_menu(job, integration_id):
+    from restaurant.models import ExternalAPIIntegration
+    from api.views.restaurant_views import sync_menu_from_api
+
+    integration = ExternalAPIIntegration.objects.select_related('tenant').get(id=integration_id, is_active=True)
+    return sync_menu_from_api(integration)
+
+
+def _import_csv(path, tenant_id, importer):
+    tenant = Tenant.objects.get(id=tenant_id)
+    with default_storage.open(path) as handle:
+        content = handle.read().decode('utf-8')
+    result = importer(content, tenant)
+    # Kept until the import succeeds so a retried attempt can read it again
+    default_storage.delete(path)
+    return result
+
+
+def import_medicines_csv(job, path, tenant_id):
+    from api.views.import_views import import_medicines_from_csv
+    return _import_csv(path, tenant_id, import_medicines_from_csv)
+
+
+def import_products_csv(job, path, tenant_id):
+    from api.views.import_views import import_products_from_csv
+    return _import_csv(path, tenant_id, import_products_from_csv)
+
+
+def render_report_card_pdf(job, report_card_id):
+    from education.models import ReportCard
+    from api.views.education_views import render_report_card_pdf as render
+
+    report_card = ReportCard._default_manager.select_related(
+        'tenant', 'student', 'class_obj', 'academic_year', 'term'
+    ).get(id=report_card_id)
+    pdf = render(report_card, report_card.tenant)
+    filename = f"report_card_{report_card.student.name}_{report_card.id}.pdf"
+    return store_job_file(job, filename, pdf, 'application/pdf')
+
+
+def generate_class_report_cards(job, class_id, academic_year_id, term_id):
+    from education.models import AcademicYear, Class, Term
+    from api.utils.report_cards import generate_class_report_cards as generate
+
+    class_obj = Class._default_manager.select_related('tenant').get(id=class_id)
+    tenant = class_obj.tenant
+    return generate(
+        tenant, class_obj,
+        AcademicYear._default_manager.get(id=academic_year_id, tenant=tenant),
+        Term._default_manager.get(id=term_id, tenant=tenant),
+        progress=lambda percent, message: set_progress(job, percent, message),
+    )
+
+
+def render_report_card_zip(job, report_card_ids, filename):
+    from api.utils.report_card_pdfs import write_report_card_zip
+
+    with tempfile.TemporaryFile() as archive:
+        result = write_report_card_zip(report_card_ids, archive,
+                                       progress=lambda percent, message: set_progress(job, percent, message))
+        archive.seek(0)
+        result.update(store_job_file(job, filename, archive, 'application/zip'))
+    return result
+
+
+def generate_fee_installments(job, fee_structure_id, installment_plan_id, student_ids, start_date=None, installments=None):
+    from education.models import FeeInstallmentPlan, FeeStructure
+    from api.utils.fee_installments import generate_installments, installment_schedule, parse_start_date
+
+    fee_structure = FeeStructure._default_manager.select_related('tenant').get(id=fee_structure_id)
+    installment_plan = FeeInstallmentPlan._default_manager.get(id=installment_plan_id, tenant=fee_structure.tenant)
+    schedule = installment_schedule(fee_structure, installment_plan, parse_start_date(start_date), installments)
+    return generate_installments(fee_structure.tenant, fee_structure, installment_plan, student_ids, schedule,
+                                 progress=lambda percent, message: set_progress(job, percent, message))
+
+
+def promote_students(job, student_ids, from_academic_year_id, to_academic_year_id, promotion_date,
+                     to_class_id=None, notes=''):
+    from datetime import date
+    from education.models import AcademicYear, Class, Student
+    from api.utils.promotions import plan_promotion, run_promotion
+
+    tenant = Tenant.objects.get(id=job.tenant_id)
+    to_class = Class._default_manager.get(id=to_class_id, tenant=tenant) if to_class_id else None
+    from_academic_year = AcademicYear._default_manager.get(id=from_academic_year_id, tenant=tenant)
+    to_academic_year = AcademicYear._default_manager.get(id=to_academic_year_id, tenant=tenant)
+    # Planned again so a retried job skips students an earlier attempt already moved
+    students = Student._default_manager.filter(tenant=tenant, is_active=True, id__in=student_ids)
+    plan = plan_promotion(tenant, students, from_academic_year, to_academic_year, to_class)
+    return run_promotion(tenant, plan, from_academic_year, to_academic_year, date.fromisoformat(promotion_date),
+                         notes=notes, promoted_by=job.created_by,
+                         progress=lambda percent, message: set_progress(job, percent, message))
+
+
+def prerender_hall_tickets(job, ticket_ids):
+    from api.utils.hall_tickets import prerender_hall_ticket_pdfs
+
+    return prerender_hall_ticket_pdfs(ticket_ids,
+                                      progress=lambda percent, message: set_progress(job, percent, message))
+
+
+def generate_timetable(job, academic_year_id, requirements, days=None, replace=False, time_budget=None):
+    from education.models import AcademicYear
+    from api.utils.timetable_generator import generate_timetable as generate
+
+    tenant = Tenant.objects.get(id=job.tenant_id)
+    academic_year = AcademicYear._default_manager.get(id=academic_year_id, tenant=tenant)
+    set_progress(job, 10, 'Solving timetable')
+    result = generate(tenant, academic_year, requirements, days=days, replace=replace, time_budget=time_budget)
+    set_progress(job, 100, 'Timetable written' if result['complete'] else 'Timetable could not be completed')
+    return result
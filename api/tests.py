@@ -6,6 +6,14 @@ from api.models.user import UserProfile, Role, Tenant
 from education.models import FeePayment, Department
 from api.models.payments import PaymentTransaction
 
+def echo_job_task(job, value):
+    return {'value': value}
+
+
+def failing_job_task(job):
+    raise ValueError('boom')
+
+
 class UserManagementTests(TestCase):
     def setUp(self):
         self.tenant = Tenant.objects.create(name="Test School", industry="education")
@@ -113,4 +121,599 @@ class DepartmentTests(TestCase):
         client.force_authenticate(user=self.accountant_user)
         data = {"name": "Math", "tenant": self.tenant.id}
         response = client.post(reverse('education-departments'), data)
-        self.assertEqual(response.status_code, 403) 
\ No newline at end of file
+        self.assertEqual(response.status_code, 403) 
+
+
+class TenantContextTests(TestCase):
+    def setUp(self):
+        from api.models.plan import Plan
+        self.plan = Plan.objects.create(name="Pro", description="Pro plan", storage_limit_mb=1024, has_education=True)
+        self.tenant = Tenant.objects.create(name="Test School", industry="education", plan=self.plan)
+        self.admin_role = Role.objects.create(name="admin")
+        self.admin_user = User.objects.create_user(username="admin", password="adminpass")
+        self.admin_profile = UserProfile.objects.create(user=self.admin_user, tenant=self.tenant, role=self.admin_role)
+
+    def test_context_resolved_once_per_request(self):
+        from django.test import RequestFactory
+        from api.utils.plan_cache import get_plan_features
+        from api.utils.tenant_context import get_tenant_context, get_request_profile
+        get_plan_features(self.tenant)  # warm the feature matrix
+        request = RequestFactory().get('/api/education/students/')
+        request.user = User.objects.get(pk=self.admin_user.pk)
+        with self.assertNumQueries(1):
+            context = get_tenant_context(request)
+            self.assertEqual(context.role_name, "admin")
+            self.assertTrue(context.features.has_feature("education"))
+            self.assertEqual(get_request_profile(request).tenant, self.tenant)
+            self.assertEqual(request.user.userprofile.tenant.name, "Test School")
+
+    def test_missing_profile_raises_does_not_exist(self):
+        from django.test import RequestFactory
+        from api.utils.tenant_context import get_request_profile
+        request = RequestFactory().get('/')
+        request.user = User.objects.create_user(username="orphan", password="orphanpass")
+        with self.assertRaises(UserProfile.DoesNotExist):
+            get_request_profile(request)
+
+
+class PlanFeatureCacheTests(TestCase):
+    def setUp(self):
+        from api.models.plan import Plan
+        self.plan = Plan.objects.create(name="Starter", description="Starter plan", storage_limit_mb=512, has_education=True)
+        self.tenant = Tenant.objects.create(name="Test School", industry="education", plan=self.plan)
+
+    def test_features_served_from_cache(self):
+        from api.utils.plan_cache import get_plan_features
+        get_plan_features(self.tenant)
+        with self.assertNumQueries(0):
+            features = get_plan_features(self.tenant)
+        self.assertTrue(features.has_feature("education"))
+        self.assertFalse(features.has_feature("retail"))
+
+    def test_plan_change_invalidates_cache(self):
+        from api.models.plan import Plan
+        from api.utils.plan_cache import get_plan_features
+        self.assertFalse(get_plan_features(self.tenant).has_feature("analytics"))
+        upgraded = Plan.objects.create(name="Pro", description="Pro plan", storage_limit_mb=5120, has_education=True, has_analytics=True)
+        self.tenant.plan = upgraded
+        self.tenant.save()
+        features = get_plan_features(self.tenant)
+        self.assertEqual(features.plan_name, "Pro")
+        self.assertTrue(features.has_feature("analytics"))
+
+    def test_unrelated_tenant_saves_keep_cache(self):
+        from api.utils.plan_cache import get_plan_features
+        other = Tenant.objects.create(name="Other School", industry="education", plan=self.plan)
+        get_plan_features(self.tenant)
+        other.name = "Renamed School"
+        other.save()
+        self.tenant.storage_used_mb = 12.5
+        self.tenant.save(update_fields=['storage_used_mb'])
+        with self.assertNumQueries(0):
+            get_plan_features(self.tenant)
+
+
+class RateLimiterTests(TestCase):
+    class FakeRedis:
+        """Minimal Redis-protocol stand-in supporting the limiter's pipeline"""
+        def __init__(self):
+            self.store = {}
+            self.round_trips = 0
+
+        def pipeline(self, transaction=True):
+            fake = self
+
+            class Pipeline:
+                def __init__(self):
+                    self.ops = []
+
+                def incr(self, key):
+                    self.ops.append(('incr', key))
+
+                def expire(self, key, seconds):
+                    self.ops.append(('expire', key))
+
+                def get(self, key):
+                    self.ops.append(('get', key))
+
+                def execute(self):
+                    fake.round_trips += 1
+                    replies = []
+                    for op, key in self.ops:
+                        if op == 'incr':
+                            fake.store[key] = fake.store.get(key, 0) + 1
+                            replies.append(fake.store[key])
+                        elif op == 'expire':
+                            replies.append(True)
+                        else:
+                            value = fake.store.get(key)
+                            replies.append(str(value).encode() if value is not None else None)
+                    return replies
+            return Pipeline()
+
+    def rules(self):
+        from api.utils.rate_limit import RateLimitRule
+        return [RateLimitRule('minute', 3, 60), RateLimitRule('hour', 5, 3600)]
+
+    def test_local_backend_enforces_tightest_window(self):
+        from api.utils.rate_limit import LocalBackend
+        backend = LocalBackend()
+        now = 120.0
+        results = [backend.hit('ip-1', self.rules(), now=now + i) for i in range(4)]
+        self.assertEqual([r.allowed for r in results], [True, True, True, False])
+        self.assertEqual(results[-1].exceeded.name, 'minute')
+        # Denied hits are not counted; a new minute frees the minute window but the hour still applies
+        self.assertTrue(backend.hit('ip-1', self.rules(), now=now + 120).allowed)
+        self.assertTrue(backend.hit('ip-1', self.rules(), now=now + 121).allowed)
+        denied = backend.hit('ip-1', self.rules(), now=now + 122)
+        self.assertEqual(denied.exceeded.name, 'hour')
+        self.assertTrue(backend.hit('ip-2', self.rules(), now=now).allowed)
+
+    def test_redis_backend_uses_one_round_trip(self):
+        from api.utils.rate_limit import RedisBackend
+        client = self.FakeRedis()
+        backend = RedisBackend(client=client)
+        results = [backend.hit('ip-1', self.rules(), now=120.0 + i) for i in range(4)]
+        self.assertEqual([r.allowed for r in results], [True, True, True, False])
+        self.assertEqual(client.round_trips, 4)
+
+    def test_missing_redis_falls_back_to_local_backend(self):
+        from unittest import mock
+        from django.test import override_settings
+        from api.utils import rate_limit
+        rate_limit.set_rate_limiter(None)
+        try:
+            with override_settings(RATE_LIMIT_BACKEND='', RATE_LIMIT_REDIS_URL='redis://localhost:6379/0'), \
+                    mock.patch.object(rate_limit, 'redis', None), \
+                    self.assertLogs('api.utils.rate_limit', level='ERROR'):
+                self.assertIsInstance(rate_limit.get_rate_limiter(), rate_limit.LocalBackend)
+        finally:
+            rate_limit.set_rate_limiter(None)
+
+    def test_sliding_window_weights_previous_window(self):
+        from api.utils.rate_limit import sliding_count
+        self.assertEqual(sliding_count(10, 2, 60, 30), 7)
+        self.assertEqual(sliding_count(10, 2, 60, 0), 12)
+
+
+class AuditLogBufferTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Test School", industry="education")
+        self.user = User.objects.create_user(username="admin", password="adminpass")
+        self.profile = UserProfile.objects.create(user=self.user, tenant=self.tenant)
+
+    def entry(self, **overrides):
+        entry = {
+            'user_id': self.user.id, 'user_profile_id': self.profile.id, 'action': 'UPDATE',
+            'resource_type': 'EDUCATION', 'resource_id': None, 'request_method': 'POST',
+            'request_path': '/api/education/students/', 'response_status': 201, 'success': True,
+            'ip_address': '127.0.0.1', 'user_agent': 'test', 'query_params': None,
+            'raw_body': b'{"name": "Student 1", "password": "secret"}',
+        }
+        entry.update(overrides)
+        return entry
+
+    def test_flush_bulk_creates_and_sanitizes(self):
+        from api.models.audit import AuditLog
+        from api.utils.audit_buffer import AuditLogBuffer
+        buffer = AuditLogBuffer(batch_size=10, autostart=False)
+        for _ in range(3):
+            buffer.enqueue(self.entry())
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 3)
+        log = AuditLog.objects.first()
+        self.assertEqual(log.request_data, {'name': 'Student 1', 'password': '[REDACTED]'})
+        self.assertEqual(buffer.stats()['queue_depth'], 0)
+
+    def test_full_buffer_drops_oldest_and_view_sampling(self):
+        from api.utils.audit_buffer import AuditLogBuffer
+        buffer = AuditLogBuffer(capacity=2, view_sample_rate=0, autostart=False)
+        for _ in range(3):
+            buffer.enqueue(self.entry())
+        self.assertFalse(buffer.should_record('VIEW'))
+        self.assertTrue(buffer.should_record('DELETE'))
+        stats = buffer.stats()
+        self.assertEqual((stats['queue_depth'], stats['dropped'], stats['sampled_out']), (2, 1, 1))
+
+
+class VisitorTrackerTests(TestCase):
+    def test_coalesces_new_and_returning_visits(self):
+        from django.utils import timezone
+        from datetime import timedelta
+        from api.models.visitor_lead import VisitorLead
+        from api.utils.visitor_tracker import VisitorTracker
+        tracker = VisitorTracker(autostart=False)
+        now = timezone.now()
+        defaults = {'ip_address': '127.0.0.1', 'utm_source': 'campaign'}
+        with self.assertNumQueries(0):
+            for i in range(5):
+                tracker.track('new-token', defaults, i == 0, now + timedelta(seconds=i))
+        self.assertEqual(tracker.flush(), (1, 0))
+        lead = VisitorLead.objects.get(visitor_token='new-token')
+        self.assertEqual(lead.last_seen, now + timedelta(seconds=4))
+
+        later = now + timedelta(minutes=5)
+        with self.assertNumQueries(0):
+            tracker.track('new-token', defaults, False, later)
+        with self.assertNumQueries(1):
+            self.assertEqual(tracker.flush(), (0, 1))
+        lead.refresh_from_db()
+        self.assertEqual(lead.last_seen, later)
+
+    def test_unknown_returning_token_resolved_once(self):
+        from django.utils import timezone
+        from api.models.visitor_lead import VisitorLead
+        from api.utils.visitor_tracker import VisitorTracker
+        VisitorLead.objects.create(visitor_token='returning')
+        tracker = VisitorTracker(autostart=False)
+        tracker.track('returning', {}, False, timezone.now())
+        with self.assertNumQueries(0):
+            tracker.track('returning', {}, False, timezone.now())
+        self.assertEqual(VisitorLead.objects.count(), 1)
+
+
+class RequestMetricsTests(TestCase):
+    def test_fingerprint_collapses_values(self):
+        from api.utils.request_metrics import fingerprint
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 5 AND name = 'x' AND pk IN (%s, %s, %s)"),
+            fingerprint("SELECT * FROM t WHERE id = 7 AND name = 'y' AND pk IN (%s)"),
+        )
+
+    def test_repeated_queries_flagged_and_exported(self):
+        from django.test import RequestFactory, override_settings
+        from django.http import HttpResponse
+        from api.middleware.request_metrics import RequestMetricsMiddleware
+        from api.utils.request_metrics import registry, render_prometheus
+        registry.reset()
+
+        def n_plus_one_view(request):
+            for pk in range(12):
+                list(Role.objects.filter(pk=pk))
+            return HttpResponse('ok')
+
+        with override_settings(REQUEST_METRICS={'RESPONSE_HEADERS': True, 'N_PLUS_ONE_THRESHOLD': 10, 'LOG_N_PLUS_ONE': False}):
+            middleware = RequestMetricsMiddleware(n_plus_one_view)
+        response = middleware(RequestFactory().get('/api/roles/'))
+        self.assertEqual(response['X-Query-Count'], '12')
+        self.assertEqual(response['X-N-Plus-One'], '12')
+        output = render_prometheus()
+        self.assertIn('erp_request_n_plus_one_total{route="unmatched",method="GET",status="2xx"} 1', output)
+        self.assertIn('erp_request_queries_count{route="unmatched",method="GET",status="2xx"} 1', output)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_synthetic_tenant_and_regression_check(self):
+        from api.utils.synthetic_tenant import SyntheticTenantBuilder, find_synthetic_tenant
+        from api.utils.benchmark import ENDPOINTS, run_benchmarks, compare_results
+        synthetic = SyntheticTenantBuilder(
+            'Bench Test', scale='small', batch_size=50, log=lambda message: None,
+            classes=2, students=10, attendance_days=3, fee_payments=5, products=4,
+            retail_customers=3, retail_sales=20, medicines=2, pharmacy_batches=6,
+        ).build()
+        counts = synthetic.counts()
+        self.assertEqual(counts['students'], 10)
+        self.assertEqual(counts['attendance'], 30)
+        self.assertEqual(counts['retail_sales'], 20)
+        self.assertEqual(counts['pharmacy_batches'], 6)
+        self.assertEqual(find_synthetic_tenant('Bench Test').tenant, synthetic.tenant)
+
+        endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in ('retail.sales', 'retail.sales.create')]
+        results = run_benchmarks(synthetic, endpoints, iterations=1, warmup=0, log=lambda message: None)
+        self.assertEqual(results['endpoints']['retail.sales']['status'], 200)
+        self.assertEqual(results['endpoints']['retail.sales.create']['status'], 201)
+        self.assertEqual(compare_results(results, results), [])
+
+        slower = {'endpoints': {'retail.sales': dict(results['endpoints']['retail.sales'])}}
+        slower['endpoints']['retail.sales']['queries'] += 3
+        slower['endpoints']['retail.sales']['p50_ms'] += 1000
+        regressions = compare_results(results, slower)
+        self.assertEqual(len(regressions), 2)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name="Job School", industry="education")
+        self.other_tenant = Tenant.objects.create(name="Other School", industry="education")
+        self.role = Role.objects.create(name="admin")
+        self.user = User.objects.create_user(username="jobadmin", password="jobpass")
+        self.profile = UserProfile.objects.create(user=self.user, tenant=self.tenant, role=self.role)
+
+    def test_worker_runs_jobs_by_priority(self):
+        from api.utils.jobs import enqueue, Worker
+        low = enqueue('api.tests.echo_job_task', {'value': 1}, tenant=self.tenant)
+        high = enqueue(echo_job_task, {'value': 2}, tenant=self.other_tenant, priority=10)
+        worker = Worker(concurrency=1, name='test')
+        self.assertEqual(worker.run_once(), 1)
+        high.refresh_from_db()
+        low.refresh_from_db()
+        self.assertEqual(high.status, 'succeeded')
+        self.assertEqual(high.result, {'value': 2})
+        self.assertEqual(low.status, 'queued')
+        self.assertEqual(worker.run_once(), 1)
+        self.assertEqual(worker.run_once(), 0)
+
+    def test_tenant_concurrency_cap(self):
+        from api.utils.jobs import enqueue, claim_jobs, queue_settings
+        options = dict(queue_settings(), TENANT_CONCURRENCY=2)
+        for value in range(4):
+            enqueue(echo_job_task, {'value': value}, tenant=self.tenant)
+        enqueue(echo_job_task, {'value': 9}, tenant=self.other_tenant)
+        claimed = claim_jobs('test', 10, options)
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(sum(1 for job in claimed if job.tenant_id == self.tenant.id), 2)
+        self.assertEqual(claim_jobs('test', 10, options), [])
+
+    def test_failed_job_retried_then_marked_failed(self):
+        from django.utils import timezone
+        from api.models.jobs import Job
+        from api.utils.jobs import enqueue, Worker
+        job = enqueue(failing_job_task, tenant=self.tenant, max_attempts=2)
+        worker = Worker(concurrency=1, name='test')
+        worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.error)
+        self.assertEqual(worker.run_once(), 0)  # still backing off
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_stale_running_job_requeued(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from api.models.jobs import Job
+        from api.utils.jobs import enqueue, requeue_stale_jobs, queue_settings
+        job = enqueue(echo_job_task, {'value': 1}, tenant=self.tenant)
+        Job.objects.filter(id=job.id).update(status='running', attempts=1,
+                                             locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(queue_settings()), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+
+    def test_status_and_cancel_api(self):
+        from api.utils.jobs import enqueue
+        job = enqueue(echo_job_task, {'value': 1}, tenant=self.tenant, created_by=self.profile)
+        foreign = enqueue(echo_job_task, {'value': 2}, tenant=self.other_tenant)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get(reverse('job-detail', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(client.get(reverse('job-detail', args=[foreign.id])).status_code, 404)
+        self.assertEqual(client.get(reverse('job-list')).data['total_count'], 1)
+
+        response = client.post(reverse('job-cancel', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.assertEqual(client.post(reverse('job-cancel', args=[job.id])).status_code, 409)
+
+    def test_non_admin_sees_only_own_jobs(self):
+        from api.utils.jobs import enqueue
+        admin_job = enqueue(echo_job_task, {'value': 1}, tenant=self.tenant, created_by=self.profile)
+        student_user = User.objects.create_user(username="jobstudent", password="jobpass")
+        student = UserProfile.objects.create(user=student_user, tenant=self.tenant, role=Role.objects.create(name="student"))
+        own_job = enqueue(echo_job_task, {'value': 2}, tenant=self.tenant, created_by=student)
+        client = APIClient()
+        client.force_authenticate(user=student_user)
+
+        self.assertEqual(client.get(reverse('job-detail', args=[admin_job.id])).status_code, 404)
+        self.assertEqual(client.post(reverse('job-cancel', args=[admin_job.id])).status_code, 404)
+        self.assertEqual(client.get(reverse('job-download', args=[admin_job.id])).status_code, 404)
+        listed = client.get(reverse('job-list')).data
+        self.assertEqual([row['id'] for row in listed['jobs']], [own_job.id])
+        self.assertEqual(client.get(reverse('job-detail', args=[own_job.id])).status_code, 200)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from api.models.notifications import Notification
+        self.tenant = Tenant.objects.create(name="Cursor School", industry="education")
+        self.role = Role.objects.create(name="admin")
+        self.user = User.objects.create_user(username="cursoradmin", password="cursorpass")
+        UserProfile.objects.create(user=self.user, tenant=self.tenant, role=self.role)
+        Notification.objects.bulk_create([
+            Notification(user=self.user, tenant=self.tenant, title=f"N{index}", message="m")
+            for index in range(7)
+        ])
+        # Identical sort keys so pages must break ties on id
+        Notification.objects.update(created_at=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        url = reverse('notification-list')
+        seen, cursor, pages = [], '', 0
+        while cursor is not None:
+            with self.assertNumQueries(2):  # profile + one page query, no COUNT
+                response = self.client.get(url, {'cursor': cursor, 'page_size': 3})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['id'] for item in response.data['notifications'])
+            cursor = response.data['next_cursor']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+        first = self.client.get(url, {'cursor': '', 'page_size': 3}).data
+        second = self.client.get(url, {'cursor': first['next_cursor'], 'page_size': 3}).data
+        third = self.client.get(url, {'cursor': second['next_cursor'], 'page_size': 3}).data
+        back = self.client.get(url, {'cursor': third['previous_cursor'], 'page_size': 3}).data
+        self.assertEqual([item['id'] for item in back['notifications']], seen[3:6])
+        self.assertTrue(back['has_previous'])
+        self.assertTrue(back['has_next'])
+        start = self.client.get(url, {'cursor': back['previous_cursor'], 'page_size': 3}).data
+        self.assertEqual([item['id'] for item in start['notifications']], seen[:3])
+        self.assertFalse(start['has_previous'])
+
+    def test_bad_cursor_and_cached_count(self):
+        from api.utils.pagination import estimate_count
+        from api.models.notifications import Notification
+        url = reverse('notification-list')
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        response = self.client.get(url, {'cursor': '', 'include_count': 'true'})
+        self.assertEqual(response.data['total_count'], 7)
+        with self.assertNumQueries(2):  # profile + page; the total comes from the cache
+            response = self.client.get(url, {'cursor': response.data['next_cursor'] or '', 'include_count': 'true'})
+        self.assertEqual(response.data['total_count'], 7)
+        queryset = Notification.objects.filter(tenant=self.tenant)
+        self.assertEqual(estimate_count(queryset), (7, False))
+        with self.assertNumQueries(0):
+            self.assertEqual(estimate_count(queryset), (7, False))
+
+    def test_default_pagination_unchanged_without_cursor(self):
+        from django.test import RequestFactory
+        from rest_framework.request import Request
+        from api.models.notifications import Notification
+        from api.utils.pagination import HybridPagination
+        paginator = HybridPagination()
+        queryset = Notification.objects.order_by('-created_at')
+        request = Request(RequestFactory().get('/api/notifications/'))
+        page = paginator.paginate_queryset(queryset, request)
+        self.assertEqual(len(page), 7)
+        self.assertEqual(paginator.get_paginated_response([]).data['count'], 7)
+
+        request = Request(RequestFactory().get('/api/notifications/', {'cursor': '', 'page_size': 5}))
+        page = paginator.paginate_queryset(queryset, request)
+        self.assertEqual(len(page), 5)
+        data = paginator.get_paginated_response([]).data
+        self.assertNotIn('count', data)
+        self.assertIn('cursor=', data['next'])
+
+
+class HotQueryIndexTests(TestCase):
+    """The planner serves the hot tenant + date/status filters from composite indexes"""
+
+    def setUp(self):
+        from django.db import connection
+        self.tenant = Tenant.objects.create(name="Index School", industry="education")
+        if connection.vendor == 'postgresql':
+            # Empty test tables always favour a sequential scan
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, fields):
+        from django.db import connection
+        model = queryset.model
+        names = [index.name for index in model._meta.indexes if list(index.fields) == fields]
+        if not names:
+            names = [constraint.name for constraint in model._meta.constraints
+                     if list(getattr(constraint, 'fields', [])) == fields]
+            if names and connection.vendor == 'sqlite':
+                # SQLite names inline UNIQUE constraints itself
+                names = [f"sqlite_autoindex_{model._meta.db_table}_"]
+        self.assertEqual(len(names), 1, f"{model.__name__} declares no index on {fields}")
+        self.assertIn(names[0], queryset.explain(), f"{model.__name__} query does not use {names[0]}")
+
+    def test_hot_queries_use_composite_indexes(self):
+        from datetime import date, timedelta
+        from django.utils import timezone
+        from api.models.notifications import Notification
+        from retail.models import Sale as RetailSale
+        from pharmacy.models import Sale as PharmacySale, MedicineBatch
+        from education.models import Attendance, FeePayment, FeeInstallment, StaffAttendance, Student
+        from hotel.models import Booking
+        from salon.models import Appointment
+        from restaurant.models import Order
+        tenant, today, now = self.tenant, date.today(), timezone.now()
+
+        self.assertUsesIndex(RetailSale.objects.filter(tenant=tenant).order_by('-sale_date')[:10], ['tenant', 'sale_date'])
+        self.assertUsesIndex(RetailSale.objects.filter(tenant=tenant, payment_status='PENDING'), ['tenant', 'payment_status'])
+        self.assertUsesIndex(PharmacySale.objects.filter(tenant=tenant, sale_date__gte=now - timedelta(days=30)), ['tenant', 'sale_date'])
+        self.assertUsesIndex(MedicineBatch.objects.filter(tenant=tenant, expiry_date__lte=today), ['tenant', 'expiry_date'])
+        self.assertUsesIndex(Attendance.objects.filter(tenant=tenant, date=today), ['tenant', 'date', 'student'])
+        self.assertUsesIndex(Attendance.objects.filter(student_id=1, date__gte=today), ['student', 'date'])
+        self.assertUsesIndex(FeePayment.objects.filter(tenant=tenant, payment_date__gte=today), ['tenant', 'payment_date'])
+        self.assertUsesIndex(FeeInstallment.objects.filter(tenant=tenant, status='PENDING', due_date__lt=today), ['tenant', 'status', 'due_date'])
+        self.assertUsesIndex(StaffAttendance.objects.filter(tenant=tenant, date=today), ['tenant', 'date'])
+        self.assertUsesIndex(Student.objects.filter(tenant=tenant).order_by('name', 'id')[:50], ['tenant', 'name'])
+        self.assertUsesIndex(Booking.objects.filter(tenant=tenant, check_in__gte=now), ['tenant', 'check_in'])
+        self.assertUsesIndex(Booking.objects.filter(tenant=tenant, status='reserved'), ['tenant', 'status'])
+        self.assertUsesIndex(Appointment.objects.filter(tenant=tenant, start_time__gte=now), ['tenant', 'start_time'])
+        self.assertUsesIndex(Order.objects.filter(tenant=tenant).order_by('-created_at')[:20], ['tenant', 'created_at'])
+        self.assertUsesIndex(Notification.objects.filter(user_id=1, tenant=tenant).order_by('-created_at')[:20], ['user', 'created_at'])
+
+
+class PdfCacheTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from datetime import date
+        from django.core.cache import cache
+        from django.test import override_settings
+        from api.models.plan import Plan
+        from education.models import Class, FeeStructure, Student
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        plan = Plan.objects.create(name="Edu", description="Education plan", storage_limit_mb=512, has_education=True)
+        self.tenant = Tenant.objects.create(name="Receipt School", industry="education", plan=plan)
+        self.user = User.objects.create_user(username="bursar", password="bursarpass", email="office@school.test")
+        self.profile = UserProfile.objects.create(user=self.user, tenant=self.tenant, role=Role.objects.create(name="admin"),
+                                                  phone="111")
+        class_obj = Class.objects.create(name="Class 3", tenant=self.tenant)
+        student = Student.objects.create(name="Payer", tenant=self.tenant, assigned_class=class_obj, admission_date=date(2024, 4, 1))
+        fee = FeeStructure.objects.create(tenant=self.tenant, class_obj=class_obj, fee_type='TUITION', amount=1000)
+        self.payment = FeePayment.objects.create(tenant=self.tenant, student=student, fee_structure=fee,
+                                                 amount_paid=400, receipt_number="R-100")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('education-fee-payment-receipt', args=[self.payment.id])
+
+    def download(self, **headers):
+        from unittest import mock
+        from api.views.education_views import FeePaymentReceiptPDFView
+        with mock.patch.object(FeePaymentReceiptPDFView, 'render_pdf', autospec=True,
+                               side_effect=FeePaymentReceiptPDFView.render_pdf) as render:
+            response = self.client.get(self.url, **headers)
+        return response, render.call_count
+
+    def test_receipt_rendered_once_then_served_from_cache(self):
+        first, renders = self.download()
+        self.assertEqual((first.status_code, renders), (200, 1))
+        self.assertTrue(first.content.startswith(b'%PDF'))
+        again, renders = self.download()
+        self.assertEqual((again.content, again['ETag'], renders), (first.content, first['ETag'], 0))
+
+        not_modified, renders = self.download(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((not_modified.status_code, renders), (304, 0))
+
+    def test_source_changes_invalidate(self):
+        from api.utils.pdf_cache import document_dir, pdf_storage
+        first, _ = self.download()
+        directory = document_dir('fee_receipt', self.tenant.id, self.payment.id)
+        self.assertEqual(len(pdf_storage().listdir(directory)[1]), 1)
+
+        self.payment.amount_paid = 500
+        self.payment.save()
+        updated, renders = self.download()
+        self.assertEqual(renders, 1)
+        self.assertNotEqual(updated['ETag'], first['ETag'])
+        # The new version replaces the stored file
+        self.assertEqual(len(pdf_storage().listdir(directory)[1]), 1)
+
+        # Contact details printed on the receipt come from the admin profile
+        self.profile.phone = "222"
+        self.profile.save()
+        response, renders = self.download(HTTP_IF_NONE_MATCH=updated['ETag'])
+        self.assertEqual((response.status_code, renders), (200, 1))
+        self.assertEqual(len(pdf_storage().listdir(directory)[1]), 1)
+
+        # So is the logo in the header
+        self.tenant.logo.name = 'tenant_logos/crest.png'
+        self.tenant.save(update_fields=['logo'])
+        logo_changed, renders = self.download(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual((logo_changed.status_code, renders), (200, 1))
+
+        self.payment.delete()
+        self.assertEqual(pdf_storage().listdir(directory)[1], [])
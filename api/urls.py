@@ -12,7 +12,7 @@ from .views.timetable_views import (
     TimetableListCreateView, TimetableDetailView, TimetableByClassView,
     HolidayListCreateView, HolidayDetailView,
     SubstituteTeacherListCreateView, SubstituteTeacherDetailView,
-    AvailableTeachersView, AvailableRoomsView, TimetableSuggestionsView
+    AvailableTeachersView, AvailableRoomsView, TimetableSuggestionsView, GenerateTimetableView
 )
 from .views.reporting_views import (
     ReportFieldListCreateView, ReportFieldDetailView,
@@ -22,10 +22,11 @@ from .views.reporting_views import (
 from .views.exam_views import (
     ExamListCreateView, ExamDetailView,
     ExamScheduleListCreateView, ExamScheduleDetailView,
-    SeatingArrangementListCreateView, SeatingArrangementDetailView,
-    HallTicketListCreateView, HallTicketDetailView, GenerateHallTicketsView
+    SeatingArrangementListCreateView, SeatingArrangementDetailView, AllocateSeatsView, ExamScheduleConflictsView,
+    HallTicketListCreateView, HallTicketDetailView, GenerateHallTicketsView, HallTicketPDFView
 )
 from .views import notification_views
+from .views import job_views
 from .views import enhanced_analytics_views
 from api.views.education_views import ExportClassStatsCSVView, ExportMonthlyReportCSVView, StaffAttendanceCheckInView, ClassAttendanceStatusView, StaffAttendanceCheckOutView
 from api.views.users_views import UserProfileViewSet
@@ -162,11 +163,14 @@ urlpatterns = [
     path('education/analytics/fee-collection/', education_views.FeeCollectionView.as_view(), name='education-fee-collection'),
     path('education/analytics/class-performance/', education_views.ClassPerformanceView.as_view(), name='education-class-performance'),
     path('education/attendance/', education_views.AttendanceListCreateView.as_view(), name='education-attendance'),
+    path('education/attendance/bulk/', education_views.AttendanceBulkMarkView.as_view(), name='education-attendance-bulk'),
     path('education/attendance/<int:pk>/', education_views.AttendanceDetailView.as_view(), name='education-attendance-detail'),
     path('education/reportcards/', education_views.ReportCardListCreateView.as_view(), name='education-reportcards'),
     path('education/reportcards/<int:pk>/', education_views.ReportCardDetailView.as_view(), name='education-reportcard-detail'),
     path('education/reportcards/<int:pk>/pdf/', education_views.ReportCardPDFView.as_view(), name='education-reportcard-pdf'),
+    path('education/reportcards/pdf-batch/', education_views.ReportCardPDFBatchView.as_view(), name='education-reportcard-pdf-batch'),
     path('education/reportcards/generate/', education_views.ReportCardGenerateView.as_view(), name='education-reportcard-generate'),
+    path('education/reportcards/generate-class/', education_views.ReportCardClassGenerateView.as_view(), name='education-reportcard-generate-class'),
     
     # Academic Structure endpoints
     path('education/academic-years/', education_views.AcademicYearListCreateView.as_view(), name='education-academic-years'),
@@ -194,6 +198,7 @@ urlpatterns = [
     path('education/installment-plans/<int:pk>/', education_views.FeeInstallmentPlanDetailView.as_view(), name='education-installment-plan-detail'),
     path('education/installments/', education_views.FeeInstallmentListCreateView.as_view(), name='education-installments'),
     path('education/installments/generate/', education_views.FeeInstallmentGenerateView.as_view(), name='education-installments-generate'),
+    path('education/installments/generate-bulk/', education_views.FeeInstallmentBulkGenerateView.as_view(), name='education-installments-generate-bulk'),
     path('education/installments/regenerate/', education_views.FeeInstallmentRegenerateView.as_view(), name='education-installments-regenerate'),
     path('education/installments/<int:pk>/', education_views.FeeInstallmentDetailView.as_view(), name='education-installment-detail'),
     path('education/students/<int:student_id>/installments/', education_views.StudentInstallmentsView.as_view(), name='education-student-installments'),
@@ -213,6 +218,7 @@ urlpatterns = [
     path('education/timetable/available-teachers/', AvailableTeachersView.as_view(), name='education-available-teachers'),
     path('education/timetable/available-rooms/', AvailableRoomsView.as_view(), name='education-available-rooms'),
     path('education/timetable/suggestions/', TimetableSuggestionsView.as_view(), name='education-timetable-suggestions'),
+    path('education/timetable/generate/', GenerateTimetableView.as_view(), name='education-generate-timetable'),
     
     # Advanced Reporting System
     path('education/reports/fields/', ReportFieldListCreateView.as_view(), name='education-report-fields'),
@@ -227,11 +233,14 @@ urlpatterns = [
     path('education/exams/<int:pk>/', ExamDetailView.as_view(), name='education-exam-detail'),
     path('education/exam-schedules/', ExamScheduleListCreateView.as_view(), name='education-exam-schedules'),
     path('education/exam-schedules/<int:pk>/', ExamScheduleDetailView.as_view(), name='education-exam-schedule-detail'),
+    path('education/exam-schedules/conflicts/', ExamScheduleConflictsView.as_view(), name='education-exam-schedule-conflicts'),
+    path('education/exam-schedules/<int:pk>/allocate-seats/', AllocateSeatsView.as_view(), name='education-allocate-seats'),
     path('education/seating-arrangements/', SeatingArrangementListCreateView.as_view(), name='education-seating-arrangements'),
     path('education/seating-arrangements/<int:pk>/', SeatingArrangementDetailView.as_view(), name='education-seating-arrangement-detail'),
     path('education/hall-tickets/', HallTicketListCreateView.as_view(), name='education-hall-tickets'),
     path('education/hall-tickets/<int:pk>/', HallTicketDetailView.as_view(), name='education-hall-ticket-detail'),
     path('education/hall-tickets/generate/', GenerateHallTicketsView.as_view(), name='education-generate-hall-tickets'),
+    path('education/hall-tickets/<int:pk>/pdf/', HallTicketPDFView.as_view(), name='education-hall-ticket-pdf'),
     
     path('education/installments/overdue/', education_views.OverdueInstallmentsView.as_view(), name='education-overdue-installments'),
     
@@ -295,6 +304,12 @@ urlpatterns = [
     path('notifications/preferences/', notification_views.NotificationPreferenceView.as_view(), name='notification-preferences'),
     path('notifications/bulk-delete/', notification_views.NotificationBulkDeleteView.as_view(), name='notification-bulk-delete'),
     
+    # Background jobs (status, cancel and download of queued work)
+    path('jobs/', job_views.JobListView.as_view(), name='job-list'),
+    path('jobs/<int:job_id>/', job_views.JobDetailView.as_view(), name='job-detail'),
+    path('jobs/<int:job_id>/cancel/', job_views.JobCancelView.as_view(), name='job-cancel'),
+    path('jobs/<int:job_id>/download/', job_views.JobDownloadView.as_view(), name='job-download'),
+    
     # # Payments
     # path('payments/create-order/', payments_views.CreateOrderView.as_view(), name='create-order'),
     # path('payments/verify/', payments_views.VerifyPaymentView.as_view(), name='verify-payment'),
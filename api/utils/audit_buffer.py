@@ -0,0 +1,214 @@
+"""
+Write-behind buffer for audit log entries.
+
+AuditLogMiddleware enqueues plain dicts into a bounded in-process ring buffer;
+a background flusher thread turns them into AuditLog rows with bulk_create
+whenever BATCH_SIZE entries are waiting or FLUSH_INTERVAL seconds have passed.
+The remaining entries are flushed at interpreter/worker shutdown.
+
+When the buffer is full the oldest entries are overwritten and counted as
+dropped, so a slow database degrades audit completeness instead of request
+latency. `stats()` exposes the counters for monitoring.
+
+Settings (all optional), e.g.:
+    AUDIT_LOG_BUFFER = {
+        'CAPACITY': 10000,        # max queued entries
+        'BATCH_SIZE': 500,        # rows per bulk_create / flush trigger
+        'FLUSH_INTERVAL': 2.0,    # seconds between time-based flushes
+        'VIEW_SAMPLE_RATE': 1.0,  # fraction of VIEW (GET) actions recorded
+    }
+"""
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CAPACITY': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+    'VIEW_SAMPLE_RATE': 1.0,
+}
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+def buffer_settings():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'AUDIT_LOG_BUFFER', {}) or {})
+    return options
+
+
+def parse_request_data(entry):
+    """Decode the deferred request payload of an entry (runs on the flusher thread)"""
+    from api.models.audit import AuditLog
+
+    data = dict(entry.pop('query_params', None) or {})
+    body = entry.pop('raw_body', None)
+    if body:
+        try:
+            parsed = json.loads(body.decode('utf-8'))
+            if isinstance(parsed, dict):
+                data.update(parsed)
+        except (ValueError, UnicodeDecodeError):
+            pass
+    return AuditLog.sanitize_request_data(data) if data else None
+
+
+class AuditLogBuffer:
+    def __init__(self, capacity=None, batch_size=None, flush_interval=None,
+                 view_sample_rate=None, autostart=True):
+        options = buffer_settings()
+        self.capacity = capacity or options['CAPACITY']
+        self.batch_size = batch_size or options['BATCH_SIZE']
+        self.flush_interval = flush_interval or options['FLUSH_INTERVAL']
+        self.view_sample_rate = (options['VIEW_SAMPLE_RATE']
+                                 if view_sample_rate is None else view_sample_rate)
+        self.autostart = autostart
+
+        self._queue = deque(maxlen=self.capacity)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.flushed = 0
+        self.failed = 0
+        self.last_flush_seconds = 0.0
+
+    # Producer side -------------------------------------------------------
+
+    def should_record(self, action):
+        """Apply the sampling policy; only VIEW actions are sampled"""
+        if action != 'VIEW' or self.view_sample_rate >= 1:
+            return True
+        if random.random() < self.view_sample_rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+    def enqueue(self, entry):
+        """Queue one entry (a dict of AuditLog field values). Never touches the DB."""
+        with self._lock:
+            if len(self._queue) == self.capacity:
+                self.dropped += 1
+            self._queue.append(entry)
+            self.enqueued += 1
+            depth = len(self._queue)
+        if self.autostart:
+            self._ensure_thread()
+            if depth >= self.batch_size:
+                self._wakeup.set()
+
+    # Consumer side -------------------------------------------------------
+
+    def _drain(self, limit):
+        with self._lock:
+            count = min(limit, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def flush(self):
+        """Write all queued entries now; returns the number of rows written"""
+        from api.models.audit import AuditLog
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                started = time.monotonic()
+                try:
+                    rows = []
+                    for entry in batch:
+                        entry['request_data'] = parse_request_data(entry)
+                        rows.append(AuditLog(**entry))
+                    AuditLog.objects.bulk_create(rows, batch_size=self.batch_size)
+                    written += len(rows)
+                    self.flushed += len(rows)
+                except Exception as e:
+                    self.failed += len(batch)
+                    logger.error(f"Error flushing {len(batch)} audit log entries: {str(e)}")
+                self.last_flush_seconds = time.monotonic() - started
+        return written
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork(); restart the flusher in each worker process
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout=10):
+        """Stop the flusher and write whatever is still queued"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing audit log buffer at shutdown: {str(e)}")
+
+    def stats(self):
+        """Backpressure metrics for monitoring"""
+        with self._lock:
+            depth = len(self._queue)
+        return {
+            'queue_depth': depth,
+            'capacity': self.capacity,
+            'utilization': depth / self.capacity if self.capacity else 0,
+            'enqueued': self.enqueued,
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'sampled_out': self.sampled_out,
+            'last_flush_seconds': self.last_flush_seconds,
+        }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_audit_buffer():
+    """Process-wide buffer used by AuditLogMiddleware"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = AuditLogBuffer()
+                atexit.register(_buffer.shutdown)
+    return _buffer
+
+
+def shutdown_audit_buffer():
+    """Flush the process-wide buffer (called from gunicorn's worker_exit hook)"""
+    if _buffer is not None:
+        _buffer.shutdown()
@@ -0,0 +1,205 @@
+"""
+Endpoint benchmark runner.
+
+Each endpoint is requested through the full middleware stack with an
+authenticated APIClient:
+- `warmup` untimed requests,
+- `iterations` timed requests (p50/p95/max latency),
+- one instrumented request recording the SQL query count and the peak Python
+  memory allocated while serving it (tracemalloc).
+
+Results are plain dicts that serialize to JSON. compare_results() checks a run
+against a stored baseline and returns one message per regression.
+"""
+import json
+import logging
+import os
+import platform
+import time
+import tracemalloc
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.utils.rate_limit import BaseBackend, RateLimitResult, get_rate_limiter, set_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCES = {
+    'latency': 0.25,      # allowed relative p50 increase
+    'latency_floor_ms': 5.0,
+    'memory': 0.25,       # allowed relative peak memory increase
+    'memory_floor_kb': 256,
+    'queries': 0,         # allowed extra queries
+}
+
+
+class Endpoint:
+    """A named request to benchmark; `payload` may be a callable taking the SyntheticTenant"""
+
+    def __init__(self, name, url_name, method='get', params=None, payload=None):
+        self.name = name
+        self.url_name = url_name
+        self.method = method
+        self.params = params or {}
+        self.payload = payload
+
+    def request(self, client, synthetic):
+        url = reverse(self.url_name)
+        # Production redirects plain HTTP to HTTPS, development redirects HTTPS to HTTP
+        secure = not settings.DEBUG
+        if self.method == 'get':
+            return client.get(url, self.params, secure=secure)
+        payload = self.payload(synthetic) if callable(self.payload) else self.payload
+        return getattr(client, self.method)(url, payload, format='json', secure=secure)
+
+
+ENDPOINTS = [
+    # Analytics
+    Endpoint('education.analytics', 'education-analytics'),
+    Endpoint('education.analytics.comprehensive', 'education-comprehensive-analytics'),
+    Endpoint('education.analytics.class_stats', 'education-class-stats'),
+    Endpoint('education.analytics.fee_collection', 'education-fee-collection'),
+    Endpoint('pharmacy.analytics', 'pharmacy-analytics'),
+    # Lists
+    Endpoint('education.students', 'education-students'),
+    Endpoint('education.attendance', 'education-attendance'),
+    Endpoint('retail.sales', 'retail-sales'),
+    Endpoint('pharmacy.batches', 'pharmacy-batches'),
+    Endpoint('notifications', 'notification-list'),
+    # Exports
+    Endpoint('education.students.export', 'education-students-export'),
+    Endpoint('education.fee_payments.export', 'education-fee-payments-export'),
+    Endpoint('retail.sales.export', 'retail-sales-export'),
+    # Writes
+    Endpoint('retail.sales.create', 'retail-sales', method='post',
+             payload=lambda synthetic: synthetic.sale_payload()),
+]
+
+
+class _UnlimitedBackend(BaseBackend):
+    """Rate limiter stand-in so benchmark traffic is never throttled"""
+
+    def hit(self, identifier, rules, now=None):
+        return RateLimitResult(True)
+
+    def reset(self, identifier=None):
+        pass
+
+
+def _consume(response):
+    """Drain the response (streaming exports included); returns the body size in bytes"""
+    if getattr(response, 'streaming', False):
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure_endpoint(client, endpoint, synthetic, iterations=5, warmup=1):
+    for _ in range(warmup):
+        _consume(endpoint.request(client, synthetic))
+
+    latencies = []
+    status = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = endpoint.request(client, synthetic)
+        size = _consume(response)
+        latencies.append((time.perf_counter() - started) * 1000)
+        status = response.status_code
+
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            _consume(endpoint.request(client, synthetic))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': status,
+        'p50_ms': round(_percentile(latencies, 0.5), 2),
+        'p95_ms': round(_percentile(latencies, 0.95), 2),
+        'max_ms': round(max(latencies), 2),
+        'queries': len(queries.captured_queries),
+        'peak_kb': round(peak / 1024, 1),
+        'response_kb': round(size / 1024, 1),
+    }
+
+
+def run_benchmarks(synthetic, endpoints=None, iterations=5, warmup=1, log=None):
+    """Benchmark `endpoints` (default ENDPOINTS) against a SyntheticTenant"""
+    log = log or logger.info
+    client = APIClient(raise_request_exception=False)
+    client.force_authenticate(user=synthetic.user)
+    results = {}
+    previous_limiter = get_rate_limiter()
+    set_rate_limiter(_UnlimitedBackend())
+    try:
+        with override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+            for endpoint in endpoints or ENDPOINTS:
+                try:
+                    results[endpoint.name] = measure_endpoint(client, endpoint, synthetic, iterations, warmup)
+                except Exception as e:
+                    logger.error(f"Benchmark of {endpoint.name} failed: {str(e)}")
+                    results[endpoint.name] = {'status': None, 'error': str(e)}
+                log(f"{endpoint.name}: {results[endpoint.name]}")
+    finally:
+        set_rate_limiter(previous_limiter)
+
+    return {
+        'meta': {
+            'tenant': synthetic.tenant.name,
+            'counts': synthetic.counts(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': iterations,
+            'recorded_at': timezone.now().isoformat(),
+        },
+        'endpoints': results,
+    }
+
+
+def compare_results(baseline, current, tolerances=None):
+    """Return a list of human-readable regressions of `current` against `baseline`"""
+    limits = dict(DEFAULT_TOLERANCES)
+    limits.update(tolerances or {})
+    regressions = []
+    for name, now in current.get('endpoints', {}).items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before or before.get('status') is None:
+            continue  # new endpoint, or no usable baseline
+        if now.get('status') is None or (before['status'] < 400 <= now['status']):
+            regressions.append(f"{name}: status {before['status']} -> {now.get('status')}")
+            continue
+        if (now['p50_ms'] > before['p50_ms'] * (1 + limits['latency'])
+                and now['p50_ms'] - before['p50_ms'] > limits['latency_floor_ms']):
+            regressions.append(f"{name}: p50 latency {before['p50_ms']}ms -> {now['p50_ms']}ms")
+        if now['queries'] > before['queries'] + limits['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+        if (now['peak_kb'] > before['peak_kb'] * (1 + limits['memory'])
+                and now['peak_kb'] - before['peak_kb'] > limits['memory_floor_kb']):
+            regressions.append(f"{name}: peak memory {before['peak_kb']}KB -> {now['peak_kb']}KB")
+    return regressions
+
+
+def load_results(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_results(path, results):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write('\n')
@@ -0,0 +1,288 @@
+"""
+Set-based education analytics.
+
+The dashboards used to issue several COUNT/SUM queries per class, student and
+teacher. EducationAnalytics computes the same figures with a fixed number of
+grouped `values().annotate()` queries (conditional aggregation for the
+gender/caste/attendance splits), so a dashboard costs the same number of
+queries for 5 classes or 500. Each grouped result is computed once per
+instance and shared between the sections that need it.
+"""
+from collections import defaultdict
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from api.models.user import UserProfile
+from education.models import Attendance, Class, FeePayment, FeeStructure, StaffAttendance, Student
+
+GENDERS = {'male': 'Male', 'female': 'Female', 'other': 'Other'}
+CASTES = {'general': 'General', 'obc': 'OBC', 'sc': 'SC', 'st': 'ST', 'other': 'Other'}
+
+
+def _display_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+class EducationAnalytics:
+    def __init__(self, tenant, today=None):
+        self.tenant = tenant
+        self.today = today or timezone.now().date()
+        self._cache = {}
+
+    def _memo(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    # Grouped building blocks
+
+    def classes(self):
+        return self._memo('classes', lambda: list(Class._default_manager.filter(tenant=self.tenant).values('id', 'name')))
+
+    def student_totals(self):
+        week_ago = (timezone.now() - timezone.timedelta(days=7)).date()
+        return self._memo('student_totals', lambda: Student._default_manager.filter(tenant=self.tenant).aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            recent_admissions=Count('id', filter=Q(admission_date__gte=week_ago)),
+        ))
+
+    def staff_totals(self):
+        return self._memo('staff_totals', lambda: UserProfile._default_manager.filter(tenant=self.tenant).aggregate(
+            teachers=Count('id', filter=Q(role__name='teacher')),
+            staff=Count('id', filter=~Q(role__name='student')),
+        ))
+
+    def attendance_today(self):
+        def compute():
+            totals = {
+                'staff_present': StaffAttendance._default_manager.filter(
+                    tenant=self.tenant, date=self.today, check_in_time__isnull=False
+                ).count(),
+                'student_present': 0,
+                'by_class': {},
+            }
+            rows = Attendance._default_manager.filter(tenant=self.tenant, date=self.today).values(
+                'student__assigned_class'
+            ).annotate(
+                present_count=Count('id', filter=Q(present=True)),
+                absent_count=Count('id', filter=Q(present=False)),
+            ).order_by()
+            for row in rows:
+                totals['by_class'][row['student__assigned_class']] = row
+                totals['student_present'] += row['present_count']
+            return totals
+        return self._memo('attendance_today', compute)
+
+    def active_students_by_class(self):
+        """Active student counts per class with gender and caste splits"""
+        def compute():
+            aggregates = {'total': Count('id')}
+            for key, value in GENDERS.items():
+                aggregates[f'gender_{key}'] = Count('id', filter=Q(gender=value))
+            for key, value in CASTES.items():
+                aggregates[f'cast_{key}'] = Count('id', filter=Q(cast=value))
+            rows = Student._default_manager.filter(tenant=self.tenant, is_active=True).values(
+                'assigned_class'
+            ).annotate(**aggregates).order_by()
+            return {row['assigned_class']: row for row in rows}
+        return self._memo('students_by_class', compute)
+
+    def fees_due_by_class(self):
+        return self._memo('fees_due_by_class', lambda: {
+            row['class_obj']: row['total']
+            for row in FeeStructure._default_manager.filter(tenant=self.tenant).values('class_obj').annotate(
+                total=Sum('amount')
+            ).order_by()
+        })
+
+    def fees_collected_by_class(self):
+        return self._memo('fees_collected_by_class', lambda: {
+            row['student__assigned_class']: row['total']
+            for row in FeePayment._default_manager.filter(tenant=self.tenant).values('student__assigned_class').annotate(
+                total=Sum('amount_paid')
+            ).order_by()
+        })
+
+    def fee_totals(self):
+        week_ago = (timezone.now() - timezone.timedelta(days=7)).date()
+        def compute():
+            totals = FeePayment._default_manager.filter(tenant=self.tenant).aggregate(
+                collected=Sum('amount_paid'),
+                recent_payments=Count('id', filter=Q(payment_date__gte=week_ago)),
+            )
+            totals['collected'] = totals['collected'] or 0
+            totals['due'] = sum(total or 0 for total in self.fees_due_by_class().values())
+            return totals
+        return self._memo('fee_totals', compute)
+
+    def attendance_records_by_class(self):
+        return self._memo('attendance_records_by_class', lambda: {
+            row['student__assigned_class']: row['total']
+            for row in Attendance._default_manager.filter(tenant=self.tenant).values('student__assigned_class').annotate(
+                total=Count('id')
+            ).order_by()
+        })
+
+    def teachers_by_class(self):
+        def compute():
+            teachers = defaultdict(list)
+            rows = UserProfile._default_manager.filter(
+                tenant=self.tenant, role__name='teacher', assigned_classes__isnull=False
+            ).values(
+                'id', 'assigned_classes', 'user__first_name', 'user__last_name', 'user__username', 'user__email'
+            ).order_by('id')
+            for row in rows:
+                teachers[row['assigned_classes']].append({
+                    'id': row['id'],
+                    'name': _display_name(row['user__first_name'], row['user__last_name'], row['user__username']),
+                    'email': row['user__email'],
+                })
+            return teachers
+        return self._memo('teachers_by_class', compute)
+
+    # Dashboard sections
+
+    def overview(self, active_students_only=False):
+        students = self.student_totals()
+        staff = self.staff_totals()
+        attendance = self.attendance_today()
+        return {
+            'total_students': students['active'] if active_students_only else students['total'],
+            'total_classes': len(self.classes()),
+            'total_teachers': staff['teachers'],
+            'total_staff': staff['staff'],
+            'staff_present_today': attendance['staff_present'],
+            'student_present_today': attendance['student_present'],
+        }
+
+    def class_analytics(self):
+        students = self.active_students_by_class()
+        due_by_class = self.fees_due_by_class()
+        collected_by_class = self.fees_collected_by_class()
+        attendance = self.attendance_today()['by_class']
+        teachers = self.teachers_by_class()
+        analytics = []
+        for class_obj in self.classes():
+            class_id = class_obj['id']
+            class_total_due = due_by_class.get(class_id) or 0
+            class_collected = collected_by_class.get(class_id) or 0
+            present_today = attendance.get(class_id, {}).get('present_count', 0)
+            absent_today = attendance.get(class_id, {}).get('absent_count', 0)
+            analytics.append({
+                'class_id': class_id,
+                'class_name': class_obj['name'],
+                'student_count': students.get(class_id, {}).get('total', 0),
+                'teachers': teachers.get(class_id, []),
+                'fee_summary': {
+                    'total_due': float(class_total_due),
+                    'collected': float(class_collected),
+                    'pending': float(class_total_due - class_collected),
+                    'collection_percentage': round((class_collected / class_total_due * 100) if class_total_due > 0 else 0, 2)
+                },
+                'attendance_today': {
+                    'present': present_today,
+                    'absent': absent_today,
+                    'total': present_today + absent_today,
+                    'percentage': round((present_today / (present_today + absent_today) * 100) if (present_today + absent_today) > 0 else 0, 2)
+                }
+            })
+        return analytics
+
+    def student_analytics(self, limit=50):
+        students = list(
+            Student._default_manager.filter(tenant=self.tenant, is_active=True).select_related('assigned_class')[:limit]
+        )
+        ids = [student.id for student in students]
+        paid = {
+            row['student']: row['total']
+            for row in FeePayment._default_manager.filter(tenant=self.tenant, student_id__in=ids).values('student').annotate(
+                total=Sum('amount_paid')
+            ).order_by()
+        }
+        attendance = {
+            row['student']: row
+            for row in Attendance._default_manager.filter(tenant=self.tenant, student_id__in=ids).values('student').annotate(
+                total=Count('id'), present_count=Count('id', filter=Q(present=True))
+            ).order_by()
+        }
+        due_by_class = self.fees_due_by_class()
+
+        analytics = []
+        for student in students:
+            student_total_due = due_by_class.get(student.assigned_class_id) or 0
+            student_paid = paid.get(student.id) or 0
+            total_attendance = attendance.get(student.id, {}).get('total', 0)
+            present_attendance = attendance.get(student.id, {}).get('present_count', 0)
+            analytics.append({
+                'student_id': student.id,
+                'name': student.name,
+                'upper_id': student.upper_id,
+                'email': student.email,
+                'class_name': student.assigned_class.name if student.assigned_class else 'Not Assigned',
+                'fee_status': {
+                    'total_due': float(student_total_due),
+                    'paid': float(student_paid),
+                    'pending': float(student_total_due - student_paid),
+                    'percentage': round((student_paid / student_total_due * 100) if student_total_due > 0 else 0, 2)
+                },
+                'attendance_percentage': round((present_attendance / total_attendance * 100) if total_attendance > 0 else 0, 2),
+                'admission_date': student.admission_date
+            })
+        return analytics
+
+    def teacher_analytics(self):
+        students = self.active_students_by_class()
+        records = self.attendance_records_by_class()
+        teachers = UserProfile._default_manager.filter(
+            tenant=self.tenant, role__name='teacher'
+        ).select_related('user').prefetch_related('assigned_classes')
+        analytics = []
+        for teacher in teachers:
+            assigned_classes = list(teacher.assigned_classes.all())
+            analytics.append({
+                'teacher_id': teacher.id,
+                'name': teacher.user.get_full_name() or teacher.user.username,
+                'email': teacher.user.email,
+                'assigned_classes': [cls.name for cls in assigned_classes],
+                'students_taught': sum(students.get(cls.id, {}).get('total', 0) for cls in assigned_classes),
+                'attendance_records': sum(records.get(cls.id, 0) for cls in assigned_classes),
+            })
+        return analytics
+
+    def monthly_fee_trends(self, months=12):
+        windows = []
+        for i in range(months):
+            month_date = self.today.replace(day=1) - timezone.timedelta(days=30*i)
+            windows.append(month_date.replace(day=1))
+        totals = {
+            row['month']: row['total']
+            for row in FeePayment._default_manager.filter(
+                tenant=self.tenant, payment_date__gte=min(windows)
+            ).annotate(month=TruncMonth('payment_date')).values('month').annotate(total=Sum('amount_paid')).order_by()
+        }
+        return [
+            {'month': month_start.strftime('%Y-%m'), 'amount': float(totals.get(month_start) or 0)}
+            for month_start in windows
+        ]
+
+    def class_distributions(self):
+        """Gender, per-class and caste breakdowns of active students"""
+        students = self.active_students_by_class()
+        gender_distribution, students_per_class, cast_distribution = [], [], []
+        for class_obj in self.classes():
+            row = students.get(class_obj['id'], {})
+            total = row.get('total', 0)
+            genders = {key: row.get(f'gender_{key}', 0) for key in GENDERS}
+            gender_distribution.append({
+                'class_id': class_obj['id'], 'class_name': class_obj['name'], **genders, 'total': total,
+            })
+            students_per_class.append({
+                'class_name': class_obj['name'], 'count': total, 'total': total, **genders,
+            })
+            cast_distribution.append({
+                'class_id': class_obj['id'], 'class_name': class_obj['name'],
+                **{key: row.get(f'cast_{key}', 0) for key in CASTES}, 'total': total,
+            })
+        return gender_distribution, students_per_class, cast_distribution
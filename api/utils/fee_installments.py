@@ -0,0 +1,218 @@
+"""
+Bulk fee installment generation.
+
+Generating installments used to create each row and then save it a second
+time from update_status(), one student per request. Here a plan's schedule
+is computed once, every student's installments are built in memory with
+their initial status already set, students that already have installments
+for the fee structure are found with one query, and the rest are inserted
+with bulk_create in batches.
+
+Installment status used to change only when update_status() ran on a single
+row. sweep_installments() applies the same rules to every installment (or one
+tenant's) with one UPDATE per target status, and charges late fees in SQL, so
+status can be read straight from the table. Run it daily:
+
+    0 1 * * * cd /path/to/backend && python manage.py sweep_installments
+
+Settings (optional):
+    FEE_INSTALLMENT_SYNC_LIMIT = 200    # larger batches are generated on a job worker
+    FEE_LATE_FEE = {
+        'GRACE_DAYS': 0,    # days after the due date before a late fee is charged
+        'FLAT': '0',        # fixed late fee
+        'PERCENT': '0',     # percentage of the due amount, added to FLAT
+        'MAX': None,        # cap on the late fee
+    }
+A late fee is charged once, on unpaid installments whose late_fee is still
+0, so fees entered or waived by hand are never overwritten.
+"""
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Coalesce, Least, Round
+from django.utils import timezone
+
+from education.models import FeeInstallment, Student
+
+BATCH_SIZE = 1000
+
+
+def parse_start_date(value):
+    """Plan start date from request data; today when missing or invalid"""
+    try:
+        return date.fromisoformat(value) if value else timezone.now().date()
+    except (TypeError, ValueError):
+        return timezone.now().date()
+
+
+def installment_schedule(fee_structure, installment_plan, start_date=None, custom=None):
+    """
+    [(installment_number, due_amount, due_date), ...] for one student.
+
+    EQUAL and PERCENTAGE plans split the fee evenly (the last installment
+    absorbs rounding) with due dates 30 days apart from `start_date`. CUSTOM
+    plans take `custom`, a list of {installment_number, due_amount, due_date}.
+    Raises ValueError for missing or malformed custom installments.
+    """
+    if installment_plan.installment_type in ('EQUAL', 'PERCENTAGE'):
+        n = int(installment_plan.number_of_installments or 1)
+        total = Decimal(str(fee_structure.amount))
+        base = (total / Decimal(n)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        amounts = [base for _ in range(n)]
+        diff = total - sum(amounts)
+        if diff != 0:
+            amounts[-1] = (amounts[-1] + diff).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        start_date = start_date or timezone.now().date()
+        return [(i, amounts[i - 1], start_date + timedelta(days=30 * (i - 1))) for i in range(1, n + 1)]
+
+    if not custom:
+        raise ValueError('installments data required for CUSTOM installment type.')
+    schedule = []
+    try:
+        for inst_data in custom:
+            due_date = inst_data['due_date']
+            schedule.append((
+                int(inst_data['installment_number']),
+                Decimal(str(inst_data['due_amount'])),
+                due_date if isinstance(due_date, date) else date.fromisoformat(due_date),
+            ))
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        raise ValueError('Each installment needs installment_number, due_amount and due_date (YYYY-MM-DD).')
+    if len({number for number, _, _ in schedule}) != len(schedule):
+        raise ValueError('Installment numbers must be unique.')
+    return schedule
+
+
+def initial_status(due_amount, due_date, today):
+    """Status of an unpaid installment, as update_status() would set it"""
+    if due_amount <= 0:
+        return 'PAID'
+    return 'OVERDUE' if today > due_date else 'PENDING'
+
+
+def build_installments(tenant, student_id, fee_structure, installment_plan, schedule, today=None):
+    today = today or timezone.now().date()
+    installments = []
+    for number, due_amount, due_date in schedule:
+        state = initial_status(due_amount, due_date, today)
+        installments.append(FeeInstallment(
+            tenant=tenant,
+            student_id=student_id,
+            fee_structure=fee_structure,
+            installment_plan=installment_plan,
+            installment_number=number,
+            due_amount=due_amount,
+            due_date=due_date,
+            status=state,
+            payment_date=today if state == 'PAID' else None,
+            # bulk_create skips save(), which normally copies this
+            academic_year=fee_structure.academic_year,
+        ))
+    return installments
+
+
+def students_with_installments(tenant, fee_structure, student_ids):
+    return set(FeeInstallment._default_manager.filter(
+        tenant=tenant, fee_structure=fee_structure, student_id__in=student_ids
+    ).values_list('student_id', flat=True).distinct())
+
+
+def generate_installments(tenant, fee_structure, installment_plan, student_ids, schedule, progress=None):
+    """
+    Create `schedule` for every student in `student_ids` that has no
+    installments for `fee_structure` yet. Returns counts of students,
+    skipped students and created installments.
+    """
+    report = progress or (lambda percent, message: None)
+    existing = students_with_installments(tenant, fee_structure, student_ids)
+    pending = [student_id for student_id in student_ids if student_id not in existing]
+    today = timezone.now().date()
+    per_batch = max(1, BATCH_SIZE // max(1, len(schedule)))
+    created = 0
+    for offset in range(0, len(pending), per_batch):
+        batch = []
+        for student_id in pending[offset:offset + per_batch]:
+            batch.extend(build_installments(tenant, student_id, fee_structure, installment_plan, schedule, today))
+        with transaction.atomic():
+            FeeInstallment._default_manager.bulk_create(batch)
+        created += len(batch)
+        done = min(offset + per_batch, len(pending))
+        report(done * 100 // len(pending), f"Generated installments for {done} of {len(pending)} students")
+    report(100, 'Installments generated')
+    return {'students': len(student_ids), 'skipped': len(existing), 'created': created}
+
+
+def class_student_ids(tenant, class_obj):
+    return list(Student._default_manager.filter(
+        tenant=tenant, assigned_class=class_obj, is_active=True
+    ).order_by('id').values_list('id', flat=True))
+
+
+def late_fee_rules():
+    rules = {'GRACE_DAYS': 0, 'FLAT': '0', 'PERCENT': '0', 'MAX': None}
+    rules.update(getattr(settings, 'FEE_LATE_FEE', {}))
+    return rules
+
+
+def late_fee_expression(rules):
+    """SQL expression for an installment's late fee, or None when no fee is configured"""
+    flat = Decimal(str(rules['FLAT'] or 0))
+    percent = Decimal(str(rules['PERCENT'] or 0))
+    if flat <= 0 and percent <= 0:
+        return None
+    money = DecimalField(max_digits=10, decimal_places=2)
+    fee = Value(flat, output_field=money)
+    if percent > 0:
+        fee = Round(fee + F('due_amount') * Value(percent / 100, output_field=DecimalField(max_digits=9, decimal_places=6)),
+                    2, output_field=money)
+    if rules['MAX'] is not None:
+        fee = Least(fee, Value(Decimal(str(rules['MAX'])), output_field=money), output_field=money)
+    return fee
+
+
+def sweep_installments(tenant=None, today=None):
+    """
+    Bring every installment's status in line with update_status() and charge
+    configured late fees, using one UPDATE per status plus one for late fees.
+    Only rows whose status actually changes are written. Returns the number
+    of rows moved to each status and charged a late fee.
+    """
+    today = today or timezone.now().date()
+    now = timezone.now()
+    installments = FeeInstallment._default_manager.all()
+    if tenant is not None:
+        installments = installments.filter(tenant=tenant)
+    unpaid = installments.filter(paid_amount__lt=F('due_amount'))
+
+    counts = {}
+    with transaction.atomic():
+        counts['PAID'] = installments.filter(paid_amount__gte=F('due_amount')).exclude(status='PAID').update(
+            status='PAID', payment_date=Coalesce(F('payment_date'), Value(today)), updated_at=now)
+        counts['PARTIAL'] = unpaid.filter(paid_amount__gt=0).exclude(status='PARTIAL').update(
+            status='PARTIAL', updated_at=now)
+        counts['OVERDUE'] = unpaid.filter(paid_amount__lte=0, due_date__lt=today).exclude(status='OVERDUE').update(
+            status='OVERDUE', updated_at=now)
+        counts['PENDING'] = unpaid.filter(paid_amount__lte=0, due_date__gte=today).exclude(status='PENDING').update(
+            status='PENDING', updated_at=now)
+
+        rules = late_fee_rules()
+        fee = late_fee_expression(rules)
+        counts['late_fees'] = 0
+        if fee is not None:
+            cutoff = today - timedelta(days=int(rules['GRACE_DAYS'] or 0))
+            counts['late_fees'] = unpaid.filter(due_date__lt=cutoff, late_fee=0).update(late_fee=fee, updated_at=now)
+    return counts
+
+
+def overdue_installments(tenant, today=None):
+    """
+    Installments that are not PAID and past their due date (the rule behind
+    FeeInstallment.is_overdue), read from the stored status so rows due since
+    the last sweep are included too.
+    """
+    today = today or timezone.now().date()
+    return FeeInstallment._default_manager.filter(
+        tenant=tenant, status__in=['PENDING', 'PARTIAL', 'OVERDUE'], due_date__lt=today,
+    )
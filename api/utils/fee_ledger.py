@@ -0,0 +1,144 @@
+"""
+Materialized per-student fee ledger.
+
+Fee status endpoints used to re-add fee structures, payments and old
+balances for every student on every call. StudentFeeBalance keeps one row per
+(student, academic year) with
+
+    total_due        fee structures of the student's class for that year
+    total_paid       payments made for that year
+    total_discount   discount_amount given on those payments
+    carried_forward  unsettled OldBalance recorded for that year
+    outstanding      total_due + carried_forward - total_paid - total_discount
+
+refresh_fee_balances() recomputes the rows of any set of students from four
+grouped queries and writes only the rows that changed. The signal handlers in
+api/signals.py call it inside the transaction that changed a fee structure,
+payment, old balance or a student's class, so a class fee summary is one
+SUM over the class's rows. Migration
+education/0026_backfill_studentfeebalance fills the ledger for existing data
+during `migrate`. After bulk imports or fixes that bypass the signals, rebuild
+with:
+
+    python manage.py rebuild_fee_balances [--tenant ID]
+
+Installments only split a fee structure's amount, so they do not change the
+ledger.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+
+from education.models import FeePayment, FeeStructure, OldBalance, Student, StudentFeeBalance
+
+LEDGER_FIELDS = ['total_due', 'total_paid', 'total_discount', 'carried_forward', 'outstanding', 'updated_at']
+MONEY_FIELDS = LEDGER_FIELDS[:-1]
+BATCH_SIZE = 500
+
+ZERO = Decimal('0.00')
+
+
+def _ledger_totals(tenant_id, student_ids):
+    """{(student_id, academic_year): {field: amount}} for the given students"""
+    totals = defaultdict(lambda: dict.fromkeys(MONEY_FIELDS, ZERO))
+
+    classes = dict(Student._default_manager.filter(
+        tenant_id=tenant_id, id__in=student_ids
+    ).values_list('id', 'assigned_class_id'))
+    class_dues = defaultdict(list)
+    for row in FeeStructure._default_manager.filter(
+        tenant_id=tenant_id, class_obj_id__in={class_id for class_id in classes.values() if class_id}
+    ).values('class_obj', 'academic_year').annotate(total=Sum('amount')).order_by():
+        class_dues[row['class_obj']].append((row['academic_year'], row['total']))
+    for student_id, class_id in classes.items():
+        for academic_year, total in class_dues.get(class_id, []):
+            totals[(student_id, academic_year)]['total_due'] += total
+
+    payments = FeePayment._default_manager.filter(tenant_id=tenant_id, student_id__in=student_ids).annotate(
+        year=Coalesce('academic_year', 'fee_structure__academic_year'),
+    ).values('student', 'year').annotate(paid=Sum('amount_paid'), discount=Sum('discount_amount')).order_by()
+    for row in payments:
+        entry = totals[(row['student'], row['year'])]
+        entry['total_paid'] += row['paid'] or 0
+        entry['total_discount'] += row['discount'] or 0
+
+    for row in OldBalance._default_manager.filter(
+        tenant_id=tenant_id, student_id__in=student_ids, is_settled=False
+    ).values('student', 'academic_year').annotate(total=Sum('balance_amount')).order_by():
+        totals[(row['student'], row['academic_year'])]['carried_forward'] += row['total'] or 0
+
+    for entry in totals.values():
+        entry['outstanding'] = (entry['total_due'] + entry['carried_forward']
+                                - entry['total_paid'] - entry['total_discount'])
+    return totals
+
+
+def refresh_fee_balances(tenant_id, student_ids):
+    """
+    Bring the ledger rows of `student_ids` in line with their fee structures,
+    payments and old balances. Rows that no longer have any source are
+    deleted. Returns the number of rows created, updated and deleted.
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return {'created': 0, 'updated': 0, 'deleted': 0}
+    totals = _ledger_totals(tenant_id, student_ids)
+    with transaction.atomic():
+        existing = {
+            (row.student_id, row.academic_year): row
+            for row in StudentFeeBalance._default_manager.select_for_update().filter(
+                tenant_id=tenant_id, student_id__in=student_ids
+            )
+        }
+        created, updated = [], []
+        for key, entry in totals.items():
+            row = existing.pop(key, None)
+            if row is None:
+                created.append(StudentFeeBalance(tenant_id=tenant_id, student_id=key[0], academic_year=key[1], **entry))
+            elif any(getattr(row, field) != value for field, value in entry.items()):
+                for field, value in entry.items():
+                    setattr(row, field, value)
+                updated.append(row)
+        StudentFeeBalance._default_manager.bulk_create(created, batch_size=BATCH_SIZE)
+        StudentFeeBalance._default_manager.bulk_update(updated, LEDGER_FIELDS, batch_size=BATCH_SIZE)
+        if existing:
+            StudentFeeBalance._default_manager.filter(id__in=[row.id for row in existing.values()]).delete()
+    return {'created': len(created), 'updated': len(updated), 'deleted': len(existing)}
+
+
+def refresh_class_fee_balances(tenant_id, class_id, academic_year=None):
+    """
+    Refresh every student assigned to a class after its fee structures
+    change. With `academic_year`, students left without a class (the class
+    was deleted) who still have a ledger row for that year are refreshed too.
+    """
+    scope = Q(assigned_class_id=class_id)
+    if academic_year is not None:
+        scope |= Q(assigned_class__isnull=True, fee_balances__academic_year=academic_year)
+    student_ids = Student._default_manager.filter(scope, tenant_id=tenant_id).values_list('id', flat=True).distinct()
+    return refresh_fee_balances(tenant_id, student_ids)
+
+
+def rebuild_fee_balances(tenant=None, progress=None):
+    """Recompute the whole ledger (or one tenant's) in batches of students"""
+    report = progress or (lambda done, total: None)
+    students = Student._default_manager.all()
+    if tenant is not None:
+        students = students.filter(tenant=tenant)
+    by_tenant = defaultdict(list)
+    for student_id, tenant_id in students.order_by('id').values_list('id', 'tenant_id'):
+        by_tenant[tenant_id].append(student_id)
+
+    counts = {'students': 0, 'created': 0, 'updated': 0, 'deleted': 0}
+    total = sum(len(ids) for ids in by_tenant.values())
+    for tenant_id, student_ids in by_tenant.items():
+        for offset in range(0, len(student_ids), BATCH_SIZE):
+            batch = student_ids[offset:offset + BATCH_SIZE]
+            for key, value in refresh_fee_balances(tenant_id, batch).items():
+                counts[key] += value
+            counts['students'] += len(batch)
+            report(counts['students'], total)
+    return counts
+
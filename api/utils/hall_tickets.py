@@ -0,0 +1,144 @@
+"""
+Bulk hall ticket generation.
+
+GenerateHallTicketsView used to check for an existing ticket and save() one
+ticket per student, retrying unique collisions with random suffixes. Here the
+exam row is locked, the students that already hold a ticket for the exam are
+loaded once as a set, a block of sequence numbers is taken, and every new
+ticket is inserted with bulk_create. Numbers are
+
+    HT<TYPE>-<year>-E<exam id>-<sequence>
+
+so they cannot collide with another exam's, and students are numbered in
+class order, then by name, so a class gets a contiguous range.
+
+prerender_hall_ticket_pdfs() renders the new tickets into the PDF cache
+(api.utils.pdf_cache) on the report card process pool, so the first
+downloads are served from storage. The pool size follows
+REPORT_CARD_PDF_WORKERS.
+"""
+import logging
+from django.db import transaction
+
+from api.utils.pdf_cache import cached_pdf, school_contact
+from api.utils.report_card_pdfs import iter_rendered
+from education.models import Exam, ExamSchedule, HallTicket, SeatingArrangement
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def ticket_prefix(exam):
+    year = exam.academic_year.name.replace('-', '')[:4]
+    return f"HT{exam.exam_type.upper()[:3]}-{year}-E{exam.id}-"
+
+
+def last_sequence(exam, prefix):
+    """Highest sequence number already issued under `prefix`"""
+    highest = 0
+    for number in HallTicket._default_manager.filter(
+        exam=exam, ticket_number__startswith=prefix
+    ).values_list('ticket_number', flat=True):
+        tail = number[len(prefix):]
+        if tail.isdigit():
+            highest = max(highest, int(tail))
+    return highest
+
+
+def generate_hall_tickets(tenant, exam, students, generated_by=None):
+    """
+    Create a ticket for every student in the `students` queryset that does
+    not have one for `exam`. Returns the new tickets' ids and the names of
+    students skipped because they already had one.
+    """
+    rows = list(students.order_by('assigned_class__order', 'assigned_class__name', 'name', 'id').values_list('id', 'name'))
+    created = []
+    with transaction.atomic():
+        # Serializes generators for the same exam, so a concurrent call sees
+        # this one's tickets as existing before taking a block of numbers
+        exam = Exam._default_manager.select_for_update().select_related('academic_year').get(id=exam.id)
+        existing = set(HallTicket._default_manager.filter(
+            tenant=tenant, exam=exam, student__in=students
+        ).values_list('student_id', flat=True))
+        pending = [student_id for student_id, _ in rows if student_id not in existing]
+        skipped = [name for student_id, name in rows if student_id in existing]
+        if pending:
+            prefix = ticket_prefix(exam)
+            start = last_sequence(exam, prefix) + 1
+            created = HallTicket._default_manager.bulk_create([
+                HallTicket(
+                    tenant=tenant,
+                    exam=exam,
+                    student_id=student_id,
+                    ticket_number=f"{prefix}{start + offset:05d}",
+                    status='generated',
+                    generated_by=generated_by,
+                )
+                for offset, student_id in enumerate(pending)
+            ], batch_size=BATCH_SIZE)
+    return {'ticket_ids': [ticket.id for ticket in created], 'skipped': skipped}
+
+
+def hall_ticket_details(ticket):
+    """(schedules, seats by schedule id) printed on a student's hall ticket"""
+    schedules = list(ExamSchedule._default_manager.filter(
+        exam_id=ticket.exam_id, class_obj_id=ticket.student.assigned_class_id, is_active=True
+    ).select_related('subject', 'room').order_by('date', 'start_time'))
+    seats = {
+        seat.exam_schedule_id: seat
+        for seat in SeatingArrangement._default_manager.filter(
+            student_id=ticket.student_id, exam_schedule__exam_id=ticket.exam_id, is_active=True
+        ).select_related('room')
+    }
+    return schedules, seats
+
+
+def hall_ticket_sources(ticket, contact, schedules, seats):
+    """Everything a hall ticket PDF is drawn from, for the PDF cache version"""
+    return [ticket, ticket.student, ticket.student.assigned_class, ticket.exam, ticket.exam.academic_year,
+            schedules, [schedule.subject for schedule in schedules], [schedule.room for schedule in schedules],
+            list(seats.values()), ticket.tenant.name, contact]
+
+
+def hall_ticket_pdf(ticket):
+    """PDF bytes for a ticket, from the PDF cache when its inputs are unchanged"""
+    from api.views.exam_views import render_hall_ticket_pdf
+
+    contact = school_contact(ticket.tenant)
+    schedules, seats = hall_ticket_details(ticket)
+    return cached_pdf(
+        'hall_ticket', ticket, hall_ticket_sources(ticket, contact, schedules, seats),
+        lambda: render_hall_ticket_pdf(ticket, contact, schedules, seats),
+    )
+
+
+def load_ticket(ticket_id):
+    return HallTicket._default_manager.select_related(
+        'tenant', 'exam__academic_year', 'student__assigned_class'
+    ).get(id=ticket_id)
+
+
+def prerender_one(ticket_id):
+    """Render one ticket into the PDF cache; returns (ticket_id, error)"""
+    try:
+        hall_ticket_pdf(load_ticket(ticket_id))
+        return ticket_id, None
+    except Exception as e:
+        logger.error(f"Error pre-rendering hall ticket {ticket_id}: {str(e)}", exc_info=True)
+        return ticket_id, str(e)
+
+
+def prerender_hall_ticket_pdfs(ticket_ids, progress=None, workers=None):
+    """Render tickets into the PDF cache on a process pool"""
+    report = progress or (lambda percent, message: None)
+    total = len(ticket_ids)
+    rendered, failed = 0, []
+    for done, (ticket_id, error) in enumerate(iter_rendered(ticket_ids, workers, render=prerender_one), 1):
+        if error is None:
+            rendered += 1
+        else:
+            failed.append({'ticket_id': ticket_id, 'error': error})
+        report(done * 100 // total, f"Rendered {done} of {total}")
+    report(100, 'Hall tickets rendered')
+    return {'rendered': rendered, 'failed': failed}
@@ -0,0 +1,261 @@
+"""
+Database-backed background jobs.
+
+Work that is too slow for the request path is stored as a Job row and run by
+`manage.py run_workers`; no broker or extra service is needed.
+
+- enqueue(task, ...) stores the dotted path of a task function plus JSON
+  keyword arguments. Tasks are plain functions taking the Job as their first
+  argument, e.g. `def send_campaign(job, campaign_id): ...`.
+- Workers claim queued jobs with SELECT ... FOR UPDATE SKIP LOCKED (where the
+  database supports it), highest priority first, respecting a per-tenant cap on
+  concurrently running jobs. The cap is checked at claim time, so two workers
+  claiming at the same instant can briefly exceed it by one.
+- A failing job is retried with exponential backoff until max_attempts, then
+  marked failed. Jobs whose worker died are re-queued once their lease expires.
+
+Settings (optional):
+    JOB_QUEUE = {
+        'TENANT_CONCURRENCY': 2,   # running jobs per tenant
+        'MAX_ATTEMPTS': 3,
+        'BACKOFF_BASE': 30,        # seconds, doubled per attempt
+        'BACKOFF_MAX': 3600,
+        'LEASE_TIMEOUT': 900,      # seconds without progress before a running job is reclaimed
+        'POLL_INTERVAL': 1.0,
+        'EAGER': False,            # run jobs inline after commit (development without workers)
+    }
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction, close_old_connections
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from api.models.jobs import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'TENANT_CONCURRENCY': 2,
+    'MAX_ATTEMPTS': 3,
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 3600,
+    'LEASE_TIMEOUT': 900,
+    'POLL_INTERVAL': 1.0,
+    'EAGER': False,
+}
+
+
+def queue_settings():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'JOB_QUEUE', {}) or {})
+    return options
+
+
+def task_path(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(task, payload=None, tenant=None, created_by=None, priority=0, max_attempts=None, run_at=None):
+    """
+    Queue `task` (a function or its dotted path) with JSON-serializable keyword
+    arguments. Returns the Job; in EAGER mode the job runs once the surrounding
+    transaction commits.
+    """
+    options = queue_settings()
+    job = Job.objects.create(
+        tenant=tenant,
+        created_by=created_by,
+        task=task if isinstance(task, str) else task_path(task),
+        payload=payload or {},
+        priority=priority,
+        max_attempts=max_attempts or options['MAX_ATTEMPTS'],
+        run_at=run_at or timezone.now(),
+    )
+    if options['EAGER']:
+        transaction.on_commit(lambda: run_eager(job.id))
+    return job
+
+
+def run_eager(job_id):
+    claimed = Job.objects.filter(id=job_id, status='queued').update(
+        status='running', locked_by='eager', locked_at=timezone.now(),
+        started_at=timezone.now(), attempts=F('attempts') + 1,
+    )
+    if claimed:
+        execute_job(Job.objects.get(id=job_id))
+
+
+def set_progress(job, progress, message=''):
+    """Record task progress (0-100); also renews the job's lease"""
+    job.progress = max(0, min(100, int(progress)))
+    job.progress_message = message[:255]
+    Job.objects.filter(id=job.id, status='running').update(
+        progress=job.progress, progress_message=job.progress_message, locked_at=timezone.now(),
+    )
+
+
+def backoff_delay(attempts, options=None):
+    options = options or queue_settings()
+    delay = min(options['BACKOFF_MAX'], options['BACKOFF_BASE'] * (2 ** max(0, attempts - 1)))
+    # Jitter spreads retries of jobs that failed together
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_jobs(worker_id, limit, options=None):
+    """Atomically mark up to `limit` runnable jobs as running by `worker_id`"""
+    if limit <= 0:
+        return []
+    options = options or queue_settings()
+    cap = options['TENANT_CONCURRENCY']
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        elif connection.features.has_select_for_update:
+            queryset = queryset.select_for_update()
+        # Over-fetch so jobs of capped tenants do not starve the others
+        candidates = list(queryset.only('id', 'tenant_id')[:limit * 4])
+        if not candidates:
+            return []
+
+        tenant_ids = {job.tenant_id for job in candidates if job.tenant_id is not None}
+        running = dict(
+            Job.objects.filter(status='running', tenant_id__in=tenant_ids)
+            .values('tenant_id').annotate(count=Count('id')).values_list('tenant_id', 'count')
+        ) if cap and tenant_ids else {}
+
+        chosen = []
+        for job in candidates:
+            if cap and job.tenant_id is not None:
+                if running.get(job.tenant_id, 0) >= cap:
+                    continue
+                running[job.tenant_id] = running.get(job.tenant_id, 0) + 1
+            chosen.append(job.id)
+            if len(chosen) == limit:
+                break
+
+        Job.objects.filter(id__in=chosen).update(
+            status='running', locked_by=worker_id, locked_at=now, started_at=now,
+            attempts=F('attempts') + 1, error='',
+        )
+    return list(Job.objects.filter(id__in=chosen).order_by('-priority', 'run_at', 'id'))
+
+
+def execute_job(job):
+    """Run a claimed job and record success, retry or failure"""
+    try:
+        func = import_string(job.task)
+        result = func(job, **(job.payload or {}))
+    except Exception as e:
+        logger.error(f"Job {job.id} ({job.task}) failed on attempt {job.attempts}: {str(e)}")
+        error = traceback.format_exc()[-5000:]
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(id=job.id).update(
+                status='queued', locked_by='', locked_at=None, error=error,
+                run_at=timezone.now() + timedelta(seconds=backoff_delay(job.attempts)),
+            )
+        else:
+            Job.objects.filter(id=job.id).update(
+                status='failed', locked_by='', locked_at=None, error=error, finished_at=timezone.now(),
+            )
+        return False
+
+    try:
+        Job.objects.filter(id=job.id).update(
+            status='succeeded', result=result, progress=100, locked_by='', locked_at=None,
+            finished_at=timezone.now(),
+        )
+    except (TypeError, ValueError) as e:
+        logger.error(f"Job {job.id} ({job.task}) returned a non-JSON result: {str(e)}")
+        Job.objects.filter(id=job.id).update(
+            status='succeeded', result={'repr': repr(result)[:1000]}, progress=100,
+            locked_by='', locked_at=None, finished_at=timezone.now(),
+        )
+    return True
+
+
+def requeue_stale_jobs(options=None):
+    """Return running jobs whose lease expired (worker crashed or was killed) to the queue"""
+    options = options or queue_settings()
+    cutoff = timezone.now() - timedelta(seconds=options['LEASE_TIMEOUT'])
+    stale = Job.objects.filter(status='running', locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', locked_at=None, finished_at=timezone.now(),
+        error='Worker lease expired',
+    )
+    requeued = stale.update(status='queued', locked_by='', locked_at=None, run_at=timezone.now())
+    return requeued, failed
+
+
+def cancel_job(job):
+    """Cancel a job that has not started yet; returns True if it was cancelled"""
+    return bool(Job.objects.filter(id=job.id, status='queued').update(
+        status='cancelled', finished_at=timezone.now(),
+    ))
+
+
+class Worker:
+    """Claims and runs jobs on a pool of `concurrency` threads"""
+
+    def __init__(self, concurrency=4, poll_interval=None, name=None, options=None):
+        self.options = options or queue_settings()
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval or self.options['POLL_INTERVAL']
+        self.worker_id = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = threading.Event()
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run_one(self, job):
+        try:
+            execute_job(job)
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._active -= 1
+
+    def run_once(self):
+        """Claim and run (synchronously) one batch of jobs; returns the number run"""
+        jobs = claim_jobs(self.worker_id, self.concurrency, self.options)
+        for job in jobs:
+            execute_job(job)
+        return len(jobs)
+
+    def run(self, burst=False):
+        """Poll until stopped; with `burst` exit once the queue is drained"""
+        last_sweep = None
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job-worker') as pool:
+            while not self._stopping.is_set():
+                now = timezone.now()
+                if last_sweep is None or (now - last_sweep).total_seconds() >= 60:
+                    requeue_stale_jobs(self.options)
+                    last_sweep = now
+
+                with self._lock:
+                    free = self.concurrency - self._active
+                jobs = claim_jobs(self.worker_id, free, self.options) if free > 0 else []
+                for job in jobs:
+                    with self._lock:
+                        self._active += 1
+                    pool.submit(self._run_one, job)
+                close_old_connections()
+
+                if not jobs:
+                    with self._lock:
+                        idle = self._active == 0
+                    if burst and idle:
+                        break
+                    self._stopping.wait(self.poll_interval)
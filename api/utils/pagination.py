@@ -0,0 +1,275 @@
+"""
+Keyset (cursor) pagination and cached list counts.
+
+Page-number pagination gets slower as a tenant's history grows: OFFSET scans
+and discards every skipped row, and every page runs COUNT(*) over the whole
+filtered set. Keyset pagination instead continues after the last row seen,
+ordering by (sort key, id) so the position is unique and each page is an
+index range scan of `page_size + 1` rows with no count query.
+
+- KeysetPaginator pages a queryset from an opaque `cursor` query parameter.
+  Works from APIViews that build their own responses.
+- HybridPagination is the DRF default pagination class. It behaves exactly like
+  PageNumberPagination unless the request has a `cursor` parameter (an empty
+  `?cursor=` requests the first page), so existing clients are unaffected.
+- estimate_count() backs the opt-in `include_count=true` total. The total is
+  cached briefly, and on PostgreSQL large results use the planner's row
+  estimate instead of COUNT(*).
+
+Settings (optional):
+    LIST_COUNT_CACHE_TTL = 60                  # seconds a total is reused
+    LIST_COUNT_ESTIMATE_THRESHOLD = 10000      # planner estimates above this are trusted
+"""
+import base64
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, time
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+logger = logging.getLogger(__name__)
+
+CURSOR_PARAM = 'cursor'
+COUNT_PARAM = 'include_count'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def wants_cursor(request):
+    return CURSOR_PARAM in request.query_params
+
+
+def wants_count(request):
+    return request.query_params.get(COUNT_PARAM, '').lower() in ('1', 'true', 'yes')
+
+
+def _count_cache_key(queryset):
+    query = queryset.order_by().query
+    digest = hashlib.md5(f"{queryset.db}:{query}".encode('utf-8')).hexdigest()
+    return f"list_count:{queryset.model._meta.label_lower}:{digest}"
+
+
+def _planner_estimate(queryset):
+    """Row estimate from the PostgreSQL planner, or None"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset, timeout=None, key=None):
+    """
+    Total rows of `queryset` as (count, is_estimate), cached for
+    LIST_COUNT_CACHE_TTL seconds. Counts may be that many seconds stale.
+    Pass `key` when the SQL changes between requests (e.g. filters on now()).
+    """
+    timeout = timeout if timeout is not None else getattr(settings, 'LIST_COUNT_CACHE_TTL', 60)
+    key = f"list_count:{key}" if key else _count_cache_key(queryset)
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    count, is_estimate = None, False
+    try:
+        estimate = _planner_estimate(queryset)
+        if estimate is not None and estimate >= getattr(settings, 'LIST_COUNT_ESTIMATE_THRESHOLD', 10000):
+            count, is_estimate = estimate, True
+    except Exception as e:
+        logger.error(f"Planner row estimate failed for {queryset.model.__name__}: {str(e)}")
+    if count is None:
+        count = queryset.count()
+    cache.set(key, (count, is_estimate), timeout)
+    return count, is_estimate
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(value, pk, reverse=False):
+    position = {'v': _encode_value(value), 'i': pk}
+    if reverse:
+        position['r'] = 1
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (value, pk, reverse) from an encoded cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return position['v'], position['i'], bool(position.get('r'))
+    except (TypeError, ValueError, KeyError, AttributeError):
+        raise InvalidCursor('Invalid cursor.')
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, previous_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Pages a queryset by (`ordering`, id). `ordering` is one concrete, non-null
+    model field, optionally prefixed with '-'; anything else falls back to id
+    in the same direction so the position stays unique and total.
+    """
+
+    def __init__(self, ordering='-id', page_size=20, max_page_size=100):
+        self.ordering = ordering
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except (TypeError, ValueError):
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _key_field(self, model):
+        descending = self.ordering.startswith('-')
+        name = self.ordering.lstrip('-')
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None, descending
+        if field.primary_key or not field.concrete or field.null or field.is_relation:
+            return None, descending
+        return field, descending
+
+    def paginate(self, queryset, request):
+        page_size = self.get_page_size(request)
+        field, descending = self._key_field(queryset.model)
+        cursor = request.query_params.get(CURSOR_PARAM) or None
+
+        reverse = False
+        if cursor:
+            value, pk, reverse = decode_cursor(cursor)
+            # Going backwards means walking the opposite direction from the cursor
+            forward_desc = descending != reverse
+            op = 'lt' if forward_desc else 'gt'
+            try:
+                if field is None:
+                    queryset = queryset.filter(**{f'pk__{op}': pk})
+                else:
+                    value = field.to_python(value)
+                    queryset = queryset.filter(
+                        Q(**{f'{field.attname}__{op}': value})
+                        | Q(**{field.attname: value, f'pk__{op}': pk})
+                    )
+            except (TypeError, ValueError, ValidationError):
+                raise InvalidCursor('Invalid cursor.')
+
+        walk_desc = descending != reverse
+        prefix = '-' if walk_desc else ''
+        order = [f'{prefix}pk'] if field is None else [f'{prefix}{field.attname}', f'{prefix}pk']
+        rows = list(queryset.order_by(*order)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        def position(obj, backwards=False):
+            value = obj.pk if field is None else getattr(obj, field.attname)
+            return encode_cursor(value, obj.pk, reverse=backwards)
+
+        if not rows:
+            return KeysetPage([], None, None)
+        if reverse:
+            next_cursor = position(rows[-1])
+            previous_cursor = position(rows[0], backwards=True) if has_more else None
+        else:
+            next_cursor = position(rows[-1]) if has_more else None
+            previous_cursor = position(rows[0], backwards=True) if cursor else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def cursor_link(request, cursor):
+    if cursor is None:
+        return None
+    return replace_query_param(request.build_absolute_uri(), CURSOR_PARAM, cursor)
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    PageNumberPagination with an opt-in keyset mode (`?cursor=`).
+
+    Views choose the keyset sort key with `keyset_ordering`; otherwise the
+    queryset's single ordering field is used, falling back to '-id'.
+    """
+    cursor_page_size = None
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_page = None
+        if not wants_cursor(request):
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        paginator = KeysetPaginator(
+            ordering=self.get_keyset_ordering(queryset, view),
+            page_size=self.cursor_page_size or self.page_size or 20,
+            max_page_size=self.max_page_size,
+        )
+        try:
+            self.keyset_page = paginator.paginate(queryset, request)
+        except InvalidCursor as e:
+            raise NotFound(str(e))
+        self.total = estimate_count(queryset) if wants_count(request) else None
+        return self.keyset_page.items
+
+    def get_keyset_ordering(self, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering:
+            return ordering
+        order_by = list(queryset.query.order_by) or list(queryset.model._meta.ordering or [])
+        order_by = [term for term in order_by if isinstance(term, str) and term.lstrip('-') not in ('id', 'pk')]
+        if len(order_by) == 1 and '__' not in order_by[0]:
+            return order_by[0]
+        return '-id'
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        payload = OrderedDict([
+            ('next', cursor_link(self.request, self.keyset_page.next_cursor)),
+            ('previous', cursor_link(self.request, self.keyset_page.previous_cursor)),
+        ])
+        if self.total is not None:
+            payload['count'], payload['count_is_estimate'] = self.total
+        payload['results'] = data
+        return Response(payload)
+
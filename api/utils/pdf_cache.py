@@ -0,0 +1,179 @@
+"""
+Content-addressed cache for generated PDFs.
+
+Receipts, certificates, invoices and folios are re-downloaded far more often
+than their source rows change, so rendered documents are stored under
+
+    <PREFIX>/<doc_type>/<tenant id>/<object id>/<version>.pdf
+
+where `version` hashes everything the document is drawn from: the source
+rows' field values, the school name, logo and contact details and
+PDF_CACHE['VERSION']. Editing any source row changes the version, so a stale
+PDF is never served; the next render replaces the stored file, and deleting
+the document's main row removes its stored files (see api/signals.py). The
+version is sent as a strong ETag with `Cache-Control: private, no-cache`, so
+clients revalidate and a repeat download with a matching If-None-Match gets
+304 without touching storage.
+
+School contact details printed on education documents come from the tenant's
+admin profile; school_contact() caches them until that profile or its user
+changes.
+
+Settings (optional):
+    PDF_CACHE = {
+        'ENABLED': True,
+        'STORAGE': None,          # dotted path to a Storage class; default_storage when unset
+        'PREFIX': 'pdf-cache',
+        'VERSION': '1',           # bump to discard every cached PDF after a layout change
+    }
+"""
+import hashlib
+import json
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Model
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# doc_type -> model whose delete purges the stored files
+PDF_DOCUMENTS = {
+    'fee_receipt': 'education.FeePayment',
+    'transfer_certificate': 'education.TransferCertificate',
+    'retail_invoice': 'retail.Sale',
+    'restaurant_invoice': 'restaurant.Order',
+    'hotel_folio': 'hotel.Booking',
+    'salon_invoice': 'salon.Appointment',
+    'hall_ticket': 'education.HallTicket',
+}
+
+CONTACT_TIMEOUT = 24 * 60 * 60  # 1 day; signals handle invalidation
+
+_storage = {}
+
+
+def pdf_cache_settings():
+    options = {'ENABLED': True, 'STORAGE': None, 'PREFIX': 'pdf-cache', 'VERSION': '1'}
+    options.update(getattr(settings, 'PDF_CACHE', {}))
+    return options
+
+
+def pdf_storage():
+    path = pdf_cache_settings()['STORAGE']
+    if not path:
+        return default_storage
+    if path not in _storage:
+        _storage[path] = import_string(path)()
+    return _storage[path]
+
+
+def _contact_key(tenant_id):
+    return f"school_contact:{tenant_id}"
+
+
+def school_contact(tenant):
+    """Address, phone and email of the tenant's first admin profile"""
+    key = _contact_key(tenant.id)
+    contact = cache.get(key)
+    if contact is None:
+        from api.models.user import UserProfile
+
+        contact = {'address': '', 'phone': '', 'email': ''}
+        admin_profile = UserProfile._default_manager.filter(
+            tenant=tenant, role__name='admin'
+        ).select_related('user').order_by('id').first()
+        if admin_profile:
+            contact = {
+                'address': admin_profile.address or '',
+                'phone': admin_profile.phone or '',
+                'email': admin_profile.user.email if admin_profile.user else '',
+            }
+        cache.set(key, contact, CONTACT_TIMEOUT)
+    return contact
+
+
+def invalidate_school_contact(tenant_id):
+    cache.delete(_contact_key(tenant_id))
+
+
+def _state(source):
+    if isinstance(source, Model):
+        return [source._meta.label_lower, {field.attname: getattr(source, field.attname) for field in source._meta.concrete_fields}]
+    if isinstance(source, (list, tuple)):
+        return [_state(item) for item in source]
+    return source
+
+
+def document_version(doc_type, sources):
+    """Hash of a document's inputs: model instances, lists of them, or plain values"""
+    payload = json.dumps([pdf_cache_settings()['VERSION'], doc_type, _state(list(sources))], default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:40]
+
+
+def document_dir(doc_type, tenant_id, object_id):
+    return f"{pdf_cache_settings()['PREFIX']}/{doc_type}/{tenant_id or 'global'}/{object_id}"
+
+
+def purge_document(doc_type, tenant_id, object_id, keep=None):
+    """Delete an object's stored PDFs, except the file named `keep`"""
+    directory = document_dir(doc_type, tenant_id, object_id)
+    storage = pdf_storage()
+    try:
+        _, files = storage.listdir(directory)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for name in files:
+        if name != keep:
+            storage.delete(f"{directory}/{name}")
+
+
+def cached_pdf(doc_type, obj, sources, render, version=None):
+    """
+    PDF bytes for `obj` from storage, calling `render()` (which returns PDF
+    bytes) and storing the result only when no file exists for the current
+    version of `sources`.
+    """
+    version = version or document_version(doc_type, sources)
+    options = pdf_cache_settings()
+    if not options['ENABLED']:
+        return render()
+    storage = pdf_storage()
+    name = f"{version}.pdf"
+    path = f"{document_dir(doc_type, obj.tenant_id, obj.pk)}/{name}"
+    try:
+        if storage.exists(path):
+            with storage.open(path, 'rb') as handle:
+                return handle.read()
+    except Exception as e:
+        logger.error(f"Error reading cached PDF {path}: {str(e)}")
+    content = render()
+    try:
+        purge_document(doc_type, obj.tenant_id, obj.pk, keep=name)
+        storage.save(path, ContentFile(content))
+    except Exception as e:
+        logger.error(f"Error caching PDF {path}: {str(e)}")
+    return content
+
+
+def cached_pdf_response(request, doc_type, obj, sources, render, filename):
+    """
+    Serve the PDF for `obj` through cached_pdf(), answering 304 when the
+    client already holds the current version.
+    """
+    version = document_version(doc_type, sources)
+    etag = f'"{version}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    response = HttpResponse(cached_pdf(doc_type, obj, sources, render, version), content_type='application/pdf')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,173 @@
+"""
+Cached, invalidation-aware plan feature matrix.
+
+Each tenant's plan features and subscription state are flattened into an
+immutable PlanFeatures snapshot. Snapshots live in an in-process dictionary
+backed by the shared Django cache and are tagged with a version pair: a global
+plan version, bumped when any Plan is saved or deleted, and a per-tenant
+version, bumped when that tenant's plan or subscription fields change (see
+api/signals.py). A bump invalidates the snapshot in this process immediately
+and in other workers on their next version check.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField
+from django.utils import timezone
+
+from api.models.plan import Plan
+
+VERSION_KEY = 'plan_features:version'
+SNAPSHOT_TIMEOUT = 24 * 60 * 60  # 1 day; versioning handles invalidation
+
+# Tenant fields copied into PlanFeatures; saves that leave them alone keep the snapshot
+TENANT_PLAN_FIELDS = frozenset({
+    'plan', 'plan_id', 'subscription_status', 'subscription_end_date', 'grace_period_end_date',
+})
+
+# tenant_id -> (version, PlanFeatures)
+_local_snapshots = {}
+# tenant_id -> (version, checked_at)
+_version_state = {}
+
+
+def _version_check_interval():
+    """Seconds between shared-cache version checks (0 = check on every lookup)"""
+    return getattr(settings, 'PLAN_FEATURE_CACHE_VERSION_TTL', 5)
+
+
+def plan_feature_names():
+    """All `has_<feature>` boolean flags declared on Plan, without the prefix"""
+    return [
+        field.name[len('has_'):]
+        for field in Plan._meta.get_fields()
+        if isinstance(field, BooleanField) and field.name.startswith('has_')
+    ]
+
+
+class PlanFeatures:
+    """Immutable snapshot of a tenant's plan features and subscription state"""
+
+    __slots__ = (
+        'tenant_id', 'plan_id', 'plan_name', 'plan_price', 'features',
+        'subscription_status', 'subscription_end_date', 'grace_period_end_date',
+    )
+
+    def __init__(self, tenant, plan):
+        self.tenant_id = tenant.id
+        self.plan_id = plan.id if plan else None
+        self.plan_name = plan.name if plan else None
+        self.plan_price = plan.price if plan else None
+        self.features = frozenset(
+            name for name in plan_feature_names() if plan and getattr(plan, f"has_{name}", False)
+        )
+        self.subscription_status = tenant.subscription_status
+        self.subscription_end_date = tenant.subscription_end_date
+        self.grace_period_end_date = tenant.grace_period_end_date
+
+    @property
+    def has_plan(self):
+        return self.plan_id is not None
+
+    def has_feature(self, feature_name):
+        return feature_name in self.features
+
+    @property
+    def is_paid(self):
+        """Custom pricing (price is None) and price > 0 count as paid"""
+        if not self.has_plan:
+            return False
+        return self.plan_price is None or self.plan_price > 0
+
+    def is_subscription_expired(self):
+        if not self.subscription_end_date:
+            return False
+        return self.subscription_end_date < timezone.now().date()
+
+    def is_in_grace_period(self):
+        if not self.grace_period_end_date:
+            return False
+        return (self.subscription_status == 'grace_period'
+                and self.grace_period_end_date >= timezone.now().date())
+
+    # Pickle support for the shared cache (slots have no __dict__)
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+
+def _tenant_version_key(tenant_id):
+    return f"{VERSION_KEY}:{tenant_id}"
+
+
+def current_version(tenant_id):
+    """Return the tenant's (plan, tenant) version pair, re-reading the shared cache periodically"""
+    now = time.monotonic()
+    state = _version_state.get(tenant_id)
+    if state is not None and now - state[1] < _version_check_interval():
+        return state[0]
+    keys = (VERSION_KEY, _tenant_version_key(tenant_id))
+    versions = cache.get_many(keys)
+    for key in keys:
+        if versions.get(key) is None:
+            # Seed from the clock so a cache flush never resurrects old snapshot keys
+            cache.add(key, int(time.time()), None)
+            versions[key] = cache.get(key)
+    version = (versions[VERSION_KEY], versions[keys[1]])
+    _version_state[tenant_id] = (version, now)
+    return version
+
+
+def _snapshot_key(version, tenant_id):
+    return f"plan_features:{version[0]}:{version[1]}:{tenant_id}"
+
+
+def get_plan_features(tenant):
+    """
+    Return the PlanFeatures snapshot for a tenant.
+    Served from process memory when current; falls back to the shared cache and
+    finally to a single Plan lookup.
+    """
+    version = current_version(tenant.id)
+    entry = _local_snapshots.get(tenant.id)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    key = _snapshot_key(version, tenant.id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        plan = None
+        if tenant.plan_id:
+            plan = Plan._default_manager.filter(pk=tenant.plan_id).first()
+        snapshot = PlanFeatures(tenant, plan)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    _local_snapshots[tenant.id] = (version, snapshot)
+    return snapshot
+
+
+def _bump(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (first write or evicted): start a new version sequence
+        version = int(time.time()) + 1
+        cache.set(key, version, None)
+        return version
+
+
+def invalidate_plan_features(tenant_id=None):
+    """
+    Bump one tenant's version, or the global plan version when tenant_id is
+    None, and drop the affected snapshots from this process.
+    """
+    if tenant_id is None:
+        _bump(VERSION_KEY)
+        _local_snapshots.clear()
+        _version_state.clear()
+    else:
+        _bump(_tenant_version_key(tenant_id))
+        _local_snapshots.pop(tenant_id, None)
+        _version_state.pop(tenant_id, None)
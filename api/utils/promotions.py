@@ -0,0 +1,158 @@
+"""
+Set-based class promotion.
+
+BulkClassPromotionView used to load every selected student, look up each
+one's next class, save the student and get_or_create a StudentPromotion one
+at a time inside a single request. Here the next class of every class is
+resolved in one annotated query (Class.next_class, else the single class
+with order + 1), the students are planned in memory, and the move is applied
+in chunks: per chunk and per (from, to) class pair one UPDATE moves the
+students, one bulk_create writes their history and the fee ledger is
+refreshed, all in one transaction.
+
+Students that already have a promotion between the two academic years are
+left out of the plan, so re-running a promotion that failed part-way (or a
+retried job) only moves the students it had not reached. plan_promotion()
+alone is the dry-run preview.
+
+Settings (optional):
+    PROMOTION_SYNC_LIMIT = 200      # larger promotions run on a job worker
+"""
+import logging
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.utils import timezone
+
+from api.utils.fee_ledger import refresh_fee_balances
+from education.models import Class, Student, StudentPromotion
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+def promotion_targets(tenant, to_class=None):
+    """
+    {class_id: (class name, target class id or None, reason when None)} for
+    every class of the tenant. `to_class` overrides the target for all.
+    """
+    following = Class._default_manager.filter(tenant=OuterRef('tenant'), order=OuterRef('order') + 1).order_by()
+    rows = Class._default_manager.filter(tenant=tenant).annotate(
+        following_id=Subquery(following.order_by('id').values('id')[:1]),
+        following_count=Subquery(following.values('tenant').annotate(total=Count('id')).values('total')),
+    ).values('id', 'name', 'next_class_id', 'following_id', 'following_count')
+
+    targets = {}
+    for row in rows:
+        if to_class is not None:
+            targets[row['id']] = (row['name'], to_class.id, None)
+        elif row['next_class_id']:
+            targets[row['id']] = (row['name'], row['next_class_id'], None)
+        elif row['following_count'] == 1:
+            targets[row['id']] = (row['name'], row['following_id'], None)
+        elif row['following_count']:
+            targets[row['id']] = (row['name'], None, f"Several classes follow {row['name']}; set its next class")
+        else:
+            targets[row['id']] = (row['name'], None, f"No next class available for {row['name']}")
+    return targets
+
+
+def plan_promotion(tenant, students, from_academic_year, to_academic_year, to_class=None):
+    """
+    Work out where each student in the `students` queryset moves. Returns
+    {'moves': [(student_id, name, from_class_id, to_class_id), ...],
+     'skipped': [...], 'already_promoted': count, 'class_names': {id: name}}
+    """
+    targets = promotion_targets(tenant, to_class)
+    class_names = {class_id: name for class_id, (name, _, _) in targets.items()}
+    done = set(StudentPromotion._default_manager.filter(
+        tenant=tenant, from_academic_year=from_academic_year, to_academic_year=to_academic_year,
+        student__in=students,
+    ).values_list('student_id', flat=True))
+
+    moves, skipped = [], []
+    for student_id, name, class_id in students.order_by('assigned_class_id', 'id').values_list('id', 'name', 'assigned_class_id'):
+        if student_id in done:
+            continue
+        if class_id is None:
+            skipped.append({'student_id': student_id, 'student_name': name, 'reason': 'Student has no assigned class'})
+            continue
+        _, target_id, reason = targets.get(class_id, (None, None, 'Assigned class not found'))
+        if target_id is None:
+            skipped.append({'student_id': student_id, 'student_name': name, 'reason': reason})
+        else:
+            moves.append((student_id, name, class_id, target_id))
+    return {'moves': moves, 'skipped': skipped, 'already_promoted': len(done), 'class_names': class_names}
+
+
+def plan_summary(plan):
+    """Dry-run preview: student counts per (from, to) class pair"""
+    names = plan['class_names']
+    pairs = defaultdict(int)
+    for _, _, from_id, to_id in plan['moves']:
+        pairs[(from_id, to_id)] += 1
+    return [
+        {'from_class': names.get(from_id), 'to_class': names.get(to_id), 'student_count': count}
+        for (from_id, to_id), count in sorted(pairs.items())
+    ]
+
+
+def run_promotion(tenant, plan, from_academic_year, to_academic_year, promotion_date, notes='',
+                  promoted_by=None, progress=None):
+    """
+    Apply a plan from plan_promotion() chunk by chunk. A chunk that fails is
+    rolled back and its students are reported as errors; the other chunks
+    still commit, and running the promotion again picks the failed students up.
+    """
+    report = progress or (lambda percent, message: None)
+    names = plan['class_names']
+    moves = plan['moves']
+    promoted, errors = [], []
+    for offset in range(0, len(moves), CHUNK_SIZE):
+        chunk = moves[offset:offset + CHUNK_SIZE]
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                by_pair = defaultdict(list)
+                for student_id, _, from_id, to_id in chunk:
+                    by_pair[(from_id, to_id)].append(student_id)
+                for (from_id, to_id), student_ids in by_pair.items():
+                    Student._default_manager.filter(
+                        tenant=tenant, id__in=student_ids, assigned_class_id=from_id
+                    ).update(assigned_class_id=to_id, updated_at=now)
+                history = StudentPromotion._default_manager.bulk_create([
+                    StudentPromotion(
+                        tenant=tenant, student_id=student_id, from_class_id=from_id, to_class_id=to_id,
+                        from_academic_year=from_academic_year, to_academic_year=to_academic_year,
+                        promotion_type='PROMOTED', promotion_date=promotion_date, notes=notes,
+                        promoted_by=promoted_by,
+                    )
+                    for student_id, _, from_id, to_id in chunk
+                ])
+                refresh_fee_balances(tenant.id, [student_id for student_id, _, _, _ in chunk])
+        except Exception as e:
+            logger.error(f"Error promoting students {chunk[0][0]}-{chunk[-1][0]}: {str(e)}", exc_info=True)
+            errors.extend({'student_id': student_id, 'student_name': name, 'error': str(e)}
+                          for student_id, name, _, _ in chunk)
+        else:
+            promoted.extend({
+                'student_id': student_id,
+                'student_name': name,
+                'from_class': names.get(from_id),
+                'to_class': names.get(to_id),
+                'promotion_id': promotion.id,
+            } for (student_id, name, from_id, to_id), promotion in zip(chunk, history))
+        done = min(offset + CHUNK_SIZE, len(moves))
+        report(done * 100 // len(moves), f"Promoted {done} of {len(moves)} students")
+    report(100, 'Promotion complete')
+    return {
+        'message': f'Promoted {len(promoted)} students successfully',
+        'promoted_count': len(promoted),
+        'skipped_count': len(plan['skipped']),
+        'already_promoted_count': plan['already_promoted'],
+        'error_count': len(errors),
+        'promoted_students': promoted,
+        'skipped_students': plan['skipped'],
+        'errors': errors,
+    }
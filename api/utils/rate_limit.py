@@ -0,0 +1,227 @@
+"""
+Pluggable rate limiter engine.
+
+Limits are expressed as RateLimitRule(name, limit, window_seconds) and every
+rule for an identifier is checked in a single backend call using the sliding
+window counter algorithm: the previous fixed window's count is weighted by how
+much of it still overlaps the sliding window, plus the current window's count.
+
+Backends:
+- LocalBackend: in-process, lock-protected check-and-increment. Exact within
+  one worker; used by default and as the test stand-in.
+- RedisBackend: any Redis-protocol server (Redis, KeyDB, Dragonfly, ...).
+  All windows are incremented and read in one MULTI/EXEC pipeline, i.e. one
+  atomic round trip shared by every gunicorn worker.
+
+Configure with RATE_LIMIT_REDIS_URL (enables RedisBackend) or point
+RATE_LIMIT_BACKEND at a dotted backend class path.
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+except ImportError:
+    redis = None  # redis is optional, RedisBackend will error if not installed
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitRule:
+    """A named limit of `limit` hits per `window` seconds"""
+
+    __slots__ = ('name', 'limit', 'window')
+
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def __repr__(self):
+        return f"RateLimitRule({self.name!r}, {self.limit}, {self.window})"
+
+
+class RateLimitResult:
+    """Outcome of a hit: `exceeded` is the first rule that denied it (or None)"""
+
+    __slots__ = ('allowed', 'exceeded', 'retry_after', 'counts')
+
+    def __init__(self, allowed, exceeded=None, retry_after=0, counts=None):
+        self.allowed = allowed
+        self.exceeded = exceeded
+        self.retry_after = retry_after
+        self.counts = counts or {}
+
+    def __bool__(self):
+        return self.allowed
+
+
+def sliding_count(previous, current, window, now):
+    """Estimated hits in the sliding window ending at `now`"""
+    elapsed = (now % window) / window
+    return previous * (1 - elapsed) + current
+
+
+def _retry_after(rule, now):
+    return max(1, int(rule.window - (now % rule.window)))
+
+
+class BaseBackend:
+    def hit(self, identifier, rules, now=None):
+        """Record one hit for `identifier` against all `rules` atomically"""
+        raise NotImplementedError
+
+    def reset(self, identifier=None):
+        """Forget counters (for one identifier, or all). Optional."""
+
+    def check(self):
+        """Raise if the backend cannot serve hits. Optional."""
+
+
+class LocalBackend(BaseBackend):
+    """
+    Process-local limiter. Counters are checked before incrementing, so denied
+    hits are not counted. Note: with several worker processes each one keeps
+    its own counters; use RedisBackend for a shared limit.
+    """
+    SWEEP_EVERY = 10000
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        # (identifier, rule name) -> [bucket, current count, previous count, window]
+        self._windows = {}
+        self._hits = 0
+
+    def hit(self, identifier, rules, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            states = []
+            counts = {}
+            for rule in rules:
+                bucket = int(now // rule.window)
+                state = self._windows.get((identifier, rule.name))
+                if state is None or state[0] < bucket - 1:
+                    state = [bucket, 0, 0, rule.window]
+                elif state[0] == bucket - 1:
+                    state = [bucket, 0, state[1], rule.window]
+                count = sliding_count(state[2], state[1], rule.window, now)
+                counts[rule.name] = count
+                if count + 1 > rule.limit:
+                    return RateLimitResult(False, rule, _retry_after(rule, now), counts)
+                states.append((rule, state))
+            for rule, state in states:
+                state[1] += 1
+                self._windows[(identifier, rule.name)] = state
+            self._hits += 1
+            if self._hits % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+        return RateLimitResult(True, counts=counts)
+
+    def _sweep(self, now):
+        """Drop counters whose windows can no longer contribute to a count"""
+        stale = [
+            key for key, state in self._windows.items()
+            if state[0] < now // state[3] - 1
+        ]
+        for key in stale:
+            del self._windows[key]
+
+    def reset(self, identifier=None):
+        with self._lock:
+            if identifier is None:
+                self._windows.clear()
+            else:
+                for key in [k for k in self._windows if k[0] == identifier]:
+                    del self._windows[key]
+
+
+class RedisBackend(BaseBackend):
+    """
+    Redis-protocol limiter. For each rule it INCRs the current window key,
+    sets its expiry and GETs the previous window key, all inside one
+    MULTI/EXEC pipeline. Hits are counted before the decision, so a client
+    that keeps hammering past its limit stays limited.
+    """
+    KEY_PREFIX = 'rl'
+
+    def __init__(self, client=None, url=None, **options):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("RedisBackend requires the 'redis' package (pip install redis).")
+            client = redis.Redis.from_url(url or settings.RATE_LIMIT_REDIS_URL)
+        self.client = client
+
+    def check(self):
+        self.client.ping()
+
+    def _key(self, identifier, rule, bucket):
+        return f"{self.KEY_PREFIX}:{identifier}:{rule.name}:{bucket}"
+
+    def hit(self, identifier, rules, now=None):
+        now = time.time() if now is None else now
+        pipe = self.client.pipeline(transaction=True)
+        for rule in rules:
+            bucket = int(now // rule.window)
+            current_key = self._key(identifier, rule, bucket)
+            pipe.incr(current_key)
+            pipe.expire(current_key, rule.window * 2)
+            pipe.get(self._key(identifier, rule, bucket - 1))
+        try:
+            replies = pipe.execute()
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down
+            logger.error(f"Rate limiter backend error: {e}")
+            return RateLimitResult(True)
+
+        counts = {}
+        exceeded = None
+        for index, rule in enumerate(rules):
+            current = int(replies[index * 3])
+            previous = int(replies[index * 3 + 2] or 0)
+            # `current` already includes this hit
+            count = sliding_count(previous, current - 1, rule.window, now)
+            counts[rule.name] = count
+            if exceeded is None and count + 1 > rule.limit:
+                exceeded = rule
+        if exceeded is not None:
+            return RateLimitResult(False, exceeded, _retry_after(exceeded, now), counts)
+        return RateLimitResult(True, counts=counts)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Return the process-wide limiter backend configured in settings. A backend
+    that cannot be built or reached (e.g. redis not installed) is logged and
+    replaced by LocalBackend so requests keep flowing.
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                backend_path = getattr(settings, 'RATE_LIMIT_BACKEND', None)
+                if not backend_path:
+                    if getattr(settings, 'RATE_LIMIT_REDIS_URL', None):
+                        backend_path = 'api.utils.rate_limit.RedisBackend'
+                    else:
+                        backend_path = 'api.utils.rate_limit.LocalBackend'
+                try:
+                    limiter = import_string(backend_path)()
+                    limiter.check()
+                except Exception as e:
+                    logger.error(f"Rate limiter backend {backend_path} unavailable, using LocalBackend: {e}")
+                    limiter = LocalBackend()
+                _limiter = limiter
+    return _limiter
+
+
+def set_rate_limiter(backend):
+    """Install a specific backend instance (tests, custom wiring)"""
+    global _limiter
+    _limiter = backend
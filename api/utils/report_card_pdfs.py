@@ -0,0 +1,97 @@
+"""
+Batch report card PDFs.
+
+Rendering one report card is CPU-bound ReportLab drawing, so a term's cards
+are rendered in a process pool (one process per core by default) and each
+PDF is written into the ZIP as soon as it comes back. The archive is built in
+a file, never in memory, and progress is reported per card so the job status
+endpoint can show it.
+
+Pool processes are started with `spawn` (the job worker is threaded, and
+forking a threaded process is unsafe); each one sets up Django and opens its
+own database connection.
+
+Settings (optional):
+    REPORT_CARD_PDF_WORKERS = 4     # rendering processes, default os.cpu_count(); 1 renders in-process
+"""
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def report_card_filename(report_card):
+    class_name = report_card.class_obj.name if report_card.class_obj else 'Unassigned'
+    parts = [class_name, f"{report_card.student.name}_{report_card.id}"]
+    return '/'.join(re.sub(r'[^\w.-]+', '_', part).strip('_') or 'report_card' for part in parts) + '.pdf'
+
+
+def render_one(report_card_id):
+    """Render one card; returns (report_card_id, filename, pdf bytes or None, error)"""
+    from education.models import ReportCard
+    from api.views.education_views import render_report_card_pdf
+
+    try:
+        report_card = ReportCard._default_manager.select_related(
+            'tenant', 'student', 'class_obj', 'academic_year', 'term'
+        ).get(id=report_card_id)
+        return report_card_id, report_card_filename(report_card), render_report_card_pdf(report_card, report_card.tenant), None
+    except Exception as e:
+        logger.error(f"Error rendering report card {report_card_id}: {str(e)}", exc_info=True)
+        return report_card_id, None, None, str(e)
+
+
+# Starting a process (spawn + django.setup()) costs about as much as rendering
+# this many cards, so smaller batches get fewer processes
+CARDS_PER_PROCESS = 25
+
+
+def pdf_workers(count):
+    workers = getattr(settings, 'REPORT_CARD_PDF_WORKERS', None) or os.cpu_count() or 1
+    return max(1, min(int(workers), -(-count // CARDS_PER_PROCESS)))
+
+
+def iter_rendered(object_ids, workers=None, render=render_one):
+    """
+    Yield render(object_id) results in order, rendering on `workers`
+    processes. `render` must be a module-level function so it can be sent
+    to the pool.
+    """
+    workers = workers or pdf_workers(len(object_ids))
+    if workers <= 1:
+        for object_id in object_ids:
+            yield render(object_id)
+        return
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+        yield from pool.map(render, object_ids, chunksize=max(1, len(object_ids) // (workers * 8)))
+
+
+def write_report_card_zip(report_card_ids, fileobj, progress=None, workers=None):
+    """
+    Render `report_card_ids` into a ZIP written to `fileobj` as each PDF
+    completes. Cards that fail to render are listed in the result instead of
+    failing the batch.
+    """
+    report = progress or (lambda percent, message: None)
+    total = len(report_card_ids)
+    rendered, failed = 0, []
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for done, (report_card_id, filename, pdf, error) in enumerate(iter_rendered(report_card_ids, workers), 1):
+            if error is None:
+                archive.writestr(filename, pdf)
+                rendered += 1
+            else:
+                failed.append({'report_card_id': report_card_id, 'error': error})
+            report(done * 100 // total if total else 100, f"Rendered {done} of {total}")
+    return {'rendered': rendered, 'failed': failed}
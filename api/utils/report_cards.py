@@ -0,0 +1,181 @@
+"""
+Set-based report card generation.
+
+ReportCardGenerateView used to build one card at a time and rank it by walking
+every card of the class in Python, so generating a class read O(n²) rows.
+generate_class_report_cards() builds every card of a class/term with a fixed
+number of queries: marks are summed per (student, subject) in one grouped
+query, attendance per student in another, cards are written with
+bulk_create/bulk_update, and rank_report_cards() assigns `rank_in_class` from
+a single Window(Rank()) pass. Tied percentages share a rank.
+
+ReportCard.calculate_totals() uses the same engine for a single card, so every
+calculation method costs one marks query however many subjects there are.
+
+Settings (optional):
+    REPORT_CARD_SYNC_LIMIT = 200    # larger classes are generated on a job worker
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import Rank
+from django.utils import timezone
+
+from education.models import Attendance, MarksEntry, ReportCard, Student
+
+GRADE_BANDS = ((90, 'A+'), (80, 'A'), (70, 'B+'), (60, 'B'), (50, 'C+'), (40, 'C'))
+
+TOTAL_FIELDS = [
+    'class_obj', 'total_marks', 'max_total_marks', 'percentage', 'grade',
+    'days_present', 'days_absent', 'attendance_percentage', 'updated_at',
+]
+
+
+def grade_for(percentage):
+    for floor, grade in GRADE_BANDS:
+        if percentage >= floor:
+            return grade
+    return 'F'
+
+
+def scoped_marks(tenant, academic_year, term):
+    """Marks entries counted towards a term's report cards under the tenant's settings"""
+    scope = getattr(tenant, 'percentage_calculation_scope', 'TERM_WISE')
+    if scope == 'ALL_TERMS':
+        marks = MarksEntry._default_manager.filter(tenant=tenant, assessment__term__academic_year=academic_year)
+    else:
+        marks = MarksEntry._default_manager.filter(tenant=tenant, assessment__term=term)
+    excluded_subject_ids = tenant.percentage_excluded_subjects or []
+    if excluded_subject_ids:
+        marks = marks.exclude(assessment__subject_id__in=excluded_subject_ids)
+    return marks
+
+
+def subject_totals(marks):
+    """
+    {student_id: [(subject_id, obtained, max, weightage), ...]} from one
+    grouped query joined to the subject's weightage. Every calculation method
+    works from this result, so a whole class costs one query.
+    """
+    totals = defaultdict(list)
+    rows = marks.values('student', 'assessment__subject', 'assessment__subject__weightage').annotate(
+        obtained=Sum('marks_obtained'), maximum=Sum('max_marks'),
+    ).order_by()
+    for row in rows:
+        totals[row['student']].append((
+            row['assessment__subject'], row['obtained'] or 0, row['maximum'] or 0,
+            row['assessment__subject__weightage'],
+        ))
+    return totals
+
+
+def compute_scores(tenant, subjects):
+    """
+    (total_marks, max_total_marks, percentage, grade) for one student's
+    per-subject totals, following the tenant's calculation method and rounding.
+    """
+    total = sum((obtained for _, obtained, _, _ in subjects), Decimal(0))
+    maximum = sum((max_marks for _, _, max_marks, _ in subjects), Decimal(0))
+    simple = (total / maximum) * 100 if maximum > 0 else 0
+
+    method = getattr(tenant, 'percentage_calculation_method', 'SIMPLE')
+    if method == 'SUBJECT_WISE':
+        percentages = [(obtained / max_marks) * 100 for _, obtained, max_marks, _ in subjects if max_marks > 0]
+        percentage = sum(percentages) / len(percentages) if percentages else 0
+    elif method == 'WEIGHTED':
+        weighted_sum, total_weightage = 0.0, 0.0
+        for _, obtained, max_marks, weightage in subjects:
+            if max_marks > 0:
+                weightage = float(weightage or 100)
+                weighted_sum += float(obtained / max_marks) * 100 * weightage
+                total_weightage += weightage
+        percentage = weighted_sum / total_weightage if total_weightage > 0 else simple
+    else:
+        percentage = simple
+
+    percentage = round(float(percentage), getattr(tenant, 'percentage_rounding', 2))
+    return total, maximum, percentage, grade_for(percentage)
+
+
+def attendance_totals(tenant, term, student_ids):
+    """{student_id: (total_days, days_present)} within the term's dates"""
+    rows = Attendance._default_manager.filter(
+        tenant=tenant, student_id__in=student_ids, date__gte=term.start_date, date__lte=term.end_date,
+    ).values('student').annotate(total=Count('id'), present_days=Count('id', filter=Q(present=True))).order_by()
+    return {row['student']: (row['total'], row['present_days']) for row in rows}
+
+
+def apply_totals(report_card, scores, attendance):
+    report_card.total_marks, report_card.max_total_marks, report_card.percentage, report_card.grade = scores
+    total_days, days_present = attendance
+    report_card.days_present = days_present
+    report_card.days_absent = total_days - days_present
+    if total_days > 0:
+        report_card.attendance_percentage = (days_present / total_days) * 100
+
+
+def rank_report_cards(tenant, academic_year, term, class_obj=None):
+    """
+    Set `rank_in_class` for every card of the term (one class, or all classes
+    partitioned by class) from one ranked query. Returns the number of cards
+    whose rank changed.
+    """
+    cards = ReportCard._default_manager.filter(tenant=tenant, academic_year=academic_year, term=term)
+    if class_obj is not None:
+        cards = cards.filter(class_obj=class_obj)
+    ranked = cards.annotate(
+        position=Window(Rank(), partition_by=[F('class_obj')], order_by=F('percentage').desc()),
+    ).only('id', 'rank_in_class')
+    changed = []
+    for card in ranked:
+        if card.rank_in_class != card.position:
+            card.rank_in_class = card.position
+            changed.append(card)
+    ReportCard._default_manager.bulk_update(changed, ['rank_in_class'], batch_size=500)
+    return len(changed)
+
+
+def generate_class_report_cards(tenant, class_obj, academic_year, term, progress=None):
+    """
+    Create or refresh the report cards of every active student in `class_obj`
+    for a term, then rank the class. Remarks and issue dates on existing
+    cards are kept. Returns counts of created/updated/ranked cards.
+    """
+    report = progress or (lambda percent, message: None)
+    student_ids = list(Student._default_manager.filter(
+        tenant=tenant, assigned_class=class_obj, is_active=True
+    ).values_list('id', flat=True))
+
+    marks = scoped_marks(tenant, academic_year, term).filter(student_id__in=student_ids)
+    totals = subject_totals(marks)
+    attendance = attendance_totals(tenant, term, student_ids)
+    report(40, 'Totals calculated')
+
+    existing = {
+        card.student_id: card
+        for card in ReportCard._default_manager.filter(
+            tenant=tenant, academic_year=academic_year, term=term, student_id__in=student_ids
+        )
+    }
+    now = timezone.now()
+    created, updated = [], []
+    for student_id in student_ids:
+        card = existing.get(student_id)
+        if card is None:
+            card = ReportCard(tenant=tenant, student_id=student_id, academic_year=academic_year, term=term)
+            created.append(card)
+        else:
+            updated.append(card)
+        card.class_obj = class_obj
+        card.updated_at = now
+        apply_totals(card, compute_scores(tenant, totals.get(student_id, [])),
+                     attendance.get(student_id, (0, 0)))
+
+    with transaction.atomic():
+        ReportCard._default_manager.bulk_create(created, batch_size=500)
+        ReportCard._default_manager.bulk_update(updated, TOTAL_FIELDS, batch_size=500)
+        report(80, 'Report cards saved')
+        ranked = rank_report_cards(tenant, academic_year, term, class_obj)
+    report(100, 'Ranks assigned')
+    return {'students': len(student_ids), 'created': len(created), 'updated': len(updated), 'ranked': ranked}
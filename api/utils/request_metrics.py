@@ -0,0 +1,219 @@
+"""
+Per-endpoint latency and SQL instrumentation.
+
+RequestMetricsMiddleware installs a QueryRecorder as a database execute
+wrapper for each request. The recorder counts queries, sums DB time and
+fingerprints statements (literals and IN-lists collapsed) so a statement
+repeated N_PLUS_ONE_THRESHOLD or more times in one request is flagged as a
+likely N+1. Per-route aggregates live in a process-local MetricsRegistry and
+are rendered in Prometheus text format by the /metrics view.
+
+Settings (optional):
+    REQUEST_METRICS = {
+        'ENABLED': True,
+        'RESPONSE_HEADERS': False,       # add X-Query-Count / X-DB-Time-Ms / Server-Timing
+        'N_PLUS_ONE_THRESHOLD': 10,
+        'LOG_N_PLUS_ONE': True,
+    }
+    METRICS_AUTH_TOKEN = '...'           # bearer token required by /metrics
+"""
+import logging
+import re
+import threading
+import time
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'RESPONSE_HEADERS': False,
+    'N_PLUS_ONE_THRESHOLD': 10,
+    'LOG_N_PLUS_ONE': True,
+}
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s|\?)(?:, ?(?:%s|\?))*\)', re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def metrics_settings():
+    options = dict(DEFAULTS)
+    options.update(getattr(settings, 'REQUEST_METRICS', {}) or {})
+    return options
+
+
+def fingerprint(sql):
+    """Normalize a statement so repeated executions with different values match"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """Database execute wrapper collecting per-request query statistics"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            key = fingerprint(sql)
+            self.fingerprints[key] = self.fingerprints.get(key, 0) + 1
+
+    def repeated(self, threshold):
+        """Fingerprints executed at least `threshold` times, most frequent first"""
+        return sorted(
+            ((sql, count) for sql, count in self.fingerprints.items() if count >= threshold),
+            key=lambda item: -item[1],
+        )
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'total')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.total = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.total += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+class RouteStats:
+    __slots__ = ('latency', 'queries', 'db_seconds', 'requests', 'n_plus_one', 'repeated')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_seconds = 0.0
+        self.requests = 0
+        self.n_plus_one = 0
+        # fingerprint -> highest repeat count seen in one request
+        self.repeated = {}
+
+
+class MetricsRegistry:
+    """Process-local per-route aggregates"""
+
+    MAX_FINGERPRINTS_PER_ROUTE = 20
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, method, status_code, latency, recorder, repeated):
+        key = (route, method, str(status_code)[0] + 'xx')
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats()
+            stats.requests += 1
+            stats.latency.observe(latency)
+            stats.queries.observe(recorder.count)
+            stats.db_seconds += recorder.duration
+            if repeated:
+                stats.n_plus_one += 1
+                for sql, count in repeated:
+                    if sql in stats.repeated or len(stats.repeated) < self.MAX_FINGERPRINTS_PER_ROUTE:
+                        stats.repeated[sql] = max(count, stats.repeated.get(sql, 0))
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._routes.items())
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = MetricsRegistry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _render_histogram(lines, name, histogram, labels):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.total}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.total}')
+
+
+def render_prometheus():
+    """Render the registry (and buffer backpressure gauges) in Prometheus text format"""
+    routes = registry.snapshot()
+    lines = [
+        '# HELP erp_request_latency_seconds Request latency per route.',
+        '# TYPE erp_request_latency_seconds histogram',
+    ]
+    for (route, method, status_class), stats in routes:
+        _render_histogram(lines, 'erp_request_latency_seconds', stats.latency,
+                          {'route': route, 'method': method, 'status': status_class})
+    lines += [
+        '# HELP erp_request_queries SQL queries issued per request.',
+        '# TYPE erp_request_queries histogram',
+    ]
+    for (route, method, status_class), stats in routes:
+        _render_histogram(lines, 'erp_request_queries', stats.queries,
+                          {'route': route, 'method': method, 'status': status_class})
+    lines += [
+        '# HELP erp_request_db_seconds_total Time spent in the database per route.',
+        '# TYPE erp_request_db_seconds_total counter',
+    ]
+    for (route, method, status_class), stats in routes:
+        labels = _labels(route=route, method=method, status=status_class)
+        lines.append(f'erp_request_db_seconds_total{labels} {stats.db_seconds}')
+    lines += [
+        '# HELP erp_request_n_plus_one_total Requests with a repeated-query (N+1) pattern.',
+        '# TYPE erp_request_n_plus_one_total counter',
+    ]
+    for (route, method, status_class), stats in routes:
+        labels = _labels(route=route, method=method, status=status_class)
+        lines.append(f'erp_request_n_plus_one_total{labels} {stats.n_plus_one}')
+    lines += [
+        '# HELP erp_repeated_query_max Highest per-request repeat count of a query fingerprint.',
+        '# TYPE erp_repeated_query_max gauge',
+    ]
+    for (route, method, status_class), stats in routes:
+        for sql, count in stats.repeated.items():
+            labels = _labels(route=route, method=method, fingerprint=sql[:200])
+            lines.append(f'erp_repeated_query_max{labels} {count}')
+
+    from api.utils import audit_buffer
+    if audit_buffer._buffer is not None:
+        lines += [
+            '# HELP erp_audit_buffer Audit log write-behind buffer state.',
+            '# TYPE erp_audit_buffer gauge',
+        ]
+        for name, value in audit_buffer._buffer.stats().items():
+            lines.append(f'erp_audit_buffer{_labels(stat=name)} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,312 @@
+"""
+Bulk exam seating allocation.
+
+SeatingArrangementListCreateView creates one seat per request. allocate_seats()
+seats every candidate of a sitting at once: the schedule being allocated plus
+any other schedules that start at the same date and time (classes writing
+different papers in the same halls). Each room's capacity is laid out as a
+grid of EXAM_SEATING_COLUMNS columns and seats are numbered by row letter and
+column (A1, A2, ... B1, ...). Seats kept from earlier allocations hold their
+cells (from row and column, or a seat number in that form); those without a
+usable position still count against the room's capacity.
+
+assign_seats() is the allocation core. It works on flat arrays only (a class
+index per candidate, a class index per grid cell) without touching the
+database. Seats are filled room by room, row by row, and each seat goes to
+the class with the most candidates left among those not already seated to its
+left or in front of it, so neighbouring students are from different classes
+whenever the class sizes allow it. Seats that cannot avoid a neighbour of the
+same class are counted and reported.
+
+Rooms are checked against the (room, date, start_time) index: a room booked by
+another schedule whose time overlaps the sitting, or holding its seats, is
+left out and reported as a conflict. schedule_room_conflicts() lists every
+pair of overlapping schedules sharing a room.
+
+Settings (optional):
+    EXAM_SEATING_COLUMNS = 6        # seats per row in every room
+"""
+import re
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+
+from education.models import ExamSchedule, Room, SeatingArrangement, Student
+
+BATCH_SIZE = 500
+EMPTY = -1
+
+
+def seating_columns():
+    return max(1, int(getattr(settings, 'EXAM_SEATING_COLUMNS', 6)))
+
+
+def row_label(row):
+    """0 -> A, 25 -> Z, 26 -> AA"""
+    label = ''
+    row += 1
+    while row:
+        row, rest = divmod(row - 1, 26)
+        label = chr(65 + rest) + label
+    return label
+
+
+def seat_number(row, column):
+    return f"{row_label(row)}{column + 1}"
+
+
+def seat_position(number):
+    """'B5' -> (2, 5), 1-based like row_number/column_number; (None, None) for other labels"""
+    match = re.fullmatch(r'([A-Z]+)(\d+)', (number or '').strip().upper())
+    if not match:
+        return None, None
+    row = 0
+    for letter in match.group(1):
+        row = row * 26 + ord(letter) - 64
+    return row, int(match.group(2))
+
+
+def assign_seats(candidate_classes, grids):
+    """
+    Seat candidates on grids.
+
+    `candidate_classes` holds a class index per candidate. `grids` holds one
+    (rows, columns, cells) per room, where `cells` is a flat row-major list
+    of length rows * columns with EMPTY for a free seat, None for a cell past
+    the room's capacity and a class index for a seat already taken.
+
+    Returns (placements, adjacent) where placements is a list of
+    (candidate index, room index, row, column) and adjacent the number of
+    placed candidates sitting next to or behind someone of their own class.
+    """
+    queues = defaultdict(list)
+    for index in range(len(candidate_classes) - 1, -1, -1):
+        queues[candidate_classes[index]].append(index)  # popped from the end, so in input order
+    order = sorted(queues, key=lambda group: (-len(queues[group]), group))
+
+    placements = []
+    adjacent = 0
+    remaining = len(candidate_classes)
+    for room_index, (rows, columns, cells) in enumerate(grids):
+        for cell, value in enumerate(cells):
+            if not remaining:
+                return placements, adjacent
+            if value != EMPTY:
+                continue
+            row, column = divmod(cell, columns)
+            left = cells[cell - 1] if column else None
+            front = cells[cell - columns] if row else None
+            best = None
+            for group in order:
+                if queues[group] and group != left and group != front:
+                    if best is None or len(queues[group]) > len(queues[best]):
+                        best = group
+            if best is None:
+                best = max((group for group in order if queues[group]), key=lambda group: len(queues[group]))
+                adjacent += 1
+            cells[cell] = best
+            placements.append((queues[best].pop(), room_index, row, column))
+            remaining -= 1
+    return placements, adjacent
+
+
+def room_grid(capacity, columns):
+    rows = -(-capacity // columns)
+    return rows, columns, [EMPTY] * capacity + [None] * (rows * columns - capacity)
+
+
+def overlapping_schedules(tenant, room_id, date, start_time, end_time):
+    """Active schedules in `room_id` on `date` whose time overlaps the given slot"""
+    return ExamSchedule._default_manager.filter(
+        tenant=tenant, room_id=room_id, date=date, is_active=True,
+        start_time__lt=end_time, end_time__gt=start_time,
+    )
+
+
+def schedule_room_conflicts(tenant, exam=None, date=None):
+    """
+    Pairs of active schedules that share a room and overlap in time. One scan
+    ordered by (room, date, start_time), keeping the schedules still running.
+    """
+    schedules = ExamSchedule._default_manager.filter(tenant=tenant, is_active=True, room__isnull=False)
+    if date is not None:
+        schedules = schedules.filter(date=date)
+    if exam is not None:
+        # Schedules of other exams can still hold the same rooms on those dates
+        schedules = schedules.filter(date__in=ExamSchedule._default_manager.filter(
+            tenant=tenant, exam=exam, is_active=True).values('date'))
+    conflicts = []
+    running, slot = [], None
+    for row in schedules.order_by('room_id', 'date', 'start_time', 'id').values(
+        'id', 'exam_id', 'room_id', 'room__name', 'date', 'start_time', 'end_time', 'class_obj__name', 'subject__name'
+    ):
+        if (row['room_id'], row['date']) != slot:
+            running, slot = [], (row['room_id'], row['date'])
+        running = [other for other in running if other['end_time'] > row['start_time']]
+        for other in running:
+            if exam is None or exam.id in (other['exam_id'], row['exam_id']):
+                conflicts.append({
+                    'room_id': row['room_id'],
+                    'room': row['room__name'],
+                    'date': row['date'],
+                    'schedules': [
+                        {'id': entry['id'], 'class': entry['class_obj__name'], 'subject': entry['subject__name'],
+                         'start_time': entry['start_time'], 'end_time': entry['end_time']}
+                        for entry in (other, row)
+                    ],
+                })
+        running.append(row)
+    return conflicts
+
+
+def busy_rooms(tenant, sitting, room_ids):
+    """
+    {room_id: reason} for rooms held at the sitting's time by schedules
+    outside the sitting, either as their room or through their seats.
+    """
+    first = sitting[0]
+    start = min(schedule.start_time for schedule in sitting)
+    end = max(schedule.end_time for schedule in sitting)
+    others = ExamSchedule._default_manager.filter(
+        tenant=tenant, date=first.date, is_active=True, start_time__lt=end, end_time__gt=start,
+    ).exclude(id__in=[schedule.id for schedule in sitting])
+    busy = {}
+    for room_id, class_name, subject_name in others.filter(room_id__in=room_ids).values_list(
+            'room_id', 'class_obj__name', 'subject__name'):
+        busy.setdefault(room_id, f"Booked for {class_name} {subject_name}")
+    for room_id, class_name, subject_name in SeatingArrangement._default_manager.filter(
+        tenant=tenant, exam_schedule__in=others, room_id__in=room_ids, is_active=True,
+    ).values_list('room_id', 'exam_schedule__class_obj__name', 'exam_schedule__subject__name').distinct():
+        busy.setdefault(room_id, f"Seats taken by {class_name} {subject_name}")
+    return busy
+
+
+def sitting_for(tenant, schedule, schedule_ids=None):
+    """The schedule plus the extra schedules seated with it; they must start together"""
+    sitting = [schedule]
+    if schedule_ids:
+        extra = list(ExamSchedule._default_manager.filter(
+            tenant=tenant, id__in=schedule_ids, is_active=True).exclude(id=schedule.id))
+        if len(extra) != len(set(schedule_ids) - {schedule.id}):
+            raise ValueError('Some exam schedules were not found.')
+        for other in extra:
+            if (other.date, other.start_time) != (schedule.date, schedule.start_time):
+                raise ValueError(f'Exam schedule {other.id} does not start at the same date and time.')
+        sitting.extend(extra)
+    if len({entry.class_obj_id for entry in sitting}) != len(sitting):
+        raise ValueError('Only one exam schedule per class can be seated together.')
+    return sitting
+
+
+def allocate_seats(tenant, schedule, schedule_ids=None, room_ids=None, student_ids=None,
+                   replace=False, dry_run=False):
+    """
+    Seat every active student of the sitting's classes (or `student_ids`)
+    who has no active seat yet, in `room_ids` or the sitting's own rooms.
+    With `replace` the sitting's existing seats are dropped first. Raises
+    ValueError when the request cannot be met.
+    """
+    sitting = sitting_for(tenant, schedule, schedule_ids)
+    schedule_by_class = {entry.class_obj_id: entry for entry in sitting}
+
+    if room_ids:
+        rooms = list(Room._default_manager.filter(tenant=tenant, id__in=room_ids, is_active=True))
+        if len(rooms) != len(set(room_ids)):
+            raise ValueError('Some rooms were not found.')
+    else:
+        rooms = list(Room._default_manager.filter(
+            tenant=tenant, id__in=[entry.room_id for entry in sitting if entry.room_id], is_active=True))
+    if not rooms:
+        raise ValueError('No rooms selected and the exam schedules have no room.')
+    rooms.sort(key=lambda room: (room.name, room.id))
+
+    busy = busy_rooms(tenant, sitting, [room.id for room in rooms])
+    conflicts = [{'room_id': room.id, 'room': room.name, 'reason': busy[room.id]} for room in rooms if room.id in busy]
+    no_capacity = [{'room_id': room.id, 'room': room.name, 'reason': 'Room has no capacity set'}
+                   for room in rooms if room.id not in busy and not room.capacity]
+    rooms = [room for room in rooms if room.id not in busy and room.capacity]
+
+    students = Student._default_manager.filter(tenant=tenant, is_active=True, assigned_class_id__in=schedule_by_class)
+    if student_ids:
+        students = students.filter(id__in=student_ids)
+    candidates = list(students.order_by('assigned_class_id', 'name', 'id').values_list('id', 'assigned_class_id'))
+
+    existing = list(SeatingArrangement._default_manager.filter(
+        tenant=tenant, exam_schedule__in=sitting,
+    ).values('id', 'student_id', 'exam_schedule__class_obj_id', 'exam_schedule__room_id', 'room_id',
+             'seat_number', 'row_number', 'column_number', 'is_active'))
+    kept = [] if replace else [seat for seat in existing if seat['is_active']]
+    seated = {seat['student_id'] for seat in kept}
+    stale = [seat['id'] for seat in existing if replace or not seat['is_active']]
+    candidates = [(student_id, class_id) for student_id, class_id in candidates if student_id not in seated]
+
+    # Class indexes keep the grids as plain integer arrays
+    class_index = {class_id: index for index, class_id in enumerate(schedule_by_class)}
+    columns = seating_columns()
+    grids = [room_grid(room.capacity, columns) for room in rooms]
+    room_position = {room.id: index for index, room in enumerate(rooms)}
+    # Kept seats take their cell; seats whose cell is unknown or clashes still use up capacity
+    unplaced = defaultdict(int)
+    for seat in kept:
+        # A seat without a room sits in its schedule's room
+        position = room_position.get(seat['room_id'] or seat['exam_schedule__room_id'])
+        if position is None:
+            continue
+        rows, grid_columns, cells = grids[position]
+        row, column = seat['row_number'], seat['column_number']
+        if row is None or column is None:
+            row, column = seat_position(seat['seat_number'])
+        cell = (row - 1) * grid_columns + column - 1 if row and column and column <= grid_columns else None
+        if cell is not None and 0 <= cell < len(cells) and cells[cell] == EMPTY:
+            cells[cell] = class_index[seat['exam_schedule__class_obj_id']]
+        else:
+            unplaced[position] += 1
+    for position, count in unplaced.items():
+        cells = grids[position][2]
+        for cell in range(len(cells) - 1, -1, -1):
+            if not count:
+                break
+            if cells[cell] == EMPTY:
+                cells[cell] = None
+                count -= 1
+
+    free = sum(cells.count(EMPTY) for _, _, cells in grids)
+    if len(candidates) > free:
+        raise ValueError(f'Not enough seats: {len(candidates)} students to seat, {free} free seats in the selected rooms.')
+
+    placements, adjacent = assign_seats([class_index[class_id] for _, class_id in candidates], grids)
+
+    used = defaultdict(int)
+    arrangements = []
+    for candidate, room_position_index, row, column in placements:
+        student_id, class_id = candidates[candidate]
+        room = rooms[room_position_index]
+        used[room.id] += 1
+        arrangements.append(SeatingArrangement(
+            tenant=tenant,
+            exam_schedule=schedule_by_class[class_id],
+            student_id=student_id,
+            room=room,
+            seat_number=seat_number(row, column),
+            row_number=row + 1,
+            column_number=column + 1,
+        ))
+
+    if not dry_run:
+        with transaction.atomic():
+            if stale:
+                SeatingArrangement._default_manager.filter(id__in=stale).delete()
+            SeatingArrangement._default_manager.bulk_create(arrangements, batch_size=BATCH_SIZE)
+
+    return {
+        'allocated_count': len(arrangements),
+        'already_seated_count': len(seated),
+        'adjacent_same_class': adjacent,
+        'rooms': [
+            {'room_id': room.id, 'room': room.name, 'capacity': room.capacity, 'allocated': used[room.id]}
+            for room in rooms if used[room.id]
+        ],
+        'room_conflicts': conflicts,
+        'skipped_rooms': no_capacity,
+        'dry_run': dry_run,
+    }
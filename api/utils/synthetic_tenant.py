@@ -0,0 +1,365 @@
+"""
+Synthetic tenant generator for benchmarks.
+
+Builds one tenant with realistic data volumes using bulk_create in fixed-size
+chunks, so a 2M-row attendance table is generated without holding it in
+memory. Rows are produced deterministically from a seed, which keeps query
+plans and benchmark results comparable between runs. Child rows reference
+the primary keys returned by bulk_create, so the database backend must
+support RETURNING (PostgreSQL, SQLite >= 3.35, MariaDB >= 10.5).
+
+Scale presets (override any count individually):
+    small   500 students,   10k attendance,   5k retail sales,   1k pharmacy batches
+    medium  5k students,   300k attendance,  50k retail sales,  10k pharmacy batches
+    large   20k students,   2M attendance,  500k retail sales, 100k pharmacy batches
+"""
+import logging
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from api.models.plan import Plan
+from api.models.user import Tenant, UserProfile, Role
+from education.models import Class, Student, FeeStructure, FeePayment, Attendance
+from retail.models import (
+    Warehouse, Product, Customer as RetailCustomer, Sale as RetailSale, SaleItem as RetailSaleItem,
+)
+from pharmacy.models import (
+    MedicineCategory, Medicine, MedicineBatch, Supplier as PharmacySupplier,
+)
+
+logger = logging.getLogger(__name__)
+
+SCALES = {
+    'small': {
+        'classes': 10, 'students': 500, 'attendance_days': 20, 'fee_payments': 1000,
+        'products': 200, 'retail_customers': 500, 'retail_sales': 5000,
+        'medicines': 200, 'pharmacy_batches': 1000,
+    },
+    'medium': {
+        'classes': 12, 'students': 5000, 'attendance_days': 60, 'fee_payments': 10000,
+        'products': 2000, 'retail_customers': 5000, 'retail_sales': 50000,
+        'medicines': 2000, 'pharmacy_batches': 10000,
+    },
+    'large': {
+        'classes': 12, 'students': 20000, 'attendance_days': 100, 'fee_payments': 40000,
+        'products': 10000, 'retail_customers': 20000, 'retail_sales': 500000,
+        'medicines': 10000, 'pharmacy_batches': 100000,
+    },
+}
+
+BENCHMARK_PLAN_NAME = 'Benchmark'
+BENCHMARK_PASSWORD = 'Bench123456!'
+
+FEE_TYPES = ('TUITION', 'EXAM', 'LIBRARY', 'TRANSPORT')
+PAYMENT_METHODS = ('CASH', 'CARD', 'UPI')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the supplied values of auto_now_add fields"""
+    previous = [(field, field.auto_now_add) for field in fields]
+    for field, _ in previous:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in previous:
+            field.auto_now_add = value
+
+
+class SyntheticTenant:
+    """Handles to the generated tenant used to build benchmark requests"""
+
+    def __init__(self, tenant, user, profile):
+        self.tenant = tenant
+        self.user = user
+        self.profile = profile
+
+    @property
+    def prefix(self):
+        return f"B{self.tenant.id}"
+
+    def counts(self):
+        tenant = self.tenant
+        return {
+            'classes': Class._default_manager.filter(tenant=tenant).count(),
+            'students': Student._default_manager.filter(tenant=tenant).count(),
+            'attendance': Attendance._default_manager.filter(tenant=tenant).count(),
+            'fee_payments': FeePayment._default_manager.filter(tenant=tenant).count(),
+            'products': Product.objects.filter(tenant=tenant).count(),
+            'retail_sales': RetailSale.objects.filter(tenant=tenant).count(),
+            'medicines': Medicine.objects.filter(tenant=tenant).count(),
+            'pharmacy_batches': MedicineBatch.objects.filter(tenant=tenant).count(),
+        }
+
+    def sale_payload(self):
+        """Body for a retail sale POST against this tenant's data"""
+        customer = RetailCustomer.objects.filter(tenant=self.tenant).order_by('id').first()
+        warehouse = Warehouse.objects.filter(tenant=self.tenant, is_primary=True).first()
+        product = Product.objects.filter(tenant=self.tenant).order_by('id').first()
+        return {
+            'customer': customer.id,
+            'warehouse': warehouse.id,
+            'payment_method': 'CASH',
+            'items': [{'product': product.name, 'quantity': 2, 'price': float(product.selling_price)}],
+        }
+
+
+def find_synthetic_tenant(name):
+    """Return the SyntheticTenant for an already generated tenant, or None"""
+    tenant = Tenant.objects.filter(name=name).first()
+    if tenant is None:
+        return None
+    profile = (UserProfile._default_manager.select_related('user')
+               .filter(tenant=tenant, role__name='admin').order_by('id').first())
+    if profile is None:
+        return None
+    return SyntheticTenant(tenant, profile.user, profile)
+
+
+class SyntheticTenantBuilder:
+    def __init__(self, name, scale='small', batch_size=5000, seed=42, log=None, **overrides):
+        if scale not in SCALES:
+            raise ValueError(f"Unknown scale '{scale}', expected one of {', '.join(SCALES)}")
+        self.name = name
+        self.counts = dict(SCALES[scale])
+        self.counts.update({key: value for key, value in overrides.items() if value is not None})
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.log = log or logger.info
+        self.today = timezone.now().date()
+
+    def build(self):
+        """Create the tenant and all of its data; returns a SyntheticTenant"""
+        with transaction.atomic():
+            synthetic = self._create_tenant()
+        tenant = synthetic.tenant
+        prefix = synthetic.prefix
+
+        class_ids = self._create_classes(tenant)
+        student_ids = self._create_students(tenant, prefix, class_ids)
+        self._create_attendance(tenant, student_ids)
+        self._create_fees(tenant, prefix, class_ids, student_ids, synthetic.profile)
+        self._create_retail(tenant, prefix, synthetic.profile)
+        self._create_pharmacy(tenant, prefix)
+        return synthetic
+
+    def _insert(self, model, rows, label, total):
+        """bulk_create `rows` (an iterable) in chunks; returns the created objects' pks"""
+        pks = []
+        written = 0
+        for chunk in chunked(rows, self.batch_size):
+            with transaction.atomic():
+                created = model._default_manager.bulk_create(chunk, batch_size=self.batch_size)
+            pks.extend(obj.pk for obj in created)
+            written += len(chunk)
+            if written == total or written % (self.batch_size * 20) == 0:
+                self.log(f"{label}: {written}/{total}")
+        return pks
+
+    def _insert_rows(self, model, rows, label, total):
+        """Like _insert for rows whose pks are never needed (keeps memory flat)"""
+        written = 0
+        for chunk in chunked(rows, self.batch_size):
+            with transaction.atomic():
+                model._default_manager.bulk_create(chunk, batch_size=self.batch_size)
+            written += len(chunk)
+            if written == total or written % (self.batch_size * 20) == 0:
+                self.log(f"{label}: {written}/{total}")
+
+    def _create_tenant(self):
+        plan, _ = Plan.objects.get_or_create(
+            name=BENCHMARK_PLAN_NAME,
+            defaults={
+                'description': 'All modules, used by the benchmark suite',
+                'storage_limit_mb': 51200,
+                'price': None,
+                'billing_cycle': 'custom',
+                'has_education': True, 'has_retail': True, 'has_pharmacy': True,
+                'has_inventory': True, 'has_dashboard': True, 'has_analytics': True,
+                'has_api_access': True,
+            },
+        )
+        tenant = Tenant.objects.create(
+            name=self.name, industry='education', plan=plan,
+            subscription_status='active', subscription_start_date=self.today,
+            subscription_end_date=self.today + timedelta(days=365),
+        )
+        role, _ = Role.objects.get_or_create(name='admin')
+        username = f"bench_{tenant.id}"
+        user = User.objects.create_user(username=username, email=f"{username}@example.com",
+                                        password=BENCHMARK_PASSWORD)
+        profile = UserProfile.objects.create(user=user, tenant=tenant, role=role)
+        return SyntheticTenant(tenant, user, profile)
+
+    # Education -----------------------------------------------------------
+
+    def _create_classes(self, tenant):
+        classes = [Class(tenant=tenant, name=f"Class {index}", order=index)
+                   for index in range(1, self.counts['classes'] + 1)]
+        return self._insert(Class, classes, 'classes', len(classes))
+
+    def _create_students(self, tenant, prefix, class_ids):
+        rnd = self.random
+        total = self.counts['students']
+
+        def rows():
+            for index in range(total):
+                yield Student(
+                    tenant=tenant,
+                    name=f"Student {index}",
+                    email=f"student{index}@bench.example.com",
+                    upper_id=f"{prefix}-STU-{index:06d}",
+                    admission_date=self.today - timedelta(days=rnd.randint(30, 1500)),
+                    assigned_class_id=class_ids[index % len(class_ids)],
+                    gender=rnd.choice(('Male', 'Female')),
+                    parent_phone=f"9{rnd.randint(100000000, 999999999)}",
+                )
+        return self._insert(Student, rows(), 'students', total)
+
+    def _create_attendance(self, tenant, student_ids):
+        days = self.counts['attendance_days']
+        total = days * len(student_ids)
+        rnd = self.random
+        start = self.today - timedelta(days=days)
+
+        def rows():
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                for student_id in student_ids:
+                    yield Attendance(tenant=tenant, student_id=student_id, date=day,
+                                     present=rnd.random() < 0.9)
+        self._insert_rows(Attendance, rows(), 'attendance', total)
+
+    def _create_fees(self, tenant, prefix, class_ids, student_ids, profile):
+        structures = [
+            FeeStructure(tenant=tenant, class_obj_id=class_id, fee_type=fee_type,
+                         amount=Decimal(self.random.randrange(1000, 20000, 500)),
+                         academic_year='2024-25', due_date=self.today)
+            for class_id in class_ids for fee_type in FEE_TYPES
+        ]
+        structure_ids = self._insert(FeeStructure, structures, 'fee structures', len(structures))
+        total = self.counts['fee_payments']
+        rnd = self.random
+
+        def rows():
+            for index in range(total):
+                yield FeePayment(
+                    tenant=tenant,
+                    student_id=student_ids[index % len(student_ids)],
+                    fee_structure_id=rnd.choice(structure_ids),
+                    amount_paid=Decimal(rnd.randrange(500, 5000, 50)),
+                    payment_date=self.today - timedelta(days=rnd.randint(0, 365)),
+                    payment_method=rnd.choice(PAYMENT_METHODS),
+                    receipt_number=f"{prefix}-RCPT-{index:07d}",
+                    collected_by=profile,
+                )
+        with explicit_timestamps(FeePayment._meta.get_field('payment_date')):
+            self._insert_rows(FeePayment, rows(), 'fee payments', total)
+
+    # Retail --------------------------------------------------------------
+
+    def _create_retail(self, tenant, prefix, profile):
+        rnd = self.random
+        warehouse = Warehouse.objects.create(tenant=tenant, name='Main Warehouse', address='Benchmark',
+                                             contact_person='Bench', phone='9000000000', is_primary=True)
+        products = []
+        for index in range(self.counts['products']):
+            cost = Decimal(rnd.randrange(10, 2000))
+            products.append(Product(tenant=tenant, name=f"Product {index}", sku=f"{prefix}-SKU-{index:06d}",
+                                    cost_price=cost, selling_price=cost * Decimal('1.2'),
+                                    mrp=cost * Decimal('1.3')))
+        product_rows = list(zip(self._insert(Product, products, 'products', len(products)),
+                                (product.selling_price for product in products)))
+        customers = [RetailCustomer(tenant=tenant, name=f"Customer {index}",
+                                    phone=f"8{index:09d}")
+                     for index in range(self.counts['retail_customers'])]
+        customer_ids = self._insert(RetailCustomer, customers, 'retail customers', len(customers))
+
+        total = self.counts['retail_sales']
+        now = timezone.now()
+        sale_date_field = RetailSale._meta.get_field('sale_date')
+        written = 0
+        with explicit_timestamps(sale_date_field):
+            for start in range(0, total, self.batch_size):
+                sales, lines = [], []
+                for index in range(start, min(start + self.batch_size, total)):
+                    product_id, price = rnd.choice(product_rows)
+                    quantity = rnd.randint(1, 5)
+                    amount = price * quantity
+                    sales.append(RetailSale(
+                        tenant=tenant, invoice_number=f"{prefix}-INV-{index:07d}",
+                        customer_id=rnd.choice(customer_ids), warehouse=warehouse,
+                        sale_date=now - timedelta(minutes=rnd.randint(0, 365 * 24 * 60)),
+                        subtotal=amount, total_amount=amount,
+                        payment_method=rnd.choice(PAYMENT_METHODS), sold_by=profile,
+                    ))
+                    lines.append((product_id, quantity, price, amount))
+                with transaction.atomic():
+                    sale_ids = [sale.pk for sale in RetailSale.objects.bulk_create(sales)]
+                    RetailSaleItem.objects.bulk_create([
+                        RetailSaleItem(tenant=tenant, sale_id=sale_id, product_id=product_id,
+                                       quantity=quantity, unit_price=price, total_price=amount)
+                        for sale_id, (product_id, quantity, price, amount) in zip(sale_ids, lines)
+                    ])
+                written += len(sales)
+                if written == total or written % (self.batch_size * 20) == 0:
+                    self.log(f"retail sales: {written}/{total}")
+
+    # Pharmacy ------------------------------------------------------------
+
+    def _create_pharmacy(self, tenant, prefix):
+        rnd = self.random
+        category = MedicineCategory.objects.create(tenant=tenant, name='General')
+        supplier = PharmacySupplier.objects.create(tenant=tenant, name='Bench Pharma', contact_person='Bench',
+                                                   phone='9000000001', address='Benchmark')
+        medicines = [Medicine(tenant=tenant, name=f"Medicine {index}", category=category,
+                              manufacturer='Bench Labs', dosage_form='TABLET')
+                     for index in range(self.counts['medicines'])]
+        medicine_ids = self._insert(Medicine, medicines, 'medicines', len(medicines))
+        total = self.counts['pharmacy_batches']
+
+        def rows():
+            for index in range(total):
+                cost = Decimal(rnd.randrange(5, 500))
+                received = rnd.randint(10, 500)
+                manufactured = self.today - timedelta(days=rnd.randint(30, 700))
+                yield MedicineBatch(
+                    tenant=tenant, medicine_id=medicine_ids[index % len(medicine_ids)],
+                    batch_number=f"{prefix}-BT-{index:07d}", supplier=supplier,
+                    manufacturing_date=manufactured,
+                    expiry_date=manufactured + timedelta(days=rnd.randint(180, 1095)),
+                    cost_price=cost, selling_price=cost * Decimal('1.25'), mrp=cost * Decimal('1.4'),
+                    quantity_received=received, quantity_available=rnd.randint(0, received),
+                )
+        self._insert_rows(MedicineBatch, rows(), 'pharmacy batches', total)
+
+
+def delete_synthetic_tenant(name):
+    """Remove a generated tenant with all of its rows; returns True if one existed"""
+    synthetic = find_synthetic_tenant(name)
+    if synthetic is None:
+        return False
+    user_ids = list(UserProfile._default_manager.filter(tenant=synthetic.tenant).values_list('user_id', flat=True))
+    with transaction.atomic():
+        # Delete the large leaf tables first so the cascade collector stays small
+        Attendance._default_manager.filter(tenant=synthetic.tenant).delete()
+        RetailSaleItem.objects.filter(tenant=synthetic.tenant).delete()
+        synthetic.tenant.delete()
+        User.objects.filter(id__in=user_ids).delete()
+    return True
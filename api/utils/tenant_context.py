@@ -0,0 +1,102 @@
+"""
+Request-scoped tenant context.
+
+Resolves the authenticated user's UserProfile together with its role and
+tenant in a single joined query and memoizes the result on the underlying
+Django HttpRequest, so permissions, middlewares and views share one lookup
+per request instead of each re-querying UserProfile. Plan features and
+subscription state come from the cached matrix in api.utils.plan_cache.
+"""
+from django.contrib.auth.models import User
+from api.models.user import UserProfile
+from api.utils.plan_cache import get_plan_features
+
+# Attribute used to store the context on the underlying HttpRequest
+REQUEST_ATTR = '_tenant_context'
+
+
+class TenantContext:
+    """Profile, role, tenant and plan for the current request's user"""
+
+    __slots__ = ('user_id', 'profile', 'role', 'tenant', '_features')
+
+    def __init__(self, user_id, profile=None):
+        self.user_id = user_id
+        self.profile = profile
+        self.role = profile.role if profile else None
+        self.tenant = profile.tenant if profile else None
+        self._features = None
+
+    @property
+    def plan(self):
+        """Tenant's Plan instance (loaded lazily; prefer `features` for checks)"""
+        return self.tenant.plan if self.tenant else None
+
+    @property
+    def features(self):
+        """Cached PlanFeatures snapshot for the tenant, or None without a tenant"""
+        if self._features is None and self.tenant is not None:
+            self._features = get_plan_features(self.tenant)
+        return self._features
+
+    @property
+    def role_name(self):
+        return self.role.name if self.role else None
+
+    def has_role(self, *roles):
+        return self.role_name in roles
+
+
+def _http_request(request):
+    """Return the Django HttpRequest behind a DRF Request (or the request itself)"""
+    return getattr(request, '_request', request)
+
+
+def load_tenant_context(user):
+    """Build a TenantContext for a user with one joined query"""
+    profile = (
+        UserProfile._default_manager
+        .select_related('role', 'tenant')
+        .filter(user_id=user.id)
+        .first()
+    )
+    if profile is not None:
+        # Reuse the request's user instance and prime the reverse one-to-one
+        # cache so `request.user.userprofile` does not hit the database again.
+        profile.user = user
+        User.userprofile.related.set_cached_value(user, profile)
+    return TenantContext(user.id, profile)
+
+
+def get_tenant_context(request):
+    """
+    Return the TenantContext for the request, resolving it at most once.
+    Returns None for anonymous requests.
+    """
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return None
+    http_request = _http_request(request)
+    context = getattr(http_request, REQUEST_ATTR, None)
+    if context is None or context.user_id != user.id:
+        context = load_tenant_context(user)
+        setattr(http_request, REQUEST_ATTR, context)
+    return context
+
+
+def get_request_profile(request):
+    """
+    Drop-in replacement for `UserProfile._default_manager.get(user=request.user)`.
+    Raises UserProfile.DoesNotExist when the user has no profile.
+    """
+    context = get_tenant_context(request)
+    if context is None or context.profile is None:
+        raise UserProfile.DoesNotExist("UserProfile matching query does not exist.")
+    return context.profile
+
+
+def clear_tenant_context(request):
+    """Drop the memoized context (e.g. after the profile or tenant was modified)"""
+    http_request = _http_request(request)
+    if hasattr(http_request, REQUEST_ATTR):
+        delattr(http_request, REQUEST_ATTR)
@@ -0,0 +1,403 @@
+"""
+Automatic weekly timetable generation.
+
+Timetables used to be built one slot per POST. generate_timetable() takes
+requirements of the form
+
+    {"class": id, "subject": id, "periods_per_week": n, "teacher": id, "room": id}
+
+(teacher and room optional) and places every period in the academic year's
+weekly grid: the working days times the tenant's active non-break Periods.
+
+The solver works on bitsets: slot day * periods + period is one bit, and every class, teacher and room has an
+integer of the slots it is booked in. Entries of the year that are not being
+regenerated are loaded as fixed bookings. Requirements are placed most
+constrained first (fewest free slots left for the periods still needed), on
+the day where the subject has the fewest periods so far, with at most
+TIMETABLE_MAX_SUBJECT_PERIODS_PER_DAY of a subject per day. When a period has
+no free slot, the lesson blocking a slot is moved to another free slot if it
+has one. Attempts are restarted with a different tie-break order until one
+places everything or the time budget runs out.
+
+Holidays are dated while the timetable is weekly, so they do not remove
+slots; they are subtracted from the teaching days of each weekday to report
+how many periods of each subject the year actually delivers.
+
+Without `replace`, the existing entries of a class are kept and count
+towards its requirements. With it they are deleted first. Deactivated
+entries of the generated classes are always removed, since they still hold
+the (class, day, period) unique key.
+
+Settings (optional):
+    TIMETABLE_WORKING_DAYS = ['monday', ..., 'saturday']
+    TIMETABLE_MAX_SUBJECT_PERIODS_PER_DAY = 2
+    TIMETABLE_SOLVER_SECONDS = 10       # default and upper bound of time_budget
+"""
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+
+from api.models.user import UserProfile
+from api.utils.timetable_index import DAYS, invalidate_timetable_index
+from education.models import Class, Holiday, Period, Room, Subject, Timetable
+
+BATCH_SIZE = 500
+
+
+def working_days():
+    return list(getattr(settings, 'TIMETABLE_WORKING_DAYS', DAYS[:6]))
+
+
+def max_periods_per_day():
+    return int(getattr(settings, 'TIMETABLE_MAX_SUBJECT_PERIODS_PER_DAY', 2))
+
+
+def solver_seconds():
+    return float(getattr(settings, 'TIMETABLE_SOLVER_SECONDS', 10))
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class _Attempt:
+    """One greedy pass with repair over the bitset state"""
+
+    def __init__(self, requirements, n_days, n_periods, busy, per_day, rng):
+        self.requirements = requirements
+        self.n_periods = n_periods
+        self.full = (1 << (n_days * n_periods)) - 1
+        self.day_masks = [((1 << n_periods) - 1) << (day * n_periods) for day in range(n_days)]
+        self.per_day = per_day
+        self.rng = rng
+        self.busy = {kind: dict(masks) for kind, masks in busy.items()}
+        self.owner = {}  # (kind, key, slot) -> requirement index, for lessons this attempt placed
+        self.slots = [[] for _ in requirements]
+        self.day_count = [[0] * n_days for _ in requirements]
+        self.capped = [0] * len(requirements)
+        self.remaining = [requirement[3] for requirement in requirements]
+
+        sharing = defaultdict(set)
+        for index, requirement in enumerate(requirements):
+            for kind, key in zip('ctr', requirement[:3]):
+                if key is not None:
+                    sharing[(kind, key)].add(index)
+        self.neighbours = [
+            set().union(*(sharing[(kind, key)] for kind, key in zip('ctr', requirement[:3]) if key is not None))
+            for requirement in requirements
+        ]
+        self.slack = {}
+        self.dirty = set(range(len(requirements)))
+
+    def _keys(self, index):
+        return [(kind, key) for kind, key in zip('ctr', self.requirements[index][:3]) if key is not None]
+
+    def candidates(self, index):
+        taken = self.capped[index]
+        for kind, key in self._keys(index):
+            taken |= self.busy[kind].get(key, 0)
+        return self.full & ~taken
+
+    def place(self, index, slot):
+        bit = 1 << slot
+        for kind, key in self._keys(index):
+            self.busy[kind][key] = self.busy[kind].get(key, 0) | bit
+            self.owner[(kind, key, slot)] = index
+        day = slot // self.n_periods
+        self.slots[index].append(slot)
+        self.day_count[index][day] += 1
+        if self.day_count[index][day] >= self.per_day:
+            self.capped[index] |= self.day_masks[day]
+        self.remaining[index] -= 1
+        self.dirty |= self.neighbours[index]
+
+    def unplace(self, index, slot):
+        bit = 1 << slot
+        for kind, key in self._keys(index):
+            self.busy[kind][key] &= ~bit
+            del self.owner[(kind, key, slot)]
+        day = slot // self.n_periods
+        self.slots[index].remove(slot)
+        self.day_count[index][day] -= 1
+        self.capped[index] &= ~self.day_masks[day]
+        self.remaining[index] += 1
+        self.dirty |= self.neighbours[index]
+
+    def pick(self, index, candidates):
+        """Free slot on the day with the fewest periods of this requirement"""
+        counts = self.day_count[index]
+        return min(_bits(candidates), key=lambda slot: (counts[slot // self.n_periods], self.rng.random()))
+
+    def repair(self, index):
+        """Free a slot for `index` by moving the lessons blocking it elsewhere"""
+        slots = list(_bits(self.full & ~self.capped[index]))
+        self.rng.shuffle(slots)
+        for slot in slots:
+            if slot in self.slots[index]:
+                continue
+            blockers = set()
+            for kind, key in self._keys(index):
+                if self.busy[kind].get(key, 0) >> slot & 1:
+                    blockers.add(self.owner.get((kind, key, slot)))
+            if not blockers or None in blockers:
+                continue  # free only past the daily cap, or held by a fixed entry
+            for blocker in blockers:
+                self.unplace(blocker, slot)
+            self.place(index, slot)
+            moved = []
+            for blocker in blockers:
+                candidates = self.candidates(blocker)
+                if not candidates:
+                    break
+                target = self.pick(blocker, candidates)
+                self.place(blocker, target)
+                moved.append((blocker, target))
+            else:
+                return True
+            for blocker, target in moved:
+                self.unplace(blocker, target)
+            self.unplace(index, slot)
+            for blocker in blockers:
+                self.place(blocker, slot)
+        return False
+
+    def run(self, deadline):
+        """Place everything it can; returns the periods left unplaced per requirement"""
+        unplaced = [0] * len(self.requirements)
+        pending = [index for index in range(len(self.requirements)) if self.remaining[index] > 0]
+        self.rng.shuffle(pending)
+        while pending:
+            if time.monotonic() > deadline:
+                for index in pending:
+                    unplaced[index] += self.remaining[index]
+                break
+            for index in self.dirty:
+                self.slack[index] = self.candidates(index).bit_count() - self.remaining[index]
+            self.dirty.clear()
+            index = min(pending, key=self.slack.__getitem__)
+            candidates = self.candidates(index)
+            if candidates:
+                self.place(index, self.pick(index, candidates))
+            elif not self.repair(index):
+                unplaced[index] += 1
+                self.remaining[index] -= 1
+                self.dirty.add(index)
+            if self.remaining[index] <= 0:
+                pending.remove(index)
+        return unplaced
+
+
+def solve_timetable(requirements, n_days, n_periods, busy=None, per_day=2, time_budget=10.0, seed=0):
+    """
+    Place weekly periods on a n_days x n_periods grid.
+
+    `requirements` is a list of (class key, teacher key or None, room key or
+    None, periods per week). `busy` holds fixed bookings as
+    {'c': {class key: mask}, 't': {...}, 'r': {...}}. Returns
+    {'slots': [[slot, ...] per requirement], 'unplaced': [count per
+    requirement], 'attempts': n} where slot = day * n_periods + period.
+    """
+    busy = {kind: dict((busy or {}).get(kind, {})) for kind in 'ctr'}
+    deadline = time.monotonic() + time_budget
+    best = None
+    attempts = 0
+    while True:
+        attempts += 1
+        attempt = _Attempt(requirements, n_days, n_periods, busy, per_day, random.Random(seed + attempts))
+        unplaced = attempt.run(deadline)
+        if best is None or sum(unplaced) < sum(best['unplaced']):
+            best = {'slots': [sorted(slots) for slots in attempt.slots], 'unplaced': unplaced}
+        if not sum(unplaced) or time.monotonic() > deadline:
+            break
+    best['attempts'] = attempts
+    return best
+
+
+def teaching_days(academic_year, days):
+    """{day: dates of that weekday in the academic year that are not holidays}"""
+    holidays = set(Holiday._default_manager.filter(
+        tenant_id=academic_year.tenant_id, academic_year=academic_year,
+    ).values_list('date', flat=True))
+    counts = dict.fromkeys(days, 0)
+    current = academic_year.start_date
+    while current <= academic_year.end_date:
+        day = DAYS[current.weekday()]
+        if day in counts and current not in holidays:
+            counts[day] += 1
+        current += timedelta(days=1)
+    return counts
+
+
+def _ids(value, label):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError(f'{label} must be an id.')
+
+
+def plan_timetable(tenant, academic_year, requirements, days=None, replace=False, time_budget=None):
+    """
+    Validate the requirements and solve. Returns the plan consumed by
+    write_timetable(): new entries, the classes generated and a report.
+    Raises ValueError for invalid input or requirements that cannot fit.
+    """
+    days = list(days or working_days())
+    if not days or any(day not in DAYS for day in days) or len(set(days)) != len(days):
+        raise ValueError(f"days must be distinct values out of {', '.join(DAYS)}.")
+    days.sort(key=DAYS.index)
+    budget = min(float(time_budget), solver_seconds()) if time_budget else solver_seconds()
+    periods = list(Period._default_manager.filter(
+        tenant=tenant, is_active=True, is_break=False).order_by('order', 'start_time').values_list('id', flat=True))
+    if not periods:
+        raise ValueError('Define the periods of the school day first.')
+    if not requirements:
+        raise ValueError('requirements are required.')
+
+    parsed = []
+    for requirement in requirements:
+        try:
+            count = int(requirement.get('periods_per_week'))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError('Each requirement needs class, subject and a numeric periods_per_week.')
+        parsed.append((_ids(requirement.get('class'), 'class'), _ids(requirement.get('subject'), 'subject'),
+                       _ids(requirement.get('teacher'), 'teacher'), _ids(requirement.get('room'), 'room'), count))
+    if any(class_id is None or subject_id is None or count < 1 for class_id, subject_id, _, _, count in parsed):
+        raise ValueError('Each requirement needs class, subject and a positive periods_per_week.')
+    if len({(class_id, subject_id) for class_id, subject_id, _, _, _ in parsed}) != len(parsed):
+        raise ValueError('Each class and subject may appear in one requirement only.')
+
+    class_names = dict(Class._default_manager.filter(
+        tenant=tenant, id__in={row[0] for row in parsed}).values_list('id', 'name'))
+    subjects = {row[0]: row[1:] for row in Subject._default_manager.filter(
+        tenant=tenant, id__in={row[1] for row in parsed}).values_list('id', 'class_obj_id', 'name')}
+    teachers = {
+        profile_id: f"{first_name} {last_name}".strip() or username
+        for profile_id, first_name, last_name, username in UserProfile._default_manager.filter(
+            tenant=tenant, id__in={row[2] for row in parsed if row[2]}
+        ).values_list('id', 'user__first_name', 'user__last_name', 'user__username')
+    }
+    rooms = set(Room._default_manager.filter(
+        tenant=tenant, is_active=True, id__in={row[3] for row in parsed if row[3]}).values_list('id', flat=True))
+    for class_id, subject_id, teacher_id, room_id, _ in parsed:
+        if class_id not in class_names:
+            raise ValueError(f'Class {class_id} not found.')
+        if subject_id not in subjects or subjects[subject_id][0] != class_id:
+            raise ValueError(f'Subject {subject_id} does not belong to class {class_names[class_id]}.')
+        if teacher_id and teacher_id not in teachers:
+            raise ValueError(f'Teacher {teacher_id} not found.')
+        if room_id and room_id not in rooms:
+            raise ValueError(f'Room {room_id} not found.')
+
+    # Entries of the year outside what is regenerated are fixed bookings
+    n_days, n_periods = len(days), len(periods)
+    day_index = {day: index for index, day in enumerate(days)}
+    period_index = {period_id: index for index, period_id in enumerate(periods)}
+    busy = {'c': defaultdict(int), 't': defaultdict(int), 'r': defaultdict(int)}
+    kept = defaultdict(int)
+    stale = []
+    for entry in Timetable._default_manager.filter(tenant=tenant, academic_year=academic_year).values(
+            'id', 'class_obj_id', 'subject_id', 'teacher_id', 'room_id', 'day', 'period_id', 'is_active'):
+        generated = entry['class_obj_id'] in class_names
+        if generated and (replace or not entry['is_active']):
+            stale.append(entry['id'])
+            continue
+        if not entry['is_active'] or entry['day'] not in day_index or entry['period_id'] not in period_index:
+            continue
+        bit = 1 << (day_index[entry['day']] * n_periods + period_index[entry['period_id']])
+        busy['c'][entry['class_obj_id']] |= bit
+        if entry['teacher_id']:
+            busy['t'][entry['teacher_id']] |= bit
+        if entry['room_id']:
+            busy['r'][entry['room_id']] |= bit
+        if generated:
+            kept[(entry['class_obj_id'], entry['subject_id'])] += 1
+
+    needed = [max(0, count - kept[(class_id, subject_id)]) for class_id, subject_id, _, _, count in parsed]
+    slots_per_week = n_days * n_periods
+    per_day = max_periods_per_day()
+    for label, key, names in (('Class', 0, class_names), ('Teacher', 2, teachers)):
+        load = defaultdict(int)
+        for row, count in zip(parsed, needed):
+            if row[key]:
+                load[row[key]] += count
+        for object_id, total in load.items():
+            free = slots_per_week - busy['c' if key == 0 else 't'][object_id].bit_count()
+            if total > free:
+                raise ValueError(f'{label} {names[object_id]} needs {total} periods a week but only {free} slots are free.')
+    for (class_id, subject_id, _, _, _), count in zip(parsed, needed):
+        if count > per_day * n_days:
+            raise ValueError(f'{subjects[subject_id][1]} for {class_names[class_id]} needs more than '
+                             f'{per_day} periods a day.')
+
+    started = time.monotonic()
+    solution = solve_timetable(
+        [(class_id, teacher_id, room_id, count)
+         for (class_id, _, teacher_id, room_id, _), count in zip(parsed, needed)],
+        n_days, n_periods, busy=busy, per_day=per_day, time_budget=budget,
+    )
+    elapsed = round(time.monotonic() - started, 3)
+
+    year_days = teaching_days(academic_year, days)
+    entries, report = [], []
+    for (class_id, subject_id, teacher_id, room_id, count), slots, missing in zip(
+            parsed, solution['slots'], solution['unplaced']):
+        for slot in slots:
+            entries.append((class_id, subject_id, teacher_id, room_id, days[slot // n_periods], periods[slot % n_periods]))
+        report.append({
+            'class': class_names[class_id],
+            'subject': subjects[subject_id][1],
+            'periods_per_week': count,
+            'placed': len(slots),
+            'kept': count - len(slots) - missing,
+            'unplaced': missing,
+            'periods_in_year': sum(year_days[days[slot // n_periods]] for slot in slots),
+        })
+    return {
+        'entries': entries,
+        'stale': stale,
+        'complete': not sum(solution['unplaced']),
+        'report': report,
+        'teaching_days': year_days,
+        'attempts': solution['attempts'],
+        'solve_seconds': elapsed,
+    }
+
+
+def write_timetable(tenant, academic_year, plan):
+    """Replace stale entries and bulk-create the plan's entries in one transaction"""
+    with transaction.atomic():
+        if plan['stale']:
+            Timetable._default_manager.filter(id__in=plan['stale']).delete()
+        created = Timetable._default_manager.bulk_create([
+            Timetable(tenant=tenant, academic_year=academic_year, class_obj_id=class_id, subject_id=subject_id,
+                      teacher_id=teacher_id, room_id=room_id, day=day, period_id=period_id)
+            for class_id, subject_id, teacher_id, room_id, day, period_id in plan['entries']
+        ], batch_size=BATCH_SIZE)
+        # bulk_create sends no post_save, so the occupancy index is invalidated here
+        invalidate_timetable_index(tenant.id)
+        transaction.on_commit(lambda: invalidate_timetable_index(tenant.id))
+    return len(created)
+
+
+def generate_timetable(tenant, academic_year, requirements, days=None, replace=False, time_budget=None,
+                       dry_run=False):
+    """Plan and, when complete and not a dry run, write the timetable. Returns the response body."""
+    plan = plan_timetable(tenant, academic_year, requirements, days=days, replace=replace, time_budget=time_budget)
+    written = plan['complete'] and not dry_run
+    created = write_timetable(tenant, academic_year, plan) if written else 0
+    return {
+        'complete': plan['complete'],
+        'created_count': created,
+        'deleted_count': len(plan['stale']) if written else 0,
+        'dry_run': dry_run,
+        'requirements': plan['report'],
+        'teaching_days': plan['teaching_days'],
+        'attempts': plan['attempts'],
+        'solve_seconds': plan['solve_seconds'],
+    }
@@ -0,0 +1,95 @@
+"""
+Cached timetable occupancy index.
+
+The availability and suggestion views used to run a Timetable query per
+teacher or room. TimetableIndex holds one academic year of active
+timetable entries grouped by (day, period) slot, built from a single query,
+so the teachers and rooms busy at a slot are one dictionary lookup away.
+Indexes are kept in the Django cache under a per-tenant version that
+api/signals.py bumps whenever a Timetable entry is saved or deleted (and
+again when the transaction commits), so a write is visible to the next read
+in every worker. The index serves reads only; the create and update conflict
+checks still query Timetable directly. Bulk .update() calls on Timetable
+bypass the signals and must call invalidate_timetable_index() themselves.
+"""
+import time
+from django.core.cache import cache
+
+from education.models import Timetable
+
+INDEX_TIMEOUT = 24 * 60 * 60  # 1 day; versioning handles invalidation
+INDEX_FORMAT = 2  # bump when TimetableIndex's attributes change, so old pickles are not read
+DAYS = [day for day, _ in Timetable.DAY_CHOICES]
+
+
+class TimetableIndex:
+    """Active timetable entries of an academic year by (day, period) slot"""
+
+    def __init__(self, rows):
+        self.cells = {}  # (day, period id) -> [(class id, teacher id, room id)]
+        self.class_names = {}
+        for row in rows:
+            self.cells.setdefault((row['day'], row['period_id']), []).append(
+                (row['class_obj_id'], row['teacher_id'], row['room_id']))
+            self.class_names[row['class_obj_id']] = row['class_obj__name']
+
+    def occupants(self, day, period_id, exclude_class=None):
+        return [cell for cell in self.cells.get((day, period_id), []) if cell[0] != exclude_class]
+
+    def busy_teachers(self, day, period_id, exclude_class=None):
+        """{teacher_id: name of the class they teach} at a slot"""
+        busy = {}
+        for class_id, teacher_id, _ in self.occupants(day, period_id, exclude_class):
+            if teacher_id:
+                busy.setdefault(teacher_id, self.class_names[class_id])
+        return busy
+
+    def busy_rooms(self, day, period_id, exclude_class=None):
+        """{room_id: name of the class using it} at a slot"""
+        busy = {}
+        for class_id, _, room_id in self.occupants(day, period_id, exclude_class):
+            if room_id:
+                busy.setdefault(room_id, self.class_names[class_id])
+        return busy
+
+
+def _version_key(tenant_id):
+    return f"timetable_index:version:{tenant_id}"
+
+
+def current_version(tenant_id):
+    key = _version_key(tenant_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a cache flush never resurrects old index keys
+        cache.add(key, int(time.time()), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_timetable_index(tenant_id):
+    """Bump the tenant's version so every worker rebuilds on its next read"""
+    key = _version_key(tenant_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time()) + 1
+        cache.set(key, version, None)
+        return version
+
+
+def build_timetable_index(tenant_id, academic_year_id):
+    return TimetableIndex(Timetable._default_manager.filter(
+        tenant_id=tenant_id, academic_year_id=academic_year_id, is_active=True,
+    ).order_by('id').values('day', 'period_id', 'class_obj_id', 'class_obj__name', 'teacher_id', 'room_id'))
+
+
+def get_timetable_index(tenant_id, academic_year_id):
+    """The tenant's occupancy index for an academic year, from the cache when current"""
+    key = f"timetable_index:{INDEX_FORMAT}:{tenant_id}:{academic_year_id}:{current_version(tenant_id)}"
+    index = cache.get(key)
+    if index is None:
+        index = build_timetable_index(tenant_id, academic_year_id)
+        cache.set(key, index, INDEX_TIMEOUT)
+    return index
+
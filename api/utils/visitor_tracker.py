@@ -0,0 +1,178 @@
+"""
+Coalesced visitor tracking for VisitorLeadMiddleware.
+
+Instead of a get_or_create plus an UPDATE per page view, the tracker keeps:
+- an LRU set of tokens known to exist in the database,
+- pending first-visit rows for freshly minted tokens,
+- the latest `last_seen` per token seen since the last flush.
+
+A background thread flushes every FLUSH_INTERVAL seconds: new visitors are
+inserted with one bulk_create (ignore_conflicts) and last_seen values are
+written with one CASE/WHEN UPDATE per chunk. Only a token that arrives with a
+cookie but is unknown to this process costs a synchronous lookup, once.
+
+Settings (optional):
+    VISITOR_TRACKING_MODE = 'coalesced'   # or 'immediate' for per-request writes
+    VISITOR_TRACKING = {'FLUSH_INTERVAL': 10.0, 'KNOWN_TOKENS': 50000}
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, When, Value, DateTimeField
+
+from api.models.visitor_lead import VisitorLead
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'FLUSH_INTERVAL': 10.0,
+    'KNOWN_TOKENS': 50000,
+}
+
+UPDATE_CHUNK_SIZE = 500
+
+
+def tracking_mode():
+    return getattr(settings, 'VISITOR_TRACKING_MODE', 'coalesced')
+
+
+class VisitorTracker:
+    def __init__(self, flush_interval=None, known_tokens=None, autostart=True):
+        options = dict(DEFAULTS)
+        options.update(getattr(settings, 'VISITOR_TRACKING', {}) or {})
+        self.flush_interval = flush_interval or options['FLUSH_INTERVAL']
+        self.known_limit = known_tokens or options['KNOWN_TOKENS']
+        self.autostart = autostart
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._known = OrderedDict()
+        self._pending_new = {}
+        self._pending_seen = {}
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _remember(self, token):
+        # Caller holds self._lock
+        self._known[token] = True
+        self._known.move_to_end(token)
+        if len(self._known) > self.known_limit:
+            self._known.popitem(last=False)
+
+    def track(self, token, defaults, is_new_token, now):
+        """Record a page view; touches the database only for unknown returning tokens"""
+        with self._lock:
+            if token in self._known or token in self._pending_new:
+                if token in self._pending_new:
+                    self._pending_new[token]['last_seen'] = now
+                else:
+                    self._pending_seen[token] = now
+                    self._known.move_to_end(token)
+                pending = True
+            elif is_new_token:
+                # Cookie minted by this request: the token cannot exist yet
+                self._pending_new[token] = dict(defaults, created_at=now, last_seen=now)
+                pending = True
+            else:
+                pending = False
+
+        if not pending:
+            # Returning visitor unknown to this process: resolve once, then coalesce
+            lead, created = VisitorLead.objects.get_or_create(
+                visitor_token=token,
+                defaults=dict(defaults, last_seen=now),
+            )
+            with self._lock:
+                self._remember(token)
+                if not created:
+                    self._pending_seen[token] = now
+
+        if self.autostart:
+            self._ensure_thread()
+
+    def flush(self):
+        """Write pending inserts and last_seen updates; returns (inserted, updated)"""
+        with self._flush_lock:
+            with self._lock:
+                new_rows, self._pending_new = self._pending_new, {}
+                seen, self._pending_seen = self._pending_seen, {}
+
+            inserted = updated = 0
+            if new_rows:
+                try:
+                    VisitorLead.objects.bulk_create(
+                        [VisitorLead(visitor_token=token, **fields) for token, fields in new_rows.items()],
+                        ignore_conflicts=True,
+                    )
+                    inserted = len(new_rows)
+                    with self._lock:
+                        for token in new_rows:
+                            self._remember(token)
+                except Exception as e:
+                    logger.error(f"Error inserting {len(new_rows)} visitor leads: {str(e)}")
+
+            tokens = list(seen)
+            for start in range(0, len(tokens), UPDATE_CHUNK_SIZE):
+                chunk = tokens[start:start + UPDATE_CHUNK_SIZE]
+                try:
+                    updated += VisitorLead.objects.filter(visitor_token__in=chunk).update(
+                        last_seen=Case(
+                            *[When(visitor_token=token, then=Value(seen[token])) for token in chunk],
+                            output_field=DateTimeField(),
+                        )
+                    )
+                except Exception as e:
+                    logger.error(f"Error updating last_seen for {len(chunk)} visitors: {str(e)}")
+            return inserted, updated
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='visitor-tracker-flusher', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout=10):
+        self._stopping.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error flushing visitor tracker at shutdown: {str(e)}")
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_visitor_tracker():
+    """Process-wide tracker used by VisitorLeadMiddleware"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = VisitorTracker()
+                atexit.register(_tracker.shutdown)
+    return _tracker
+
+
+def shutdown_visitor_tracker():
+    """Flush the process-wide tracker (called from gunicorn's worker_exit hook)"""
+    if _tracker is not None:
+        _tracker.shutdown()
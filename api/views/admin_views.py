@@ -14,6 +14,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import serializers
 from api.models.user import UserProfile, Tenant, Role
+from api.utils.tenant_context import get_request_profile
 from api.models.plan import Plan
 from education.models import Student, Class, FeeStructure, FeePayment, Attendance, ReportCard, Department
 from pharmacy.models import Medicine, MedicineBatch, Customer, Sale, SaleItem, Prescription
@@ -61,7 +62,7 @@ class AdminExportDataView(APIView):
 		try:
 			# Check if user is admin
 			try:
-				user_profile = UserProfile.objects.get(user=request.user)
+				user_profile = get_request_profile(request)
 			except UserProfile.DoesNotExist:
 				return Response({'error': 'User profile not found'}, status=status.HTTP_404_NOT_FOUND)
 			
@@ -255,7 +256,7 @@ class AdminImportDataView(APIView):
 		try:
 			# Check if user is admin
 			try:
-				user_profile = UserProfile.objects.get(user=request.user)
+				user_profile = get_request_profile(request)
 			except UserProfile.DoesNotExist:
 				return Response({'error': 'User profile not found'}, status=status.HTTP_404_NOT_FOUND)
 			
@@ -338,7 +339,7 @@ class TenantPublicSettingsView(APIView):
 	def get(self, request):
 		try:
 			try:
-				profile = UserProfile.objects.get(user=request.user)
+				profile = get_request_profile(request)
 			except UserProfile.DoesNotExist:
 				return Response({'error': 'User profile not found'}, status=status.HTTP_404_NOT_FOUND)
 			if not profile.role or profile.role.name != 'admin':
@@ -384,7 +385,7 @@ class TenantPublicSettingsView(APIView):
 	def post(self, request):
 		try:
 			try:
-				profile = UserProfile.objects.get(user=request.user)
+				profile = get_request_profile(request)
 			except UserProfile.DoesNotExist:
 				return Response({'error': 'User profile not found'}, status=status.HTTP_404_NOT_FOUND)
 			if not profile.role or profile.role.name != 'admin':
@@ -517,7 +518,7 @@ class TenantLogoView(APIView):
 		"""Get current logo URL"""
 		try:
 			try:
-				profile = UserProfile.objects.get(user=request.user)
+				profile = get_request_profile(request)
 			except UserProfile.DoesNotExist:
 				return Response({'error': 'User profile not found'}, status=status.HTTP_404_NOT_FOUND)
 			if not profile.role or profile.role.name != 'admin':
@@ -535,7 +536,7 @@ class TenantLogoView(APIView):
 		"""Upload logo"""
 		try:
 			try:
-				profile = UserProfile.objects.get(user=request.user)
+				profile = get_request_profile(request)
 			except UserProfile.DoesNotExist:
 				return Response({'error': 'User profile not found'}, status=status.HTTP_404_NOT_FOUND)
 			if not profile.role or profile.role.name != 'admin':
@@ -566,7 +567,7 @@ class TenantLogoView(APIView):
 		"""Delete logo"""
 		try:
 			try:
-				profile = UserProfile.objects.get(user=request.user)
+				profile = get_request_profile(request)
 			except UserProfile.DoesNotExist:
 				return Response({'error': 'User profile not found'}, status=status.HTTP_404_NOT_FOUND)
 			if not profile.role or profile.role.name != 'admin':
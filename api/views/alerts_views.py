@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.models.alerts import Alert
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
 from api.models.permissions import role_required
 from django.utils import timezone
 from django.db import transaction
@@ -20,7 +21,7 @@ class AlertListView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             alerts = Alert.objects.filter(tenant=profile.tenant).order_by('-created_at')
             
             # Add pagination support
@@ -60,7 +61,7 @@ class AlertMarkReadView(APIView):
 
     def post(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             alert_id = request.data.get('alert_id')
             read = request.data.get('read', True)
             
@@ -88,7 +89,7 @@ class AlertCreateView(APIView):
     @role_required('admin', 'principal')
     def post(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             message = request.data.get('message')
             alert_type = request.data.get('type', 'general')
             
@@ -128,7 +129,7 @@ class AlertDeleteView(APIView):
     @role_required('admin', 'principal')
     def delete(self, request, alert_id):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             
             try:
                 alert = Alert.objects.get(id=alert_id, tenant=profile.tenant)
@@ -149,7 +150,7 @@ class AlertBulkMarkReadView(APIView):
 
     def post(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             alert_ids = request.data.get('alert_ids', [])
             read = request.data.get('read', True)
             
@@ -183,7 +184,7 @@ class AlertBulkDeleteView(APIView):
     @role_required('admin', 'principal')
     def post(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             alert_ids = request.data.get('alert_ids', [])
             
             if not alert_ids:
@@ -212,7 +213,7 @@ class AlertStatsView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             # Use utility function for alert summary
@@ -232,7 +233,7 @@ class AlertAutoCreateView(APIView):
     @role_required('admin', 'principal')
     def post(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             alerts_created = []
@@ -281,7 +282,7 @@ class AlertCleanupView(APIView):
     @role_required('admin', 'principal')
     def post(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             days_old = request.data.get('days_old', 30)
             
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
 from api.models.permissions import role_required
 
 class DashboardView(APIView):
@@ -10,7 +11,7 @@ class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         tenant = profile.tenant
         plan = tenant.plan
         # Calculate storage used (sum all user profile photo sizes for this tenant)
@@ -49,7 +50,7 @@ class StorageUsageView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         tenant = profile.tenant
         plan = tenant.plan if tenant else None
         
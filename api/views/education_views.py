@@ -5,12 +5,23 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.models.user import UserProfile, Tenant
+from api.utils.tenant_context import get_request_profile
+from api.utils.jobs import enqueue
+from api.utils.education_analytics import EducationAnalytics
+from api.utils.fee_installments import (
+    build_installments, class_student_ids, generate_installments, installment_schedule, overdue_installments,
+    parse_start_date,
+)
+from api.utils.pdf_cache import cached_pdf_response, school_contact
+from api.utils.promotions import plan_promotion, plan_summary, run_promotion
+from api.utils.pagination import KeysetPaginator, InvalidCursor, cursor_link, estimate_count, wants_count, wants_cursor
+from api.utils.report_cards import generate_class_report_cards, rank_report_cards
 from education.models import (
     Class, Student, FeeStructure, FeePayment, FeeDiscount, Attendance, 
     ReportCard, StaffAttendance, Department, AcademicYear, Term, Subject, 
     Unit, AssessmentType, Assessment, MarksEntry, FeeInstallmentPlan, FeeInstallment,
     OldBalance, BalanceAdjustment, StudentPromotion, TransferCertificate, AdmissionApplication,
-    Period, Room, Timetable, Holiday, SubstituteTeacher, ReportTemplate, ReportField
+    StudentFeeBalance, Period, Room, Timetable, Holiday, SubstituteTeacher, ReportTemplate, ReportField
 )
 from api.models.permissions import HasFeaturePermissionFactory, role_required, role_exclude
 from api.models.serializers_education import (
@@ -25,10 +36,14 @@ from api.models.serializers_education import (
     PeriodSerializer, RoomSerializer, TimetableSerializer, TimetableDetailSerializer,
     HolidaySerializer, SubstituteTeacherSerializer, PublicFeePaymentCreateSerializer
 )
+from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse
+from django.urls import reverse
 import csv
+import re
 from io import BytesIO
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count, Sum, FilteredRelation
 from django.utils import timezone
 try:
     from reportlab.lib.pagesizes import letter
@@ -174,7 +189,7 @@ class ClassListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
             classes = Class._default_manager.filter(tenant=profile.tenant)  # type: ignore
             serializer = ClassSerializer(classes, many=True)
             return Response(serializer.data)
@@ -187,7 +202,7 @@ class ClassListCreateView(APIView):
 
     @role_required('admin', 'principal')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = ClassSerializer(data=data)
@@ -201,7 +216,7 @@ class ClassDetailView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         try:
             c = Class._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
             serializer = ClassSerializer(c)
@@ -211,7 +226,7 @@ class ClassDetailView(APIView):
 
     @role_required('admin', 'principal')
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             c = Class._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = ClassSerializer(c, data=request.data, partial=True)
@@ -224,7 +239,7 @@ class ClassDetailView(APIView):
 
     @role_required('admin', 'principal')
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             c = Class._default_manager.get(id=pk, tenant=profile.tenant)
             c.delete()
@@ -238,7 +253,7 @@ class StudentListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
             if profile.role and profile.role.name in ['admin', 'accountant', 'principal']:
                 students = Student._default_manager.filter(tenant=profile.tenant)  # type: ignore
             else:
@@ -259,8 +274,24 @@ class StudentListCreateView(APIView):
                 students = students.filter(admission_date__gte=date_from)
             if date_to:
                 students = students.filter(admission_date__lte=date_to)
+            if wants_cursor(request):
+                # Keyset pages for large schools; without `cursor` the full list is returned as before
+                ordering = request.query_params.get('ordering', 'name')
+                if ordering.lstrip('-') not in ('name', 'admission_date', 'id'):
+                    ordering = 'name'
+                page = KeysetPaginator(ordering=ordering, page_size=50, max_page_size=200).paginate(students, request)
+                data = {
+                    'results': StudentSerializer(page.items, many=True).data,
+                    'next': cursor_link(request, page.next_cursor),
+                    'previous': cursor_link(request, page.previous_cursor),
+                }
+                if wants_count(request):
+                    data['count'], data['count_is_estimate'] = estimate_count(students)
+                return Response(data)
             serializer = StudentSerializer(students, many=True)
             return Response(serializer.data)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except UserProfile.DoesNotExist:
             logger.error(f"UserProfile not found for user: {request.user.username}")
             return Response({'error': 'User profile not found. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
@@ -270,7 +301,7 @@ class StudentListCreateView(APIView):
 
     @role_required('admin', 'principal', 'teacher', 'staff', 'accountant')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = StudentSerializer(data=data, context={'tenant': profile.tenant})
@@ -284,7 +315,7 @@ class StudentDetailView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         try:
             s = Student._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
             serializer = StudentSerializer(s)
@@ -293,7 +324,7 @@ class StudentDetailView(APIView):
             return Response({'error': 'Student not found.'}, status=status.HTTP_404_NOT_FOUND)
 
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         # Check role-based permissions
         user_role = profile.role.name if profile.role else None
         
@@ -320,7 +351,7 @@ class StudentDetailView(APIView):
 
     @role_required('admin', 'principal')
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             s = Student._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
             s.delete()
@@ -335,7 +366,7 @@ class EducationCRMStudentContactsView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             students = Student._default_manager.filter(tenant=profile.tenant).select_related('assigned_class')
             contacts = []
             for student in students:
@@ -370,7 +401,7 @@ class AttendanceListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
             if not profile.tenant:
                 return Response({'error': 'Tenant not found for user. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
             
@@ -390,21 +421,103 @@ class AttendanceListCreateView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = AttendanceSerializer(data=data)
         if serializer.is_valid():
-            serializer.save(tenant=profile.tenant)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            # One mark per student per day: re-marking updates the existing record
+            attendance, created = Attendance._default_manager.update_or_create(  # type: ignore
+                tenant=profile.tenant,
+                student=serializer.validated_data['student'],
+                date=serializer.validated_data['date'],
+                defaults={'present': serializer.validated_data.get('present', True)},
+            )
+            return Response(AttendanceSerializer(attendance).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class AttendanceBulkMarkView(APIView):
+    """
+    Mark a whole class for one day in a single request.
+
+    Body: {"class_id": 1, "date": "2025-06-02", "records": [{"student": 5, "present": true}, ...]}
+    The roster is validated against the class in one query and written with one
+    upsert on (tenant, date, student), so resubmitting the same day is safe.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+
+    @role_required('admin', 'principal', 'teacher')
+    def post(self, request):
+        try:
+            profile = get_request_profile(request)
+            tenant = profile.tenant
+            class_id = request.data.get('class_id')
+            records = request.data.get('records')
+            if not class_id or not isinstance(records, list) or not records:
+                return Response({'error': 'class_id and a non-empty records list are required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            date_str = request.data.get('date')
+            try:
+                mark_date = timezone.datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.now().date()
+            except (TypeError, ValueError):
+                return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+            if mark_date > timezone.now().date():
+                return Response({'error': 'Attendance cannot be marked for a future date.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            marks = {}
+            for record in records:
+                try:
+                    student_id = int(record['student'])
+                except (TypeError, KeyError, ValueError):
+                    return Response({'error': 'Each record needs a numeric student id.'}, status=status.HTTP_400_BAD_REQUEST)
+                if student_id in marks:
+                    return Response({'error': f'Student {student_id} appears more than once.'}, status=status.HTTP_400_BAD_REQUEST)
+                marks[student_id] = bool(record.get('present', True))
+
+            # Class ownership and roster membership in one query
+            roster = Student._default_manager.filter(  # type: ignore
+                tenant=tenant, assigned_class_id=class_id, id__in=list(marks)
+            )
+            if profile.role and profile.role.name == 'teacher':
+                roster = roster.filter(assigned_class__in=profile.assigned_classes.all())
+            valid_ids = set(roster.values_list('id', flat=True))
+            invalid = sorted(set(marks) - valid_ids)
+            if invalid:
+                return Response({
+                    'error': 'Some students do not belong to this class.',
+                    'invalid_students': invalid,
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            Attendance._default_manager.bulk_create(  # type: ignore
+                [Attendance(tenant=tenant, student_id=student_id, date=mark_date, present=present)
+                 for student_id, present in marks.items()],
+                update_conflicts=True,
+                unique_fields=['tenant', 'date', 'student'],
+                update_fields=['present'],
+                batch_size=500,
+            )
+            present_count = sum(1 for present in marks.values() if present)
+            return Response({
+                'class_id': int(class_id),
+                'date': mark_date.isoformat(),
+                'saved': len(marks),
+                'present': present_count,
+                'absent': len(marks) - present_count,
+            })
+        except UserProfile.DoesNotExist:
+            logger.error(f"UserProfile not found for user: {request.user.username}")
+            return Response({'error': 'User profile not found. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error in AttendanceBulkMarkView.post: {str(e)}", exc_info=True)
+            return Response({'error': f'An error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class AttendanceDetailView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         try:
             a = Attendance._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
             serializer = AttendanceSerializer(a)
@@ -414,11 +527,21 @@ class AttendanceDetailView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             a = Attendance._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
             serializer = AttendanceSerializer(a, data=request.data, partial=True)
             if serializer.is_valid():
+                # One mark per student and day (education_attendance_student_day_uniq)
+                student = serializer.validated_data.get('student', a.student)
+                day = serializer.validated_data.get('date', a.date)
+                if Attendance._default_manager.filter(
+                    tenant=profile.tenant, student=student, date=day
+                ).exclude(id=pk).exists():  # type: ignore
+                    return Response(
+                        {'error': 'Attendance is already marked for this student on this date.'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
                 serializer.save()
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -427,7 +550,7 @@ class AttendanceDetailView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             a = Attendance._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
             a.delete()
@@ -441,7 +564,7 @@ class ReportCardListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
             reportcards = ReportCard._default_manager.filter(tenant=profile.tenant).select_related(
                 'student', 'class_obj', 'academic_year', 'term'
             )
@@ -456,7 +579,7 @@ class ReportCardListCreateView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         # Accept either *_id or plain FK keys and map to serializer fields
         if 'student' in data and 'student_id' not in data:
@@ -504,7 +627,7 @@ class ReportCardDetailView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         try:
             r = ReportCard._default_manager.select_related(
                 'student', 'class_obj', 'academic_year', 'term'
@@ -516,7 +639,7 @@ class ReportCardDetailView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             r = ReportCard._default_manager.select_related(
                 'student', 'class_obj', 'academic_year', 'term'
@@ -531,7 +654,7 @@ class ReportCardDetailView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             r = ReportCard._default_manager.select_related(
                 'student', 'class_obj', 'academic_year', 'term'
@@ -547,14 +670,14 @@ class AcademicYearListCreateView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         academic_years = AcademicYear._default_manager.filter(tenant=profile.tenant)
         serializer = AcademicYearSerializer(academic_years, many=True)
         return Response(serializer.data)
 
     @role_required('admin', 'principal')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = AcademicYearSerializer(data=data)
@@ -571,7 +694,7 @@ class AcademicYearDetailView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             ay = AcademicYear._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = AcademicYearSerializer(ay)
@@ -581,7 +704,7 @@ class AcademicYearDetailView(APIView):
 
     @role_required('admin', 'principal')
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             ay = AcademicYear._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = AcademicYearSerializer(ay, data=request.data, partial=True)
@@ -597,7 +720,7 @@ class AcademicYearDetailView(APIView):
 
     @role_required('admin', 'principal')
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             ay = AcademicYear._default_manager.get(id=pk, tenant=profile.tenant)
             ay.delete()
@@ -610,7 +733,7 @@ class TermListCreateView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         academic_year_id = request.query_params.get('academic_year')
         terms = Term._default_manager.filter(tenant=profile.tenant)
         if academic_year_id:
@@ -620,7 +743,7 @@ class TermListCreateView(APIView):
 
     @role_required('admin', 'principal')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = TermSerializer(data=data)
@@ -634,7 +757,7 @@ class SubjectListCreateView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         class_id = request.query_params.get('class')
         subjects = Subject._default_manager.filter(tenant=profile.tenant)
         if class_id:
@@ -644,7 +767,7 @@ class SubjectListCreateView(APIView):
 
     @role_required('admin', 'principal')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = SubjectSerializer(data=data)
@@ -658,7 +781,7 @@ class UnitListCreateView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         subject_id = request.query_params.get('subject')
         units = Unit._default_manager.filter(tenant=profile.tenant)
         if subject_id:
@@ -669,7 +792,7 @@ class UnitListCreateView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             data = request.data.copy()
             data['tenant'] = profile.tenant.id
             serializer = UnitSerializer(data=data)
@@ -688,7 +811,7 @@ class UnitDetailView(APIView):
 
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             unit = Unit._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = UnitSerializer(unit)
             return Response(serializer.data)
@@ -698,7 +821,7 @@ class UnitDetailView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             unit = Unit._default_manager.get(id=pk, tenant=profile.tenant)
             data = request.data.copy()
             data['tenant'] = profile.tenant.id
@@ -716,7 +839,7 @@ class UnitDetailView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def patch(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             unit = Unit._default_manager.get(id=pk, tenant=profile.tenant)
             data = request.data.copy()
             data['tenant'] = profile.tenant.id
@@ -734,7 +857,7 @@ class UnitDetailView(APIView):
     @role_required('admin', 'principal')
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             unit = Unit._default_manager.get(id=pk, tenant=profile.tenant)
             unit.delete()
             return Response({'message': 'Unit deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
@@ -747,7 +870,7 @@ class AssessmentTypeListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             assessment_types = AssessmentType._default_manager.filter(tenant=profile.tenant)
             serializer = AssessmentTypeSerializer(assessment_types, many=True)
             return Response(serializer.data)
@@ -760,7 +883,7 @@ class AssessmentTypeListCreateView(APIView):
 
     @role_required('admin', 'principal')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = AssessmentTypeSerializer(data=data)
@@ -774,7 +897,7 @@ class AssessmentListCreateView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         term_id = request.query_params.get('term')
         subject_id = request.query_params.get('subject')
         assessments = Assessment._default_manager.filter(tenant=profile.tenant)
@@ -788,7 +911,7 @@ class AssessmentListCreateView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             data = request.data.copy()
             data['tenant'] = profile.tenant.id
             serializer = AssessmentSerializer(data=data)
@@ -807,7 +930,7 @@ class MarksEntryListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile.tenant:
                 return Response({'error': 'Tenant not found for user. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
             
@@ -836,7 +959,7 @@ class MarksEntryListCreateView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         data['entered_by'] = profile.id
@@ -860,7 +983,7 @@ class MarksEntryDetailView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             me = MarksEntry._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = MarksEntrySerializer(me)
@@ -870,7 +993,7 @@ class MarksEntryDetailView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             me = MarksEntry._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = MarksEntrySerializer(me, data=request.data, partial=True)
@@ -883,7 +1006,7 @@ class MarksEntryDetailView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             me = MarksEntry._default_manager.get(id=pk, tenant=profile.tenant)
             me.delete()
@@ -898,7 +1021,7 @@ class ReportCardGenerateView(APIView):
 
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         # Accept either *_id or plain FK keys
         student_id = data.get('student_id') or data.get('student')
@@ -939,22 +1062,11 @@ class ReportCardGenerateView(APIView):
             # Auto-calculate totals
             report_card.calculate_totals()
             
-            # Calculate rank
-            from django.db.models import F, Window
-            same_class_term = ReportCard._default_manager.filter(
-                tenant=profile.tenant,
-                academic_year=academic_year,
-                term=term,
-                class_obj=class_obj
-            ).order_by('-percentage')
-            
-            rank = 1
-            for rc in same_class_term:
-                if rc.id == report_card.id:
-                    report_card.rank_in_class = rank
-                    report_card.save()
-                    break
-                rank += 1
+            # Re-rank the class in one pass; ties share a rank
+            rank_report_cards(profile.tenant, academic_year, term, class_obj)
+            report_card.rank_in_class = ReportCard._default_manager.values_list(
+                'rank_in_class', flat=True
+            ).get(id=report_card.id)
             
             # Update remarks if provided
             if 'teacher_remarks' in data:
@@ -981,13 +1093,710 @@ class ReportCardGenerateView(APIView):
             logger.error(f"Error generating report card: {str(e)}", exc_info=True)
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class ReportCardClassGenerateView(APIView):
+    """
+    Generate or regenerate the report cards of a whole class for a term.
+
+    Body: {"class_id": 1, "academic_year_id": 2, "term_id": 3}
+    Classes above REPORT_CARD_SYNC_LIMIT students (or any class with
+    ?async=1) are generated on a job worker and return 202 with the job's
+    status URL.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+
+    @role_required('admin', 'principal', 'teacher')
+    def post(self, request):
+        profile = get_request_profile(request)
+        class_id = request.data.get('class_id') or request.data.get('class_obj')
+        academic_year_id = request.data.get('academic_year_id') or request.data.get('academic_year')
+        term_id = request.data.get('term_id') or request.data.get('term')
+        if not all([class_id, academic_year_id, term_id]):
+            return Response(
+                {'error': 'class_id, academic_year_id, and term_id are required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            classes = Class._default_manager.filter(tenant=profile.tenant)
+            if profile.role and profile.role.name == 'teacher':
+                classes = classes.filter(id__in=profile.assigned_classes.all())
+            class_obj = classes.get(id=class_id)
+            academic_year = AcademicYear._default_manager.get(id=academic_year_id, tenant=profile.tenant)
+            term = Term._default_manager.get(id=term_id, tenant=profile.tenant, academic_year=academic_year)
+
+            class_size = Student._default_manager.filter(
+                tenant=profile.tenant, assigned_class=class_obj, is_active=True
+            ).count()
+            sync_limit = getattr(settings, 'REPORT_CARD_SYNC_LIMIT', 200)
+            if request.query_params.get('async') in ('1', 'true') or class_size > sync_limit:
+                job = enqueue('api.tasks.generate_class_report_cards', {
+                    'class_id': class_obj.id, 'academic_year_id': academic_year.id, 'term_id': term.id,
+                }, tenant=profile.tenant, created_by=profile)
+                return Response({
+                    'message': 'Report card generation queued',
+                    'students': class_size,
+                    'job_id': job.id,
+                    'status_url': reverse('job-detail', args=[job.id]),
+                }, status=status.HTTP_202_ACCEPTED)
+
+            result = generate_class_report_cards(profile.tenant, class_obj, academic_year, term)
+            return Response(result, status=status.HTTP_200_OK)
+
+        except Class.DoesNotExist:
+            return Response({'error': 'Class not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except AcademicYear.DoesNotExist:
+            return Response({'error': 'Academic year not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Term.DoesNotExist:
+            return Response({'error': 'Term not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error generating class report cards: {str(e)}", exc_info=True)
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ReportCardPDFBatchView(APIView):
+    """
+    Render a class's (or the whole school's) report cards for a term into one ZIP.
+
+    Body: {"academic_year_id": 2, "term_id": 3, "class_id": 1}; omit class_id
+    for every class. Rendering runs on a job worker across a process pool;
+    poll the returned status_url for progress and fetch the ZIP from the
+    job's download URL.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+
+    @role_required('admin', 'principal', 'teacher')
+    def post(self, request):
+        profile = get_request_profile(request)
+        class_id = request.data.get('class_id') or request.data.get('class_obj')
+        academic_year_id = request.data.get('academic_year_id') or request.data.get('academic_year')
+        term_id = request.data.get('term_id') or request.data.get('term')
+        if not all([academic_year_id, term_id]):
+            return Response({'error': 'academic_year_id and term_id are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        is_teacher = profile.role and profile.role.name == 'teacher'
+        if is_teacher and not class_id:
+            return Response({'error': 'class_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            term = Term._default_manager.select_related('academic_year').get(
+                id=term_id, academic_year_id=academic_year_id, tenant=profile.tenant
+            )
+            report_cards = ReportCard._default_manager.filter(
+                tenant=profile.tenant, academic_year=term.academic_year, term=term
+            )
+            scope = 'all_classes'
+            if class_id:
+                classes = Class._default_manager.filter(tenant=profile.tenant)
+                if is_teacher:
+                    classes = classes.filter(id__in=profile.assigned_classes.all())
+                class_obj = classes.get(id=class_id)
+                report_cards = report_cards.filter(class_obj=class_obj)
+                scope = class_obj.name
+            report_card_ids = list(report_cards.order_by('class_obj__order', 'class_obj__name', 'student__name', 'id').values_list('id', flat=True))
+            if not report_card_ids:
+                return Response({'error': 'No report cards found. Generate them first.'}, status=status.HTTP_404_NOT_FOUND)
+
+            filename = re.sub(r'[^\w.-]+', '_', f"report_cards_{term.academic_year.name}_{term.name}_{scope}") + '.zip'
+            job = enqueue('api.tasks.render_report_card_zip', {
+                'report_card_ids': report_card_ids, 'filename': filename,
+            }, tenant=profile.tenant, created_by=profile)
+            return Response({
+                'message': 'Report card PDFs queued',
+                'report_cards': len(report_card_ids),
+                'job_id': job.id,
+                'status_url': reverse('job-detail', args=[job.id]),
+            }, status=status.HTTP_202_ACCEPTED)
+
+        except Term.DoesNotExist:
+            return Response({'error': 'Term not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Class.DoesNotExist:
+            return Response({'error': 'Class not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error queueing report card PDFs: {str(e)}", exc_info=True)
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def render_report_card_pdf(report_card, tenant):
+    """Render a report card to PDF bytes (shared by the download view and background jobs)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    from reportlab.lib.units import mm
+    from io import BytesIO
+
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    # Classic border frame around entire page
+    p.setStrokeColor(colors.HexColor('#1a237e'))
+    p.setLineWidth(2)
+    p.rect(15 * mm, 15 * mm, width - 30 * mm, height - 30 * mm, stroke=1, fill=0)
+    
+    # Inner decorative border
+    p.setStrokeColor(colors.HexColor('#666666'))
+    p.setLineWidth(0.5)
+    p.rect(18 * mm, 18 * mm, width - 36 * mm, height - 36 * mm, stroke=1, fill=0)
+
+    # Header with logo on LEFT and school name + info on RIGHT
+    school_name = getattr(tenant, 'name', '') or 'School'
+    
+    # School contact information (admin profile, cached)
+    contact = school_contact(tenant)
+    school_address = contact['address']
+    school_phone = contact['phone']
+    school_email = contact['email']
+    
+    # OPTION: Remove logo completely for cleaner PDFs (or keep it small)
+    # Set REMOVE_LOGO = True to remove logos from all PDFs
+    REMOVE_LOGO = True  # Set to True to remove logos completely
+    
+    logo_drawn = False
+    FIXED_TEXT_START_X = 25 * mm  # Text starts at left margin (no logo space needed)
+    logo_y_top = height - 25 * mm  # Define logo_y_top regardless of REMOVE_LOGO
+    
+    if not REMOVE_LOGO and tenant.logo:
+        try:
+            from PIL import Image
+            import os
+            logo_path = tenant.logo.path
+            if os.path.exists(logo_path):
+                img = Image.open(logo_path)
+                # Very small logo: max 15mm to avoid text overlap
+                max_height = 15 * mm
+                max_width = 15 * mm
+                img_width, img_height = img.size
+                scale = min(max_height / img_height, max_width / img_width, 1.0)
+                new_width = int(img_width * scale)
+                new_height = int(img_height * scale)
+                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                
+                if img.mode != 'RGB':
+                    img = img.convert('RGB')
+                
+                from reportlab.lib.utils import ImageReader
+                logo_reader = ImageReader(img)
+                # Logo at top-left corner, very small
+                logo_x = 25 * mm
+                logo_y_top = height - 25 * mm
+                logo_y = logo_y_top - new_height
+                p.drawImage(logo_reader, logo_x, logo_y, width=new_width, height=new_height, preserveAspectRatio=True, mask='auto')
+                logo_drawn = True
+                # Adjust text start if logo is drawn
+                FIXED_TEXT_START_X = logo_x + new_width + 5 * mm
+        except Exception as e:
+            logger.warning(f"Could not load tenant logo: {e}")
+    
+    # Text always starts at FIXED position
+    p.setFillColor(colors.black)
+    text_x = FIXED_TEXT_START_X  # Fixed position for text
+    p.setFont('Helvetica-Bold', 20)
+    school_y = logo_y_top
+    p.drawString(text_x, school_y, school_name.upper())
+    
+    # School contact info below name - IMPROVED: Better spacing and wrapping
+    info_y = school_y - 20  # Increased spacing from school name
+    p.setFont('Helvetica', 10)
+    if school_address:
+        max_addr_width = width - text_x - 25 * mm
+        # Use safe text drawing with automatic wrapping
+        info_y = draw_text_safe(p, school_address, text_x, info_y, max_addr_width, 
+                               'Helvetica', 10, 'left', max_lines=2, line_spacing=12)
+        info_y -= 3  # Extra spacing after address
+    if school_phone:
+        phone_text = f"Phone: {school_phone}"
+        max_phone_width = width - text_x - 25 * mm
+        draw_string_safe(p, phone_text, text_x, info_y, max_phone_width, 'Helvetica', 10, 'left')
+        info_y -= 15  # Increased line spacing
+    if school_email:
+        email_text = f"Email: {school_email}"
+        max_email_width = width - text_x - 25 * mm
+        draw_string_safe(p, email_text, text_x, info_y, max_email_width, 'Helvetica', 10, 'left')
+        info_y -= 15  # Increased line spacing
+    
+    # Document title below contact info
+    info_y -= 5
+    p.setFont('Helvetica-Bold', 12)
+    p.drawString(text_x, info_y, 'OFFICIAL REPORT CARD')
+    p.setFont('Helvetica', 10)
+    academic_year_text = 'ACADEMIC YEAR ' + (report_card.academic_year.name if report_card.academic_year else '')
+    p.drawString(text_x, info_y - 13, academic_year_text)
+    info_y -= 25
+    header_bottom_y = info_y
+    separator_y = min(height - 75, header_bottom_y)
+    separator_y = max(separator_y, height - 130)  # Keep minimum top padding for report card body
+    
+    # Separator line (simple border, no background)
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.line(20 * mm, separator_y, width - 20 * mm, separator_y)
+    
+    y = separator_y - 20
+    p.setFillColor(colors.black)
+
+    # Student information section - clean white background, no colors
+    student_info_start = min(height - 90, y)
+    student_info_start = max(student_info_start, height - 140)
+    y = student_info_start
+    # Outer border only - no background color
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.rect(22 * mm, y - 65, width - 44 * mm, 65, stroke=1, fill=0)
+    # Simple header line (no background color)
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.line(22 * mm, y - 12, width - 22 * mm, y - 12)
+    # Header text (black on white)
+    p.setFillColor(colors.black)
+    p.setFont('Helvetica-Bold', 13)
+    p.drawCentredString(width / 2, y - 7, 'STUDENT INFORMATION')
+    
+    y -= 18
+    p.setFillColor(colors.black)
+    
+    # Student details in classic two-column layout - Government marksheet standard alignment
+    p.setFillColor(colors.black)
+    # Fixed-width columns for consistent alignment (like government marksheets)
+    label_x = 25 * mm          # Fixed label position (left column)
+    value_x = 95 * mm          # Fixed value position (consistent spacing)
+    label_x2 = 130 * mm        # Fixed label position (right column)
+    value_x2 = 170 * mm        # Fixed value position (consistent spacing)
+    
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(label_x, y, 'Full Name:')
+    p.setFont('Helvetica', 10)
+    p.drawString(value_x, y, report_card.student.name.upper())
+    
+    roll_val = getattr(report_card.student, 'roll_number', None) or getattr(report_card.student, 'admission_number', None) or report_card.student.id
+    upper_val = getattr(report_card.student, 'upper_id', None) or getattr(report_card.student, 'admission_number', None)
+    
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(label_x2, y, 'Roll Number:')
+    p.setFont('Helvetica', 10)
+    p.drawString(value_x2, y, str(roll_val))
+    y -= 15
+    
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(label_x, y, 'Class:')
+    p.setFont('Helvetica', 10)
+    p.drawString(value_x, y, report_card.class_obj.name if report_card.class_obj else 'N/A')
+    
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(label_x2, y, 'Academic Year:')
+    p.setFont('Helvetica', 10)
+    p.drawString(value_x2, y, report_card.academic_year.name if report_card.academic_year else 'N/A')
+    y -= 15
+    
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(label_x, y, 'Term:')
+    p.setFont('Helvetica', 10)
+    p.drawString(value_x, y, report_card.term.name if report_card.term else 'N/A')
+    
+    # Use generated_at safely
+    gen_date = report_card.generated_at if hasattr(report_card, 'generated_at') and report_card.generated_at else (report_card.created_at if hasattr(report_card, 'created_at') and report_card.created_at else timezone.now())
+    issued_str = report_card.issued_date.strftime('%d-%m-%Y') if report_card.issued_date else gen_date.strftime('%d-%m-%Y')
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(label_x2, y, 'Issued Date:')
+    p.setFont('Helvetica', 10)
+    p.drawString(value_x2, y, issued_str)
+    
+    if upper_val:
+        y -= 15
+        p.setFont('Helvetica-Bold', 11)
+        p.drawString(label_x, y, 'Student ID:')
+        p.setFont('Helvetica', 11)
+        p.drawString(value_x, y, upper_val)
+    
+    y -= 20
+
+    # Classic styled marks table - with formal borders (single page, limited rows)
+    y -= 5
+    # Get marks entries first to calculate table height
+    from education.models import MarksEntry
+    marks_entries = MarksEntry._default_manager.filter(
+        tenant=report_card.tenant,
+        student=report_card.student,
+        assessment__term=report_card.term
+    ).select_related('assessment', 'assessment__subject').order_by('assessment__subject__name')
+
+    # Table dimensions
+    row_height = 16
+    header_height = 15
+    calculated_height = len(marks_entries) * row_height + header_height
+    max_available_height = max(header_height + row_height, y - 80)
+    table_height = min(calculated_height, max_available_height)
+    if table_height < header_height + row_height:
+        table_height = header_height + row_height
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    # Ensure table fits within page margins
+    table_left = 22 * mm
+    table_right = width - 22 * mm
+    table_width = table_right - table_left
+    table_bottom = y - table_height
+    p.rect(table_left, table_bottom, table_width, table_height, stroke=1, fill=0)
+
+    # Table header
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.line(table_left, y - header_height, table_right, y - header_height)
+
+    p.setFillColor(colors.black)
+    p.setFont('Helvetica-Bold', 10)
+    headers = ['SUBJECT', 'MARKS OBTAINED', 'MAX MARKS', 'PERCENTAGE']
+    available_width = width - 44 * mm
+    fixed_cols_width = 72 * mm
+    col_spacing = 3 * mm
+    subject_col_width = available_width - fixed_cols_width - (col_spacing * 3)
+    if subject_col_width < 30 * mm:
+        subject_col_width = 30 * mm
+    col_x = [
+        table_left + 3 * mm,
+        table_left + subject_col_width + col_spacing,
+        table_left + subject_col_width + 24 * mm + (col_spacing * 2),
+        table_left + subject_col_width + 48 * mm + (col_spacing * 3)
+    ]
+    if col_x[3] + 24 * mm > table_right - 3 * mm:
+        excess = (col_x[3] + 24 * mm) - (table_right - 3 * mm)
+        subject_col_width = max(30 * mm, subject_col_width - excess - col_spacing)
+        col_x = [
+            table_left + 3 * mm,
+            table_left + subject_col_width + col_spacing,
+            table_left + subject_col_width + 24 * mm + (col_spacing * 2),
+            table_left + subject_col_width + 48 * mm + (col_spacing * 3)
+        ]
+    col_widths = [subject_col_width, 24 * mm, 24 * mm, 24 * mm]
+
+    for i, htxt in enumerate(headers):
+        if i == 0:
+            max_subject_width = col_widths[0] - 3 * mm
+            if p.stringWidth(htxt, 'Helvetica-Bold', 10) > max_subject_width:
+                htxt = htxt[:15] + '...'
+            p.drawString(col_x[i], y - 8, htxt)
+        else:
+            p.drawRightString(col_x[i] + col_widths[i], y - 8, htxt)
+    p.setFillColor(colors.black)
+    y -= header_height
+
+    # Column separators
+    p.setStrokeColor(colors.HexColor('#cccccc'))
+    p.setLineWidth(0.3)
+    sep_positions = [
+        col_x[1] - 1 * mm,
+        col_x[2] - 1 * mm,
+        col_x[3] - 1 * mm
+    ]
+    for sep_x in sep_positions:
+        p.line(sep_x, y, sep_x, table_bottom)
+
+    # Limit rows to available space
+    available_row_space = table_height - header_height
+    max_rows = max(1, int(available_row_space / row_height))
+    display_entries = marks_entries[:max_rows]
+    truncated = len(marks_entries) > max_rows
+
+    # Table rows
+    p.setFont('Helvetica', 9)
+    for entry in display_entries:
+        percent = (float(entry.marks_obtained) / float(entry.max_marks) * 100) if entry.max_marks else 0
+        p.setStrokeColor(colors.HexColor('#d0d0d0'))
+        p.setLineWidth(0.5)
+        p.line(table_left, y - row_height, table_right, y - row_height)
+        p.setFillColor(colors.black)
+
+        max_subject_width = col_widths[0] - 6 * mm
+        subject_x = col_x[0] + 3 * mm
+        subject_name = entry.assessment.subject.name if entry.assessment and entry.assessment.subject else 'N/A'
+        draw_string_safe(p, subject_name, subject_x, y, max_subject_width, 'Helvetica', 9, 'left')
+
+        marks_str = str(int(float(entry.marks_obtained)))
+        marks_col_right = col_x[1] + col_widths[1] - 3 * mm
+        marks_max_width = col_widths[1] - 6 * mm
+        draw_string_safe(p, marks_str, marks_col_right, y, marks_max_width, 'Helvetica', 9, 'right')
+
+        max_marks_str = str(int(float(entry.max_marks)))
+        max_marks_col_right = col_x[2] + col_widths[2] - 3 * mm
+        max_marks_max_width = col_widths[2] - 6 * mm
+        draw_string_safe(p, max_marks_str, max_marks_col_right, y, max_marks_max_width, 'Helvetica', 9, 'right')
+
+        percent_str = f"{percent:.1f}%"
+        percent_col_right = col_x[3] + col_widths[3] - 3 * mm
+        percent_max_width = col_widths[3] - 6 * mm
+        draw_string_safe(p, percent_str, percent_col_right, y, percent_max_width, 'Helvetica', 9, 'right')
+        y -= row_height
+
+    # Truncated note
+    if truncated:
+        note_y = table_bottom + 5 * mm
+        p.setFont('Helvetica-Oblique', 8)
+        p.drawString(table_left + 3 * mm, note_y, 'Additional marks entries are available in the portal dashboard.')
+
+    # Move cursor below table
+    y = table_bottom - 20
+
+    # Academic summary section - no background colors
+    y -= 8
+    # Outer border only
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.rect(22 * mm, y - 55, width - 44 * mm, 55, stroke=1, fill=0)
+    # Header line
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.line(22 * mm, y - 12, width - 22 * mm, y - 12)
+    
+    p.setFillColor(colors.black)  # Black text on white background
+    p.setFont('Helvetica-Bold', 14)
+    p.drawCentredString(width / 2, y - 7, 'ACADEMIC SUMMARY')
+    y -= 18
+    
+    # Summary layout - black text on white
+    p.setFillColor(colors.black)
+    summary_items = [
+        ('Total Marks', f"{float(report_card.total_marks)} / {float(report_card.max_total_marks)}"),
+        ('Percentage', f"{float(report_card.percentage):.2f}%"),
+        ('Grade', report_card.grade),
+    ]
+    if report_card.rank_in_class:
+        summary_items.append(('Class Rank', f"#{report_card.rank_in_class}"))
+    
+    # IMPROVED: Better alignment for summary items - consistent spacing within margins
+    # Use page width minus margins (22mm each side) to calculate safe positions
+    available_summary_width = width - 44 * mm
+    summary_start_x = 25 * mm
+    summary_end_x = width - 25 * mm
+    
+    # IMPROVED: Better spacing and alignment to prevent text overlapping
+    # Use two-column layout with proper spacing
+    left_label_x = 30 * mm
+    left_value_x = 95 * mm
+    right_label_x = 130 * mm
+    right_value_x = 170 * mm
+    
+    # Calculate row positions with proper vertical spacing
+    row_height = 20  # Increased spacing between rows
+    current_y = y
+    
+    for i, (label, value) in enumerate(summary_items):
+        if i % 2 == 0:
+            # Left column (even indices)
+            label_x = left_label_x
+            value_x = left_value_x
+            row_y = current_y
+        else:
+            # Right column (odd indices)
+            label_x = right_label_x
+            value_x = right_value_x
+            row_y = current_y
+        
+        # Draw label and value on same line
+        p.setFont('Helvetica-Bold', 10)
+        label_text = label + ':'
+        # Ensure label doesn't exceed column boundary
+        max_label_width = value_x - label_x - 5 * mm
+        if p.stringWidth(label_text, 'Helvetica-Bold', 10) > max_label_width:
+            label_text = label_text[:15] + '...'
+        p.drawString(label_x, row_y, label_text)
+        
+        # Draw value - ensure it doesn't exceed right margin
+        p.setFont('Helvetica', 11)
+        value_width = p.stringWidth(value, 'Helvetica', 11)
+        max_value_x = width - 25 * mm
+        if value_x + value_width > max_value_x:
+            value_x = max_value_x - value_width
+        p.drawString(value_x, row_y, value)
+        
+        # Move to next row if we've filled both columns or this is the last item
+        if i % 2 == 1 or i == len(summary_items) - 1:
+            current_y -= row_height
+    
+    p.setFillColor(colors.black)  # Switch back to black for rest
+    y = current_y - 5  # Add extra spacing after summary
+
+    # Attendance and Conduct - clean white background, no colors
+    y -= 5
+    # Outer border only - no background color
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.rect(22 * mm, y - 45, width - 44 * mm, 45, stroke=1, fill=0)
+    # Header line
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.line(22 * mm, y - 12, width - 22 * mm, y - 12)
+    
+    p.setFillColor(colors.black)  # Black text on white background
+    p.setFont('Helvetica-Bold', 12)
+    p.drawCentredString(width / 2, y - 7, 'ATTENDANCE & CONDUCT')
+    y -= 18
+    
+    # IMPROVED: Better spacing to prevent overlapping
+    # First row: Days Present and Days Absent
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(25 * mm, y, 'Days Present:')
+    p.setFont('Helvetica', 10)
+    present_val = str(report_card.days_present)
+    p.drawString(90 * mm, y, present_val)  # Increased spacing
+    
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(120 * mm, y, 'Days Absent:')  # Increased spacing from previous
+    p.setFont('Helvetica', 10)
+    absent_val = str(report_card.days_absent)
+    p.drawString(170 * mm, y, absent_val)  # Increased spacing
+    y -= 16  # Increased line spacing
+    
+    # Second row: Attendance Percentage and Conduct Grade
+    p.setFont('Helvetica-Bold', 10)
+    p.drawString(25 * mm, y, 'Attendance Percentage:')
+    p.setFont('Helvetica', 10)
+    att_percent = f"{float(report_card.attendance_percentage):.2f}%"
+    p.drawString(100 * mm, y, att_percent)  # Increased spacing
+    
+    if report_card.conduct_grade:
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(150 * mm, y, 'Conduct Grade:')  # Increased spacing
+        p.setFont('Helvetica', 10)
+        p.drawString(175 * mm, y, report_card.conduct_grade)
+    y -= 25  # Increased spacing after section
+
+    # Remarks section - clean white background
+    if report_card.teacher_remarks or report_card.principal_remarks:
+        remarks_height = 0
+        if report_card.teacher_remarks:
+            remarks_height += (len(report_card.teacher_remarks) // 95 + 1) * 12 + 20
+        if report_card.principal_remarks:
+            remarks_height += (len(report_card.principal_remarks) // 95 + 1) * 12 + 20
+        
+        # Border only - no background color
+        p.setStrokeColor(colors.HexColor('#000000'))
+        p.setLineWidth(1)
+        p.rect(22 * mm, y - remarks_height - 15, width - 44 * mm, remarks_height + 15, stroke=1, fill=0)
+        # Header line
+        p.setStrokeColor(colors.HexColor('#000000'))
+        p.setLineWidth(1)
+        p.line(22 * mm, y - 12, width - 22 * mm, y - 12)
+        p.setFillColor(colors.black)
+        p.setFont('Helvetica-Bold', 12)
+        p.drawCentredString(width / 2, y - 7, 'REMARKS')
+        y -= 18
+        
+        p.setFont('Helvetica', 10)
+        # IMPROVED: Better text wrapping that respects word boundaries
+        def wrap_text(text, max_width_mm):
+            """Wrap text at word boundaries to fit within max_width_mm"""
+            if not text:
+                return []
+            words = text.split()
+            lines = []
+            current_line = ''
+            max_width = max_width_mm
+            
+            for word in words:
+                test_line = current_line + (' ' if current_line else '') + word
+                test_width = p.stringWidth(test_line, 'Helvetica', 9)
+                if test_width <= max_width:
+                    current_line = test_line
+                else:
+                    if current_line:
+                        lines.append(current_line)
+                    current_line = word
+                    # If single word is too long, truncate it
+                    if p.stringWidth(word, 'Helvetica', 9) > max_width:
+                        # Truncate word to fit
+                        while p.stringWidth(current_line, 'Helvetica', 9) > max_width and len(current_line) > 1:
+                            current_line = current_line[:-1]
+                        current_line += '...'
+            if current_line:
+                lines.append(current_line)
+            return lines
+        
+        max_remarks_width = width - 50 * mm  # Available width for remarks
+        
+        if report_card.teacher_remarks:
+            p.setFont('Helvetica-Bold', 10)
+            p.drawString(25 * mm, y, 'Class Teacher:')
+            y -= 14  # Increased spacing
+            p.setFont('Helvetica', 9)
+            remarks_lines = wrap_text(report_card.teacher_remarks, max_remarks_width)
+            for line in remarks_lines[:5]:  # Limit to 5 lines
+                if y < 60:  # Prevent overflow to footer
+                    break
+                p.drawString(25 * mm, y, line)
+                y -= 12  # Consistent line spacing
+            y -= 8  # Extra spacing after section
+        
+        if report_card.principal_remarks:
+            p.setFont('Helvetica-Bold', 10)
+            p.drawString(25 * mm, y, 'Principal:')
+            y -= 14  # Increased spacing
+            p.setFont('Helvetica', 9)
+            remarks_lines = wrap_text(report_card.principal_remarks, max_remarks_width)
+            for line in remarks_lines[:5]:  # Limit to 5 lines
+                if y < 60:  # Prevent overflow to footer
+                    break
+                p.drawString(25 * mm, y, line)
+                y -= 12  # Consistent line spacing
+        y -= 10  # Extra spacing after section
+
+    # Signature section - clean white background, no colors
+    sig_y_start = 25 * mm
+    sig_height = 40 * mm
+    # Outer border only - no background color
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.rect(22 * mm, sig_y_start, width - 44 * mm, sig_height, stroke=1, fill=0)
+    # Header line
+    p.setStrokeColor(colors.HexColor('#000000'))
+    p.setLineWidth(1)
+    p.line(22 * mm, sig_y_start + sig_height - 12, width - 22 * mm, sig_y_start + sig_height - 12)
+    p.setFillColor(colors.black)
+    p.setFont('Helvetica-Bold', 10)
+    p.drawCentredString(width / 2, sig_y_start + sig_height - 7, 'AUTHENTICATION')
+    
+    # Signature lines with labels - formal style
+    p.setStrokeColor(colors.black)
+    p.setLineWidth(1)
+    sig_line_y = sig_y_start + 22 * mm
+    
+    # Class Teacher signature box
+    p.setStrokeColor(colors.HexColor('#666666'))
+    p.setLineWidth(0.5)
+    p.rect(30 * mm, sig_line_y - 8, 50 * mm, 20 * mm, stroke=1, fill=0)
+    p.line(30 * mm, sig_line_y + 4, 80 * mm, sig_line_y + 4)
+    p.setFont('Helvetica-Bold', 9)
+    p.setFillColor(colors.black)
+    p.drawString(32 * mm, sig_line_y + 8, 'Class Teacher')
+    p.setFont('Helvetica', 7)
+    p.drawString(32 * mm, sig_line_y - 3, '(Signature & Seal)')
+    
+    # Principal signature box
+    p.rect(120 * mm, sig_line_y - 8, 50 * mm, 20 * mm, stroke=1, fill=0)
+    p.line(120 * mm, sig_line_y + 4, 170 * mm, sig_line_y + 4)
+    p.setFont('Helvetica-Bold', 9)
+    p.drawString(122 * mm, sig_line_y + 8, 'Principal')
+    p.setFont('Helvetica', 7)
+    p.drawString(122 * mm, sig_line_y - 3, '(Signature & Seal)')
+    
+    # Footer with classic styling
+    p.setFont('Helvetica', 8)
+    p.setFillColor(colors.black)
+    # Use created_at or current time if generated_at doesn't exist
+    gen_date = report_card.generated_at if hasattr(report_card, 'generated_at') and report_card.generated_at else (report_card.created_at if hasattr(report_card, 'created_at') and report_card.created_at else timezone.now())
+    footer_text = f"Generated on {gen_date.strftime('%d-%m-%Y at %I:%M %p')} — {school_name.upper()}"
+    p.drawCentredString(width / 2, 20 * mm, footer_text)
+    p.setFont('Helvetica-Oblique', 7)
+    p.drawCentredString(width / 2, 15 * mm, 'This is a computer-generated document and does not require a physical signature.')
+
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
 class ReportCardPDFView(APIView):
     """Generate PDF for a specific report card"""
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             report_card = ReportCard._default_manager.select_related(
                 'student', 'class_obj', 'academic_year', 'term'
@@ -1006,613 +1815,40 @@ class ReportCardPDFView(APIView):
                 return Response({'error': 'Report card missing term information.'}, status=status.HTTP_400_BAD_REQUEST)
             if not report_card.academic_year:
                 return Response({'error': 'Report card missing academic year information.'}, status=status.HTTP_400_BAD_REQUEST)
-            from reportlab.lib.pagesizes import A4
-            from reportlab.pdfgen import canvas
-            from reportlab.lib import colors
-            from reportlab.lib.units import mm
-            from io import BytesIO
-
-            buffer = BytesIO()
-            p = canvas.Canvas(buffer, pagesize=A4)
-            width, height = A4
-
-            # Classic border frame around entire page
-            p.setStrokeColor(colors.HexColor('#1a237e'))
-            p.setLineWidth(2)
-            p.rect(15 * mm, 15 * mm, width - 30 * mm, height - 30 * mm, stroke=1, fill=0)
-            
-            # Inner decorative border
-            p.setStrokeColor(colors.HexColor('#666666'))
-            p.setLineWidth(0.5)
-            p.rect(18 * mm, 18 * mm, width - 36 * mm, height - 36 * mm, stroke=1, fill=0)
-
-            # Header with logo on LEFT and school name + info on RIGHT
-            tenant = profile.tenant
-            school_name = getattr(tenant, 'name', '') or 'School'
-            
-            # Get school contact information from admin user profile
-            school_address = ''
-            school_phone = ''
-            school_email = ''
-            try:
-                # Get admin user profile for contact info
-                admin_profile = UserProfile._default_manager.filter(
-                    tenant=tenant, 
-                    role__name='admin'
-                ).first()
-                if admin_profile:
-                    school_address = admin_profile.address or ''
-                    school_phone = admin_profile.phone or ''
-                    school_email = admin_profile.user.email if admin_profile.user else ''
-            except Exception:
-                pass
-            
-            # OPTION: Remove logo completely for cleaner PDFs (or keep it small)
-            # Set REMOVE_LOGO = True to remove logos from all PDFs
-            REMOVE_LOGO = True  # Set to True to remove logos completely
-            
-            logo_drawn = False
-            FIXED_TEXT_START_X = 25 * mm  # Text starts at left margin (no logo space needed)
-            logo_y_top = height - 25 * mm  # Define logo_y_top regardless of REMOVE_LOGO
-            
-            if not REMOVE_LOGO and tenant.logo:
-                try:
-                    from PIL import Image
-                    import os
-                    logo_path = tenant.logo.path
-                    if os.path.exists(logo_path):
-                        img = Image.open(logo_path)
-                        # Very small logo: max 15mm to avoid text overlap
-                        max_height = 15 * mm
-                        max_width = 15 * mm
-                        img_width, img_height = img.size
-                        scale = min(max_height / img_height, max_width / img_width, 1.0)
-                        new_width = int(img_width * scale)
-                        new_height = int(img_height * scale)
-                        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        
-                        from reportlab.lib.utils import ImageReader
-                        logo_reader = ImageReader(img)
-                        # Logo at top-left corner, very small
-                        logo_x = 25 * mm
-                        logo_y_top = height - 25 * mm
-                        logo_y = logo_y_top - new_height
-                        p.drawImage(logo_reader, logo_x, logo_y, width=new_width, height=new_height, preserveAspectRatio=True, mask='auto')
-                        logo_drawn = True
-                        # Adjust text start if logo is drawn
-                        FIXED_TEXT_START_X = logo_x + new_width + 5 * mm
-                except Exception as e:
-                    logger.warning(f"Could not load tenant logo: {e}")
-            
-            # Text always starts at FIXED position
-            p.setFillColor(colors.black)
-            text_x = FIXED_TEXT_START_X  # Fixed position for text
-            p.setFont('Helvetica-Bold', 20)
-            school_y = logo_y_top
-            p.drawString(text_x, school_y, school_name.upper())
-            
-            # School contact info below name - IMPROVED: Better spacing and wrapping
-            info_y = school_y - 20  # Increased spacing from school name
-            p.setFont('Helvetica', 10)
-            if school_address:
-                max_addr_width = width - text_x - 25 * mm
-                # Use safe text drawing with automatic wrapping
-                info_y = draw_text_safe(p, school_address, text_x, info_y, max_addr_width, 
-                                       'Helvetica', 10, 'left', max_lines=2, line_spacing=12)
-                info_y -= 3  # Extra spacing after address
-            if school_phone:
-                phone_text = f"Phone: {school_phone}"
-                max_phone_width = width - text_x - 25 * mm
-                draw_string_safe(p, phone_text, text_x, info_y, max_phone_width, 'Helvetica', 10, 'left')
-                info_y -= 15  # Increased line spacing
-            if school_email:
-                email_text = f"Email: {school_email}"
-                max_email_width = width - text_x - 25 * mm
-                draw_string_safe(p, email_text, text_x, info_y, max_email_width, 'Helvetica', 10, 'left')
-                info_y -= 15  # Increased line spacing
-            
-            # Document title below contact info
-            info_y -= 5
-            p.setFont('Helvetica-Bold', 12)
-            p.drawString(text_x, info_y, 'OFFICIAL REPORT CARD')
-            p.setFont('Helvetica', 10)
-            academic_year_text = 'ACADEMIC YEAR ' + (report_card.academic_year.name if report_card.academic_year else '')
-            p.drawString(text_x, info_y - 13, academic_year_text)
-            info_y -= 25
-            header_bottom_y = info_y
-            separator_y = min(height - 75, header_bottom_y)
-            separator_y = max(separator_y, height - 130)  # Keep minimum top padding for report card body
-            
-            # Separator line (simple border, no background)
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.line(20 * mm, separator_y, width - 20 * mm, separator_y)
-            
-            y = separator_y - 20
-            p.setFillColor(colors.black)
-
-            # Student information section - clean white background, no colors
-            student_info_start = min(height - 90, y)
-            student_info_start = max(student_info_start, height - 140)
-            y = student_info_start
-            # Outer border only - no background color
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.rect(22 * mm, y - 65, width - 44 * mm, 65, stroke=1, fill=0)
-            # Simple header line (no background color)
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.line(22 * mm, y - 12, width - 22 * mm, y - 12)
-            # Header text (black on white)
-            p.setFillColor(colors.black)
-            p.setFont('Helvetica-Bold', 13)
-            p.drawCentredString(width / 2, y - 7, 'STUDENT INFORMATION')
-            
-            y -= 18
-            p.setFillColor(colors.black)
-            
-            # Student details in classic two-column layout - Government marksheet standard alignment
-            p.setFillColor(colors.black)
-            # Fixed-width columns for consistent alignment (like government marksheets)
-            label_x = 25 * mm          # Fixed label position (left column)
-            value_x = 95 * mm          # Fixed value position (consistent spacing)
-            label_x2 = 130 * mm        # Fixed label position (right column)
-            value_x2 = 170 * mm        # Fixed value position (consistent spacing)
-            
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x, y, 'Full Name:')
-            p.setFont('Helvetica', 10)
-            p.drawString(value_x, y, report_card.student.name.upper())
-            
-            roll_val = getattr(report_card.student, 'roll_number', None) or getattr(report_card.student, 'admission_number', None) or report_card.student.id
-            upper_val = getattr(report_card.student, 'upper_id', None) or getattr(report_card.student, 'admission_number', None)
-            
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x2, y, 'Roll Number:')
-            p.setFont('Helvetica', 10)
-            p.drawString(value_x2, y, str(roll_val))
-            y -= 15
-            
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x, y, 'Class:')
-            p.setFont('Helvetica', 10)
-            p.drawString(value_x, y, report_card.class_obj.name if report_card.class_obj else 'N/A')
-            
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x2, y, 'Academic Year:')
-            p.setFont('Helvetica', 10)
-            p.drawString(value_x2, y, report_card.academic_year.name if report_card.academic_year else 'N/A')
-            y -= 15
-            
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x, y, 'Term:')
-            p.setFont('Helvetica', 10)
-            p.drawString(value_x, y, report_card.term.name if report_card.term else 'N/A')
-            
-            # Use generated_at safely
-            gen_date = report_card.generated_at if hasattr(report_card, 'generated_at') and report_card.generated_at else (report_card.created_at if hasattr(report_card, 'created_at') and report_card.created_at else timezone.now())
-            issued_str = report_card.issued_date.strftime('%d-%m-%Y') if report_card.issued_date else gen_date.strftime('%d-%m-%Y')
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x2, y, 'Issued Date:')
-            p.setFont('Helvetica', 10)
-            p.drawString(value_x2, y, issued_str)
-            
-            if upper_val:
-                y -= 15
-                p.setFont('Helvetica-Bold', 11)
-                p.drawString(label_x, y, 'Student ID:')
-                p.setFont('Helvetica', 11)
-                p.drawString(value_x, y, upper_val)
-            
-            y -= 20
-
-            # Classic styled marks table - with formal borders (single page, limited rows)
-            y -= 5
-            # Get marks entries first to calculate table height
-            from education.models import MarksEntry
-            marks_entries = MarksEntry._default_manager.filter(
-                tenant=report_card.tenant,
-                student=report_card.student,
-                assessment__term=report_card.term
-            ).select_related('assessment', 'assessment__subject').order_by('assessment__subject__name')
-
-            # Table dimensions
-            row_height = 16
-            header_height = 15
-            calculated_height = len(marks_entries) * row_height + header_height
-            max_available_height = max(header_height + row_height, y - 80)
-            table_height = min(calculated_height, max_available_height)
-            if table_height < header_height + row_height:
-                table_height = header_height + row_height
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            # Ensure table fits within page margins
-            table_left = 22 * mm
-            table_right = width - 22 * mm
-            table_width = table_right - table_left
-            table_bottom = y - table_height
-            p.rect(table_left, table_bottom, table_width, table_height, stroke=1, fill=0)
-
-            # Table header
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.line(table_left, y - header_height, table_right, y - header_height)
+            if request.query_params.get('async') in ('1', 'true'):
+                # Render on a job worker; the file is fetched from the job's download URL
+                job = enqueue('api.tasks.render_report_card_pdf', {'report_card_id': report_card.id},
+                              tenant=profile.tenant, created_by=profile)
+                return Response({
+                    'message': 'PDF generation queued',
+                    'job_id': job.id,
+                    'status_url': reverse('job-detail', args=[job.id]),
+                }, status=status.HTTP_202_ACCEPTED)
+            pdf = render_report_card_pdf(report_card, profile.tenant)
+            response = HttpResponse(pdf, content_type='application/pdf')
+            response['Content-Disposition'] = f'attachment; filename="report_card_{report_card.student.name}_{report_card.id}.pdf"'
+            return response
+        except ImportError as e:
+            logger.error(f"PDF generation import error: {str(e)}", exc_info=True)
+            return Response({
+                'error': 'PDF generation library not installed.',
+                'details': 'Install required packages: pip install reportlab Pillow',
+                'missing': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except Exception as e:
+            logger.error(f"Error generating PDF: {str(e)}", exc_info=True)
+            return Response({
+                'error': f'PDF generation failed: {str(e)}',
+                'details': 'Check server logs for more information.'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            p.setFillColor(colors.black)
-            p.setFont('Helvetica-Bold', 10)
-            headers = ['SUBJECT', 'MARKS OBTAINED', 'MAX MARKS', 'PERCENTAGE']
-            available_width = width - 44 * mm
-            fixed_cols_width = 72 * mm
-            col_spacing = 3 * mm
-            subject_col_width = available_width - fixed_cols_width - (col_spacing * 3)
-            if subject_col_width < 30 * mm:
-                subject_col_width = 30 * mm
-            col_x = [
-                table_left + 3 * mm,
-                table_left + subject_col_width + col_spacing,
-                table_left + subject_col_width + 24 * mm + (col_spacing * 2),
-                table_left + subject_col_width + 48 * mm + (col_spacing * 3)
-            ]
-            if col_x[3] + 24 * mm > table_right - 3 * mm:
-                excess = (col_x[3] + 24 * mm) - (table_right - 3 * mm)
-                subject_col_width = max(30 * mm, subject_col_width - excess - col_spacing)
-                col_x = [
-                    table_left + 3 * mm,
-                    table_left + subject_col_width + col_spacing,
-                    table_left + subject_col_width + 24 * mm + (col_spacing * 2),
-                    table_left + subject_col_width + 48 * mm + (col_spacing * 3)
-                ]
-            col_widths = [subject_col_width, 24 * mm, 24 * mm, 24 * mm]
-
-            for i, htxt in enumerate(headers):
-                if i == 0:
-                    max_subject_width = col_widths[0] - 3 * mm
-                    if p.stringWidth(htxt, 'Helvetica-Bold', 10) > max_subject_width:
-                        htxt = htxt[:15] + '...'
-                    p.drawString(col_x[i], y - 8, htxt)
-                else:
-                    p.drawRightString(col_x[i] + col_widths[i], y - 8, htxt)
-            p.setFillColor(colors.black)
-            y -= header_height
-
-            # Column separators
-            p.setStrokeColor(colors.HexColor('#cccccc'))
-            p.setLineWidth(0.3)
-            sep_positions = [
-                col_x[1] - 1 * mm,
-                col_x[2] - 1 * mm,
-                col_x[3] - 1 * mm
-            ]
-            for sep_x in sep_positions:
-                p.line(sep_x, y, sep_x, table_bottom)
-
-            # Limit rows to available space
-            available_row_space = table_height - header_height
-            max_rows = max(1, int(available_row_space / row_height))
-            display_entries = marks_entries[:max_rows]
-            truncated = len(marks_entries) > max_rows
-
-            # Table rows
-            p.setFont('Helvetica', 9)
-            for entry in display_entries:
-                percent = (float(entry.marks_obtained) / float(entry.max_marks) * 100) if entry.max_marks else 0
-                p.setStrokeColor(colors.HexColor('#d0d0d0'))
-                p.setLineWidth(0.5)
-                p.line(table_left, y - row_height, table_right, y - row_height)
-                p.setFillColor(colors.black)
-
-                max_subject_width = col_widths[0] - 6 * mm
-                subject_x = col_x[0] + 3 * mm
-                subject_name = entry.assessment.subject.name if entry.assessment and entry.assessment.subject else 'N/A'
-                draw_string_safe(p, subject_name, subject_x, y, max_subject_width, 'Helvetica', 9, 'left')
-
-                marks_str = str(int(float(entry.marks_obtained)))
-                marks_col_right = col_x[1] + col_widths[1] - 3 * mm
-                marks_max_width = col_widths[1] - 6 * mm
-                draw_string_safe(p, marks_str, marks_col_right, y, marks_max_width, 'Helvetica', 9, 'right')
-
-                max_marks_str = str(int(float(entry.max_marks)))
-                max_marks_col_right = col_x[2] + col_widths[2] - 3 * mm
-                max_marks_max_width = col_widths[2] - 6 * mm
-                draw_string_safe(p, max_marks_str, max_marks_col_right, y, max_marks_max_width, 'Helvetica', 9, 'right')
-
-                percent_str = f"{percent:.1f}%"
-                percent_col_right = col_x[3] + col_widths[3] - 3 * mm
-                percent_max_width = col_widths[3] - 6 * mm
-                draw_string_safe(p, percent_str, percent_col_right, y, percent_max_width, 'Helvetica', 9, 'right')
-                y -= row_height
-
-            # Truncated note
-            if truncated:
-                note_y = table_bottom + 5 * mm
-                p.setFont('Helvetica-Oblique', 8)
-                p.drawString(table_left + 3 * mm, note_y, 'Additional marks entries are available in the portal dashboard.')
-
-            # Move cursor below table
-            y = table_bottom - 20
-
-            # Academic summary section - no background colors
-            y -= 8
-            # Outer border only
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.rect(22 * mm, y - 55, width - 44 * mm, 55, stroke=1, fill=0)
-            # Header line
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.line(22 * mm, y - 12, width - 22 * mm, y - 12)
-            
-            p.setFillColor(colors.black)  # Black text on white background
-            p.setFont('Helvetica-Bold', 14)
-            p.drawCentredString(width / 2, y - 7, 'ACADEMIC SUMMARY')
-            y -= 18
-            
-            # Summary layout - black text on white
-            p.setFillColor(colors.black)
-            summary_items = [
-                ('Total Marks', f"{float(report_card.total_marks)} / {float(report_card.max_total_marks)}"),
-                ('Percentage', f"{float(report_card.percentage):.2f}%"),
-                ('Grade', report_card.grade),
-            ]
-            if report_card.rank_in_class:
-                summary_items.append(('Class Rank', f"#{report_card.rank_in_class}"))
-            
-            # IMPROVED: Better alignment for summary items - consistent spacing within margins
-            # Use page width minus margins (22mm each side) to calculate safe positions
-            available_summary_width = width - 44 * mm
-            summary_start_x = 25 * mm
-            summary_end_x = width - 25 * mm
-            
-            # IMPROVED: Better spacing and alignment to prevent text overlapping
-            # Use two-column layout with proper spacing
-            left_label_x = 30 * mm
-            left_value_x = 95 * mm
-            right_label_x = 130 * mm
-            right_value_x = 170 * mm
-            
-            # Calculate row positions with proper vertical spacing
-            row_height = 20  # Increased spacing between rows
-            current_y = y
-            
-            for i, (label, value) in enumerate(summary_items):
-                if i % 2 == 0:
-                    # Left column (even indices)
-                    label_x = left_label_x
-                    value_x = left_value_x
-                    row_y = current_y
-                else:
-                    # Right column (odd indices)
-                    label_x = right_label_x
-                    value_x = right_value_x
-                    row_y = current_y
-                
-                # Draw label and value on same line
-                p.setFont('Helvetica-Bold', 10)
-                label_text = label + ':'
-                # Ensure label doesn't exceed column boundary
-                max_label_width = value_x - label_x - 5 * mm
-                if p.stringWidth(label_text, 'Helvetica-Bold', 10) > max_label_width:
-                    label_text = label_text[:15] + '...'
-                p.drawString(label_x, row_y, label_text)
-                
-                # Draw value - ensure it doesn't exceed right margin
-                p.setFont('Helvetica', 11)
-                value_width = p.stringWidth(value, 'Helvetica', 11)
-                max_value_x = width - 25 * mm
-                if value_x + value_width > max_value_x:
-                    value_x = max_value_x - value_width
-                p.drawString(value_x, row_y, value)
-                
-                # Move to next row if we've filled both columns or this is the last item
-                if i % 2 == 1 or i == len(summary_items) - 1:
-                    current_y -= row_height
-            
-            p.setFillColor(colors.black)  # Switch back to black for rest
-            y = current_y - 5  # Add extra spacing after summary
-
-            # Attendance and Conduct - clean white background, no colors
-            y -= 5
-            # Outer border only - no background color
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.rect(22 * mm, y - 45, width - 44 * mm, 45, stroke=1, fill=0)
-            # Header line
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.line(22 * mm, y - 12, width - 22 * mm, y - 12)
-            
-            p.setFillColor(colors.black)  # Black text on white background
-            p.setFont('Helvetica-Bold', 12)
-            p.drawCentredString(width / 2, y - 7, 'ATTENDANCE & CONDUCT')
-            y -= 18
-            
-            # IMPROVED: Better spacing to prevent overlapping
-            # First row: Days Present and Days Absent
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(25 * mm, y, 'Days Present:')
-            p.setFont('Helvetica', 10)
-            present_val = str(report_card.days_present)
-            p.drawString(90 * mm, y, present_val)  # Increased spacing
-            
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(120 * mm, y, 'Days Absent:')  # Increased spacing from previous
-            p.setFont('Helvetica', 10)
-            absent_val = str(report_card.days_absent)
-            p.drawString(170 * mm, y, absent_val)  # Increased spacing
-            y -= 16  # Increased line spacing
-            
-            # Second row: Attendance Percentage and Conduct Grade
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(25 * mm, y, 'Attendance Percentage:')
-            p.setFont('Helvetica', 10)
-            att_percent = f"{float(report_card.attendance_percentage):.2f}%"
-            p.drawString(100 * mm, y, att_percent)  # Increased spacing
-            
-            if report_card.conduct_grade:
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(150 * mm, y, 'Conduct Grade:')  # Increased spacing
-                p.setFont('Helvetica', 10)
-                p.drawString(175 * mm, y, report_card.conduct_grade)
-            y -= 25  # Increased spacing after section
-
-            # Remarks section - clean white background
-            if report_card.teacher_remarks or report_card.principal_remarks:
-                remarks_height = 0
-                if report_card.teacher_remarks:
-                    remarks_height += (len(report_card.teacher_remarks) // 95 + 1) * 12 + 20
-                if report_card.principal_remarks:
-                    remarks_height += (len(report_card.principal_remarks) // 95 + 1) * 12 + 20
-                
-                # Border only - no background color
-                p.setStrokeColor(colors.HexColor('#000000'))
-                p.setLineWidth(1)
-                p.rect(22 * mm, y - remarks_height - 15, width - 44 * mm, remarks_height + 15, stroke=1, fill=0)
-                # Header line
-                p.setStrokeColor(colors.HexColor('#000000'))
-                p.setLineWidth(1)
-                p.line(22 * mm, y - 12, width - 22 * mm, y - 12)
-                p.setFillColor(colors.black)
-                p.setFont('Helvetica-Bold', 12)
-                p.drawCentredString(width / 2, y - 7, 'REMARKS')
-                y -= 18
-                
-                p.setFont('Helvetica', 10)
-                # IMPROVED: Better text wrapping that respects word boundaries
-                def wrap_text(text, max_width_mm):
-                    """Wrap text at word boundaries to fit within max_width_mm"""
-                    if not text:
-                        return []
-                    words = text.split()
-                    lines = []
-                    current_line = ''
-                    max_width = max_width_mm
-                    
-                    for word in words:
-                        test_line = current_line + (' ' if current_line else '') + word
-                        test_width = p.stringWidth(test_line, 'Helvetica', 9)
-                        if test_width <= max_width:
-                            current_line = test_line
-                        else:
-                            if current_line:
-                                lines.append(current_line)
-                            current_line = word
-                            # If single word is too long, truncate it
-                            if p.stringWidth(word, 'Helvetica', 9) > max_width:
-                                # Truncate word to fit
-                                while p.stringWidth(current_line, 'Helvetica', 9) > max_width and len(current_line) > 1:
-                                    current_line = current_line[:-1]
-                                current_line += '...'
-                    if current_line:
-                        lines.append(current_line)
-                    return lines
-                
-                max_remarks_width = width - 50 * mm  # Available width for remarks
-                
-                if report_card.teacher_remarks:
-                    p.setFont('Helvetica-Bold', 10)
-                    p.drawString(25 * mm, y, 'Class Teacher:')
-                    y -= 14  # Increased spacing
-                    p.setFont('Helvetica', 9)
-                    remarks_lines = wrap_text(report_card.teacher_remarks, max_remarks_width)
-                    for line in remarks_lines[:5]:  # Limit to 5 lines
-                        if y < 60:  # Prevent overflow to footer
-                            break
-                        p.drawString(25 * mm, y, line)
-                        y -= 12  # Consistent line spacing
-                    y -= 8  # Extra spacing after section
-                
-                if report_card.principal_remarks:
-                    p.setFont('Helvetica-Bold', 10)
-                    p.drawString(25 * mm, y, 'Principal:')
-                    y -= 14  # Increased spacing
-                    p.setFont('Helvetica', 9)
-                    remarks_lines = wrap_text(report_card.principal_remarks, max_remarks_width)
-                    for line in remarks_lines[:5]:  # Limit to 5 lines
-                        if y < 60:  # Prevent overflow to footer
-                            break
-                        p.drawString(25 * mm, y, line)
-                        y -= 12  # Consistent line spacing
-                y -= 10  # Extra spacing after section
-
-            # Signature section - clean white background, no colors
-            sig_y_start = 25 * mm
-            sig_height = 40 * mm
-            # Outer border only - no background color
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.rect(22 * mm, sig_y_start, width - 44 * mm, sig_height, stroke=1, fill=0)
-            # Header line
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.line(22 * mm, sig_y_start + sig_height - 12, width - 22 * mm, sig_y_start + sig_height - 12)
-            p.setFillColor(colors.black)
-            p.setFont('Helvetica-Bold', 10)
-            p.drawCentredString(width / 2, sig_y_start + sig_height - 7, 'AUTHENTICATION')
-            
-            # Signature lines with labels - formal style
-            p.setStrokeColor(colors.black)
-            p.setLineWidth(1)
-            sig_line_y = sig_y_start + 22 * mm
-            
-            # Class Teacher signature box
-            p.setStrokeColor(colors.HexColor('#666666'))
-            p.setLineWidth(0.5)
-            p.rect(30 * mm, sig_line_y - 8, 50 * mm, 20 * mm, stroke=1, fill=0)
-            p.line(30 * mm, sig_line_y + 4, 80 * mm, sig_line_y + 4)
-            p.setFont('Helvetica-Bold', 9)
-            p.setFillColor(colors.black)
-            p.drawString(32 * mm, sig_line_y + 8, 'Class Teacher')
-            p.setFont('Helvetica', 7)
-            p.drawString(32 * mm, sig_line_y - 3, '(Signature & Seal)')
-            
-            # Principal signature box
-            p.rect(120 * mm, sig_line_y - 8, 50 * mm, 20 * mm, stroke=1, fill=0)
-            p.line(120 * mm, sig_line_y + 4, 170 * mm, sig_line_y + 4)
-            p.setFont('Helvetica-Bold', 9)
-            p.drawString(122 * mm, sig_line_y + 8, 'Principal')
-            p.setFont('Helvetica', 7)
-            p.drawString(122 * mm, sig_line_y - 3, '(Signature & Seal)')
-            
-            # Footer with classic styling
-            p.setFont('Helvetica', 8)
-            p.setFillColor(colors.black)
-            # Use created_at or current time if generated_at doesn't exist
-            gen_date = report_card.generated_at if hasattr(report_card, 'generated_at') and report_card.generated_at else (report_card.created_at if hasattr(report_card, 'created_at') and report_card.created_at else timezone.now())
-            footer_text = f"Generated on {gen_date.strftime('%d-%m-%Y at %I:%M %p')} — {school_name.upper()}"
-            p.drawCentredString(width / 2, 20 * mm, footer_text)
-            p.setFont('Helvetica-Oblique', 7)
-            p.drawCentredString(width / 2, 15 * mm, 'This is a computer-generated document and does not require a physical signature.')
-
-            p.showPage()
-            p.save()
-            buffer.seek(0)
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="report_card_{report_card.student.name}_{report_card.id}.pdf"'
-            return response
-        except ImportError as e:
-            logger.error(f"PDF generation import error: {str(e)}", exc_info=True)
-            return Response({
-                'error': 'PDF generation library not installed.',
-                'details': 'Install required packages: pip install reportlab Pillow',
-                'missing': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except Exception as e:
-            logger.error(f"Error generating PDF: {str(e)}", exc_info=True)
-            return Response({
-                'error': f'PDF generation failed: {str(e)}',
-                'details': 'Check server logs for more information.'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-class StudentExportView(APIView):
-    authentication_classes = [JWTAuthentication]
-    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+class StudentExportView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
         except UserProfile.DoesNotExist:
             return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -1712,7 +1948,7 @@ class ClassFeeStructureListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
             # Allow admin, accountant, principal, and teacher to view fee structures (read-only for teachers)
             if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal', 'teacher']:
                 return Response({'error': 'You do not have permission to view fee structures.'}, status=status.HTTP_403_FORBIDDEN)
@@ -1727,7 +1963,7 @@ class ClassFeeStructureListCreateView(APIView):
             return Response({'error': f'An error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if not profile.role or profile.role.name != 'admin':
             return Response({'error': 'Only admins can create fee structures.'}, status=status.HTTP_403_FORBIDDEN)
         data = request.data.copy()
@@ -1743,7 +1979,7 @@ class ClassFeeStructureDetailView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         if not profile.role or profile.role.name != 'admin':
             return Response({'error': 'Only admins can update fee structures.'}, status=status.HTTP_403_FORBIDDEN)
         try:
@@ -1757,7 +1993,7 @@ class ClassFeeStructureDetailView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         if not profile.role or profile.role.name != 'admin':
             return Response({'error': 'Only admins can delete fee structures.'}, status=status.HTTP_403_FORBIDDEN)
         try:
@@ -1773,7 +2009,7 @@ class StaffAttendanceListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
             if not profile.tenant:
                 return Response({'error': 'Tenant not found for user. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
             
@@ -1805,7 +2041,7 @@ class StaffAttendanceListCreateView(APIView):
     @role_exclude('student')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
             print(f"DEBUG: User profile found: {profile.id} - {profile.user.username}")
             logger.info(f"User profile found: {profile.id} - {profile.user.username}")
         except Exception as e:
@@ -1881,7 +2117,7 @@ class StaffAttendanceDetailView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         try:
             att = StaffAttendance._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
         except StaffAttendance.DoesNotExist:  # type: ignore
@@ -1896,7 +2132,7 @@ class StaffAttendanceDetailView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         try:
             att = StaffAttendance._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
         except StaffAttendance.DoesNotExist:  # type: ignore
@@ -1911,7 +2147,7 @@ class StaffAttendanceDetailView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         try:
             att = StaffAttendance._default_manager.get(id=pk, tenant=profile.tenant)  # type: ignore
         except StaffAttendance.DoesNotExist:  # type: ignore
@@ -1927,7 +2163,7 @@ class AdminEducationSummaryView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can view admin summary.'}, status=status.HTTP_403_FORBIDDEN)
         tenant = profile.tenant
@@ -1959,7 +2195,7 @@ class ClassStatsView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education'), HasFeaturePermissionFactory('analytics')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can view class stats.'}, status=status.HTTP_403_FORBIDDEN)
         tenant = profile.tenant
@@ -1987,7 +2223,7 @@ class MonthlyReportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education'), HasFeaturePermissionFactory('analytics')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can view monthly reports.'}, status=status.HTTP_403_FORBIDDEN)
         tenant = profile.tenant
@@ -2015,7 +2251,7 @@ class ExportClassStatsCSVView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education'), HasFeaturePermissionFactory('analytics')]
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can export class stats.'}, status=status.HTTP_403_FORBIDDEN)
         tenant = profile.tenant
@@ -2037,7 +2273,7 @@ class ExportMonthlyReportCSVView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can export monthly reports.'}, status=status.HTTP_403_FORBIDDEN)
         tenant = profile.tenant
@@ -2065,7 +2301,7 @@ class StaffListView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         # Optionally filter by role if you want only staff/teachers
         staff = UserProfile._default_manager.filter(tenant=profile.tenant, role__name__in=['staff', 'teacher'])
         data = [{"id": s.id, "name": s.user.get_full_name() or s.user.username} for s in staff]
@@ -2081,7 +2317,7 @@ class StaffAttendanceCheckInView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         today = timezone.now().date()
         # Check if already checked in
         attendance, created = StaffAttendance.objects.get_or_create(
@@ -2099,7 +2335,7 @@ class StaffAttendanceCheckOutView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         staff_id = request.data.get('staff_id')
         if not staff_id:
             return Response({'error': 'staff_id is required.'}, status=400)
@@ -2123,7 +2359,7 @@ class EducationDepartmentListCreateView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         # Allow admin, principal, and teacher to view departments (read-only for teachers)
         if not profile.role or profile.role.name not in ['admin', 'principal', 'teacher', 'staff']:
             return Response({'error': 'You do not have permission to view departments.'}, status=status.HTTP_403_FORBIDDEN)
@@ -2133,7 +2369,7 @@ class EducationDepartmentListCreateView(APIView):
 
     @role_required('admin', 'principal')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = DepartmentSerializer(data=data)
@@ -2148,7 +2384,7 @@ class FeePaymentListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile.tenant:
                 return Response({'error': 'Tenant not found for user. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
             
@@ -2177,7 +2413,7 @@ class FeePaymentListCreateView(APIView):
 
     @role_required('admin', 'principal', 'teacher', 'accountant')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = FeePaymentSerializer(data=data, context={'request': request})
@@ -2192,7 +2428,7 @@ class FeePaymentDetailView(APIView):
 
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             try:
                 payment = FeePayment._default_manager.select_related(
                     'student', 'fee_structure', 'student__assigned_class', 'fee_structure__class_obj'
@@ -2210,7 +2446,7 @@ class FeePaymentDetailView(APIView):
 
     @role_required('admin', 'principal', 'teacher', 'accountant')
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             payment = FeePayment._default_manager.get(id=pk, tenant=profile.tenant)
         except Exception:
@@ -2223,7 +2459,7 @@ class FeePaymentDetailView(APIView):
 
     @role_required('admin', 'principal', 'teacher', 'accountant')
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             payment = FeePayment._default_manager.get(id=pk, tenant=profile.tenant)
         except Exception:
@@ -2237,376 +2473,375 @@ class FeePaymentReceiptPDFView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
-            payment = FeePayment._default_manager.get(id=pk, tenant=profile.tenant)
+            payment = FeePayment._default_manager.select_related(
+                'student__assigned_class', 'fee_structure'
+            ).get(id=pk, tenant=profile.tenant)
         except FeePayment.DoesNotExist:
             return Response({'error': 'Fee payment not found.'}, status=status.HTTP_404_NOT_FOUND)
         
         try:
-            from reportlab.lib.pagesizes import A4
-            from reportlab.pdfgen import canvas
-            from reportlab.lib import colors
-            from reportlab.lib.units import mm
-            from io import BytesIO
+            tenant = profile.tenant
+            contact = school_contact(tenant)
+            student = payment.student
+            receipt_number = payment.receipt_number or f"RCP-{payment.id:08X}"
+            return cached_pdf_response(
+                request, 'fee_receipt', payment,
+                [payment, student, student.assigned_class if student else None, payment.fee_structure,
+                 tenant.name, tenant.logo.name, contact],
+                lambda: self.render_pdf(payment, tenant, contact),
+                f"fee_receipt_{receipt_number}_{payment.id}.pdf",
+            )
+        except ImportError as e:
+            logger.error(f"PDF generation import error: {str(e)}", exc_info=True)
+            return Response({
+                'error': 'PDF generation library not installed.',
+                'details': 'Install required packages: pip install reportlab Pillow',
+                'missing': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except Exception as e:
+            logger.error(f"Error generating receipt PDF: {str(e)}", exc_info=True)
+            return Response({
+                'error': f'Receipt PDF generation failed: {str(e)}',
+                'details': 'Check server logs for more information.'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            buffer = BytesIO()
-            p = canvas.Canvas(buffer, pagesize=A4)
-            width, height = A4
+    def render_pdf(self, payment, tenant, contact):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        from reportlab.lib import colors
+        from reportlab.lib.units import mm
+        from io import BytesIO
 
-            # Get tenant info
-            tenant = profile.tenant
-            school_name = getattr(tenant, 'name', '') or 'School'
-            
-            # Get school contact information from admin user profile
-            school_address = ''
-            school_phone = ''
-            school_email = ''
+        buffer = BytesIO()
+        p = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+
+        school_name = getattr(tenant, 'name', '') or 'School'
+        
+        school_address = contact['address']
+        school_phone = contact['phone']
+        school_email = contact['email']
+        
+        # OPTION: Remove logo completely for cleaner PDFs (or keep it small)
+        REMOVE_LOGO = True  # Set to True to remove logos completely
+        
+        logo_drawn = False
+        FIXED_TEXT_START_X = 25 * mm  # Text starts at left margin (no logo space needed)
+        logo_y_top = height - 25 * mm
+        
+        if not REMOVE_LOGO and tenant.logo:
             try:
-                # Get admin user profile for contact info
-                admin_profile = UserProfile._default_manager.filter(
-                    tenant=tenant, 
-                    role__name='admin'
-                ).first()
-                if admin_profile:
-                    school_address = admin_profile.address or ''
-                    school_phone = admin_profile.phone or ''
-                    school_email = admin_profile.user.email if admin_profile.user else ''
-            except Exception:
-                pass
-            
-            # OPTION: Remove logo completely for cleaner PDFs (or keep it small)
-            REMOVE_LOGO = True  # Set to True to remove logos completely
-            
-            logo_drawn = False
-            FIXED_TEXT_START_X = 25 * mm  # Text starts at left margin (no logo space needed)
-            logo_y_top = height - 25 * mm
-            
-            if not REMOVE_LOGO and tenant.logo:
-                try:
-                    from PIL import Image
-                    import os
-                    logo_path = tenant.logo.path
-                    if os.path.exists(logo_path):
-                        img = Image.open(logo_path)
-                        # Very small logo: max 15mm to avoid text overlap
-                        max_height = 15 * mm
-                        max_width = 15 * mm
-                        img_width, img_height = img.size
-                        scale = min(max_height / img_height, max_width / img_width, 1.0)
-                        new_width = int(img_width * scale)
-                        new_height = int(img_height * scale)
-                        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        from reportlab.lib.utils import ImageReader
-                        logo_reader = ImageReader(img)
-                        # Logo at top-left corner, very small
-                        logo_x = 25 * mm
-                        logo_y = logo_y_top - new_height
-                        p.drawImage(logo_reader, logo_x, logo_y, width=new_width, height=new_height, preserveAspectRatio=True, mask='auto')
-                        logo_drawn = True
-                        # Adjust text start if logo is drawn
-                        FIXED_TEXT_START_X = logo_x + new_width + 5 * mm
-                except Exception as e:
-                    logger.warning(f"Could not load tenant logo: {e}")
-            
-            # Text always starts at FIXED position
-            p.setFillColor(colors.black)
-            text_x = FIXED_TEXT_START_X  # Fixed position for text
-            p.setFont('Helvetica-Bold', 18)
-            school_y = logo_y_top
-            p.drawString(text_x, school_y, school_name.upper())
-            
-            # School contact info below name - IMPROVED SPACING
-            info_y = school_y - 20  # Increased spacing from school name
-            p.setFont('Helvetica', 9)
-            if school_address:
-                max_addr_width = width - text_x - 25 * mm
-                if p.stringWidth(school_address, 'Helvetica', 9) > max_addr_width:
-                    addr_lines = [school_address[i:i+50] for i in range(0, min(len(school_address), 100), 50)]
-                    for line in addr_lines[:2]:
-                        p.drawString(text_x, info_y, line)
-                        info_y -= 12  # Consistent line spacing
-                else:
-                    p.drawString(text_x, info_y, school_address)
+                from PIL import Image
+                import os
+                logo_path = tenant.logo.path
+                if os.path.exists(logo_path):
+                    img = Image.open(logo_path)
+                    # Very small logo: max 15mm to avoid text overlap
+                    max_height = 15 * mm
+                    max_width = 15 * mm
+                    img_width, img_height = img.size
+                    scale = min(max_height / img_height, max_width / img_width, 1.0)
+                    new_width = int(img_width * scale)
+                    new_height = int(img_height * scale)
+                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                    if img.mode != 'RGB':
+                        img = img.convert('RGB')
+                    from reportlab.lib.utils import ImageReader
+                    logo_reader = ImageReader(img)
+                    # Logo at top-left corner, very small
+                    logo_x = 25 * mm
+                    logo_y = logo_y_top - new_height
+                    p.drawImage(logo_reader, logo_x, logo_y, width=new_width, height=new_height, preserveAspectRatio=True, mask='auto')
+                    logo_drawn = True
+                    # Adjust text start if logo is drawn
+                    FIXED_TEXT_START_X = logo_x + new_width + 5 * mm
+            except Exception as e:
+                logger.warning(f"Could not load tenant logo: {e}")
+        
+        # Text always starts at FIXED position
+        p.setFillColor(colors.black)
+        text_x = FIXED_TEXT_START_X  # Fixed position for text
+        p.setFont('Helvetica-Bold', 18)
+        school_y = logo_y_top
+        p.drawString(text_x, school_y, school_name.upper())
+        
+        # School contact info below name - IMPROVED SPACING
+        info_y = school_y - 20  # Increased spacing from school name
+        p.setFont('Helvetica', 9)
+        if school_address:
+            max_addr_width = width - text_x - 25 * mm
+            if p.stringWidth(school_address, 'Helvetica', 9) > max_addr_width:
+                addr_lines = [school_address[i:i+50] for i in range(0, min(len(school_address), 100), 50)]
+                for line in addr_lines[:2]:
+                    p.drawString(text_x, info_y, line)
                     info_y -= 12  # Consistent line spacing
-            if school_phone:
-                p.drawString(text_x, info_y, f"Phone: {school_phone}")
-                info_y -= 12  # Consistent line spacing
-            if school_email:
-                p.drawString(text_x, info_y, f"Email: {school_email}")
+            else:
+                p.drawString(text_x, info_y, school_address)
                 info_y -= 12  # Consistent line spacing
-            
-            # Document title below contact info - IMPROVED SPACING
-            info_y -= 10  # Increased spacing before title
-            p.setFont('Helvetica-Bold', 14)
-            p.drawString(text_x, info_y, 'FEE PAYMENT RECEIPT')
-            
-            y = info_y - 25  # Start receipt details section with proper spacing
-            p.setFillColor(colors.black)
-
-            # Receipt number and date section - IMPROVED SPACING AND LAYOUT
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.rect(20 * mm, y - 40, width - 40 * mm, 40, stroke=1, fill=0)  # Increased height for better spacing
-            p.setFillColor(colors.black)
-            p.setFont('Helvetica-Bold', 12)
-            p.drawString(25 * mm, y - 10, 'RECEIPT DETAILS')  # Adjusted position
-            y -= 20  # Increased spacing after header
-            
-            receipt_number = payment.receipt_number or f"RCP-{payment.id:08X}"
-            payment_date = payment.payment_date.strftime('%d/%m/%Y')
-            
-            # IMPROVED: Better alignment with more spacing
-            receipt_label_x = 25 * mm
-            receipt_value_x = 105 * mm  # Increased spacing
-            date_label_x = 140 * mm  # Increased spacing
-            date_value_x = 175 * mm  # Increased spacing
-            
-            p.setFont('Helvetica-Bold', 11)
-            p.drawString(receipt_label_x, y, 'Receipt Number:')
-            p.setFont('Helvetica', 11)
-            p.drawString(receipt_value_x, y, receipt_number)
-            
-            p.setFont('Helvetica-Bold', 11)
-            p.drawString(date_label_x, y, 'Date:')
-            p.setFont('Helvetica', 11)
-            p.drawString(date_value_x, y, payment_date)
-            y -= 20  # Increased spacing after section
-
-            # Student information section - IMPROVED SPACING AND LAYOUT
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            p.rect(20 * mm, y - 55, width - 40 * mm, 55, stroke=1, fill=0)  # Increased height
-            p.setFillColor(colors.black)
-            p.setFont('Helvetica-Bold', 12)
-            p.drawString(25 * mm, y - 10, 'STUDENT INFORMATION')  # Adjusted position
-            y -= 20  # Increased spacing after header
-            
-            student_name = payment.student.name if payment.student else 'N/A'
-            roll_number = getattr(payment.student, 'roll_number', None) or getattr(payment.student, 'admission_number', None) or getattr(payment.student, 'upper_id', None) or 'N/A'
-            class_name = payment.student.assigned_class.name if payment.student and payment.student.assigned_class else 'N/A'
-            
-            # IMPROVED: Better alignment with proper spacing to prevent overlapping
-            label_x = 25 * mm          # Fixed label position (left column)
-            value_x = 100 * mm          # Increased spacing for values
-            label_x2 = 140 * mm         # Increased spacing for right column
-            value_x2 = 175 * mm         # Increased spacing for right column values (reduced to prevent overflow)
-            
-            # First row: Student Name and Roll Number
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x, y, 'Student Name:')
-            p.setFont('Helvetica', 10)
-            # Truncate if too long to prevent overflow
-            name_text = student_name.upper()
-            max_name_width = label_x2 - value_x - 10 * mm  # Available space between columns
-            if p.stringWidth(name_text, 'Helvetica', 10) > max_name_width:
-                # Truncate name to fit
-                while p.stringWidth(name_text, 'Helvetica', 10) > max_name_width and len(name_text) > 1:
-                    name_text = name_text[:-1]
-                name_text = name_text.rstrip() + '...'
-            p.drawString(value_x, y, name_text)
-            
-            p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x2, y, 'Roll Number:')
-            p.setFont('Helvetica', 10)
-            roll_text = str(roll_number)
-            # Ensure roll number doesn't exceed page width
-            max_roll_x = width - 25 * mm
-            if value_x2 + p.stringWidth(roll_text, 'Helvetica', 10) > max_roll_x:
-                value_x2 = max_roll_x - p.stringWidth(roll_text, 'Helvetica', 10)
-            p.drawString(value_x2, y, roll_text)
-            y -= 20  # Increased line spacing
-            
-            # Second row: Class and Fee Type
+        if school_phone:
+            p.drawString(text_x, info_y, f"Phone: {school_phone}")
+            info_y -= 12  # Consistent line spacing
+        if school_email:
+            p.drawString(text_x, info_y, f"Email: {school_email}")
+            info_y -= 12  # Consistent line spacing
+        
+        # Document title below contact info - IMPROVED SPACING
+        info_y -= 10  # Increased spacing before title
+        p.setFont('Helvetica-Bold', 14)
+        p.drawString(text_x, info_y, 'FEE PAYMENT RECEIPT')
+        
+        y = info_y - 25  # Start receipt details section with proper spacing
+        p.setFillColor(colors.black)
+
+        # Receipt number and date section - IMPROVED SPACING AND LAYOUT
+        p.setStrokeColor(colors.HexColor('#000000'))
+        p.setLineWidth(1)
+        p.rect(20 * mm, y - 40, width - 40 * mm, 40, stroke=1, fill=0)  # Increased height for better spacing
+        p.setFillColor(colors.black)
+        p.setFont('Helvetica-Bold', 12)
+        p.drawString(25 * mm, y - 10, 'RECEIPT DETAILS')  # Adjusted position
+        y -= 20  # Increased spacing after header
+        
+        receipt_number = payment.receipt_number or f"RCP-{payment.id:08X}"
+        payment_date = payment.payment_date.strftime('%d/%m/%Y')
+        
+        # IMPROVED: Better alignment with more spacing
+        receipt_label_x = 25 * mm
+        receipt_value_x = 105 * mm  # Increased spacing
+        date_label_x = 140 * mm  # Increased spacing
+        date_value_x = 175 * mm  # Increased spacing
+        
+        p.setFont('Helvetica-Bold', 11)
+        p.drawString(receipt_label_x, y, 'Receipt Number:')
+        p.setFont('Helvetica', 11)
+        p.drawString(receipt_value_x, y, receipt_number)
+        
+        p.setFont('Helvetica-Bold', 11)
+        p.drawString(date_label_x, y, 'Date:')
+        p.setFont('Helvetica', 11)
+        p.drawString(date_value_x, y, payment_date)
+        y -= 20  # Increased spacing after section
+
+        # Student information section - IMPROVED SPACING AND LAYOUT
+        p.setStrokeColor(colors.HexColor('#000000'))
+        p.setLineWidth(1)
+        p.rect(20 * mm, y - 55, width - 40 * mm, 55, stroke=1, fill=0)  # Increased height
+        p.setFillColor(colors.black)
+        p.setFont('Helvetica-Bold', 12)
+        p.drawString(25 * mm, y - 10, 'STUDENT INFORMATION')  # Adjusted position
+        y -= 20  # Increased spacing after header
+        
+        student_name = payment.student.name if payment.student else 'N/A'
+        roll_number = getattr(payment.student, 'roll_number', None) or getattr(payment.student, 'admission_number', None) or getattr(payment.student, 'upper_id', None) or 'N/A'
+        class_name = payment.student.assigned_class.name if payment.student and payment.student.assigned_class else 'N/A'
+        
+        # IMPROVED: Better alignment with proper spacing to prevent overlapping
+        label_x = 25 * mm          # Fixed label position (left column)
+        value_x = 100 * mm          # Increased spacing for values
+        label_x2 = 140 * mm         # Increased spacing for right column
+        value_x2 = 175 * mm         # Increased spacing for right column values (reduced to prevent overflow)
+        
+        # First row: Student Name and Roll Number
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(label_x, y, 'Student Name:')
+        p.setFont('Helvetica', 10)
+        # Truncate if too long to prevent overflow
+        name_text = student_name.upper()
+        max_name_width = label_x2 - value_x - 10 * mm  # Available space between columns
+        if p.stringWidth(name_text, 'Helvetica', 10) > max_name_width:
+            # Truncate name to fit
+            while p.stringWidth(name_text, 'Helvetica', 10) > max_name_width and len(name_text) > 1:
+                name_text = name_text[:-1]
+            name_text = name_text.rstrip() + '...'
+        p.drawString(value_x, y, name_text)
+        
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(label_x2, y, 'Roll Number:')
+        p.setFont('Helvetica', 10)
+        roll_text = str(roll_number)
+        # Ensure roll number doesn't exceed page width
+        max_roll_x = width - 25 * mm
+        if value_x2 + p.stringWidth(roll_text, 'Helvetica', 10) > max_roll_x:
+            value_x2 = max_roll_x - p.stringWidth(roll_text, 'Helvetica', 10)
+        p.drawString(value_x2, y, roll_text)
+        y -= 20  # Increased line spacing
+        
+        # Second row: Class and Fee Type
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(label_x, y, 'Class:')
+        p.setFont('Helvetica', 10)
+        class_text = class_name
+        # Ensure class name doesn't exceed column boundary
+        if p.stringWidth(class_text, 'Helvetica', 10) > max_name_width:
+            while p.stringWidth(class_text, 'Helvetica', 10) > max_name_width and len(class_text) > 1:
+                class_text = class_text[:-1]
+            class_text = class_text.rstrip() + '...'
+        p.drawString(value_x, y, class_text)
+        
+        fee_type = payment.fee_structure.fee_type if payment.fee_structure else 'N/A'
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(label_x2, y, 'Fee Type:')
+        p.setFont('Helvetica', 10)
+        fee_type_text = fee_type
+        # Ensure fee type doesn't exceed page width
+        if value_x2 + p.stringWidth(fee_type_text, 'Helvetica', 10) > max_roll_x:
+            value_x2_fee = max_roll_x - p.stringWidth(fee_type_text, 'Helvetica', 10)
+        else:
+            value_x2_fee = value_x2
+        p.drawString(value_x2_fee, y, fee_type_text)
+        y -= 25  # Increased spacing after section
+
+        # Totals are needed to size the payment section
+        amount_paid = float(payment.amount_paid)
+        total_fee = float(payment.fee_structure.amount) if payment.fee_structure else amount_paid
+        remaining = max(0, total_fee - amount_paid)
+
+        # Payment details section - IMPROVED SPACING AND LAYOUT
+        p.setStrokeColor(colors.HexColor('#000000'))
+        p.setLineWidth(1)
+        # Calculate dynamic height based on content
+        section_height = 75 if (payment.fee_structure and remaining > 0) else 60
+        p.rect(20 * mm, y - section_height, width - 40 * mm, section_height, stroke=1, fill=0)
+        p.setFillColor(colors.black)
+        p.setFont('Helvetica-Bold', 12)
+        p.drawString(25 * mm, y - 10, 'PAYMENT INFORMATION')  # Adjusted position
+        y -= 20  # Increased spacing after header
+        
+        payment_method = payment.get_payment_method_display() if hasattr(payment, 'get_payment_method_display') else payment.payment_method or 'CASH'
+        discount = float(payment.discount_amount) if payment.discount_amount else 0
+        
+        # IMPROVED: Better alignment with proper spacing
+        label_x = 25 * mm          # Fixed label position (left column)
+        value_x = 105 * mm         # Increased spacing for text values
+        currency_x = width - 30 * mm  # Fixed right-aligned position for all currency with margin
+        
+        # Payment Method - on its own line
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(label_x, y, 'Payment Method:')
+        p.setFont('Helvetica', 10)
+        p.drawString(value_x, y, payment_method.upper())
+        y -= 18  # Increased line spacing
+        
+        # Amount Paid - on its own line
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(label_x, y, 'Amount Paid:')
+        p.setFont('Helvetica-Bold', 11)
+        p.setFillColor(colors.black)
+        amount_text = f"₹{amount_paid:,.2f}"
+        amount_width = p.stringWidth(amount_text, 'Helvetica-Bold', 11)
+        if amount_width > (width - currency_x):
             p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x, y, 'Class:')
-            p.setFont('Helvetica', 10)
-            class_text = class_name
-            # Ensure class name doesn't exceed column boundary
-            if p.stringWidth(class_text, 'Helvetica', 10) > max_name_width:
-                while p.stringWidth(class_text, 'Helvetica', 10) > max_name_width and len(class_text) > 1:
-                    class_text = class_text[:-1]
-                class_text = class_text.rstrip() + '...'
-            p.drawString(value_x, y, class_text)
-            
-            fee_type = payment.fee_structure.fee_type if payment.fee_structure else 'N/A'
+            amount_text = f"₹{amount_paid:,.2f}"
+        p.drawRightString(currency_x, y, amount_text)
+        y -= 18  # Increased line spacing
+        
+        # Discount (if exists) - on its own line
+        if discount > 0:
             p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x2, y, 'Fee Type:')
+            p.drawString(label_x, y, 'Discount:')
             p.setFont('Helvetica', 10)
-            fee_type_text = fee_type
-            # Ensure fee type doesn't exceed page width
-            if value_x2 + p.stringWidth(fee_type_text, 'Helvetica', 10) > max_roll_x:
-                value_x2_fee = max_roll_x - p.stringWidth(fee_type_text, 'Helvetica', 10)
-            else:
-                value_x2_fee = value_x2
-            p.drawString(value_x2_fee, y, fee_type_text)
-            y -= 25  # Increased spacing after section
-
-            # Payment details section - IMPROVED SPACING AND LAYOUT
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1)
-            # Calculate dynamic height based on content
-            section_height = 75 if (payment.fee_structure and remaining > 0) else 60
-            p.rect(20 * mm, y - section_height, width - 40 * mm, section_height, stroke=1, fill=0)
-            p.setFillColor(colors.black)
-            p.setFont('Helvetica-Bold', 12)
-            p.drawString(25 * mm, y - 10, 'PAYMENT INFORMATION')  # Adjusted position
-            y -= 20  # Increased spacing after header
-            
-            payment_method = payment.get_payment_method_display() if hasattr(payment, 'get_payment_method_display') else payment.payment_method or 'CASH'
-            amount_paid = float(payment.amount_paid)
-            total_fee = float(payment.fee_structure.amount) if payment.fee_structure else amount_paid
-            remaining = max(0, total_fee - amount_paid)
-            discount = float(payment.discount_amount) if payment.discount_amount else 0
-            
-            # IMPROVED: Better alignment with proper spacing
-            label_x = 25 * mm          # Fixed label position (left column)
-            value_x = 105 * mm         # Increased spacing for text values
-            currency_x = width - 30 * mm  # Fixed right-aligned position for all currency with margin
-            
-            # Payment Method - on its own line
+            discount_text = f"₹{discount:,.2f}"
+            p.drawRightString(currency_x, y, discount_text)
+            y -= 18  # Increased line spacing
+        
+        # Total Fee (if exists) - on its own line
+        if payment.fee_structure:
             p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x, y, 'Payment Method:')
+            p.drawString(label_x, y, 'Total Fee:')
             p.setFont('Helvetica', 10)
-            p.drawString(value_x, y, payment_method.upper())
+            total_text = f"₹{total_fee:,.2f}"
+            total_width = p.stringWidth(total_text, 'Helvetica', 10)
+            if total_width > (width - currency_x):
+                p.setFont('Helvetica', 9)
+                total_text = f"₹{total_fee:,.2f}"
+            p.drawRightString(currency_x, y, total_text)
             y -= 18  # Increased line spacing
-            
-            # Amount Paid - on its own line
+        
+        # Remaining (if exists) - on its own line
+        if payment.fee_structure and remaining > 0:
             p.setFont('Helvetica-Bold', 10)
-            p.drawString(label_x, y, 'Amount Paid:')
-            p.setFont('Helvetica-Bold', 11)
+            p.drawString(label_x, y, 'Remaining:')
+            p.setFont('Helvetica', 10)
             p.setFillColor(colors.black)
-            amount_text = f"₹{amount_paid:,.2f}"
-            amount_width = p.stringWidth(amount_text, 'Helvetica-Bold', 11)
-            if amount_width > (width - currency_x):
-                p.setFont('Helvetica-Bold', 10)
-                amount_text = f"₹{amount_paid:,.2f}"
-            p.drawRightString(currency_x, y, amount_text)
-            y -= 18  # Increased line spacing
-            
-            # Discount (if exists) - on its own line
-            if discount > 0:
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(label_x, y, 'Discount:')
-                p.setFont('Helvetica', 10)
-                discount_text = f"₹{discount:,.2f}"
-                p.drawRightString(currency_x, y, discount_text)
-                y -= 18  # Increased line spacing
-            
-            # Total Fee (if exists) - on its own line
-            if payment.fee_structure:
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(label_x, y, 'Total Fee:')
-                p.setFont('Helvetica', 10)
-                total_text = f"₹{total_fee:,.2f}"
-                total_width = p.stringWidth(total_text, 'Helvetica', 10)
-                if total_width > (width - currency_x):
-                    p.setFont('Helvetica', 9)
-                    total_text = f"₹{total_fee:,.2f}"
-                p.drawRightString(currency_x, y, total_text)
-                y -= 18  # Increased line spacing
-            
-            # Remaining (if exists) - on its own line
-            if payment.fee_structure and remaining > 0:
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(label_x, y, 'Remaining:')
-                p.setFont('Helvetica', 10)
-                p.setFillColor(colors.black)
-                remaining_text = f"₹{remaining:,.2f}"
-                remaining_width = p.stringWidth(remaining_text, 'Helvetica', 10)
-                if remaining_width > (width - currency_x):
-                    p.setFont('Helvetica', 9)
-                    remaining_text = f"₹{remaining:,.2f}"
-                p.drawRightString(currency_x, y, remaining_text)
-                y -= 18  # Increased line spacing
-            
-            y -= 15  # Extra spacing after payment section
-
-            # Notes section (if exists) - IMPROVED: Better text wrapping to prevent word collapsing
-            if payment.notes:
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(25 * mm, y, 'Notes:')
-                y -= 12
+            remaining_text = f"₹{remaining:,.2f}"
+            remaining_width = p.stringWidth(remaining_text, 'Helvetica', 10)
+            if remaining_width > (width - currency_x):
                 p.setFont('Helvetica', 9)
-                # IMPROVED: Smart word wrapping - break at word boundaries, not mid-word
-                notes_text = str(payment.notes)
-                max_width = width - 50 * mm  # Available width for notes
-                words = notes_text.split()
-                lines = []
-                current_line = ''
-                for word in words:
-                    test_line = current_line + (' ' if current_line else '') + word
-                    if p.stringWidth(test_line, 'Helvetica', 9) <= max_width:
-                        current_line = test_line
-                    else:
-                        if current_line:
-                            lines.append(current_line)
-                        current_line = word
-                if current_line:
-                    lines.append(current_line)
-                # Display up to 4 lines with proper spacing
-                for line in lines[:4]:
-                    if y < 60:
-                        break
-                    p.drawString(25 * mm, y, line)
-                    y -= 11
-                y -= 8
-            else:
-                y -= 15
+                remaining_text = f"₹{remaining:,.2f}"
+            p.drawRightString(currency_x, y, remaining_text)
+            y -= 18  # Increased line spacing
+        
+        y -= 15  # Extra spacing after payment section
 
-            # Total amount section - IMPROVED SPACING AND ALIGNMENT
-            p.setStrokeColor(colors.HexColor('#000000'))
-            p.setLineWidth(1.5)
-            p.rect(20 * mm, y - 40, width - 40 * mm, 40, stroke=1, fill=0)  # Increased height
-            p.setFillColor(colors.black)
-            p.setFont('Helvetica-Bold', 14)
-            p.drawString(25 * mm, y - 15, 'TOTAL AMOUNT PAID:')  # Adjusted position
-            p.setFont('Helvetica-Bold', 18)
-            # IMPROVED: Ensure total amount fits within bounds
-            total_paid_text = f"₹{amount_paid:,.2f}"
-            total_paid_width = p.stringWidth(total_paid_text, 'Helvetica-Bold', 18)
-            if total_paid_width > (width - 30 * mm):
-                p.setFont('Helvetica-Bold', 16)
-                total_paid_text = f"₹{amount_paid:,.2f}"
-            p.drawRightString(width - 30 * mm, y - 12, total_paid_text)  # Adjusted position with margin
-            y -= 50  # Increased spacing after total section
-
-            # Thank you message (black text on white background)
-            p.setFont('Helvetica', 11)
-            p.setFillColor(colors.black)  # Black text on white
-            p.drawCentredString(width / 2, y, 'Thank you for your payment!')
+        # Notes section (if exists) - IMPROVED: Better text wrapping to prevent word collapsing
+        if payment.notes:
+            p.setFont('Helvetica-Bold', 10)
+            p.drawString(25 * mm, y, 'Notes:')
+            y -= 12
+            p.setFont('Helvetica', 9)
+            # IMPROVED: Smart word wrapping - break at word boundaries, not mid-word
+            notes_text = str(payment.notes)
+            max_width = width - 50 * mm  # Available width for notes
+            words = notes_text.split()
+            lines = []
+            current_line = ''
+            for word in words:
+                test_line = current_line + (' ' if current_line else '') + word
+                if p.stringWidth(test_line, 'Helvetica', 9) <= max_width:
+                    current_line = test_line
+                else:
+                    if current_line:
+                        lines.append(current_line)
+                    current_line = word
+            if current_line:
+                lines.append(current_line)
+            # Display up to 4 lines with proper spacing
+            for line in lines[:4]:
+                if y < 60:
+                    break
+                p.drawString(25 * mm, y, line)
+                y -= 11
+            y -= 8
+        else:
             y -= 15
 
-            # Footer
-            p.setFont('Helvetica', 8)
-            p.setFillColor(colors.black)
-            footer_text = f"Generated on {timezone.now().strftime('%d-%m-%Y at %I:%M %p')} — {school_name.upper()}"
-            p.drawCentredString(width / 2, 20 * mm, footer_text)
-            p.setFont('Helvetica-Oblique', 7)
-            p.drawCentredString(width / 2, 15 * mm, 'This is a computer-generated receipt and does not require a physical signature.')
-
-            p.showPage()
-            p.save()
-            buffer.seek(0)
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            receipt_filename = f"fee_receipt_{receipt_number}_{payment.id}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{receipt_filename}"'
-            return response
-        except ImportError as e:
-            logger.error(f"PDF generation import error: {str(e)}", exc_info=True)
-            return Response({
-                'error': 'PDF generation library not installed.',
-                'details': 'Install required packages: pip install reportlab Pillow',
-                'missing': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except Exception as e:
-            logger.error(f"Error generating receipt PDF: {str(e)}", exc_info=True)
-            return Response({
-                'error': f'Receipt PDF generation failed: {str(e)}',
-                'details': 'Check server logs for more information.'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        # Total amount section - IMPROVED SPACING AND ALIGNMENT
+        p.setStrokeColor(colors.HexColor('#000000'))
+        p.setLineWidth(1.5)
+        p.rect(20 * mm, y - 40, width - 40 * mm, 40, stroke=1, fill=0)  # Increased height
+        p.setFillColor(colors.black)
+        p.setFont('Helvetica-Bold', 14)
+        p.drawString(25 * mm, y - 15, 'TOTAL AMOUNT PAID:')  # Adjusted position
+        p.setFont('Helvetica-Bold', 18)
+        # IMPROVED: Ensure total amount fits within bounds
+        total_paid_text = f"₹{amount_paid:,.2f}"
+        total_paid_width = p.stringWidth(total_paid_text, 'Helvetica-Bold', 18)
+        if total_paid_width > (width - 30 * mm):
+            p.setFont('Helvetica-Bold', 16)
+            total_paid_text = f"₹{amount_paid:,.2f}"
+        p.drawRightString(width - 30 * mm, y - 12, total_paid_text)  # Adjusted position with margin
+        y -= 50  # Increased spacing after total section
+
+        # Thank you message (black text on white background)
+        p.setFont('Helvetica', 11)
+        p.setFillColor(colors.black)  # Black text on white
+        p.drawCentredString(width / 2, y, 'Thank you for your payment!')
+        y -= 15
+
+        # Footer
+        p.setFont('Helvetica', 8)
+        p.setFillColor(colors.black)
+        footer_text = f"Generated on {timezone.now().strftime('%d-%m-%Y at %I:%M %p')} — {school_name.upper()}"
+        p.drawCentredString(width / 2, 20 * mm, footer_text)
+        p.setFont('Helvetica-Oblique', 7)
+        p.drawCentredString(width / 2, 15 * mm, 'This is a computer-generated receipt and does not require a physical signature.')
+
+        p.showPage()
+        p.save()
+        buffer.seek(0)
+        return buffer.getvalue()
 
 # Installment Management Views
 class FeeInstallmentPlanListCreateView(APIView):
@@ -2615,7 +2850,7 @@ class FeeInstallmentPlanListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             fee_structure_id = request.query_params.get('fee_structure')
             plans = FeeInstallmentPlan._default_manager.filter(tenant=profile.tenant)
             if fee_structure_id:
@@ -2631,7 +2866,7 @@ class FeeInstallmentPlanListCreateView(APIView):
 
     @role_required('admin', 'principal', 'accountant')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = FeeInstallmentPlanSerializer(data=data)
@@ -2646,7 +2881,7 @@ class FeeInstallmentPlanDetailView(APIView):
 
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             try:
                 plan = FeeInstallmentPlan._default_manager.get(id=pk, tenant=profile.tenant)
             except FeeInstallmentPlan.DoesNotExist:
@@ -2662,7 +2897,7 @@ class FeeInstallmentPlanDetailView(APIView):
 
     @role_required('admin', 'principal', 'accountant')
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             plan = FeeInstallmentPlan._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = FeeInstallmentPlanSerializer(plan, data=request.data, partial=True)
@@ -2675,7 +2910,7 @@ class FeeInstallmentPlanDetailView(APIView):
 
     @role_required('admin', 'principal', 'accountant')
     def delete(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             plan = FeeInstallmentPlan._default_manager.get(id=pk, tenant=profile.tenant)
             plan.delete()
@@ -2689,7 +2924,7 @@ class FeeInstallmentListCreateView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             student_id = request.query_params.get('student')
             fee_structure_id = request.query_params.get('fee_structure')
             status_filter = request.query_params.get('status')
@@ -2776,7 +3011,7 @@ class FeeInstallmentListCreateView(APIView):
 
     @role_required('admin', 'principal', 'accountant')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         serializer = FeeInstallmentSerializer(data=data)
@@ -2791,7 +3026,7 @@ class FeeInstallmentDetailView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             installment = FeeInstallment._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = FeeInstallmentSerializer(installment)
@@ -2801,7 +3036,7 @@ class FeeInstallmentDetailView(APIView):
 
     @role_required('admin', 'principal', 'accountant')
     def put(self, request, pk):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             installment = FeeInstallment._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = FeeInstallmentSerializer(installment, data=request.data, partial=True)
@@ -2820,7 +3055,7 @@ class FeeInstallmentGenerateView(APIView):
 
     @role_required('admin', 'principal', 'accountant')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         
         student_id = data.get('student_id')
@@ -2850,66 +3085,15 @@ class FeeInstallmentGenerateView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Generate installments based on plan
-            installments_data = data.get('installments', [])  # Custom installments if provided
-            created_installments = []
-            
-            if installment_plan.installment_type in ('EQUAL', 'PERCENTAGE'):
-                # Equal split with rounding and proper due dates from start_date
-                from decimal import Decimal, ROUND_HALF_UP
-                from datetime import timedelta, date
-                from django.utils import timezone
-
-                n = int(installment_plan.number_of_installments or 1)
-                total = Decimal(str(fee_structure.amount))
-                base = (total / Decimal(n)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                amounts = [base for _ in range(n)]
-                # Adjust last installment to fix rounding difference
-                diff = total - sum(amounts)
-                if diff != 0:
-                    amounts[-1] = (amounts[-1] + diff).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-                # Start date parsing
-                start_date_str = data.get('start_date')
-                try:
-                    start_dt = date.fromisoformat(start_date_str) if start_date_str else timezone.now().date()
-                except Exception:
-                    start_dt = timezone.now().date()
-
-                for i in range(1, n + 1):
-                    # Approximate month increment by 30-day blocks
-                    due_dt = (start_dt + timedelta(days=30 * (i - 1)))
-                    installment = FeeInstallment._default_manager.create(
-                        tenant=profile.tenant,
-                        student=student,
-                        fee_structure=fee_structure,
-                        installment_plan=installment_plan,
-                        installment_number=i,
-                        due_amount=amounts[i - 1],
-                        due_date=due_dt
-                    )
-                    installment.update_status()
-                    created_installments.append(installment)
-            else:
-                # Custom amounts - use provided installments_data
-                if not installments_data:
-                    return Response(
-                        {'error': 'installments data required for CUSTOM installment type.'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                for inst_data in installments_data:
-                    installment = FeeInstallment._default_manager.create(
-                        tenant=profile.tenant,
-                        student=student,
-                        fee_structure=fee_structure,
-                        installment_plan=installment_plan,
-                        installment_number=inst_data['installment_number'],
-                        due_amount=inst_data['due_amount'],
-                        due_date=inst_data['due_date']
-                    )
-                    installment.update_status()
-                    created_installments.append(installment)
+            # Generate installments based on plan (custom installments if provided)
+            try:
+                schedule = installment_schedule(fee_structure, installment_plan, parse_start_date(data.get('start_date')),
+                                                data.get('installments', []))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            created_installments = FeeInstallment._default_manager.bulk_create(
+                build_installments(profile.tenant, student.id, fee_structure, installment_plan, schedule)
+            )
             
             serializer = FeeInstallmentSerializer(created_installments, many=True)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -2924,6 +3108,74 @@ class FeeInstallmentGenerateView(APIView):
             logger.error(f"Error generating installments: {str(e)}", exc_info=True)
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class FeeInstallmentBulkGenerateView(APIView):
+    """
+    Generate installments for every active student of a class from one plan.
+
+    Body: {"fee_structure_id": 1, "installment_plan_id": 2, "class_id": 3,
+    "start_date": "2025-04-01", "installments": [...]}; class_id defaults to
+    the fee structure's class. Students who already have installments for the
+    fee structure are skipped. Batches above FEE_INSTALLMENT_SYNC_LIMIT
+    students (or any request with ?async=1) run on a job worker.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+
+    @role_required('admin', 'principal', 'accountant')
+    def post(self, request):
+        profile = get_request_profile(request)
+        data = request.data
+        fee_structure_id = data.get('fee_structure_id')
+        installment_plan_id = data.get('installment_plan_id')
+        if not all([fee_structure_id, installment_plan_id]):
+            return Response(
+                {'error': 'fee_structure_id and installment_plan_id are required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            fee_structure = FeeStructure._default_manager.get(id=fee_structure_id, tenant=profile.tenant)
+            installment_plan = FeeInstallmentPlan._default_manager.get(
+                id=installment_plan_id, tenant=profile.tenant, fee_structure=fee_structure
+            )
+            class_id = data.get('class_id') or fee_structure.class_obj_id
+            class_obj = Class._default_manager.get(id=class_id, tenant=profile.tenant)
+            start_date = parse_start_date(data.get('start_date'))
+            try:
+                schedule = installment_schedule(fee_structure, installment_plan, start_date, data.get('installments', []))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            student_ids = class_student_ids(profile.tenant, class_obj)
+            sync_limit = getattr(settings, 'FEE_INSTALLMENT_SYNC_LIMIT', 200)
+            if request.query_params.get('async') in ('1', 'true') or len(student_ids) > sync_limit:
+                job = enqueue('api.tasks.generate_fee_installments', {
+                    'fee_structure_id': fee_structure.id,
+                    'installment_plan_id': installment_plan.id,
+                    'student_ids': student_ids,
+                    'start_date': start_date.isoformat(),
+                    'installments': data.get('installments', []),
+                }, tenant=profile.tenant, created_by=profile)
+                return Response({
+                    'message': 'Installment generation queued',
+                    'students': len(student_ids),
+                    'job_id': job.id,
+                    'status_url': reverse('job-detail', args=[job.id]),
+                }, status=status.HTTP_202_ACCEPTED)
+
+            result = generate_installments(profile.tenant, fee_structure, installment_plan, student_ids, schedule)
+            return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+        except FeeStructure.DoesNotExist:
+            return Response({'error': 'Fee structure not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except FeeInstallmentPlan.DoesNotExist:
+            return Response({'error': 'Installment plan not found for this fee structure.'}, status=status.HTTP_404_NOT_FOUND)
+        except Class.DoesNotExist:
+            return Response({'error': 'Class not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error generating class installments: {str(e)}", exc_info=True)
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 class FeeInstallmentRegenerateView(APIView):
     """Delete existing installments for student+fee_structure and regenerate from a plan"""
     authentication_classes = [JWTAuthentication]
@@ -2931,7 +3183,7 @@ class FeeInstallmentRegenerateView(APIView):
 
     @role_required('admin', 'principal', 'accountant')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
 
         student_id = data.get('student_id')
@@ -2945,63 +3197,22 @@ class FeeInstallmentRegenerateView(APIView):
             fee_structure = FeeStructure._default_manager.get(id=fee_structure_id, tenant=profile.tenant)
             installment_plan = FeeInstallmentPlan._default_manager.get(id=installment_plan_id, tenant=profile.tenant)
 
-            # Delete existing installments
-            FeeInstallment._default_manager.filter(
-                tenant=profile.tenant,
-                student=student,
-                fee_structure=fee_structure
-            ).delete()
-
-            # Reuse generation logic
-            from decimal import Decimal, ROUND_HALF_UP
-            from datetime import timedelta, date
-            from django.utils import timezone
-
-            created_installments = []
-            if installment_plan.installment_type in ('EQUAL', 'PERCENTAGE'):
-                n = int(installment_plan.number_of_installments or 1)
-                total = Decimal(str(fee_structure.amount))
-                base = (total / Decimal(n)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                amounts = [base for _ in range(n)]
-                diff = total - sum(amounts)
-                if diff != 0:
-                    amounts[-1] = (amounts[-1] + diff).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-                start_date_str = data.get('start_date')
-                try:
-                    start_dt = date.fromisoformat(start_date_str) if start_date_str else timezone.now().date()
-                except Exception:
-                    start_dt = timezone.now().date()
+            try:
+                schedule = installment_schedule(fee_structure, installment_plan, parse_start_date(data.get('start_date')),
+                                                data.get('installments', []))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-                for i in range(1, n + 1):
-                    due_dt = (start_dt + timedelta(days=30 * (i - 1)))
-                    installment = FeeInstallment._default_manager.create(
-                        tenant=profile.tenant,
-                        student=student,
-                        fee_structure=fee_structure,
-                        installment_plan=installment_plan,
-                        installment_number=i,
-                        due_amount=amounts[i - 1],
-                        due_date=due_dt
-                    )
-                    installment.update_status()
-                    created_installments.append(installment)
-            else:
-                installments_data = data.get('installments', [])
-                if not installments_data:
-                    return Response({'error': 'installments data required for CUSTOM installment type.'}, status=status.HTTP_400_BAD_REQUEST)
-                for inst_data in installments_data:
-                    installment = FeeInstallment._default_manager.create(
-                        tenant=profile.tenant,
-                        student=student,
-                        fee_structure=fee_structure,
-                        installment_plan=installment_plan,
-                        installment_number=inst_data['installment_number'],
-                        due_amount=inst_data['due_amount'],
-                        due_date=inst_data['due_date']
-                    )
-                    installment.update_status()
-                    created_installments.append(installment)
+            # Replace existing installments
+            with transaction.atomic():
+                FeeInstallment._default_manager.filter(
+                    tenant=profile.tenant,
+                    student=student,
+                    fee_structure=fee_structure
+                ).delete()
+                created_installments = FeeInstallment._default_manager.bulk_create(
+                    build_installments(profile.tenant, student.id, fee_structure, installment_plan, schedule)
+                )
 
             serializer = FeeInstallmentSerializer(created_installments, many=True)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -3021,7 +3232,7 @@ class StudentInstallmentsView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, student_id):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             student = Student._default_manager.get(id=student_id, tenant=profile.tenant)
             installments = FeeInstallment._default_manager.filter(
@@ -3040,19 +3251,11 @@ class OverdueInstallmentsView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
-        from django.utils import timezone
-        today = timezone.now().date()
-        
-        overdue = FeeInstallment._default_manager.filter(
-            tenant=profile.tenant,
-            status__in=['PENDING', 'PARTIAL'],
-            due_date__lt=today
-        ).order_by('due_date')
-        
-        # Update status to OVERDUE for any that are overdue
-        for inst in overdue.filter(status__in=['PENDING', 'PARTIAL']):
-            inst.update_status()
+        profile = get_request_profile(request)
+        # Statuses are kept current by sweep_installments; nothing is re-derived per row
+        overdue = overdue_installments(profile.tenant).select_related(
+            'student__assigned_class', 'fee_structure__class_obj', 'installment_plan'
+        ).order_by('due_date', 'id')
         
         serializer = FeeInstallmentSerializer(overdue, many=True)
         return Response(serializer.data)
@@ -3087,7 +3290,7 @@ class FeeStructureListView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile.tenant:
                 return Response({'error': 'Tenant not found for user. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
             
@@ -3111,7 +3314,7 @@ class ClassAttendanceStatusView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+            profile = get_request_profile(request)  # type: ignore
             if not profile.tenant:
                 return Response({'error': 'Tenant not found for user. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
             
@@ -3131,27 +3334,42 @@ class ClassAttendanceStatusView(APIView):
                 except Exception:
                     query_date = timezone.now().date()
 
-                students = Student._default_manager.filter(tenant=tenant, assigned_class=class_obj)  # type: ignore
+                students = Student._default_manager.filter(tenant=tenant, assigned_class=class_obj).only('id', 'name')  # type: ignore
+                # One lookup of the day's attendance for the whole class, keyed by student.
+                # Descending ids so the earliest record wins if a student was marked twice.
+                marked = dict(
+                    Attendance._default_manager.filter(  # type: ignore
+                        tenant=tenant, student__assigned_class=class_obj, date=query_date
+                    ).order_by('-id').values_list('student_id', 'present')
+                )
                 result = []
                 for s in students:
-                    att = Attendance._default_manager.filter(tenant=tenant, student=s, date=query_date).first()  # type: ignore
                     result.append({
                         'student': {
                             'id': s.id,
                             'name': s.name,
                         },
-                        'present': bool(att.present) if att is not None else False,
+                        'present': bool(marked.get(s.id, False)),
                     })
                 return Response(result)
 
-            # Default: return class summary for today
-            classes = Class._default_manager.filter(tenant=tenant)  # type: ignore
-            data = []
+            # Default: return class summary for today, one grouped query over today's attendance only
             today = timezone.now().date()
+            classes = Class._default_manager.filter(tenant=tenant).annotate(  # type: ignore
+                todays_attendance=FilteredRelation(
+                    'student__attendance',
+                    condition=Q(student__attendance__date=today, student__attendance__tenant=tenant),
+                ),
+            ).annotate(
+                total_students=Count('student', filter=Q(student__tenant=tenant), distinct=True),
+                present_today=Count('todays_attendance', filter=Q(todays_attendance__present=True)),
+                absent_today=Count('todays_attendance', filter=Q(todays_attendance__present=False)),
+            )
+            data = []
             for c in classes:
-                total_students = Student._default_manager.filter(tenant=tenant, assigned_class=c).count()  # type: ignore
-                present_today = Attendance._default_manager.filter(tenant=tenant, student__assigned_class=c, date=today, present=True).count()  # type: ignore
-                absent_today = Attendance._default_manager.filter(tenant=tenant, student__assigned_class=c, date=today, present=False).count()  # type: ignore
+                total_students = c.total_students
+                present_today = c.present_today
+                absent_today = c.absent_today
                 data.append({
                     'class_id': c.id,
                     'class_name': c.name,
@@ -3174,7 +3392,7 @@ class AttendanceTrendsView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education'), HasFeaturePermissionFactory('analytics')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         tenant = profile.tenant
         
         # Get attendance data for the last 30 days
@@ -3205,7 +3423,7 @@ class StaffDistributionView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education'), HasFeaturePermissionFactory('analytics')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         tenant = profile.tenant
         
         # Get staff distribution by role
@@ -3239,7 +3457,7 @@ class FeeCollectionView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education'), HasFeaturePermissionFactory('analytics')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)  # type: ignore
+        profile = get_request_profile(request)  # type: ignore
         tenant = profile.tenant
         
         # Get fee collection data for the last 12 months
@@ -3283,7 +3501,7 @@ class ClassPerformanceView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             if not tenant:
                 return Response({'error': 'Tenant not found for user. Please contact support.'}, status=status.HTTP_404_NOT_FOUND)
@@ -3352,7 +3570,7 @@ class FeeStructureExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can export fee structures.'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -3433,7 +3651,7 @@ class FeePaymentExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can export fee payments.'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -3519,7 +3737,7 @@ class FeeDiscountExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can export fee discounts.'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -3600,7 +3818,7 @@ class StudentFeeStatusView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, student_id):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             student = Student._default_manager.get(id=student_id, tenant=profile.tenant)
         except Student.DoesNotExist:
@@ -3617,22 +3835,21 @@ class StudentFeeStatusView(APIView):
             tenant=profile.tenant,
             student=student
         )
+        paid_by_structure = {
+            row['fee_structure']: row
+            for row in payments.values('fee_structure').annotate(
+                paid=Sum('amount_paid'), discount=Sum('discount_amount')
+            ).order_by()
+        }
         
         # Calculate fee status
         fee_status = []
         total_due = 0
         total_paid = 0
-        
         for fee_structure in fee_structures:
-            # Calculate total paid for this fee type
-            paid_amount = payments.filter(fee_structure=fee_structure).aggregate(
-                total=Sum('amount_paid')
-            )['total'] or 0
-            
-            # Calculate discount applied
-            discount_amount = payments.filter(fee_structure=fee_structure).aggregate(
-                total=Sum('discount_amount')
-            )['total'] or 0
+            paid_row = paid_by_structure.get(fee_structure.id, {})
+            paid_amount = paid_row.get('paid') or 0
+            discount_amount = paid_row.get('discount') or 0
             
             remaining_amount = fee_structure.amount - paid_amount
             is_paid = remaining_amount <= 0
@@ -3681,7 +3898,7 @@ class StudentFeePaymentHistoryView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, student_id):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             student = Student._default_manager.get(id=student_id, tenant=profile.tenant)
         except Student.DoesNotExist:
@@ -3713,7 +3930,7 @@ class StudentFeeReminderView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def post(self, request, student_id):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can send fee reminders.'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -3770,7 +3987,7 @@ class ClassFeeSummaryView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
 
     def get(self, request, class_id):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if not profile.role or profile.role.name not in ['admin', 'accountant', 'principal']:
             return Response({'error': 'Only admins, accountants, and principals can view class fee summaries.'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -3797,22 +4014,21 @@ class ClassFeeSummaryView(APIView):
             'students': []
         }
         
+        # One grouped read of the fee ledger for the whole class
+        balances = {
+            row['student']: row
+            for row in StudentFeeBalance._default_manager.filter(
+                tenant=profile.tenant, student__in=students
+            ).values('student').annotate(due=Sum('total_due'), paid=Sum('total_paid')).order_by()
+        }
+        
         total_due = 0
         total_collected = 0
         
         for student in students:
-            # Get fee structures for this class
-            fee_structures = FeeStructure._default_manager.filter(
-                tenant=profile.tenant,
-                class_obj=class_obj
-            )
-            
-            student_total_due = sum(fs.amount for fs in fee_structures)
-            student_payments = FeePayment._default_manager.filter(
-                tenant=profile.tenant,
-                student=student
-            )
-            student_total_paid = student_payments.aggregate(total=Sum('amount_paid'))['total'] or 0
+            balance = balances.get(student.id, {})
+            student_total_due = balance.get('due') or 0
+            student_total_paid = balance.get('paid') or 0
             
             student_remaining = student_total_due - student_total_paid
             student_percentage = (student_total_paid / student_total_due * 100) if student_total_due > 0 else 0
@@ -3848,200 +4064,29 @@ class ComprehensiveAnalyticsView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education'), HasFeaturePermissionFactory('analytics')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         # Allow admin, principal, and teacher to view analytics
         if not profile.role or profile.role.name not in ['admin', 'principal', 'teacher']:
             return Response({'error': 'Only admins, principals, and teachers can view comprehensive analytics.'}, status=status.HTTP_403_FORBIDDEN)
         
-        tenant = profile.tenant
-        today = timezone.now().date()
-        
-        # Basic statistics
-        total_students = Student.objects.filter(tenant=tenant, is_active=True).count()
-        total_classes = Class.objects.filter(tenant=tenant).count()
-        total_teachers = UserProfile.objects.filter(tenant=tenant, role__name='teacher').count()
-        total_staff = UserProfile.objects.filter(tenant=tenant).exclude(role__name='student').count()
-        
-        # Today's attendance
-        staff_present = StaffAttendance.objects.filter(
-            tenant=tenant, date=today, check_in_time__isnull=False
-        ).count()
-        # Count attendance for today
-        student_present = Attendance.objects.filter(
-            tenant=tenant,
-            date=today,
-            present=True
-        ).count()
-        
-        # Fee analytics
-        total_fees_due = FeeStructure.objects.filter(tenant=tenant).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        total_fees_collected = FeePayment.objects.filter(tenant=tenant).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
-        
-        # Class-wise analytics
-        class_analytics = []
-        classes = Class.objects.filter(tenant=tenant)
-        
-        for class_obj in classes:
-            students_in_class = Student.objects.filter(
-                tenant=tenant, assigned_class=class_obj, is_active=True
-            )
-            
-            # Student count
-            student_count = students_in_class.count()
-            
-            # Teachers assigned to this class
-            teachers = UserProfile._default_manager.filter(
-                tenant=tenant, assigned_classes=class_obj, role__name='teacher'
-            )
-            
-            # Fee collection for this class
-            class_fee_structures = FeeStructure._default_manager.filter(
-                tenant=tenant, class_obj=class_obj
-            )
-            class_total_due = class_fee_structures.aggregate(total=Sum('amount'))['total'] or 0
-            
-            class_payments = FeePayment._default_manager.filter(
-                tenant=tenant, student__assigned_class=class_obj
-            )
-            class_collected = class_payments.aggregate(total=Sum('amount_paid'))['total'] or 0
-            
-            # Attendance for this class (Attendance has only 'date', no 'created_at')
-            class_attendance = Attendance.objects.filter(
-                tenant=tenant, student__assigned_class=class_obj, date=today
-            )
-            present_today = class_attendance.filter(present=True).count()
-            absent_today = class_attendance.filter(present=False).count()
-            
-            class_analytics.append({
-                'class_id': class_obj.id,
-                'class_name': class_obj.name,
-                'student_count': student_count,
-                'teachers': [
-                    {
-                        'id': teacher.id,
-                        'name': teacher.user.get_full_name() or teacher.user.username,
-                        'email': teacher.user.email
-                    } for teacher in teachers
-                ],
-                'fee_summary': {
-                    'total_due': float(class_total_due),
-                    'collected': float(class_collected),
-                    'pending': float(class_total_due - class_collected),
-                    'collection_percentage': round((class_collected / class_total_due * 100) if class_total_due > 0 else 0, 2)
-                },
-                'attendance_today': {
-                    'present': present_today,
-                    'absent': absent_today,
-                    'total': present_today + absent_today,
-                    'percentage': round((present_today / (present_today + absent_today) * 100) if (present_today + absent_today) > 0 else 0, 2)
-                }
-            })
-        
-        # Student-wise analytics
-        student_analytics = []
-        students = Student._default_manager.filter(tenant=tenant, is_active=True)[:50]  # Limit for performance
-        
-        for student in students:
-            # Fee status for this student
-            student_fee_structures = FeeStructure._default_manager.filter(
-                tenant=tenant, class_obj=student.assigned_class
-            )
-            student_total_due = student_fee_structures.aggregate(total=Sum('amount'))['total'] or 0
-            
-            student_payments = FeePayment._default_manager.filter(
-                tenant=tenant, student=student
-            )
-            student_paid = student_payments.aggregate(total=Sum('amount_paid'))['total'] or 0
-            
-            # Attendance percentage for this student
-            student_attendance = Attendance._default_manager.filter(
-                tenant=tenant, student=student
-            )
-            total_attendance = student_attendance.count()
-            present_attendance = student_attendance.filter(present=True).count()
-            attendance_percentage = round((present_attendance / total_attendance * 100) if total_attendance > 0 else 0, 2)
-            
-            student_analytics.append({
-                'student_id': student.id,
-                'name': student.name,
-                'upper_id': student.upper_id,
-                'email': student.email,
-                'class_name': student.assigned_class.name if student.assigned_class else 'Not Assigned',
-                'fee_status': {
-                    'total_due': float(student_total_due),
-                    'paid': float(student_paid),
-                    'pending': float(student_total_due - student_paid),
-                    'percentage': round((student_paid / student_total_due * 100) if student_total_due > 0 else 0, 2)
-                },
-                'attendance_percentage': attendance_percentage,
-                'admission_date': student.admission_date
-            })
-        
-        # Teacher-wise analytics
-        teacher_analytics = []
-        teachers = UserProfile._default_manager.filter(tenant=tenant, role__name='teacher')
-        
-        for teacher in teachers:
-            assigned_classes = teacher.assigned_classes.all()
-            students_taught = Student._default_manager.filter(
-                tenant=tenant, assigned_class__in=assigned_classes, is_active=True
-            ).count()
-            
-            # Attendance records created by this teacher
-            attendance_records = Attendance._default_manager.filter(
-                tenant=tenant, student__assigned_class__in=assigned_classes
-            ).count()
-            
-            teacher_analytics.append({
-                'teacher_id': teacher.id,
-                'name': teacher.user.get_full_name() or teacher.user.username,
-                'email': teacher.user.email,
-                'assigned_classes': [cls.name for cls in assigned_classes],
-                'students_taught': students_taught,
-                'attendance_records': attendance_records
-            })
-        
-        # Monthly fee collection trends
-        monthly_fees = []
-        for i in range(12):
-            month_date = today.replace(day=1) - timezone.timedelta(days=30*i)
-            month_start = month_date.replace(day=1)
-            if month_date.month == 12:
-                month_end = month_date.replace(year=month_date.year+1, month=1, day=1) - timezone.timedelta(days=1)
-            else:
-                month_end = month_date.replace(month=month_date.month+1, day=1) - timezone.timedelta(days=1)
-            
-            month_fees = FeePayment._default_manager.filter(
-                tenant=tenant, payment_date__range=(month_start, month_end)
-            ).aggregate(total=Sum('amount_paid'))['total'] or 0
-            
-            monthly_fees.append({
-                'month': month_start.strftime('%Y-%m'),
-                'amount': float(month_fees)
-            })
+        # Grouped queries; the query count does not grow with classes, students or teachers
+        analytics = EducationAnalytics(profile.tenant)
+        fees = analytics.fee_totals()
+        total_fees_due = fees['due']
+        total_fees_collected = fees['collected']
         
         return Response({
             'overview': {
-                'total_students': total_students,
-                'total_classes': total_classes,
-                'total_teachers': total_teachers,
-                'total_staff': total_staff,
-                'staff_present_today': staff_present,
-                'student_present_today': student_present,
+                **analytics.overview(active_students_only=True),
                 'total_fees_due': float(total_fees_due),
                 'total_fees_collected': float(total_fees_collected),
                 'fees_pending': float(total_fees_due - total_fees_collected),
                 'collection_percentage': round((total_fees_collected / total_fees_due * 100) if total_fees_due > 0 else 0, 2)
             },
-            'class_analytics': class_analytics,
-            'student_analytics': student_analytics,
-            'teacher_analytics': teacher_analytics,
-            'monthly_fee_trends': monthly_fees
+            'class_analytics': analytics.class_analytics(),
+            'student_analytics': analytics.student_analytics(limit=50),
+            'teacher_analytics': analytics.teacher_analytics(),
+            'monthly_fee_trends': analytics.monthly_fee_trends()
         })
 
 class EducationAnalyticsView(APIView):
@@ -4051,85 +4096,33 @@ class EducationAnalyticsView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
-            
-            # Get basic statistics
-            total_students = Student._default_manager.filter(tenant=tenant).count()
-            total_classes = Class._default_manager.filter(tenant=tenant).count()
-            total_teachers = UserProfile._default_manager.filter(tenant=tenant, role__name='teacher').count()
-            total_staff = UserProfile._default_manager.filter(tenant=tenant).exclude(role__name='student').count()
-            
-            # Get today's attendance
             today = timezone.now().date()
-            staff_present = StaffAttendance._default_manager.filter(
-                tenant=tenant, 
-                date=today, 
-                check_in_time__isnull=False
-            ).count()
-            
-            student_present = Attendance._default_manager.filter(
-                tenant=tenant, 
-                date=today, 
-                present=True
-            ).count()
-            
-            # Get fee collection stats
-            total_fees_collected = FeePayment._default_manager.filter(tenant=tenant).aggregate(
-                total=Sum('amount_paid')
-            )['total'] or 0
-            
-            # Get recent activity (last 7 days)
-            week_ago = timezone.now() - timezone.timedelta(days=7)
-            recent_admissions = Student._default_manager.filter(
-                tenant=tenant,
-                admission_date__gte=week_ago.date()
-            ).count()
-            
-            recent_fee_payments = FeePayment._default_manager.filter(
-                tenant=tenant,
-                payment_date__gte=week_ago.date()
-            ).count()
+            analytics = EducationAnalytics(tenant, today=today)
+            overview = analytics.overview()
+            fees = analytics.fee_totals()
+            gender_distribution, students_per_class, cast_distribution = analytics.class_distributions()
             
-            # Gender distribution per class
-            gender_distribution = []
-            classes = Class._default_manager.filter(tenant=tenant)
-            for class_obj in classes:
-                students = Student._default_manager.filter(tenant=tenant, assigned_class=class_obj, is_active=True)
-                male_count = students.filter(gender='Male').count()
-                female_count = students.filter(gender='Female').count()
-                other_count = students.filter(gender='Other').count()
-                total = students.count()
-                
-                gender_distribution.append({
-                    'class_id': class_obj.id,
-                    'class_name': class_obj.name,
-                    'male': male_count,
-                    'female': female_count,
-                    'other': other_count,
-                    'total': total
-                })
-            
-            # Upcoming birthdays (today)
-            today_month = today.month
-            today_day = today.day
+            # Birthdays today
             upcoming_birthdays = []
-            students = Student._default_manager.filter(tenant=tenant, is_active=True, date_of_birth__isnull=False)
+            students = Student._default_manager.filter(
+                tenant=tenant, is_active=True,
+                date_of_birth__month=today.month, date_of_birth__day=today.day
+            ).select_related('assigned_class')
             for student in students:
-                if student.date_of_birth:
-                    if student.date_of_birth.month == today_month and student.date_of_birth.day == today_day:
-                        upcoming_birthdays.append({
-                            'student_id': student.id,
-                            'student_name': student.name,
-                            'upper_id': student.upper_id,
-                            'class_name': student.assigned_class.name if student.assigned_class else 'Not Assigned',
-                            'birthday': student.date_of_birth.strftime('%Y-%m-%d'),
-                            'age': today.year - student.date_of_birth.year
-                        })
+                upcoming_birthdays.append({
+                    'student_id': student.id,
+                    'student_name': student.name,
+                    'upper_id': student.upper_id,
+                    'class_name': student.assigned_class.name if student.assigned_class else 'Not Assigned',
+                    'birthday': student.date_of_birth.strftime('%Y-%m-%d'),
+                    'age': today.year - student.date_of_birth.year
+                })
             
             # Student contact information with parent contacts
             student_contacts = []
-            all_students = Student._default_manager.filter(tenant=tenant, is_active=True)
+            all_students = Student._default_manager.filter(tenant=tenant, is_active=True).select_related('assigned_class')
             for student in all_students:
                 student_contacts.append({
                     'student_id': student.id,
@@ -4142,56 +4135,17 @@ class EducationAnalyticsView(APIView):
                     'email': student.email or ''
                 })
             
-            # Students per class with gender breakdown
-            students_per_class = []
-            for class_obj in classes:
-                students = Student._default_manager.filter(tenant=tenant, assigned_class=class_obj, is_active=True)
-                total_count = students.count()
-                male_count = students.filter(gender='Male').count()
-                female_count = students.filter(gender='Female').count()
-                other_count = students.filter(gender='Other').count()
-                students_per_class.append({
-                    'class_name': class_obj.name,
-                    'count': total_count,
-                    'total': total_count,
-                    'male': male_count,
-                    'female': female_count,
-                    'other': other_count
-                })
-            
-            # Cast distribution per class
-            cast_distribution = []
-            for class_obj in classes:
-                students = Student._default_manager.filter(tenant=tenant, assigned_class=class_obj, is_active=True)
-                general_count = students.filter(cast='General').count()
-                obc_count = students.filter(cast='OBC').count()
-                sc_count = students.filter(cast='SC').count()
-                st_count = students.filter(cast='ST').count()
-                other_cast_count = students.filter(cast='Other').count()
-                total_count = students.count()
-                
-                cast_distribution.append({
-                    'class_id': class_obj.id,
-                    'class_name': class_obj.name,
-                    'general': general_count,
-                    'obc': obc_count,
-                    'sc': sc_count,
-                    'st': st_count,
-                    'other': other_cast_count,
-                    'total': total_count
-                })
-            
             data = {
                 'overview': {
-                    'total_students': total_students,
-                    'total_teachers': total_teachers,
-                    'total_classes': total_classes,
-                    'total_staff': total_staff,
-                    'staff_present_today': staff_present,
-                    'student_present_today': student_present,
-                    'total_fees_collected': float(total_fees_collected),
-                    'recent_admissions': recent_admissions,
-                    'recent_fee_payments': recent_fee_payments
+                    'total_students': overview['total_students'],
+                    'total_teachers': overview['total_teachers'],
+                    'total_classes': overview['total_classes'],
+                    'total_staff': overview['total_staff'],
+                    'staff_present_today': overview['staff_present_today'],
+                    'student_present_today': overview['student_present_today'],
+                    'total_fees_collected': float(fees['collected']),
+                    'recent_admissions': analytics.student_totals()['recent_admissions'],
+                    'recent_fee_payments': fees['recent_payments']
                 },
                 'gender_distribution_per_class': gender_distribution,
                 'cast_distribution_per_class': cast_distribution,
@@ -4225,7 +4179,7 @@ class OldBalanceListCreateView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def get(self, request):
         """Get old balances - filtered by academic year, class, or student"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         balances = OldBalance._default_manager.filter(tenant=profile.tenant)
         
         # Filters
@@ -4249,7 +4203,7 @@ class OldBalanceListCreateView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def post(self, request):
         """Create old balance entry"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         
@@ -4267,7 +4221,7 @@ class OldBalanceDetailView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def get(self, request, pk):
         """Get single old balance"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             balance = OldBalance._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = OldBalanceSerializer(balance)
@@ -4278,7 +4232,7 @@ class OldBalanceDetailView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def put(self, request, pk):
         """Update old balance (e.g., mark as settled)"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             balance = OldBalance._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = OldBalanceSerializer(balance, data=request.data, partial=True)
@@ -4292,7 +4246,7 @@ class OldBalanceDetailView(APIView):
     @role_required('admin', 'principal')
     def delete(self, request, pk):
         """Delete old balance"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             balance = OldBalance._default_manager.get(id=pk, tenant=profile.tenant)
             balance.delete()
@@ -4308,7 +4262,7 @@ class CarryForwardBalancesView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def post(self, request):
         """Carry forward outstanding balances from old academic year to new one"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         from_academic_year = request.data.get('from_academic_year')
         to_academic_year = request.data.get('to_academic_year')
         class_filter = request.data.get('class_name')  # Optional: filter by class
@@ -4366,7 +4320,7 @@ class BalanceAdjustmentListCreateView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def get(self, request):
         """Get balance adjustments"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         adjustments = BalanceAdjustment._default_manager.filter(tenant=profile.tenant)
         
         # Filters
@@ -4387,7 +4341,7 @@ class BalanceAdjustmentListCreateView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def post(self, request):
         """Create balance adjustment"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         data['created_by'] = profile.id
@@ -4406,62 +4360,40 @@ class OldBalanceSummaryView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def get(self, request):
         """Get class-wise and academic year-wise old balance summary"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         
-        # Get all old balances
+        # Grouped totals instead of walking every balance row
         balances = OldBalance._default_manager.filter(tenant=profile.tenant, is_settled=False)
+        rows = list(balances.values('academic_year', 'class_name').annotate(
+            amount=Sum('balance_amount'), count=Count('id'), students=Count('student', distinct=True)
+        ).order_by())
         
         # Summary by academic year
-        from django.db.models import Sum
         year_summary = {}
-        student_years = {}  # Track unique students per year
-        
-        for balance in balances:
-            year = balance.academic_year
-            if year not in year_summary:
-                year_summary[year] = {'total_amount': 0, 'student_count': 0, 'class_breakdown': {}}
-                student_years[year] = set()
-            
-            year_summary[year]['total_amount'] += float(balance.balance_amount)
-            student_years[year].add(balance.student.id)
-            
-            class_name = balance.class_name
-            if class_name not in year_summary[year]['class_breakdown']:
-                year_summary[year]['class_breakdown'][class_name] = {'amount': 0, 'count': 0}
-            year_summary[year]['class_breakdown'][class_name]['amount'] += float(balance.balance_amount)
-            year_summary[year]['class_breakdown'][class_name]['count'] += 1
-        
-        # Set student counts
-        for year in year_summary:
-            year_summary[year]['student_count'] = len(student_years[year])
+        for row in rows:
+            year = row['academic_year']
+            summary = year_summary.setdefault(year, {'total_amount': 0, 'student_count': 0, 'class_breakdown': {}})
+            summary['total_amount'] += float(row['amount'])
+            summary['class_breakdown'][row['class_name']] = {'amount': float(row['amount']), 'count': row['count']}
+        for row in balances.values('academic_year').annotate(students=Count('student', distinct=True)).order_by():
+            year_summary[row['academic_year']]['student_count'] = row['students']
         
         # Summary by class (current outstanding)
         class_summary = {}
-        class_students = {}  # Track unique students per class
-        
-        for balance in balances:
-            class_name = balance.class_name or 'Unknown'
-            if class_name not in class_summary:
-                class_summary[class_name] = {'total_amount': 0, 'student_count': 0, 'years': {}}
-                class_students[class_name] = set()
-            
-            class_summary[class_name]['total_amount'] += float(balance.balance_amount)
-            class_students[class_name].add(balance.student.id)
-            year = balance.academic_year
-            if year not in class_summary[class_name]['years']:
-                class_summary[class_name]['years'][year] = float(balance.balance_amount)
-            else:
-                class_summary[class_name]['years'][year] += float(balance.balance_amount)
-        
-        # Set student counts
-        for class_name in class_summary:
-            class_summary[class_name]['student_count'] = len(class_students[class_name])
-        
+        for row in rows:
+            class_name = row['class_name'] or 'Unknown'
+            summary = class_summary.setdefault(class_name, {'total_amount': 0, 'student_count': 0, 'years': {}})
+            summary['total_amount'] += float(row['amount'])
+            summary['years'][row['academic_year']] = summary['years'].get(row['academic_year'], 0) + float(row['amount'])
+        for row in balances.values('class_name').annotate(students=Count('student', distinct=True)).order_by():
+            class_summary[row['class_name'] or 'Unknown']['student_count'] += row['students']
+        
+        totals = balances.aggregate(total=Sum('balance_amount'), students=Count('student', distinct=True))
         return Response({
             'by_academic_year': year_summary,
             'by_class': class_summary,
-            'total_outstanding': sum(float(b.balance_amount) for b in balances),
-            'total_students_with_balance': len(set(b.student.id for b in balances))
+            'total_outstanding': float(totals['total'] or 0),
+            'total_students_with_balance': totals['students']
         })
 
 class BulkClassPromotionView(APIView):
@@ -4484,10 +4416,16 @@ class BulkClassPromotionView(APIView):
             "promote_all": false,  # If true, promote all students regardless of eligibility
             "student_ids": [1, 2, 3],  # Optional: Specific student IDs to promote
             "exclude_student_ids": [4, 5],  # Optional: Student IDs to exclude from promotion
-            "notes": "Annual promotion 2025"  # Optional notes
+            "notes": "Annual promotion 2025",  # Optional notes
+            "dry_run": false  # Optional: preview the moves without changing anything (or ?dry_run=1)
         }
+        
+        Students already promoted between the two academic years are skipped,
+        so a promotion that stopped part-way can simply be sent again.
+        Promotions above PROMOTION_SYNC_LIMIT students (or with ?async=1)
+        run on a job worker and return 202 with the job's status URL.
         """
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data
         
         from_class_id = data.get('from_class_id')
@@ -4499,6 +4437,7 @@ class BulkClassPromotionView(APIView):
         student_ids = data.get('student_ids', [])
         exclude_student_ids = data.get('exclude_student_ids', [])
         notes = data.get('notes', '')
+        dry_run = str(data.get('dry_run', request.query_params.get('dry_run', ''))).lower() in ('1', 'true')
         
         # Validate required fields
         if not from_academic_year_id or not to_academic_year_id:
@@ -4549,6 +4488,13 @@ class BulkClassPromotionView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
         
+        to_class = None
+        if to_class_id:
+            try:
+                to_class = Class._default_manager.get(id=to_class_id, tenant=profile.tenant)
+            except Class.DoesNotExist:
+                return Response({'error': 'To class not found'}, status=status.HTTP_404_NOT_FOUND)
+        
         # Filter by specific student IDs if provided
         if student_ids:
             students_query = students_query.filter(id__in=student_ids)
@@ -4557,95 +4503,54 @@ class BulkClassPromotionView(APIView):
         if exclude_student_ids:
             students_query = students_query.exclude(id__in=exclude_student_ids)
         
-        students = list(students_query)
-        
-        if not students:
-            return Response(
-                {'error': 'No students found to promote'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Process promotions
-        promoted_students = []
-        skipped_students = []
-        errors = []
-        
-        for student in students:
-            try:
-                current_class = student.assigned_class
-                
-                # Determine next class
-                if to_class_id:
-                    try:
-                        next_class = Class._default_manager.get(id=to_class_id, tenant=profile.tenant)
-                    except Class.DoesNotExist:
-                        errors.append({
-                            'student_id': student.id,
-                            'student_name': student.name,
-                            'error': 'To class not found'
-                        })
-                        continue
-                elif current_class:
-                    next_class = current_class.get_next_class()
-                    if not next_class:
-                        skipped_students.append({
-                            'student_id': student.id,
-                            'student_name': student.name,
-                            'reason': f'No next class available for {current_class.name}'
-                        })
-                        continue
-                else:
-                    skipped_students.append({
-                        'student_id': student.id,
-                        'student_name': student.name,
-                        'reason': 'Student has no assigned class'
-                    })
-                    continue
-                
-                # Create promotion record
-                promotion, created = StudentPromotion._default_manager.get_or_create(
-                    tenant=profile.tenant,
-                    student=student,
-                    from_academic_year=from_academic_year,
-                    to_academic_year=to_academic_year,
-                    defaults={
-                        'from_class': current_class,
-                        'to_class': next_class,
-                        'promotion_type': 'PROMOTED',
-                        'promotion_date': promotion_date_obj,
-                        'notes': notes,
-                        'promoted_by': profile
-                    }
+        try:
+            plan = plan_promotion(profile.tenant, students_query, from_academic_year, to_academic_year, to_class)
+            if not plan['moves'] and not plan['skipped'] and not plan['already_promoted']:
+                return Response(
+                    {'error': 'No students found to promote'}, 
+                    status=status.HTTP_400_BAD_REQUEST
                 )
-                
-                # Update student's assigned class
-                student.assigned_class = next_class
-                student.save()
-                
-                promoted_students.append({
-                    'student_id': student.id,
-                    'student_name': student.name,
-                    'from_class': current_class.name if current_class else None,
-                    'to_class': next_class.name,
-                    'promotion_id': promotion.id
-                })
-                
-            except Exception as e:
-                errors.append({
-                    'student_id': student.id,
-                    'student_name': student.name,
-                    'error': str(e)
-                })
-        
-        return Response({
-            'message': f'Promoted {len(promoted_students)} students successfully',
-            'promoted_count': len(promoted_students),
-            'skipped_count': len(skipped_students),
-            'error_count': len(errors),
-            'promoted_students': promoted_students,
-            'skipped_students': skipped_students,
-            'errors': errors
-        }, status=status.HTTP_200_OK)
+            
+            if dry_run:
+                names = plan['class_names']
+                return Response({
+                    'dry_run': True,
+                    'promoted_count': len(plan['moves']),
+                    'skipped_count': len(plan['skipped']),
+                    'already_promoted_count': plan['already_promoted'],
+                    'moves': plan_summary(plan),
+                    'promoted_students': [
+                        {'student_id': student_id, 'student_name': name,
+                         'from_class': names.get(from_id), 'to_class': names.get(to_id)}
+                        for student_id, name, from_id, to_id in plan['moves']
+                    ],
+                    'skipped_students': plan['skipped'],
+                }, status=status.HTTP_200_OK)
+            
+            sync_limit = getattr(settings, 'PROMOTION_SYNC_LIMIT', 200)
+            if request.query_params.get('async') in ('1', 'true') or len(plan['moves']) > sync_limit:
+                job = enqueue('api.tasks.promote_students', {
+                    'student_ids': [student_id for student_id, _, _, _ in plan['moves']],
+                    'from_academic_year_id': from_academic_year.id,
+                    'to_academic_year_id': to_academic_year.id,
+                    'to_class_id': to_class.id if to_class else None,
+                    'promotion_date': promotion_date_obj.isoformat(),
+                    'notes': notes,
+                }, tenant=profile.tenant, created_by=profile)
+                return Response({
+                    'message': 'Promotion queued',
+                    'students': len(plan['moves']),
+                    'skipped_count': len(plan['skipped']),
+                    'job_id': job.id,
+                    'status_url': reverse('job-detail', args=[job.id]),
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            result = run_promotion(profile.tenant, plan, from_academic_year, to_academic_year,
+                                   promotion_date_obj, notes=notes, promoted_by=profile)
+            return Response(result, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error in BulkClassPromotionView: {str(e)}", exc_info=True)
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class ClassPromotionHistoryView(APIView):
     """View promotion history for a student or class"""
@@ -4661,7 +4566,7 @@ class ClassPromotionHistoryView(APIView):
         - class_id: Filter by class ID
         - academic_year_id: Filter by academic year
         """
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         
         promotions = StudentPromotion._default_manager.filter(tenant=profile.tenant)
         
@@ -4716,7 +4621,7 @@ class TransferCertificateListCreateView(APIView):
     def get(self, request):
         """List all TCs with filtering"""
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tcs = TransferCertificate._default_manager.filter(tenant=profile.tenant)
             
             # Filtering
@@ -4747,7 +4652,7 @@ class TransferCertificateListCreateView(APIView):
     def post(self, request):
         """Create a new Transfer Certificate"""
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             data = request.data.copy()
             data['tenant'] = profile.tenant.id
         
@@ -4798,7 +4703,7 @@ class TransferCertificateDetailView(APIView):
     def get(self, request, pk):
         """Get a specific TC"""
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             try:
                 tc = TransferCertificate._default_manager.get(id=pk, tenant=profile.tenant)
                 serializer = TransferCertificateSerializer(tc)
@@ -4816,7 +4721,7 @@ class TransferCertificateDetailView(APIView):
     def put(self, request, pk):
         """Update a TC"""
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             try:
                 tc = TransferCertificate._default_manager.get(id=pk, tenant=profile.tenant)
                 serializer = TransferCertificateSerializer(tc, data=request.data, partial=True)
@@ -4837,7 +4742,7 @@ class TransferCertificateDetailView(APIView):
     def patch(self, request, pk):
         """Update a TC (partial update)"""
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             try:
                 tc = TransferCertificate._default_manager.get(id=pk, tenant=profile.tenant)
                 serializer = TransferCertificateSerializer(tc, data=request.data, partial=True)
@@ -4858,7 +4763,7 @@ class TransferCertificateDetailView(APIView):
     def delete(self, request, pk):
         """Delete a TC"""
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             try:
                 tc = TransferCertificate._default_manager.get(id=pk, tenant=profile.tenant)
                 tc.delete()
@@ -4882,9 +4787,11 @@ class TransferCertificatePDFView(APIView):
     def get(self, request, pk):
         """Generate standard TC PDF"""
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             try:
-                tc = TransferCertificate._default_manager.get(id=pk, tenant=profile.tenant)
+                tc = TransferCertificate._default_manager.select_related(
+                    'academic_year', 'class_obj', 'issued_by__user', 'approved_by__user'
+                ).get(id=pk, tenant=profile.tenant)
             except TransferCertificate.DoesNotExist:
                 return Response({'error': 'Transfer Certificate not found.'}, status=status.HTTP_404_NOT_FOUND)
         except UserProfile.DoesNotExist:
@@ -4895,374 +4802,369 @@ class TransferCertificatePDFView(APIView):
             return Response({'error': f'An error occurred: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         try:
-            from reportlab.lib.pagesizes import A4
-            from reportlab.pdfgen import canvas
-            from reportlab.lib import colors
-            from reportlab.lib.units import mm
-            from io import BytesIO
-            
-            buffer = BytesIO()
-            p = canvas.Canvas(buffer, pagesize=A4)
-            width, height = A4
-            
-            # Get tenant/school info
             tenant = profile.tenant
-            school_name = getattr(tenant, 'name', '') or 'School'
+            contact = school_contact(tenant)
+            signatories = [tc.issued_by, tc.issued_by.user if tc.issued_by else None,
+                           tc.approved_by, tc.approved_by.user if tc.approved_by else None]
+            return cached_pdf_response(
+                request, 'transfer_certificate', tc,
+                [tc, tc.academic_year, tc.class_obj, signatories, tenant.name, tenant.logo.name, contact],
+                lambda: self.render_pdf(tc, tenant, contact),
+                f"transfer_certificate_{tc.tc_number}_{tc.id}.pdf",
+            )
             
-            # Get school contact information from admin user profile
-            school_address = ''
-            school_phone = ''
-            school_email = ''
+        except ImportError as e:
+            logger.error(f"PDF generation import error: {str(e)}", exc_info=True)
+            return Response({
+                'error': 'PDF generation library not installed.',
+                'details': 'Install required packages: pip install reportlab Pillow'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except Exception as e:
+            logger.error(f"Error generating TC PDF: {str(e)}", exc_info=True)
+            return Response({
+                'error': f'TC PDF generation failed: {str(e)}',
+                'details': 'Check server logs for more information.'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def render_pdf(self, tc, tenant, contact):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        from reportlab.lib import colors
+        from reportlab.lib.units import mm
+        from io import BytesIO
+        
+        buffer = BytesIO()
+        p = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        
+        school_name = getattr(tenant, 'name', '') or 'School'
+        
+        school_address = contact['address']
+        school_phone = contact['phone']
+        school_email = contact['email']
+        
+        # OPTION: Remove logo completely for cleaner PDFs (or keep it small)
+        REMOVE_LOGO = True  # Set to True to remove logos completely
+        
+        logo_drawn = False
+        FIXED_TEXT_START_X = 25 * mm  # Text starts at left margin (no logo space needed)
+        logo_y_top = height - 25 * mm
+        
+        if not REMOVE_LOGO and tenant.logo:
             try:
-                admin_profile = UserProfile._default_manager.filter(
-                    tenant=tenant, 
-                    role__name='admin'
-                ).first()
-                if admin_profile:
-                    school_address = admin_profile.address or ''
-                    school_phone = admin_profile.phone or ''
-                    school_email = admin_profile.user.email if admin_profile.user else ''
-            except Exception:
-                pass
-            
-            # OPTION: Remove logo completely for cleaner PDFs (or keep it small)
-            REMOVE_LOGO = True  # Set to True to remove logos completely
-            
-            logo_drawn = False
-            FIXED_TEXT_START_X = 25 * mm  # Text starts at left margin (no logo space needed)
-            logo_y_top = height - 25 * mm
-            
-            if not REMOVE_LOGO and tenant.logo:
-                try:
-                    from PIL import Image
-                    import os
-                    logo_path = tenant.logo.path
-                    if os.path.exists(logo_path):
-                        img = Image.open(logo_path)
-                        # Very small logo: max 15mm to avoid text overlap
-                        max_height = 15 * mm
-                        max_width = 15 * mm
-                        img_width, img_height = img.size
-                        scale = min(max_height / img_height, max_width / img_width, 1.0)
-                        new_width = int(img_width * scale)
-                        new_height = int(img_height * scale)
-                        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        from reportlab.lib.utils import ImageReader
-                        logo_reader = ImageReader(img)
-                        # Logo at top-left corner, very small
-                        logo_x = 25 * mm
-                        logo_y = logo_y_top - new_height
-                        p.drawImage(logo_reader, logo_x, logo_y, width=new_width, height=new_height, preserveAspectRatio=True, mask='auto')
-                        logo_drawn = True
-                        # Adjust text start if logo is drawn
-                        FIXED_TEXT_START_X = logo_x + new_width + 5 * mm
-                except Exception as e:
-                    logger.warning(f"Could not load tenant logo: {e}")
-            
-            # Text always starts at FIXED position
-            p.setFillColor(colors.black)
-            text_x = FIXED_TEXT_START_X  # Fixed position for text
-            p.setFont('Helvetica-Bold', 18)
-            school_y = logo_y_top
-            p.drawString(text_x, school_y, school_name.upper())
-            
-            # School contact info
-            info_y = school_y - 16
-            p.setFont('Helvetica', 9)
-            if school_address:
-                max_addr_width = width - text_x - 25 * mm
-                if p.stringWidth(school_address, 'Helvetica', 9) > max_addr_width:
-                    addr_lines = [school_address[i:i+50] for i in range(0, min(len(school_address), 100), 50)]
-                    for line in addr_lines[:2]:
-                        p.drawString(text_x, info_y, line)
-                        info_y -= 11
-                else:
-                    p.drawString(text_x, info_y, school_address)
+                from PIL import Image
+                import os
+                logo_path = tenant.logo.path
+                if os.path.exists(logo_path):
+                    img = Image.open(logo_path)
+                    # Very small logo: max 15mm to avoid text overlap
+                    max_height = 15 * mm
+                    max_width = 15 * mm
+                    img_width, img_height = img.size
+                    scale = min(max_height / img_height, max_width / img_width, 1.0)
+                    new_width = int(img_width * scale)
+                    new_height = int(img_height * scale)
+                    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                    if img.mode != 'RGB':
+                        img = img.convert('RGB')
+                    from reportlab.lib.utils import ImageReader
+                    logo_reader = ImageReader(img)
+                    # Logo at top-left corner, very small
+                    logo_x = 25 * mm
+                    logo_y = logo_y_top - new_height
+                    p.drawImage(logo_reader, logo_x, logo_y, width=new_width, height=new_height, preserveAspectRatio=True, mask='auto')
+                    logo_drawn = True
+                    # Adjust text start if logo is drawn
+                    FIXED_TEXT_START_X = logo_x + new_width + 5 * mm
+            except Exception as e:
+                logger.warning(f"Could not load tenant logo: {e}")
+        
+        # Text always starts at FIXED position
+        p.setFillColor(colors.black)
+        text_x = FIXED_TEXT_START_X  # Fixed position for text
+        p.setFont('Helvetica-Bold', 18)
+        school_y = logo_y_top
+        p.drawString(text_x, school_y, school_name.upper())
+        
+        # School contact info
+        info_y = school_y - 16
+        p.setFont('Helvetica', 9)
+        if school_address:
+            max_addr_width = width - text_x - 25 * mm
+            if p.stringWidth(school_address, 'Helvetica', 9) > max_addr_width:
+                addr_lines = [school_address[i:i+50] for i in range(0, min(len(school_address), 100), 50)]
+                for line in addr_lines[:2]:
+                    p.drawString(text_x, info_y, line)
                     info_y -= 11
-            if school_phone:
-                p.drawString(text_x, info_y, f"Phone: {school_phone}")
-                info_y -= 11
-            if school_email:
-                p.drawString(text_x, info_y, f"Email: {school_email}")
+            else:
+                p.drawString(text_x, info_y, school_address)
                 info_y -= 11
-            
-            # Document title
-            info_y -= 5
-            p.setFont('Helvetica-Bold', 14)
-            p.drawString(text_x, info_y, 'TRANSFER CERTIFICATE')
-            # Move body start below header to avoid overlap when contact info spans multiple lines
-            info_y -= 18
-            header_bottom_y = info_y
-            default_body_start = height - 110
-            # Choose the lower point (smaller y) to ensure content starts below the header
-            y = min(default_body_start, header_bottom_y)
-            # Enforce a minimum top buffer to keep the border visible
-            y = max(y, height - 140)
-            
-            # TC Number and Date
-            p.setFont('Helvetica-Bold', 12)
-            p.drawString(25 * mm, y, f'TC Number: {tc.tc_number}')
-            p.setFont('Helvetica', 12)
-            issue_date_str = tc.issue_date.strftime('%d/%m/%Y') if tc.issue_date else 'N/A'
-            p.drawRightString(width - 25 * mm, y, f'Date: {issue_date_str}')
-            y -= 25
-            
-            # Border box for TC content
-            content_y_start = y
-            content_height = 40 * mm
-            p.setStrokeColor(colors.black)
-            p.setLineWidth(1.5)
-            p.rect(20 * mm, content_height, width - 40 * mm, content_y_start - content_height, stroke=1, fill=0)
-            
-            y -= 15
-            
-            # Student Information Section
-            p.setFont('Helvetica-Bold', 12)
-            p.drawString(25 * mm, y, 'STUDENT INFORMATION')
-            y -= 20
-            
-            # IMPROVED: Student details with proper alignment - consistent spacing
-            # Two-column layout: labels on left, values aligned consistently
-            label_x = 25 * mm
-            value_x = 95 * mm
-            value_max_width = width - value_x - 25 * mm
-            
-            details = [
-                ('Student Name:', tc.student_name or 'N/A'),
-                ('Date of Birth:', tc.date_of_birth.strftime('%d/%m/%Y') if tc.date_of_birth else 'N/A'),
-                ('Admission Number:', tc.admission_number or 'N/A'),
-                ('Admission Date:', tc.admission_date.strftime('%d/%m/%Y') if tc.admission_date else 'N/A'),
-                ('Class:', tc.class_obj.name if tc.class_obj else 'N/A'),
-                ('Academic Year:', tc.academic_year.name if tc.academic_year else 'N/A'),
-                ('Last Class Promoted:', tc.last_class_promoted or 'N/A'),
-            ]
-            
-            p.setFont('Helvetica-Bold', 10)
-            for label, value in details:
-                if y < content_height + 20:
-                    p.showPage()
-                    y = height - 40
-                # Draw label
-                p.drawString(label_x, y, label)
-                p.setFont('Helvetica', 10)
-                # IMPROVED: Truncate value if too long - ensure it fits within boundaries
-                value_str = str(value)
-                value_width = p.stringWidth(value_str, 'Helvetica', 10)
-                if value_width > value_max_width:
-                    # Binary search for optimal truncation
-                    low, high = 0, len(value_str)
-                    while low < high:
-                        mid = (low + high + 1) // 2
-                        test_str = value_str[:mid]
-                        # Account for ellipsis width
-                        if p.stringWidth(test_str, 'Helvetica', 10) + p.stringWidth('...', 'Helvetica', 10) <= value_max_width:
-                            low = mid
-                        else:
-                            high = mid - 1
-                    value_str = value_str[:low] + '...' if low < len(value_str) else value_str[:low]
-                    # Final safety check
-                    if p.stringWidth(value_str, 'Helvetica', 10) > value_max_width:
-                        value_str = value_str[:max(0, len(value_str) - 3)] + '...'
-                # Ensure value doesn't exceed right margin
-                final_value_x = value_x
-                # Validate it fits within page boundaries
-                if p.stringWidth(value_str, 'Helvetica', 10) + final_value_x > width - 25 * mm:
-                    # Adjust if needed
-                    final_value_x = max(value_x, width - 25 * mm - p.stringWidth(value_str, 'Helvetica', 10))
-                p.drawString(final_value_x, y, value_str)
-                y -= 15
-                p.setFont('Helvetica-Bold', 10)
-            
-            y -= 10
-            
-            # Fees and Dues Section
-            if y < content_height + 30:
+        if school_phone:
+            p.drawString(text_x, info_y, f"Phone: {school_phone}")
+            info_y -= 11
+        if school_email:
+            p.drawString(text_x, info_y, f"Email: {school_email}")
+            info_y -= 11
+        
+        # Document title
+        info_y -= 5
+        p.setFont('Helvetica-Bold', 14)
+        p.drawString(text_x, info_y, 'TRANSFER CERTIFICATE')
+        # Move body start below header to avoid overlap when contact info spans multiple lines
+        info_y -= 18
+        header_bottom_y = info_y
+        default_body_start = height - 110
+        # Choose the lower point (smaller y) to ensure content starts below the header
+        y = min(default_body_start, header_bottom_y)
+        # Enforce a minimum top buffer to keep the border visible
+        y = max(y, height - 140)
+        
+        # TC Number and Date
+        p.setFont('Helvetica-Bold', 12)
+        p.drawString(25 * mm, y, f'TC Number: {tc.tc_number}')
+        p.setFont('Helvetica', 12)
+        issue_date_str = tc.issue_date.strftime('%d/%m/%Y') if tc.issue_date else 'N/A'
+        p.drawRightString(width - 25 * mm, y, f'Date: {issue_date_str}')
+        y -= 25
+        
+        # Border box for TC content
+        content_y_start = y
+        content_height = 40 * mm
+        p.setStrokeColor(colors.black)
+        p.setLineWidth(1.5)
+        p.rect(20 * mm, content_height, width - 40 * mm, content_y_start - content_height, stroke=1, fill=0)
+        
+        y -= 15
+        
+        # Student Information Section
+        p.setFont('Helvetica-Bold', 12)
+        p.drawString(25 * mm, y, 'STUDENT INFORMATION')
+        y -= 20
+        
+        # IMPROVED: Student details with proper alignment - consistent spacing
+        # Two-column layout: labels on left, values aligned consistently
+        label_x = 25 * mm
+        value_x = 95 * mm
+        value_max_width = width - value_x - 25 * mm
+        
+        details = [
+            ('Student Name:', tc.student_name or 'N/A'),
+            ('Date of Birth:', tc.date_of_birth.strftime('%d/%m/%Y') if tc.date_of_birth else 'N/A'),
+            ('Admission Number:', tc.admission_number or 'N/A'),
+            ('Admission Date:', tc.admission_date.strftime('%d/%m/%Y') if tc.admission_date else 'N/A'),
+            ('Class:', tc.class_obj.name if tc.class_obj else 'N/A'),
+            ('Academic Year:', tc.academic_year.name if tc.academic_year else 'N/A'),
+            ('Last Class Promoted:', tc.last_class_promoted or 'N/A'),
+        ]
+        
+        p.setFont('Helvetica-Bold', 10)
+        for label, value in details:
+            if y < content_height + 20:
                 p.showPage()
                 y = height - 40
-            
+            # Draw label
+            p.drawString(label_x, y, label)
+            p.setFont('Helvetica', 10)
+            # IMPROVED: Truncate value if too long - ensure it fits within boundaries
+            value_str = str(value)
+            value_width = p.stringWidth(value_str, 'Helvetica', 10)
+            if value_width > value_max_width:
+                # Binary search for optimal truncation
+                low, high = 0, len(value_str)
+                while low < high:
+                    mid = (low + high + 1) // 2
+                    test_str = value_str[:mid]
+                    # Account for ellipsis width
+                    if p.stringWidth(test_str, 'Helvetica', 10) + p.stringWidth('...', 'Helvetica', 10) <= value_max_width:
+                        low = mid
+                    else:
+                        high = mid - 1
+                value_str = value_str[:low] + '...' if low < len(value_str) else value_str[:low]
+                # Final safety check
+                if p.stringWidth(value_str, 'Helvetica', 10) > value_max_width:
+                    value_str = value_str[:max(0, len(value_str) - 3)] + '...'
+            # Ensure value doesn't exceed right margin
+            final_value_x = value_x
+            # Validate it fits within page boundaries
+            if p.stringWidth(value_str, 'Helvetica', 10) + final_value_x > width - 25 * mm:
+                # Adjust if needed
+                final_value_x = max(value_x, width - 25 * mm - p.stringWidth(value_str, 'Helvetica', 10))
+            p.drawString(final_value_x, y, value_str)
+            y -= 15
+            p.setFont('Helvetica-Bold', 10)
+        
+        y -= 10
+        
+        # Fees and Dues Section
+        if y < content_height + 30:
+            p.showPage()
+            y = height - 40
+        
+        p.setFont('Helvetica-Bold', 12)
+        p.drawString(25 * mm, y, 'FEES & DUES')
+        y -= 20
+        
+        # IMPROVED: Consistent alignment for fees & dues
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(25 * mm, y, 'All Dues Cleared:')
+        p.setFont('Helvetica', 10)
+        dues_status = 'Yes' if tc.dues_paid else 'No'
+        # Ensure value aligns consistently with other fields
+        p.drawString(95 * mm, y, dues_status)
+        y -= 15
+        
+        if tc.dues_details:
+            p.setFont('Helvetica-Bold', 10)
+            p.drawString(25 * mm, y, 'Dues Details:')
+            y -= 12
+            p.setFont('Helvetica', 9)
+            dues_lines = [tc.dues_details[i:i+80] for i in range(0, min(len(tc.dues_details), 240), 80)]
+            for line in dues_lines[:3]:
+                if y < content_height + 15:
+                    break
+                p.drawString(25 * mm, y, line)
+                y -= 11
+            y -= 5
+        
+        y -= 10
+        
+        # Transfer Details Section
+        if y < content_height + 30:
+            p.showPage()
+            y = height - 40
+        
+        if tc.transferring_to_school:
             p.setFont('Helvetica-Bold', 12)
-            p.drawString(25 * mm, y, 'FEES & DUES')
+            p.drawString(25 * mm, y, 'TRANSFER DETAILS')
             y -= 20
             
-            # IMPROVED: Consistent alignment for fees & dues
+            # IMPROVED: Better text truncation and alignment - ensure it fits within boundaries
             p.setFont('Helvetica-Bold', 10)
-            p.drawString(25 * mm, y, 'All Dues Cleared:')
+            p.drawString(25 * mm, y, 'Transferring To:')
             p.setFont('Helvetica', 10)
-            dues_status = 'Yes' if tc.dues_paid else 'No'
-            # Ensure value aligns consistently with other fields
-            p.drawString(95 * mm, y, dues_status)
+            school_name = str(tc.transferring_to_school)
+            # Calculate max width and truncate if needed - ensure it doesn't exceed page margin
+            max_school_width = width - 95 * mm - 25 * mm  # Available width from value position to right margin
+            if p.stringWidth(school_name, 'Helvetica', 10) > max_school_width:
+                # Binary search for optimal truncation
+                low, high = 0, len(school_name)
+                while low < high:
+                    mid = (low + high + 1) // 2
+                    test_str = school_name[:mid]
+                    # Account for ellipsis width
+                    if p.stringWidth(test_str, 'Helvetica', 10) + p.stringWidth('...', 'Helvetica', 10) <= max_school_width:
+                        low = mid
+                    else:
+                        high = mid - 1
+                school_name_trunc = school_name[:low] + '...' if low < len(school_name) else school_name[:low]
+                # Final safety check
+                if p.stringWidth(school_name_trunc, 'Helvetica', 10) > max_school_width:
+                    school_name_trunc = school_name_trunc[:max(0, len(school_name_trunc) - 5)] + '...'
+            else:
+                school_name_trunc = school_name
+            # Ensure it doesn't exceed right margin
+            final_x = min(95 * mm, width - 25 * mm - p.stringWidth(school_name_trunc, 'Helvetica', 10))
+            p.drawString(final_x, y, school_name_trunc)
             y -= 15
             
-            if tc.dues_details:
+            if tc.transferring_to_address:
                 p.setFont('Helvetica-Bold', 10)
-                p.drawString(25 * mm, y, 'Dues Details:')
+                p.drawString(25 * mm, y, 'Address:')
                 y -= 12
                 p.setFont('Helvetica', 9)
-                dues_lines = [tc.dues_details[i:i+80] for i in range(0, min(len(tc.dues_details), 240), 80)]
-                for line in dues_lines[:3]:
+                addr_lines = [tc.transferring_to_address[i:i+80] for i in range(0, min(len(tc.transferring_to_address), 240), 80)]
+                for line in addr_lines[:3]:
                     if y < content_height + 15:
                         break
                     p.drawString(25 * mm, y, line)
                     y -= 11
-                y -= 5
-            
-            y -= 10
-            
-            # Transfer Details Section
-            if y < content_height + 30:
-                p.showPage()
-                y = height - 40
-            
-            if tc.transferring_to_school:
-                p.setFont('Helvetica-Bold', 12)
-                p.drawString(25 * mm, y, 'TRANSFER DETAILS')
-                y -= 20
-                
-                # IMPROVED: Better text truncation and alignment - ensure it fits within boundaries
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(25 * mm, y, 'Transferring To:')
-                p.setFont('Helvetica', 10)
-                school_name = str(tc.transferring_to_school)
-                # Calculate max width and truncate if needed - ensure it doesn't exceed page margin
-                max_school_width = width - 95 * mm - 25 * mm  # Available width from value position to right margin
-                if p.stringWidth(school_name, 'Helvetica', 10) > max_school_width:
-                    # Binary search for optimal truncation
-                    low, high = 0, len(school_name)
-                    while low < high:
-                        mid = (low + high + 1) // 2
-                        test_str = school_name[:mid]
-                        # Account for ellipsis width
-                        if p.stringWidth(test_str, 'Helvetica', 10) + p.stringWidth('...', 'Helvetica', 10) <= max_school_width:
-                            low = mid
-                        else:
-                            high = mid - 1
-                    school_name_trunc = school_name[:low] + '...' if low < len(school_name) else school_name[:low]
-                    # Final safety check
-                    if p.stringWidth(school_name_trunc, 'Helvetica', 10) > max_school_width:
-                        school_name_trunc = school_name_trunc[:max(0, len(school_name_trunc) - 5)] + '...'
-                else:
-                    school_name_trunc = school_name
-                # Ensure it doesn't exceed right margin
-                final_x = min(95 * mm, width - 25 * mm - p.stringWidth(school_name_trunc, 'Helvetica', 10))
-                p.drawString(final_x, y, school_name_trunc)
-                y -= 15
-                
-                if tc.transferring_to_address:
-                    p.setFont('Helvetica-Bold', 10)
-                    p.drawString(25 * mm, y, 'Address:')
-                    y -= 12
-                    p.setFont('Helvetica', 9)
-                    addr_lines = [tc.transferring_to_address[i:i+80] for i in range(0, min(len(tc.transferring_to_address), 240), 80)]
-                    for line in addr_lines[:3]:
-                        if y < content_height + 15:
-                            break
-                        p.drawString(25 * mm, y, line)
-                        y -= 11
-            
-            y -= 10
-            
-            # Reason and Remarks
-            if y < content_height + 40:
-                p.showPage()
-                y = height - 40
-            
-            if tc.reason_for_leaving:
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(25 * mm, y, 'Reason for Leaving:')
-                y -= 12
-                p.setFont('Helvetica', 10)
-                reason_trunc = str(tc.reason_for_leaving)[:80] if len(str(tc.reason_for_leaving)) > 80 else str(tc.reason_for_leaving)
-                p.drawString(25 * mm, y, reason_trunc)
-                y -= 20
-            
-            if tc.conduct_remarks:
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(25 * mm, y, 'Conduct Remarks:')
-                y -= 12
-                p.setFont('Helvetica', 10)
-                conduct_trunc = str(tc.conduct_remarks)[:90] if len(str(tc.conduct_remarks)) > 90 else str(tc.conduct_remarks)
-                p.drawString(25 * mm, y, conduct_trunc)
-                y -= 20
-            
-            if tc.remarks:
-                p.setFont('Helvetica-Bold', 10)
-                p.drawString(25 * mm, y, 'Additional Remarks:')
-                y -= 12
-                p.setFont('Helvetica', 9)
-                def wrap_text(text, max_width_mm, max_lines=4):
-                    words = text.split()
-                    lines = []
-                    current = ''
-                    max_width = max_width_mm
-                    for word in words:
-                        test = current + (' ' if current else '') + word
-                        if p.stringWidth(test, 'Helvetica', 9) <= max_width:
-                            current = test
-                        else:
-                            if current:
-                                lines.append(current)
-                            current = word
-                    if current:
-                        lines.append(current)
-                    return lines[:max_lines]
-
-                remarks_lines = wrap_text(tc.remarks, (width - 50 * mm), max_lines=4)
-                for line in remarks_lines:
-                    p.drawString(25 * mm, y, line)
-                    y -= 11
-                y -= 5
-            
-            # Authority signatures section (bottom)
-            sig_y_start = 45 * mm
-            sig_height = 40 * mm
-            p.setFont('Helvetica-Bold', 11)
-            p.drawString(25 * mm, sig_y_start + sig_height + 5 * mm, 'AUTHORITY SIGNATURES')
-            y = sig_y_start + sig_height - 15
-            
-            # Issued by
-            if tc.issued_by:
-                issuer_name = tc.issued_by.user.get_full_name() or tc.issued_by.user.username if tc.issued_by.user else 'N/A'
-                p.setFont('Helvetica', 10)
-                p.drawString(25 * mm, y, f'Issued By: {issuer_name}')
-                y -= 20
-                p.drawString(25 * mm, y, 'Signature: ___________________')
-                y -= 25
-            
-            # Approved by
-            if tc.approved_by:
-                approver_name = tc.approved_by.user.get_full_name() or tc.approved_by.user.username if tc.approved_by.user else 'N/A'
-                p.setFont('Helvetica', 10)
-                p.drawString(25 * mm, y, f'Approved By: {approver_name}')
-                y -= 20
-                p.drawString(25 * mm, y, 'Signature: ___________________')
-            
-            # Footer
-            p.setFont('Helvetica', 8)
-            p.setFillColor(colors.black)
-            footer_text = f"Generated on {timezone.now().strftime('%d-%m-%Y at %I:%M %p')} — {school_name.upper()}"
-            p.drawCentredString(width / 2, 20 * mm, footer_text)
-            
-            p.save()
-            buffer.seek(0)
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            tc_filename = f"transfer_certificate_{tc.tc_number}_{tc.id}.pdf"
-            response['Content-Disposition'] = f'attachment; filename="{tc_filename}"'
-            return response
-            
-        except ImportError as e:
-            logger.error(f"PDF generation import error: {str(e)}", exc_info=True)
-            return Response({
-                'error': 'PDF generation library not installed.',
-                'details': 'Install required packages: pip install reportlab Pillow'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except Exception as e:
-            logger.error(f"Error generating TC PDF: {str(e)}", exc_info=True)
-            return Response({
-                'error': f'TC PDF generation failed: {str(e)}',
-                'details': 'Check server logs for more information.'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        y -= 10
+        
+        # Reason and Remarks
+        if y < content_height + 40:
+            p.showPage()
+            y = height - 40
+        
+        if tc.reason_for_leaving:
+            p.setFont('Helvetica-Bold', 10)
+            p.drawString(25 * mm, y, 'Reason for Leaving:')
+            y -= 12
+            p.setFont('Helvetica', 10)
+            reason_trunc = str(tc.reason_for_leaving)[:80] if len(str(tc.reason_for_leaving)) > 80 else str(tc.reason_for_leaving)
+            p.drawString(25 * mm, y, reason_trunc)
+            y -= 20
+        
+        if tc.conduct_remarks:
+            p.setFont('Helvetica-Bold', 10)
+            p.drawString(25 * mm, y, 'Conduct Remarks:')
+            y -= 12
+            p.setFont('Helvetica', 10)
+            conduct_trunc = str(tc.conduct_remarks)[:90] if len(str(tc.conduct_remarks)) > 90 else str(tc.conduct_remarks)
+            p.drawString(25 * mm, y, conduct_trunc)
+            y -= 20
+        
+        if tc.remarks:
+            p.setFont('Helvetica-Bold', 10)
+            p.drawString(25 * mm, y, 'Additional Remarks:')
+            y -= 12
+            p.setFont('Helvetica', 9)
+            def wrap_text(text, max_width_mm, max_lines=4):
+                words = text.split()
+                lines = []
+                current = ''
+                max_width = max_width_mm
+                for word in words:
+                    test = current + (' ' if current else '') + word
+                    if p.stringWidth(test, 'Helvetica', 9) <= max_width:
+                        current = test
+                    else:
+                        if current:
+                            lines.append(current)
+                        current = word
+                if current:
+                    lines.append(current)
+                return lines[:max_lines]
+
+            remarks_lines = wrap_text(tc.remarks, (width - 50 * mm), max_lines=4)
+            for line in remarks_lines:
+                p.drawString(25 * mm, y, line)
+                y -= 11
+            y -= 5
+        
+        # Authority signatures section (bottom)
+        sig_y_start = 45 * mm
+        sig_height = 40 * mm
+        p.setFont('Helvetica-Bold', 11)
+        p.drawString(25 * mm, sig_y_start + sig_height + 5 * mm, 'AUTHORITY SIGNATURES')
+        y = sig_y_start + sig_height - 15
+        
+        # Issued by
+        if tc.issued_by:
+            issuer_name = tc.issued_by.user.get_full_name() or tc.issued_by.user.username if tc.issued_by.user else 'N/A'
+            p.setFont('Helvetica', 10)
+            p.drawString(25 * mm, y, f'Issued By: {issuer_name}')
+            y -= 20
+            p.drawString(25 * mm, y, 'Signature: ___________________')
+            y -= 25
+        
+        # Approved by
+        if tc.approved_by:
+            approver_name = tc.approved_by.user.get_full_name() or tc.approved_by.user.username if tc.approved_by.user else 'N/A'
+            p.setFont('Helvetica', 10)
+            p.drawString(25 * mm, y, f'Approved By: {approver_name}')
+            y -= 20
+            p.drawString(25 * mm, y, 'Signature: ___________________')
+        
+        # Footer
+        p.setFont('Helvetica', 8)
+        p.setFillColor(colors.black)
+        footer_text = f"Generated on {timezone.now().strftime('%d-%m-%Y at %I:%M %p')} — {school_name.upper()}"
+        p.drawCentredString(width / 2, 20 * mm, footer_text)
+        
+        p.save()
+        buffer.seek(0)
+        return buffer.getvalue()
 
 
 class AdmissionApplicationListCreateView(APIView):
@@ -5273,7 +5175,7 @@ class AdmissionApplicationListCreateView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def get(self, request):
         """List all admission applications with filtering"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         applications = AdmissionApplication._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
@@ -5298,7 +5200,7 @@ class AdmissionApplicationListCreateView(APIView):
     @role_required('admin', 'principal')
     def post(self, request):
         """Create a new admission application"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         data = request.data.copy()
         data['tenant'] = profile.tenant.id
         
@@ -5317,7 +5219,7 @@ class AdmissionApplicationDetailView(APIView):
     @role_required('admin', 'principal', 'accountant')
     def get(self, request, pk):
         """Get a specific admission application"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             application = AdmissionApplication._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = AdmissionApplicationSerializer(application)
@@ -5328,7 +5230,7 @@ class AdmissionApplicationDetailView(APIView):
     @role_required('admin', 'principal')
     def put(self, request, pk):
         """Update an admission application"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             application = AdmissionApplication._default_manager.get(id=pk, tenant=profile.tenant)
             serializer = AdmissionApplicationSerializer(application, data=request.data, partial=True)
@@ -5342,7 +5244,7 @@ class AdmissionApplicationDetailView(APIView):
     @role_required('admin', 'principal')
     def delete(self, request, pk):
         """Delete an admission application"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             application = AdmissionApplication._default_manager.get(id=pk, tenant=profile.tenant)
             application.delete()
@@ -5359,7 +5261,7 @@ class AdmissionApplicationApproveView(APIView):
     @role_required('admin', 'principal')
     def post(self, request, pk):
         """Approve admission application and optionally create student record"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             application = AdmissionApplication._default_manager.get(id=pk, tenant=profile.tenant)
         except AdmissionApplication.DoesNotExist:
@@ -5418,7 +5320,7 @@ class AdmissionApplicationRejectView(APIView):
     @role_required('admin', 'principal')
     def post(self, request, pk):
         """Reject admission application"""
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         try:
             application = AdmissionApplication._default_manager.get(id=pk, tenant=profile.tenant)
             application.status = 'rejected'
@@ -5494,18 +5396,16 @@ class PublicStudentFeeStatusView(APIView):
                 class_obj=student.assigned_class
             ).select_related('class_obj')
             
-            # Get all payments made by student
-            payments = FeePayment.objects.filter(
+            # Paid amount per fee structure in one grouped query
+            paid_by_structure = dict(FeePayment.objects.filter(
                 tenant=tenant,
                 student=student
-            ).select_related('fee_structure', 'fee_structure__class_obj')
+            ).values('fee_structure').annotate(total=Sum('amount_paid')).order_by().values_list('fee_structure', 'total'))
             
             # Calculate fee status
             fee_status = []
             for fee_structure in fee_structures:
-                total_paid = payments.filter(fee_structure=fee_structure).aggregate(
-                    total=Sum('amount_paid')
-                )['total'] or 0
+                total_paid = paid_by_structure.get(fee_structure.id) or 0
                 
                 remaining = float(fee_structure.amount) - float(total_paid)
                 
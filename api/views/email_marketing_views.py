@@ -6,6 +6,7 @@ from django.db.models import Q, Count, Sum
 from django.utils import timezone
 from django.core.mail import send_mail, EmailMultiAlternatives
 from django.template import Template, Context
+from django.urls import reverse
 from datetime import timedelta
 import logging
 
@@ -14,6 +15,7 @@ from api.models.email_marketing import (
     EmailSequence, EmailSequenceStep
 )
 from api.models.user import UserProfile
+from api.utils.jobs import enqueue
 from api.serializers_email import (
     EmailTemplateSerializer, ContactListSerializer, EmailCampaignSerializer,
     EmailActivitySerializer, EmailSequenceSerializer, EmailSequenceStepSerializer
@@ -22,6 +24,96 @@ from api.serializers_email import (
 logger = logging.getLogger(__name__)
 
 
+def deliver_campaign(campaign, user_profile, progress=None):
+    """Send a campaign to its recipients and mark it sent; runs on a job worker"""
+    if campaign.contact_list:
+        recipients = campaign.contact_list.get_contacts()
+    else:
+        recipients = campaign.recipients.all()
+    total = recipients.count()
+    
+    # A retried job skips contacts that were already delivered to
+    delivered = campaign.email_activities.filter(status='sent').values('contact_id')
+    sent_count = campaign.email_activities.filter(status='sent').count()
+    failed_count = 0
+    
+    pending = recipients.exclude(id__in=delivered).select_related('company')
+    for index, contact in enumerate(pending, start=1):
+        if progress and index % 50 == 0:
+            progress(index * 100 // total, f'{index}/{total} emails')
+        if not contact.email:
+            continue
+        
+        try:
+            # Replace template variables
+            subject = campaign.subject
+            body_html = campaign.body_html
+            body_text = campaign.body_text
+            
+            # Simple variable replacement (can be enhanced)
+            context = {
+                'first_name': contact.first_name,
+                'last_name': contact.last_name,
+                'full_name': contact.full_name,
+                'email': contact.email,
+                'phone': contact.phone or '',
+                'company_name': contact.company.name if contact.company else '',
+            }
+            
+            # Replace variables in subject and body
+            for key, value in context.items():
+                subject = subject.replace(f'{{{{{key}}}}}', str(value))
+                body_html = body_html.replace(f'{{{{{key}}}}}', str(value))
+                body_text = body_text.replace(f'{{{{{key}}}}}', str(value))
+            
+            # Create email
+            from_email = campaign.from_email or user_profile.tenant.name
+            from_name = campaign.from_name or user_profile.tenant.name
+            reply_to = campaign.reply_to or from_email
+            
+            email = EmailMultiAlternatives(
+                subject=subject,
+                body=body_text,
+                from_email=f"{from_name} <{from_email}>",
+                to=[contact.email],
+                reply_to=[reply_to]
+            )
+            email.attach_alternative(body_html, "text/html")
+            email.send()
+            
+            # Create email activity
+            EmailActivity.objects.create(
+                campaign=campaign,
+                contact=contact,
+                status='sent',
+                sent_at=timezone.now()
+            )
+            
+            sent_count += 1
+            
+        except Exception as e:
+            logger.error(f"Error sending email to {contact.email}: {str(e)}")
+            # Create failed activity
+            EmailActivity.objects.create(
+                campaign=campaign,
+                contact=contact,
+                status='failed',
+                bounce_reason=str(e)
+            )
+            failed_count += 1
+    
+    # Update campaign status
+    campaign.status = 'sent'
+    campaign.sent_at = timezone.now()
+    campaign.save()
+    
+    return {
+        'sent_count': sent_count,
+        'failed_count': failed_count,
+        'total_recipients': total
+    }
+
+
 class EmailTemplateViewSet(viewsets.ModelViewSet):
     """ViewSet for managing email templates"""
     serializer_class = EmailTemplateSerializer
@@ -117,90 +209,24 @@ class EmailCampaignViewSet(viewsets.ModelViewSet):
         else:
             recipients = campaign.recipients.all()
         
-        if not recipients:
+        if not recipients.exists():
             return Response({'error': 'No recipients found'}, status=400)
         
         # Update campaign status
         campaign.status = 'sending'
         campaign.save()
         
-        # Send emails (in production, use Celery for background tasks)
-        sent_count = 0
-        failed_count = 0
-        
-        for contact in recipients:
-            if not contact.email:
-                continue
-            
-            try:
-                # Replace template variables
-                subject = campaign.subject
-                body_html = campaign.body_html
-                body_text = campaign.body_text
-                
-                # Simple variable replacement (can be enhanced)
-                context = {
-                    'first_name': contact.first_name,
-                    'last_name': contact.last_name,
-                    'full_name': contact.full_name,
-                    'email': contact.email,
-                    'phone': contact.phone or '',
-                    'company_name': contact.company.name if contact.company else '',
-                }
-                
-                # Replace variables in subject and body
-                for key, value in context.items():
-                    subject = subject.replace(f'{{{{{key}}}}}', str(value))
-                    body_html = body_html.replace(f'{{{{{key}}}}}', str(value))
-                    body_text = body_text.replace(f'{{{{{key}}}}}', str(value))
-                
-                # Create email
-                from_email = campaign.from_email or user_profile.tenant.name
-                from_name = campaign.from_name or user_profile.tenant.name
-                reply_to = campaign.reply_to or from_email
-                
-                email = EmailMultiAlternatives(
-                    subject=subject,
-                    body=body_text,
-                    from_email=f"{from_name} <{from_email}>",
-                    to=[contact.email],
-                    reply_to=[reply_to]
-                )
-                email.attach_alternative(body_html, "text/html")
-                email.send()
-                
-                # Create email activity
-                EmailActivity.objects.create(
-                    campaign=campaign,
-                    contact=contact,
-                    status='sent',
-                    sent_at=timezone.now()
-                )
-                
-                sent_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error sending email to {contact.email}: {str(e)}")
-                # Create failed activity
-                EmailActivity.objects.create(
-                    campaign=campaign,
-                    contact=contact,
-                    status='failed',
-                    bounce_reason=str(e)
-                )
-                failed_count += 1
-        
-        # Update campaign status
-        campaign.status = 'sent'
-        campaign.sent_at = timezone.now()
-        campaign.save()
+        # Delivery runs on a job worker so large lists do not hit the request timeout
+        job = enqueue('api.tasks.send_email_campaign',
+                      {'campaign_id': campaign.id, 'user_profile_id': user_profile.id},
+                      tenant=user_profile.tenant, created_by=user_profile, priority=5)
         
         return Response({
-            'status': 'Campaign sent',
-            'sent_count': sent_count,
-            'failed_count': failed_count,
+            'status': 'Campaign queued',
+            'job_id': job.id,
+            'status_url': reverse('job-detail', args=[job.id]),
             'total_recipients': recipients.count()
-        })
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['get'])
     def activities(self, request, pk=None):
@@ -7,6 +7,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.db.models import Q, Count
 from datetime import datetime, timedelta, date
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
 from api.models.permissions import role_required
 from django.utils import timezone
 
@@ -20,7 +21,7 @@ class EmployeeAnalyticsView(APIView):
     def get(self, request):
         try:
             # Get current user's tenant
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             # Get all employees in the tenant
@@ -12,6 +12,7 @@ from django.db.models import Sum, Count, Avg, Q, F
 from django.db.models.functions import TruncDate, TruncMonth, TruncYear
 from datetime import timedelta, datetime
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
 import calendar
 
 # Import models from different modules
@@ -56,7 +57,7 @@ class EnhancedDashboardAnalyticsView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             today = timezone.now().date()
             month_start = today.replace(day=1)
@@ -262,7 +263,7 @@ class TimeSeriesTrendsView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             period = request.query_params.get('period', 'month')  # day, week, month, year
@@ -403,7 +404,7 @@ class ComparisonAnalyticsView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             period = request.query_params.get('period', 'month')  # month, week, year
@@ -577,7 +578,7 @@ class RevenueForecastingView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             forecast_days = int(request.query_params.get('days', 30))  # Forecast for next N days
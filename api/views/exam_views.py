@@ -8,12 +8,17 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
+from api.utils.hall_tickets import generate_hall_tickets, hall_ticket_details, hall_ticket_sources
+from api.utils.jobs import enqueue
+from api.utils.pdf_cache import cached_pdf_response, school_contact
+from api.utils.seating import allocate_seats, overlapping_schedules, schedule_room_conflicts
 from education.models import Exam, ExamSchedule, SeatingArrangement, HallTicket, Student, Class, Subject, Room
 from api.models.permissions import HasFeaturePermissionFactory, role_required
 from api.models.serializers_education import (
     ExamSerializer, ExamScheduleSerializer, SeatingArrangementSerializer, HallTicketSerializer
 )
-from django.db.models import Q
+from django.urls import reverse
 from django.utils import timezone
 import uuid
 
@@ -31,7 +36,7 @@ class ExamListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             exams = Exam.objects.filter(tenant=profile.tenant, is_active=True).order_by('-start_date')
             serializer = ExamSerializer(exams, many=True)
             return Response(serializer.data)
@@ -41,7 +46,7 @@ class ExamListCreateView(APIView):
     @role_required('admin', 'principal')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             serializer = ExamSerializer(data=request.data, context={'request': request})
             if serializer.is_valid():
                 serializer.save(tenant=profile.tenant)
@@ -76,7 +81,7 @@ class ExamDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             exam = Exam.objects.get(id=pk, tenant=profile.tenant)
             serializer = ExamSerializer(exam)
             return Response(serializer.data)
@@ -88,7 +93,7 @@ class ExamDetailView(APIView):
     @role_required('admin', 'principal')
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             exam = Exam.objects.get(id=pk, tenant=profile.tenant)
             serializer = ExamSerializer(exam, data=request.data, partial=True, context={'request': request})
             if serializer.is_valid():
@@ -121,7 +126,7 @@ class ExamDetailView(APIView):
     @role_required('admin', 'principal')
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             exam = Exam.objects.get(id=pk, tenant=profile.tenant)
             exam.is_active = False
             exam.save()
@@ -143,7 +148,7 @@ class ExamScheduleListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             exam_id = request.query_params.get('exam_id')
             class_id = request.query_params.get('class_id')
             date = request.query_params.get('date')
@@ -166,7 +171,7 @@ class ExamScheduleListCreateView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             
             # Check for room conflicts
             room_id = request.data.get('room')
@@ -189,14 +194,7 @@ class ExamScheduleListCreateView(APIView):
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
                 # Check for overlapping schedules in same room
-                conflict = ExamSchedule.objects.filter(
-                    tenant=profile.tenant,
-                    room_id=room_id,
-                    date=date,
-                    is_active=True
-                ).filter(
-                    Q(start_time__lt=end_time, end_time__gt=start_time)
-                ).exists()
+                conflict = overlapping_schedules(profile.tenant, room_id, date, start_time, end_time).exists()
                 
                 if conflict:
                     return Response({
@@ -232,7 +230,7 @@ class ExamScheduleDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             schedule = ExamSchedule.objects.get(id=pk, tenant=profile.tenant)
             serializer = ExamScheduleSerializer(schedule)
             return Response(serializer.data)
@@ -244,7 +242,7 @@ class ExamScheduleDetailView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             schedule = ExamSchedule.objects.get(id=pk, tenant=profile.tenant)
             
             # Check for room conflicts
@@ -267,14 +265,7 @@ class ExamScheduleDetailView(APIView):
                         'details': {'start_time': start_time, 'end_time': end_time}
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
-                conflict = ExamSchedule.objects.filter(
-                    tenant=profile.tenant,
-                    room_id=room_id,
-                    date=date,
-                    is_active=True
-                ).exclude(id=pk).filter(
-                    Q(start_time__lt=end_time, end_time__gt=start_time)
-                ).exists()
+                conflict = overlapping_schedules(profile.tenant, room_id, date, start_time, end_time).exclude(id=pk).exists()
                 
                 if conflict:
                     return Response({
@@ -313,7 +304,7 @@ class ExamScheduleDetailView(APIView):
     @role_required('admin', 'principal')
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             schedule = ExamSchedule.objects.get(id=pk, tenant=profile.tenant)
             schedule.is_active = False
             schedule.save()
@@ -341,7 +332,7 @@ class SeatingArrangementListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             exam_schedule_id = request.query_params.get('exam_schedule_id')
             student_id = request.query_params.get('student_id')
             
@@ -361,7 +352,7 @@ class SeatingArrangementListCreateView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             serializer = SeatingArrangementSerializer(data=request.data, context={'request': request})
             if serializer.is_valid():
                 serializer.save(tenant=profile.tenant)
@@ -396,7 +387,7 @@ class SeatingArrangementDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             arrangement = SeatingArrangement.objects.get(id=pk, tenant=profile.tenant)
             serializer = SeatingArrangementSerializer(arrangement)
             return Response(serializer.data)
@@ -408,7 +399,7 @@ class SeatingArrangementDetailView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             arrangement = SeatingArrangement.objects.get(id=pk, tenant=profile.tenant)
             serializer = SeatingArrangementSerializer(arrangement, data=request.data, partial=True, context={'request': request})
             if serializer.is_valid():
@@ -441,7 +432,7 @@ class SeatingArrangementDetailView(APIView):
     @role_required('admin', 'principal')
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             arrangement = SeatingArrangement.objects.get(id=pk, tenant=profile.tenant)
             arrangement.is_active = False
             arrangement.save()
@@ -458,6 +449,85 @@ class SeatingArrangementDetailView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class AllocateSeatsView(APIView):
+    """
+    Seat all candidates of an exam schedule in one request.
+
+    Body (all optional): {"schedule_ids": [...], "room_ids": [...],
+    "student_ids": [...], "replace": false, "dry_run": false}. schedule_ids
+    adds schedules starting at the same date and time, so their classes are
+    interleaved in the same rooms; room_ids defaults to the schedules' rooms.
+    Students who already have an active seat keep it unless replace is set.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+    
+    @role_required('admin', 'principal', 'teacher')
+    def post(self, request, pk):
+        try:
+            profile = get_request_profile(request)
+            try:
+                schedule = ExamSchedule.objects.get(id=pk, tenant=profile.tenant, is_active=True)
+            except ExamSchedule.DoesNotExist:
+                return Response({'error': 'Exam schedule not found.'}, status=status.HTTP_404_NOT_FOUND)
+            
+            flags = {
+                key: str(request.data.get(key, request.query_params.get(key, ''))).lower() in ('1', 'true')
+                for key in ('replace', 'dry_run')
+            }
+            try:
+                ids = {
+                    key: [int(value) for value in request.data.get(key) or []]
+                    for key in ('schedule_ids', 'room_ids', 'student_ids')
+                }
+            except (TypeError, ValueError):
+                return Response({'error': 'schedule_ids, room_ids and student_ids must be lists of ids.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                result = allocate_seats(profile.tenant, schedule, **ids, **flags)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            return Response(result, status=status.HTTP_200_OK if flags['dry_run'] else status.HTTP_201_CREATED)
+        except UserProfile.DoesNotExist:
+            return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error allocating seats: {str(e)}", exc_info=True)
+            return Response({
+                'error': f'Failed to allocate seats: {str(e)}',
+                'details': 'Please check server logs for more information.'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ExamScheduleConflictsView(APIView):
+    """Exam schedules sharing a room at overlapping times (?exam_id=&date=)"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+    
+    def get(self, request):
+        try:
+            profile = get_request_profile(request)
+            exam = None
+            exam_id = request.query_params.get('exam_id')
+            if exam_id:
+                try:
+                    exam = Exam.objects.get(id=exam_id, tenant=profile.tenant)
+                except (Exam.DoesNotExist, ValueError):
+                    return Response({'error': 'Exam not found.'}, status=status.HTTP_404_NOT_FOUND)
+            date = request.query_params.get('date')
+            if date:
+                try:
+                    date = timezone.datetime.strptime(date, '%Y-%m-%d').date()
+                except ValueError:
+                    return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            conflicts = schedule_room_conflicts(profile.tenant, exam=exam, date=date or None)
+            return Response({'conflict_count': len(conflicts), 'conflicts': conflicts})
+        except UserProfile.DoesNotExist:
+            return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+
 # ============================================
 # HALL TICKET MANAGEMENT
 # ============================================
@@ -469,7 +539,7 @@ class HallTicketListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             exam_id = request.query_params.get('exam_id')
             student_id = request.query_params.get('student_id')
             status_filter = request.query_params.get('status')
@@ -492,7 +562,7 @@ class HallTicketListCreateView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             
             # Generate ticket number if not provided
             data = request.data.copy()
@@ -549,7 +619,7 @@ class HallTicketDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             ticket = HallTicket.objects.get(id=pk, tenant=profile.tenant)
             serializer = HallTicketSerializer(ticket)
             return Response(serializer.data)
@@ -561,7 +631,7 @@ class HallTicketDetailView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             ticket = HallTicket.objects.get(id=pk, tenant=profile.tenant)
             serializer = HallTicketSerializer(ticket, data=request.data, partial=True)
             if serializer.is_valid():
@@ -593,16 +663,24 @@ class HallTicketDetailView(APIView):
 
 
 class GenerateHallTicketsView(APIView):
-    """Bulk generate hall tickets for all students in an exam"""
+    """
+    Bulk generate hall tickets for all students in an exam.
+    
+    Body: {"exam_id": 1, "class_id": 2, "prerender_pdfs": false}; class_id is
+    optional. Students who already hold a ticket are skipped. With
+    prerender_pdfs the new tickets' PDFs are rendered on a job worker and the
+    response carries the job's status URL.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
     
     @role_required('admin', 'principal')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             exam_id = request.data.get('exam_id')
             class_id = request.data.get('class_id')  # Optional: filter by class
+            prerender = str(request.data.get('prerender_pdfs', '')).lower() in ('1', 'true')
             
             if not exam_id:
                 return Response({'error': 'exam_id is required.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -617,57 +695,21 @@ class GenerateHallTicketsView(APIView):
             if class_id:
                 students = students.filter(assigned_class_id=class_id)
             
-            generated_count = 0
-            errors = []
-            
-            for student in students:
-                # Check if ticket already exists
-                existing = HallTicket.objects.filter(
-                    tenant=profile.tenant,
-                    exam=exam,
-                    student=student
-                ).first()
-                
-                if existing:
-                    errors.append(f"Ticket already exists for {student.name}")
-                    continue
-                
-                # Create hall ticket
-                hall_ticket = HallTicket(
-                    tenant=profile.tenant,
-                    exam=exam,
-                    student=student,
-                    generated_by=profile,
-                    status='generated'
-                )
-                hall_ticket.generate_ticket_number()
-                
-                # Handle ticket number uniqueness
-                max_attempts = 10
-                attempt = 0
-                while attempt < max_attempts:
-                    try:
-                        hall_ticket.save()
-                        generated_count += 1
-                        break
-                    except Exception as e:
-                        if 'ticket_number' in str(e).lower() or 'unique' in str(e).lower():
-                            # Regenerate ticket number if collision
-                            import random
-                            suffix = str(random.randint(1000, 9999))
-                            hall_ticket.ticket_number = f"{hall_ticket.ticket_number}-{suffix}"
-                            attempt += 1
-                        else:
-                            errors.append(f"Error creating ticket for {student.name}: {str(e)}")
-                            break
-                else:
-                    errors.append(f"Failed to generate unique ticket number for {student.name} after {max_attempts} attempts")
-            
-            return Response({
+            result = generate_hall_tickets(profile.tenant, exam, students, generated_by=profile)
+            generated_count = len(result['ticket_ids'])
+            errors = [f"Ticket already exists for {name}" for name in result['skipped']]
+            response = {
                 'message': f'Generated {generated_count} hall tickets.',
                 'generated_count': generated_count,
                 'errors': errors if errors else None
-            }, status=status.HTTP_201_CREATED)
+            }
+            
+            if prerender and result['ticket_ids']:
+                job = enqueue('api.tasks.prerender_hall_tickets', {'ticket_ids': result['ticket_ids']},
+                              tenant=profile.tenant, created_by=profile)
+                response.update({'job_id': job.id, 'status_url': reverse('job-detail', args=[job.id])})
+            
+            return Response(response, status=status.HTTP_201_CREATED)
             
         except UserProfile.DoesNotExist:
             return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
@@ -678,3 +720,126 @@ class GenerateHallTicketsView(APIView):
                 'details': 'Check server logs for more information.'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+def render_hall_ticket_pdf(ticket, contact, schedules, seats):
+    """Render a hall ticket to PDF bytes (shared by the download view and the pre-render job)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    from reportlab.lib.units import mm
+    from io import BytesIO
+
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    student = ticket.student
+    exam = ticket.exam
+
+    p.setStrokeColor(colors.HexColor('#1a237e'))
+    p.setLineWidth(2)
+    p.rect(15 * mm, 15 * mm, width - 30 * mm, height - 30 * mm, stroke=1, fill=0)
+
+    # School header
+    y = height - 30 * mm
+    p.setFont('Helvetica-Bold', 16)
+    p.drawCentredString(width / 2, y, ticket.tenant.name or 'School')
+    p.setFont('Helvetica', 9)
+    contact_line = ' | '.join(part for part in (contact['address'], contact['phone'], contact['email']) if part)
+    if contact_line:
+        y -= 6 * mm
+        p.drawCentredString(width / 2, y, contact_line[:110])
+    y -= 12 * mm
+    p.setFont('Helvetica-Bold', 14)
+    p.drawCentredString(width / 2, y, 'HALL TICKET')
+    y -= 6 * mm
+    p.setFont('Helvetica', 11)
+    p.drawCentredString(width / 2, y, f"{exam.name} ({exam.academic_year.name})")
+
+    # Candidate details
+    y -= 14 * mm
+    details = [
+        ('Ticket No.', ticket.ticket_number),
+        ('Student Name', student.name),
+        ('Roll No.', student.upper_id or str(student.id)),
+        ('Class', student.assigned_class.name if student.assigned_class else '-'),
+        ('Exam Dates', f"{exam.start_date.strftime('%d-%m-%Y')} to {exam.end_date.strftime('%d-%m-%Y')}"),
+    ]
+    for label, value in details:
+        p.setFont('Helvetica-Bold', 10)
+        p.drawString(25 * mm, y, f"{label}:")
+        p.setFont('Helvetica', 10)
+        p.drawString(60 * mm, y, str(value))
+        y -= 7 * mm
+
+    # Exam schedule
+    y -= 6 * mm
+    columns = [25 * mm, 55 * mm, 85 * mm, 135 * mm, 165 * mm]
+    p.setFillColor(colors.HexColor('#e8eaf6'))
+    p.rect(22 * mm, y - 2 * mm, width - 44 * mm, 7 * mm, stroke=0, fill=1)
+    p.setFillColor(colors.black)
+    p.setFont('Helvetica-Bold', 10)
+    for x, heading in zip(columns, ('Date', 'Time', 'Subject', 'Room', 'Seat')):
+        p.drawString(x, y, heading)
+    p.setFont('Helvetica', 10)
+    for schedule in schedules:
+        y -= 7 * mm
+        if y < 50 * mm:
+            p.showPage()
+            y = height - 30 * mm
+            p.setFont('Helvetica', 10)
+        seat = seats.get(schedule.id)
+        room = seat.room if seat and seat.room else schedule.room
+        values = (
+            schedule.date.strftime('%d-%m-%Y'),
+            f"{schedule.start_time.strftime('%H:%M')}-{schedule.end_time.strftime('%H:%M')}",
+            schedule.subject.name[:28],
+            room.name[:18] if room else '-',
+            seat.seat_number if seat else '-',
+        )
+        for x, value in zip(columns, values):
+            p.drawString(x, y, value)
+    if not schedules:
+        y -= 7 * mm
+        p.drawString(columns[0], y, 'Schedule to be announced')
+
+    # Signatures
+    p.setFont('Helvetica', 10)
+    p.line(25 * mm, 35 * mm, 75 * mm, 35 * mm)
+    p.drawString(25 * mm, 30 * mm, "Candidate's Signature")
+    p.line(width - 75 * mm, 35 * mm, width - 25 * mm, 35 * mm)
+    p.drawString(width - 75 * mm, 30 * mm, 'Principal')
+
+    p.showPage()
+    p.save()
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+class HallTicketPDFView(APIView):
+    """Download a hall ticket as PDF (served from the PDF cache when unchanged)"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+    
+    def get(self, request, pk):
+        try:
+            profile = get_request_profile(request)
+            ticket = HallTicket.objects.select_related(
+                'tenant', 'exam__academic_year', 'student__assigned_class'
+            ).get(id=pk, tenant=profile.tenant)
+        except HallTicket.DoesNotExist:
+            return Response({'error': 'Hall ticket not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except UserProfile.DoesNotExist:
+            return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            contact = school_contact(ticket.tenant)
+            schedules, seats = hall_ticket_details(ticket)
+            return cached_pdf_response(
+                request, 'hall_ticket', ticket, hall_ticket_sources(ticket, contact, schedules, seats),
+                lambda: render_hall_ticket_pdf(ticket, contact, schedules, seats),
+                f"hall_ticket_{ticket.ticket_number}.pdf",
+            )
+        except Exception as e:
+            logger.error(f"Error rendering hall ticket PDF: {str(e)}", exc_info=True)
+            return Response({'error': f'Failed to generate PDF: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
@@ -10,7 +10,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.models.audit import AuditLog
 from api.utils.security import sanitize_string, validate_email, validate_amount
 from api.models.permissions import role_required
-from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
 
 class SecureExampleView(APIView):
     """
@@ -26,7 +26,7 @@ class SecureExampleView(APIView):
         """
         try:
             # 1. Get user profile
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             
             # 2. Sanitize and validate input
             email = request.data.get('email')
@@ -10,13 +10,13 @@ import logging
 logger = logging.getLogger(__name__)
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.http import HttpResponse
 from io import BytesIO
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
 from reportlab.lib import colors
 from api.models.user import Tenant
+from api.utils.pdf_cache import cached_pdf_response
 from hotel.models import RoomType, Room, Guest, Booking
 from api.serializers import RoomTypeSerializer, RoomSerializer, GuestSerializer, BookingSerializer
 
@@ -300,6 +300,12 @@ class HotelBookingFolioView(APIView):
         except Booking.DoesNotExist:
             return Response({'error': 'Booking not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+        return cached_pdf_response(
+            request, 'hotel_folio', booking, [booking, booking.guest, booking.room, booking.room.room_type],
+            lambda: self.render_pdf(booking), f"hotel_folio_{booking.id}.pdf",
+        )
+
+    def render_pdf(self, booking):
         buffer = BytesIO()
         p = canvas.Canvas(buffer, pagesize=A4)
         width, height = A4
@@ -368,9 +374,7 @@ class HotelBookingFolioView(APIView):
         p.save()
         buffer.seek(0)
 
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="hotel_folio_{booking.id}.pdf"'
-        return response
+        return buffer.getvalue()
 
 
 class BookingBulkDeleteView(APIView):
@@ -2,21 +2,177 @@ import os
 import csv
 import json
 import tempfile
+import uuid
 from datetime import datetime
 from decimal import Decimal
 from django.http import HttpResponse, JsonResponse
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from django.urls import reverse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
+from api.utils.jobs import enqueue
 from pharmacy.models import Medicine, MedicineCategory, Customer
 from retail.models import Product, ProductCategory, Customer as RetailCustomer
 from api.serializers import MedicineSerializer, ProductSerializer
 
+def import_medicines_from_csv(content, tenant):
+    """Import medicines from CSV text; returns the import summary"""
+    reader = csv.DictReader(content.splitlines())
+
+    imported_count = 0
+    errors = []
+    preview_data = []
+    
+    for row_num, row in enumerate(reader, start=2):  # Start from 2 to account for header
+        try:
+            # Validate required fields
+            if not row.get('name'):
+                errors.append(f"Row {row_num}: Medicine name is required")
+                continue
+            
+            # Get or create category
+            category_name = row.get('category', 'General')
+            category, created = MedicineCategory.objects.get_or_create(
+                name=category_name,
+                tenant=tenant,
+                defaults={'description': f'Category for {category_name}'}
+            )
+            
+            # Create medicine
+            medicine_data = {
+                'name': row.get('name'),
+                'generic_name': row.get('generic_name', ''),
+                'category': category,
+                'manufacturer': row.get('manufacturer', ''),
+                'strength': row.get('strength', ''),
+                'dosage_form': row.get('dosage_form', 'TABLET'),
+                'prescription_required': row.get('prescription_required', 'false').lower() == 'true',
+                'description': row.get('description', ''),
+                'side_effects': row.get('side_effects', ''),
+                'storage_conditions': row.get('storage_conditions', ''),
+                'expiry_alert_days': int(row.get('expiry_alert_days', 30)),
+                'barcode': row.get('barcode', ''),
+                'tenant': tenant
+            }
+            
+            # Check if medicine already exists
+            existing_medicine = Medicine.objects.filter(
+                name=medicine_data['name'],
+                manufacturer=medicine_data['manufacturer'],
+                tenant=tenant
+            ).first()
+            
+            if existing_medicine:
+                errors.append(f"Row {row_num}: Medicine '{medicine_data['name']}' already exists")
+                continue
+            
+            # Create medicine
+            medicine = Medicine.objects.create(**medicine_data)
+            imported_count += 1
+            
+            # Add to preview
+            preview_data.append({
+                'name': medicine.name,
+                'generic_name': medicine.generic_name,
+                'category': medicine.category.name,
+                'manufacturer': medicine.manufacturer,
+                'strength': medicine.strength,
+                'dosage_form': medicine.dosage_form,
+                'prescription_required': medicine.prescription_required
+            })
+            
+        except Exception as e:
+            errors.append(f"Row {row_num}: {str(e)}")
+    
+    return {
+        'message': f'Successfully imported {imported_count} medicines',
+        'imported_count': imported_count,
+        'errors': errors,
+        'preview_data': preview_data[:10]  # Show first 10 items
+    }
+
+
+def import_products_from_csv(content, tenant):
+    """Import products from CSV text; returns the import summary"""
+    reader = csv.DictReader(content.splitlines())
+
+    imported_count = 0
+    errors = []
+    preview_data = []
+    
+    for row_num, row in enumerate(reader, start=2):  # Start from 2 to account for header
+        try:
+            # Validate required fields
+            if not row.get('name'):
+                errors.append(f"Row {row_num}: Product name is required")
+                continue
+            
+            # Get or create category
+            category_name = row.get('category', 'General')
+            category, created = ProductCategory.objects.get_or_create(
+                name=category_name,
+                tenant=tenant,
+                defaults={'description': f'Category for {category_name}'}
+            )
+            
+            # Create product
+            product_data = {
+                'name': row.get('name'),
+                'description': row.get('description', ''),
+                'category': category,
+                'manufacturer': row.get('manufacturer', ''),
+                'sku': row.get('sku', ''),
+                'barcode': row.get('barcode', ''),
+                'unit_price': Decimal(row.get('unit_price', '0.00')),
+                'cost_price': Decimal(row.get('cost_price', '0.00')),
+                'reorder_level': int(row.get('reorder_level', 0)),
+                'current_stock': int(row.get('current_stock', 0)),
+                'location': row.get('location', ''),
+                'tenant': tenant
+            }
+            
+            # Check if product already exists
+            existing_product = Product.objects.filter(
+                name=product_data['name'],
+                sku=product_data['sku'],
+                tenant=tenant
+            ).first()
+            
+            if existing_product:
+                errors.append(f"Row {row_num}: Product '{product_data['name']}' already exists")
+                continue
+            
+            # Create product
+            product = Product.objects.create(**product_data)
+            imported_count += 1
+            
+            # Add to preview
+            preview_data.append({
+                'name': product.name,
+                'description': product.description,
+                'category': product.category.name,
+                'manufacturer': product.manufacturer,
+                'sku': product.sku,
+                'unit_price': float(product.unit_price),
+                'current_stock': product.current_stock
+            })
+            
+        except Exception as e:
+            errors.append(f"Row {row_num}: {str(e)}")
+    
+    return {
+        'message': f'Successfully imported {imported_count} products',
+        'imported_count': imported_count,
+        'errors': errors,
+        'preview_data': preview_data[:10]  # Show first 10 items
+    }
+
+
 class MedicineImportView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -25,7 +181,7 @@ class MedicineImportView(APIView):
         """Import medicines from CSV/Excel file"""
         try:
             # Check if user has pharmacy permissions
-            user_profile = UserProfile.objects.get(user=request.user)
+            user_profile = get_request_profile(request)
             if user_profile.role.name not in ['admin', 'pharmacy_admin', 'pharmacist']:
                 return Response({'error': 'Pharmacy access required'}, status=status.HTTP_403_FORBIDDEN)
             
@@ -43,7 +199,7 @@ class MedicineImportView(APIView):
             
             # Process CSV file
             if file_extension == 'csv':
-                return self.process_csv_medicines(uploaded_file, tenant)
+                return self.process_csv_medicines(uploaded_file, tenant, user_profile)
             else:
                 return self.process_excel_medicines(uploaded_file, tenant)
                 
@@ -53,84 +209,19 @@ class MedicineImportView(APIView):
             print(traceback.format_exc())
             return Response({'error': f'Import failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    def process_csv_medicines(self, uploaded_file, tenant):
-        """Process CSV file for medicine import"""
+    def process_csv_medicines(self, uploaded_file, tenant, user_profile):
+        """Queue the CSV for a background import; the summary is stored on the job"""
         try:
-            # Read CSV file
-            decoded_file = uploaded_file.read().decode('utf-8').splitlines()
-            reader = csv.DictReader(decoded_file)
-            
-            imported_count = 0
-            errors = []
-            preview_data = []
-            
-            for row_num, row in enumerate(reader, start=2):  # Start from 2 to account for header
-                try:
-                    # Validate required fields
-                    if not row.get('name'):
-                        errors.append(f"Row {row_num}: Medicine name is required")
-                        continue
-                    
-                    # Get or create category
-                    category_name = row.get('category', 'General')
-                    category, created = MedicineCategory.objects.get_or_create(
-                        name=category_name,
-                        tenant=tenant,
-                        defaults={'description': f'Category for {category_name}'}
-                    )
-                    
-                    # Create medicine
-                    medicine_data = {
-                        'name': row.get('name'),
-                        'generic_name': row.get('generic_name', ''),
-                        'category': category,
-                        'manufacturer': row.get('manufacturer', ''),
-                        'strength': row.get('strength', ''),
-                        'dosage_form': row.get('dosage_form', 'TABLET'),
-                        'prescription_required': row.get('prescription_required', 'false').lower() == 'true',
-                        'description': row.get('description', ''),
-                        'side_effects': row.get('side_effects', ''),
-                        'storage_conditions': row.get('storage_conditions', ''),
-                        'expiry_alert_days': int(row.get('expiry_alert_days', 30)),
-                        'barcode': row.get('barcode', ''),
-                        'tenant': tenant
-                    }
-                    
-                    # Check if medicine already exists
-                    existing_medicine = Medicine.objects.filter(
-                        name=medicine_data['name'],
-                        manufacturer=medicine_data['manufacturer'],
-                        tenant=tenant
-                    ).first()
-                    
-                    if existing_medicine:
-                        errors.append(f"Row {row_num}: Medicine '{medicine_data['name']}' already exists")
-                        continue
-                    
-                    # Create medicine
-                    medicine = Medicine.objects.create(**medicine_data)
-                    imported_count += 1
-                    
-                    # Add to preview
-                    preview_data.append({
-                        'name': medicine.name,
-                        'generic_name': medicine.generic_name,
-                        'category': medicine.category.name,
-                        'manufacturer': medicine.manufacturer,
-                        'strength': medicine.strength,
-                        'dosage_form': medicine.dosage_form,
-                        'prescription_required': medicine.prescription_required
-                    })
-                    
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
-            
+            path = default_storage.save(
+                f"imports/{tenant.id}/{uuid.uuid4().hex}.csv", ContentFile(uploaded_file.read())
+            )
+            job = enqueue('api.tasks.import_medicines_csv', {'path': path, 'tenant_id': tenant.id},
+                          tenant=tenant, created_by=user_profile)
             return Response({
-                'message': f'Successfully imported {imported_count} medicines',
-                'imported_count': imported_count,
-                'errors': errors,
-                'preview_data': preview_data[:10]  # Show first 10 items
-            }, status=status.HTTP_200_OK)
+                'message': 'Import queued',
+                'job_id': job.id,
+                'status_url': reverse('job-detail', args=[job.id]),
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
             return Response({'error': f'CSV processing failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -151,7 +242,7 @@ class ProductImportView(APIView):
         """Import products from CSV/Excel file"""
         try:
             # Check if user has retail permissions
-            user_profile = UserProfile.objects.get(user=request.user)
+            user_profile = get_request_profile(request)
             if user_profile.role.name not in ['admin', 'retail_admin', 'retail_manager']:
                 return Response({'error': 'Retail access required'}, status=status.HTTP_403_FORBIDDEN)
             
@@ -169,7 +260,7 @@ class ProductImportView(APIView):
             
             # Process CSV file
             if file_extension == 'csv':
-                return self.process_csv_products(uploaded_file, tenant)
+                return self.process_csv_products(uploaded_file, tenant, user_profile)
             else:
                 return self.process_excel_products(uploaded_file, tenant)
                 
@@ -179,83 +270,19 @@ class ProductImportView(APIView):
             print(traceback.format_exc())
             return Response({'error': f'Import failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
-    def process_csv_products(self, uploaded_file, tenant):
-        """Process CSV file for product import"""
+    def process_csv_products(self, uploaded_file, tenant, user_profile):
+        """Queue the CSV for a background import; the summary is stored on the job"""
         try:
-            # Read CSV file
-            decoded_file = uploaded_file.read().decode('utf-8').splitlines()
-            reader = csv.DictReader(decoded_file)
-            
-            imported_count = 0
-            errors = []
-            preview_data = []
-            
-            for row_num, row in enumerate(reader, start=2):  # Start from 2 to account for header
-                try:
-                    # Validate required fields
-                    if not row.get('name'):
-                        errors.append(f"Row {row_num}: Product name is required")
-                        continue
-                    
-                    # Get or create category
-                    category_name = row.get('category', 'General')
-                    category, created = ProductCategory.objects.get_or_create(
-                        name=category_name,
-                        tenant=tenant,
-                        defaults={'description': f'Category for {category_name}'}
-                    )
-                    
-                    # Create product
-                    product_data = {
-                        'name': row.get('name'),
-                        'description': row.get('description', ''),
-                        'category': category,
-                        'manufacturer': row.get('manufacturer', ''),
-                        'sku': row.get('sku', ''),
-                        'barcode': row.get('barcode', ''),
-                        'unit_price': Decimal(row.get('unit_price', '0.00')),
-                        'cost_price': Decimal(row.get('cost_price', '0.00')),
-                        'reorder_level': int(row.get('reorder_level', 0)),
-                        'current_stock': int(row.get('current_stock', 0)),
-                        'location': row.get('location', ''),
-                        'tenant': tenant
-                    }
-                    
-                    # Check if product already exists
-                    existing_product = Product.objects.filter(
-                        name=product_data['name'],
-                        sku=product_data['sku'],
-                        tenant=tenant
-                    ).first()
-                    
-                    if existing_product:
-                        errors.append(f"Row {row_num}: Product '{product_data['name']}' already exists")
-                        continue
-                    
-                    # Create product
-                    product = Product.objects.create(**product_data)
-                    imported_count += 1
-                    
-                    # Add to preview
-                    preview_data.append({
-                        'name': product.name,
-                        'description': product.description,
-                        'category': product.category.name,
-                        'manufacturer': product.manufacturer,
-                        'sku': product.sku,
-                        'unit_price': float(product.unit_price),
-                        'current_stock': product.current_stock
-                    })
-                    
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
-            
+            path = default_storage.save(
+                f"imports/{tenant.id}/{uuid.uuid4().hex}.csv", ContentFile(uploaded_file.read())
+            )
+            job = enqueue('api.tasks.import_products_csv', {'path': path, 'tenant_id': tenant.id},
+                          tenant=tenant, created_by=user_profile)
             return Response({
-                'message': f'Successfully imported {imported_count} products',
-                'imported_count': imported_count,
-                'errors': errors,
-                'preview_data': preview_data[:10]  # Show first 10 items
-            }, status=status.HTTP_200_OK)
+                'message': 'Import queued',
+                'job_id': job.id,
+                'status_url': reverse('job-detail', args=[job.id]),
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
             return Response({'error': f'CSV processing failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
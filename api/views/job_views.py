@@ -0,0 +1,124 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.core.files.storage import default_storage
+from django.http import FileResponse
+
+from api.models.user import UserProfile
+from api.models.jobs import Job
+from api.utils.tenant_context import get_request_profile
+from api.utils.jobs import cancel_job
+from api.serializers import JobSerializer
+
+# Roles that see, cancel and download every job of the tenant; others only their own
+JOB_ADMIN_ROLES = ('admin', 'principal')
+
+
+def visible_jobs(profile):
+    """Jobs the profile may see: all of the tenant's for admins, otherwise the ones it queued"""
+    jobs = Job.objects.filter(tenant=profile.tenant)
+    if not profile.role or profile.role.name not in JOB_ADMIN_ROLES:
+        jobs = jobs.filter(created_by=profile)
+    return jobs
+
+
+class JobListView(APIView):
+    """
+    List background jobs of the current tenant (admins and principals see
+    every job, other roles only the jobs they queued)
+    Supports filtering by status and task, newest first
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            profile = get_request_profile(request)
+            jobs = visible_jobs(profile).select_related('created_by__user')
+
+            status_filter = request.query_params.get('status')
+            if status_filter:
+                jobs = jobs.filter(status=status_filter)
+            task = request.query_params.get('task')
+            if task:
+                jobs = jobs.filter(task__endswith=task)
+
+            page_size = min(int(request.query_params.get('page_size', 20)), 100)
+            page = int(request.query_params.get('page', 1))
+            start = (page - 1) * page_size
+            end = start + page_size
+            total_count = jobs.count()
+
+            return Response({
+                'jobs': JobSerializer(jobs.order_by('-created_at')[start:end], many=True).data,
+                'total_count': total_count,
+                'page': page,
+                'page_size': page_size,
+                'has_next': end < total_count,
+                'has_previous': page > 1
+            })
+        except UserProfile.DoesNotExist:
+            return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class JobDetailView(APIView):
+    """Status, progress and result of one job"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        try:
+            profile = get_request_profile(request)
+            job = visible_jobs(profile).select_related('created_by__user').get(id=job_id)
+            return Response(JobSerializer(job).data)
+        except (Job.DoesNotExist, UserProfile.DoesNotExist):
+            return Response({'error': 'Job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class JobCancelView(APIView):
+    """Cancel a job that is still queued"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, job_id):
+        try:
+            profile = get_request_profile(request)
+            job = visible_jobs(profile).get(id=job_id)
+            if not cancel_job(job):
+                return Response({'error': 'Only queued jobs can be cancelled.'}, status=status.HTTP_409_CONFLICT)
+            job.refresh_from_db()
+            return Response(JobSerializer(job).data)
+        except (Job.DoesNotExist, UserProfile.DoesNotExist):
+            return Response({'error': 'Job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class JobDownloadView(APIView):
+    """Download the file produced by a finished job (PDFs, exports)"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        try:
+            profile = get_request_profile(request)
+            job = visible_jobs(profile).get(id=job_id, status='succeeded')
+        except (Job.DoesNotExist, UserProfile.DoesNotExist):
+            return Response({'error': 'Job not found or not finished.'}, status=status.HTTP_404_NOT_FOUND)
+
+        result = job.result if isinstance(job.result, dict) else {}
+        path = result.get('file')
+        if not path or not default_storage.exists(path):
+            return Response({'error': 'This job has no downloadable file.'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(
+            default_storage.open(path, 'rb'),
+            as_attachment=True,
+            filename=result.get('filename') or path.rsplit('/', 1)[-1],
+            content_type=result.get('content_type') or 'application/octet-stream',
+        )
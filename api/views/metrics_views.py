@@ -0,0 +1,20 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from api.utils.request_metrics import render_prometheus
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of per-route request metrics.
+    Requires `Authorization: Bearer <METRICS_AUTH_TOKEN>` when the token is set;
+    without a token the endpoint is only served in DEBUG.
+    """
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if token:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not hmac.compare_digest(header, f"Bearer {token}"):
+            return JsonResponse({'error': 'Access denied'}, status=403)
+    elif not settings.DEBUG:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -8,6 +8,8 @@ from django.db.models import Q, Count
 from datetime import timedelta
 
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
+from api.utils.pagination import KeysetPaginator, InvalidCursor, estimate_count, wants_count, wants_cursor
 from api.models.notifications import (
     Notification, NotificationPreference, NotificationTemplate, NotificationLog
 )
@@ -27,7 +29,7 @@ class NotificationListView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             notifications = Notification.objects.filter(user=request.user, tenant=profile.tenant)
             
             # Filter by read status
@@ -61,6 +63,27 @@ class NotificationListView(APIView):
             # Order by created_at (newest first)
             notifications = notifications.order_by('-created_at')
             
+            # Keyset pagination (`?cursor=`): no OFFSET and no count unless include_count=true
+            if wants_cursor(request):
+                page = KeysetPaginator(ordering='-created_at', page_size=20).paginate(notifications, request)
+                data = {
+                    'notifications': NotificationSerializer(page.items, many=True).data,
+                    'next_cursor': page.next_cursor,
+                    'previous_cursor': page.previous_cursor,
+                    'has_next': page.has_next,
+                    'has_previous': page.has_previous,
+                }
+                if wants_count(request):
+                    # The expiry filter embeds now(), so key the cached total on the filters instead
+                    filters = sorted(
+                        (name, value) for name, value in request.query_params.items()
+                        if name not in ('cursor', 'page_size', 'include_count')
+                    )
+                    data['total_count'], data['count_is_estimate'] = estimate_count(
+                        notifications, key=f"notifications:{profile.tenant_id}:{request.user.id}:{filters}"
+                    )
+                return Response(data)
+
             # Pagination
             page_size = int(request.query_params.get('page_size', 20))
             page = int(request.query_params.get('page', 1))
@@ -82,6 +105,8 @@ class NotificationListView(APIView):
             })
         except UserProfile.DoesNotExist:
             return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -181,7 +206,7 @@ class NotificationMarkAllReadView(APIView):
 
     def post(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             notifications = Notification.objects.filter(
                 user=request.user,
                 tenant=profile.tenant,
@@ -212,7 +237,7 @@ class NotificationStatsView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             notifications = Notification.objects.filter(user=request.user, tenant=profile.tenant)
             
             # Exclude expired
@@ -275,7 +300,7 @@ class NotificationPreferenceView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             preference, created = NotificationPreference.objects.get_or_create(
                 user=request.user,
                 defaults={'tenant': profile.tenant}
@@ -290,7 +315,7 @@ class NotificationPreferenceView(APIView):
     def put(self, request):
         """Update notification preferences"""
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             preference, created = NotificationPreference.objects.get_or_create(
                 user=request.user,
                 defaults={'tenant': profile.tenant}
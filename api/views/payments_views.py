@@ -12,6 +12,7 @@ from rest_framework.decorators import api_view, permission_classes, authenticati
 import hmac
 import hashlib
 from api.models.user import UserProfile, Tenant
+from api.utils.tenant_context import get_request_profile
 from api.models.plan import Plan
 from api.models.payments import PaymentTransaction
 from django.utils import timezone
@@ -89,7 +90,7 @@ class RazorpayPaymentVerifyView(APIView):
             if generated_signature == signature:
                 # Activate user plan
                 try:
-                    profile = UserProfile._default_manager.get(user=request.user)
+                    profile = get_request_profile(request)
                 except UserProfile._default_manager.model.DoesNotExist:
                     return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
                 tenant = profile.tenant
@@ -183,7 +184,7 @@ class PaymentTransactionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def destroy(self, request, *args, **kwargs):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if not profile.role or profile.role.name != 'admin':
             return Response({'error': 'Permission denied.'}, status=403)
         return super().destroy(request, *args, **kwargs)
@@ -198,7 +199,7 @@ class PaymentReceiptPDFView(APIView):
         logger = logging.getLogger(__name__)
         
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             transaction = PaymentTransaction._default_manager.get(id=pk)
             
             # Check permissions - user can only download their own receipts or admin can download any
@@ -19,7 +19,8 @@ try:
 except ImportError:
     pass
 
-from api.models.user import Tenant, UserProfile
+from api.models.user import Tenant
+from api.utils.tenant_context import get_request_profile
 import logging
 
 logger = logging.getLogger(__name__)
@@ -694,7 +695,7 @@ class MedicineExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('pharmacy')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         medicines = Medicine._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
@@ -792,7 +793,7 @@ class PharmacySaleExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('pharmacy')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         sales = Sale._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
@@ -873,7 +874,7 @@ class PharmacyPurchaseOrderExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('pharmacy')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         purchase_orders = PurchaseOrder._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
@@ -954,7 +955,7 @@ class PharmacyInventoryExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('pharmacy')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         batches = MedicineBatch._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
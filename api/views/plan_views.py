@@ -3,7 +3,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from api.models.user import UserProfile, Tenant
+from api.models.user import Tenant
+from api.utils.tenant_context import get_request_profile
 from rest_framework import status
 from api.models.plan import Plan
 from api.utils.subscription_utils import handle_user_limit_exceeded, reactivate_suspended_users
@@ -141,7 +142,7 @@ class PlanChangeView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        profile = UserProfile.objects.get(user=request.user)
+        profile = get_request_profile(request)
         if not profile.role or profile.role.name != "admin":
             return Response({"error": "Only admins can change the plan."}, status=status.HTTP_403_FORBIDDEN)
         tenant = profile.tenant
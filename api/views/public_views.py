@@ -1,14 +1,13 @@
 import os
 import requests
-from time import time
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.core.cache import cache
 from api.models.user import Tenant
+from api.utils.rate_limit import RateLimitRule, get_rate_limiter
 from salon.models import Service as SalonService, Stylist as SalonStylist, Appointment as SalonAppointment
 from django.db import transaction
 from datetime import datetime, timedelta
@@ -69,22 +68,8 @@ def verify_recaptcha(request):
 
 def check_rate_limit(request, key_prefix: str, limit: int = 10, window_seconds: int = 60):
 	ip = request.META.get('REMOTE_ADDR', 'unknown')
-	cache_key = f"rl:{key_prefix}:{ip}"
-	data = cache.get(cache_key)
-	now = int(time())
-	if not data:
-		cache.set(cache_key, { 'start': now, 'count': 1 }, window_seconds)
-		return True
-	start = data.get('start', now)
-	count = data.get('count', 0)
-	if now - start >= window_seconds:
-		cache.set(cache_key, { 'start': now, 'count': 1 }, window_seconds)
-		return True
-	if count + 1 > limit:
-		return False
-	data['count'] = count + 1
-	cache.set(cache_key, data, window_seconds - (now - start))
-	return True
+	rule = RateLimitRule(key_prefix, limit, window_seconds)
+	return get_rate_limiter().hit(f"public:{ip}", [rule]).allowed
 
 
 
@@ -13,6 +13,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.models.user import UserProfile, Tenant
+from api.utils.tenant_context import get_request_profile
 from django.utils import timezone
 import hmac
 import hashlib
@@ -29,7 +30,7 @@ class RazorpaySetupStatusView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             setup_status = {
@@ -96,7 +97,7 @@ class RazorpaySetupView(APIView):
 
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             # Check if user is admin
@@ -162,7 +163,7 @@ class RazorpaySetupGuideView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             guide = {
@@ -289,7 +290,7 @@ class RazorpayCreateOrderView(APIView):
             }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             # Check if Razorpay is configured
@@ -376,7 +377,7 @@ class RazorpayVerifyPaymentView(APIView):
 
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             if not tenant.has_razorpay_configured():
@@ -854,7 +855,7 @@ class EducationFeePaymentView(APIView):
 
     def post(self, request, payment_id):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile or not profile.tenant:
                 return Response({
                     'error': 'User profile or tenant not found. Please contact support.'
@@ -970,7 +971,7 @@ class RestaurantOrderPaymentView(APIView):
 
     def post(self, request, order_id):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile or not profile.tenant:
                 return Response({
                     'error': 'User profile or tenant not found. Please contact support.'
@@ -1084,7 +1085,7 @@ class SalonAppointmentPaymentView(APIView):
 
     def post(self, request, appointment_id):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile or not profile.tenant:
                 return Response({
                     'error': 'User profile or tenant not found. Please contact support.'
@@ -1199,7 +1200,7 @@ class PharmacySalePaymentView(APIView):
 
     def post(self, request, sale_id):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile or not profile.tenant:
                 return Response({
                     'error': 'User profile or tenant not found. Please contact support.'
@@ -1313,7 +1314,7 @@ class RetailSalePaymentView(APIView):
 
     def post(self, request, sale_id):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile or not profile.tenant:
                 return Response({
                     'error': 'User profile or tenant not found. Please contact support.'
@@ -1425,7 +1426,7 @@ class HotelBookingPaymentView(APIView):
 
     def post(self, request, booking_id):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             if not profile or not profile.tenant:
                 return Response({
                     'error': 'User profile or tenant not found. Please contact support.'
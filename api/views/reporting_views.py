@@ -8,6 +8,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
 from education.models import (
     ReportTemplate, ReportField, ReportCard, MarksEntry, Attendance, 
     Student, Class, AcademicYear, Term, Subject, FeePayment
@@ -34,7 +35,7 @@ class ReportFieldListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             fields = ReportField.objects.filter(tenant=profile.tenant, is_active=True)
             serializer = ReportFieldSerializer(fields, many=True)
             return Response(serializer.data)
@@ -44,7 +45,7 @@ class ReportFieldListCreateView(APIView):
     @role_required('admin', 'principal')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             serializer = ReportFieldSerializer(data=request.data)
             if serializer.is_valid():
                 serializer.save(tenant=profile.tenant)
@@ -61,7 +62,7 @@ class ReportFieldDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             field = ReportField.objects.get(id=pk, tenant=profile.tenant)
             serializer = ReportFieldSerializer(field)
             return Response(serializer.data)
@@ -71,7 +72,7 @@ class ReportFieldDetailView(APIView):
     @role_required('admin', 'principal')
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             field = ReportField.objects.get(id=pk, tenant=profile.tenant)
             serializer = ReportFieldSerializer(field, data=request.data, partial=True)
             if serializer.is_valid():
@@ -84,7 +85,7 @@ class ReportFieldDetailView(APIView):
     @role_required('admin', 'principal')
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             field = ReportField.objects.get(id=pk, tenant=profile.tenant)
             field.is_active = False
             field.save()
@@ -104,7 +105,7 @@ class ReportTemplateListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             templates = ReportTemplate.objects.filter(
                 tenant=profile.tenant,
                 is_active=True
@@ -119,7 +120,7 @@ class ReportTemplateListCreateView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             data = request.data.copy()
             data['created_by'] = profile.id
             serializer = ReportTemplateSerializer(data=data)
@@ -138,7 +139,7 @@ class ReportTemplateDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             template = ReportTemplate.objects.get(
                 id=pk,
                 tenant=profile.tenant,
@@ -156,7 +157,7 @@ class ReportTemplateDetailView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             template = ReportTemplate.objects.get(id=pk, tenant=profile.tenant)
             
             # Check permissions
@@ -174,7 +175,7 @@ class ReportTemplateDetailView(APIView):
     @role_required('admin', 'principal', 'teacher')
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             template = ReportTemplate.objects.get(id=pk, tenant=profile.tenant)
             
             # Check permissions
@@ -199,7 +200,7 @@ class CustomReportBuilderView(APIView):
     
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             # Validate request data
@@ -427,7 +428,7 @@ class ComparativeAnalysisView(APIView):
     
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             # Get comparison parameters
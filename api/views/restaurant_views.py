@@ -8,6 +8,9 @@ from django.db.models import Q, Count, Sum, Avg, F
 from django.utils import timezone
 from datetime import datetime, timedelta
 from api.models.user import Tenant, UserProfile
+from api.utils.tenant_context import get_request_profile
+from api.utils.jobs import enqueue
+from api.utils.pdf_cache import cached_pdf_response
 from restaurant.models import MenuCategory, MenuItem, Table, Order, OrderItem, ExternalAPIIntegration, MenuSyncLog
 from api.serializers import (
 	MenuCategorySerializer, MenuItemSerializer, TableSerializer, OrderSerializer, OrderItemSerializer,
@@ -17,7 +20,7 @@ from api.serializers import (
 import requests
 import logging
 from decimal import Decimal
-from django.http import HttpResponse
+from django.urls import reverse
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
@@ -208,7 +211,7 @@ class RestaurantOrderInvoiceView(APIView):
 
 	def get(self, request, pk):
 		try:
-			profile = UserProfile._default_manager.get(user=request.user)
+			profile = get_request_profile(request)
 			tenant = profile.tenant
 			order = Order.objects.select_related('table').prefetch_related('items', 'items__menu_item').get(id=pk, tenant=tenant)
 		except UserProfile.DoesNotExist:
@@ -216,6 +219,12 @@ class RestaurantOrderInvoiceView(APIView):
 		except Order.DoesNotExist:
 			return Response({'error': 'Order not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+		return cached_pdf_response(
+			request, 'restaurant_invoice', order, [order, order.table, [(item, item.menu_item) for item in order.items.all()]],
+			lambda: self.render_pdf(order), f"restaurant_invoice_{order.id}.pdf",
+		)
+
+	def render_pdf(self, order):
 		buffer = BytesIO()
 		p = canvas.Canvas(buffer, pagesize=A4)
 		width, height = A4
@@ -288,9 +297,7 @@ class RestaurantOrderInvoiceView(APIView):
 		p.save()
 		buffer.seek(0)
 
-		response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-		response['Content-Disposition'] = f'attachment; filename="restaurant_invoice_{order.id}.pdf"'
-		return response
+		return buffer.getvalue()
 
 
 class RestaurantAnalyticsView(APIView):
@@ -575,11 +582,14 @@ class MenuSyncView(APIView):
 			return Response({'error': 'Integration not found or inactive'}, status=status.HTTP_404_NOT_FOUND)
 		
 		try:
-			result = sync_menu_from_api(integration)
+			# The external API call and item upserts run on a job worker
+			job = enqueue('api.tasks.sync_menu', {'integration_id': integration.id},
+						  tenant=integration.tenant, created_by=get_request_profile(request))
 			return Response({
-				'message': 'Menu synced successfully',
-				'result': result
-			})
+				'message': 'Menu sync queued',
+				'job_id': job.id,
+				'status_url': reverse('job-detail', args=[job.id])
+			}, status=status.HTTP_202_ACCEPTED)
 		except Exception as e:
 			logger.error(f"Menu sync error: {str(e)}", exc_info=True)
 			return Response({
@@ -940,50 +950,68 @@ def sync_menu_from_api(integration):
 
 
 def send_order_webhook(order):
-	"""Send order webhook to external API if configured"""
+	"""
+	Queue one webhook delivery job per configured integration (delivery runs
+	on a worker). The payload is captured now, so a delayed or retried
+	delivery reports the order as it was when the event happened.
+	"""
 	integrations = ExternalAPIIntegration.objects.filter(
 		tenant=order.tenant,
 		is_active=True,
 		webhook_url__isnull=False
 	).exclude(webhook_url='')
 	
+	payload = None
 	for integration in integrations:
 		try:
-			headers = {
-				'Content-Type': 'application/json',
-			}
-			if integration.webhook_secret:
-				headers['X-Webhook-Secret'] = integration.webhook_secret
-			
-			payload = {
-				'order_id': order.id,
-				'order_number': f"ORD-{order.id:06d}",
-				'status': order.status,
-				'customer_name': order.customer_name,
-				'customer_phone': order.customer_phone,
-				'customer_email': order.customer_email,
-				'delivery_address': order.delivery_address,
-				'order_type': order.order_type,
-				'total_amount': str(order.total_amount),
-				'items': [
-					{
-						'menu_item_id': item.menu_item.id,
-						'name': item.menu_item.name,
-						'quantity': item.quantity,
-						'price': str(item.price)
-					}
-					for item in order.items.all()
-				],
-				'created_at': order.created_at.isoformat()
-			}
-			
-			response = requests.post(
-				integration.webhook_url,
-				json=payload,
-				headers=headers,
-				timeout=10
-			)
-			response.raise_for_status()
-			logger.info(f"Webhook sent successfully for order {order.id} to {integration.name}")
+			if payload is None:
+				payload = order_webhook_payload(order)
+			enqueue('api.tasks.deliver_order_webhook',
+					{'payload': payload, 'integration_id': integration.id},
+					tenant=order.tenant, priority=10, max_attempts=5)
 		except Exception as e:
-			logger.error(f"Webhook failed for order {order.id}: {str(e)}")
+			logger.error(f"Could not queue webhook for order {order.id}: {str(e)}")
+
+
+def order_webhook_payload(order):
+	"""JSON body describing an order for webhook integrations"""
+	return {
+		'order_id': order.id,
+		'order_number': f"ORD-{order.id:06d}",
+		'status': order.status,
+		'customer_name': order.customer_name,
+		'customer_phone': order.customer_phone,
+		'customer_email': order.customer_email,
+		'delivery_address': order.delivery_address,
+		'order_type': order.order_type,
+		'total_amount': str(order.total_amount),
+		'items': [
+			{
+				'menu_item_id': item.menu_item.id,
+				'name': item.menu_item.name,
+				'quantity': item.quantity,
+				'price': str(item.price)
+			}
+			for item in order.items.select_related('menu_item')
+		],
+		'created_at': order.created_at.isoformat()
+	}
+
+
+def post_order_webhook(payload, integration):
+	"""POST an order payload to one integration; raises on failure so the job is retried"""
+	headers = {
+		'Content-Type': 'application/json',
+	}
+	if integration.webhook_secret:
+		headers['X-Webhook-Secret'] = integration.webhook_secret
+	
+	response = requests.post(
+		integration.webhook_url,
+		json=payload,
+		headers=headers,
+		timeout=10
+	)
+	response.raise_for_status()
+	logger.info(f"Webhook sent successfully for order {payload['order_id']} to {integration.name}")
+	return response.status_code
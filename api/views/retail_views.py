@@ -21,7 +21,9 @@ try:
 except ImportError:
     pass
 
-from api.models.user import Tenant, UserProfile
+from api.models.user import Tenant
+from api.utils.tenant_context import get_request_profile
+from api.utils.pdf_cache import cached_pdf_response
 from retail.models import (
     ProductCategory, Supplier, Product, Warehouse, Inventory, Customer,
     PurchaseOrder, PurchaseOrderItem, GoodsReceipt, GoodsReceiptItem,
@@ -958,6 +960,12 @@ class RetailSaleInvoiceView(APIView):
         except Sale.DoesNotExist:
             return Response({'error': 'Sale not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+        return cached_pdf_response(
+            request, 'retail_invoice', sale, [sale, sale.customer, sale.warehouse, [(item, item.product) for item in sale.items.all()]],
+            lambda: self.render_pdf(sale), f"retail_sale_{sale.invoice_number}.pdf",
+        )
+
+    def render_pdf(self, sale):
         buffer = BytesIO()
         p = canvas.Canvas(buffer, pagesize=A4)
         width, height = A4
@@ -1031,9 +1039,7 @@ class RetailSaleInvoiceView(APIView):
         p.save()
         buffer.seek(0)
 
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="retail_sale_{sale.invoice_number}.pdf"'
-        return response
+        return buffer.getvalue()
 
 # Check-in/Check-out Views
 class StaffAttendanceCheckInView(APIView):
@@ -1091,7 +1097,7 @@ class RetailProductExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('retail')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         products = Product._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
@@ -1186,7 +1192,7 @@ class RetailSaleExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('retail')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         sales = Sale._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
@@ -1267,7 +1273,7 @@ class RetailPurchaseOrderExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('retail')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         purchase_orders = PurchaseOrder._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
@@ -1348,7 +1354,7 @@ class RetailInventoryExportView(APIView):
     permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('retail')]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         inventory_items = Inventory._default_manager.filter(tenant=profile.tenant)
         
         # Filtering
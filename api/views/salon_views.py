@@ -9,9 +9,10 @@ from django.db.models import Q, Count, Sum, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta
 from api.models.user import Tenant, UserProfile
+from api.utils.tenant_context import get_request_profile
+from api.utils.pdf_cache import cached_pdf_response
 from salon.models import ServiceCategory, Service, Stylist, Appointment
 from api.serializers import ServiceCategorySerializer, ServiceSerializer, StylistSerializer, AppointmentSerializer
-from django.http import HttpResponse
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
@@ -465,7 +466,7 @@ class SalonAppointmentInvoiceView(APIView):
 
 	def get(self, request, pk):
 		try:
-			profile = UserProfile._default_manager.get(user=request.user)
+			profile = get_request_profile(request)
 			tenant = profile.tenant
 			appointment = Appointment.objects.select_related('service', 'stylist').get(id=pk, tenant=tenant)
 		except UserProfile.DoesNotExist:
@@ -473,6 +474,12 @@ class SalonAppointmentInvoiceView(APIView):
 		except Appointment.DoesNotExist:
 			return Response({'error': 'Appointment not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+		return cached_pdf_response(
+			request, 'salon_invoice', appointment, [appointment, appointment.service, appointment.stylist],
+			lambda: self.render_pdf(appointment), f"salon_invoice_{appointment.id}.pdf",
+		)
+
+	def render_pdf(self, appointment):
 		buffer = BytesIO()
 		p = canvas.Canvas(buffer, pagesize=A4)
 		width, height = A4
@@ -530,6 +537,4 @@ class SalonAppointmentInvoiceView(APIView):
 		p.save()
 		buffer.seek(0)
 
-		response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-		response['Content-Disposition'] = f'attachment; filename="salon_invoice_{appointment.id}.pdf"'
-		return response
+		return buffer.getvalue()
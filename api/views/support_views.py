@@ -6,6 +6,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from api.models.permissions import IsTenantMember
+from api.utils.tenant_context import get_request_profile
 from api.models.support import SupportTicket, TicketResponse, TicketSLA
 from django.contrib.auth.models import User
 from django.db.models import Q
@@ -123,7 +124,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
         from datetime import timedelta
         
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             tickets = SupportTicket.objects.filter(tenant=tenant)
@@ -9,8 +9,13 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from api.models.user import UserProfile
-from education.models import Period, Room, Timetable, Holiday, SubstituteTeacher
-from api.models.permissions import HasFeaturePermissionFactory
+from api.utils.tenant_context import get_request_profile
+from api.utils.jobs import enqueue
+from api.utils.timetable_generator import generate_timetable
+from api.utils.timetable_index import get_timetable_index
+from django.urls import reverse
+from education.models import AcademicYear, Period, Room, Timetable, Holiday, SubstituteTeacher
+from api.models.permissions import HasFeaturePermissionFactory, role_required
 from api.models.serializers_education import (
     PeriodSerializer, RoomSerializer, TimetableSerializer, TimetableDetailSerializer,
     HolidaySerializer, SubstituteTeacherSerializer
@@ -25,7 +30,7 @@ class PeriodListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             periods = Period.objects.filter(tenant=profile.tenant, is_active=True).order_by('order', 'start_time')
             serializer = PeriodSerializer(periods, many=True)
             return Response(serializer.data)
@@ -34,7 +39,7 @@ class PeriodListCreateView(APIView):
     
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             
             # Prepare data with proper formatting
             data = request.data.copy()
@@ -94,7 +99,7 @@ class PeriodDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             period = Period.objects.get(id=pk, tenant=profile.tenant)
             serializer = PeriodSerializer(period)
             return Response(serializer.data)
@@ -105,7 +110,7 @@ class PeriodDetailView(APIView):
     
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             period = Period.objects.get(id=pk, tenant=profile.tenant)
             
             # Prepare data with proper formatting
@@ -163,7 +168,7 @@ class PeriodDetailView(APIView):
     
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             period = Period.objects.get(id=pk, tenant=profile.tenant)
             period.delete()
             return Response({'message': 'Period deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
@@ -178,7 +183,7 @@ class RoomListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             rooms = Room.objects.filter(tenant=profile.tenant, is_active=True).order_by('name')
             serializer = RoomSerializer(rooms, many=True)
             return Response(serializer.data)
@@ -187,7 +192,7 @@ class RoomListCreateView(APIView):
     
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             serializer = RoomSerializer(data=request.data)
             if serializer.is_valid():
                 serializer.save(tenant=profile.tenant)
@@ -203,7 +208,7 @@ class RoomDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             room = Room.objects.get(id=pk, tenant=profile.tenant)
             serializer = RoomSerializer(room)
             return Response(serializer.data)
@@ -212,7 +217,7 @@ class RoomDetailView(APIView):
     
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             room = Room.objects.get(id=pk, tenant=profile.tenant)
             serializer = RoomSerializer(room, data=request.data, partial=True)
             if serializer.is_valid():
@@ -224,7 +229,7 @@ class RoomDetailView(APIView):
     
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             room = Room.objects.get(id=pk, tenant=profile.tenant)
             room.delete()
             return Response({'message': 'Room deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
@@ -239,7 +244,7 @@ class TimetableListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             # Filter parameters
@@ -267,7 +272,7 @@ class TimetableListCreateView(APIView):
     
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
             # Check for conflicts
@@ -327,7 +332,7 @@ class TimetableDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             timetable = Timetable.objects.select_related('academic_year', 'class_obj', 'period', 'subject', 'teacher__user', 'room').get(id=pk, tenant=profile.tenant)
             serializer = TimetableDetailSerializer(timetable)
             return Response(serializer.data)
@@ -336,7 +341,7 @@ class TimetableDetailView(APIView):
     
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             timetable = Timetable.objects.get(id=pk, tenant=tenant)
             
@@ -392,7 +397,7 @@ class TimetableDetailView(APIView):
     
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             timetable = Timetable.objects.get(id=pk, tenant=profile.tenant)
             timetable.delete()
             return Response({'message': 'Timetable entry deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
@@ -407,7 +412,7 @@ class TimetableByClassView(APIView):
     
     def get(self, request, class_id):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             academic_year_id = request.query_params.get('academic_year')
             
             if not academic_year_id:
@@ -433,6 +438,87 @@ class TimetableByClassView(APIView):
             return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
 
 
+class GenerateTimetableView(APIView):
+    """
+    Generate a conflict-free weekly timetable for an academic year.
+    
+    Body:
+    {
+        "academic_year": 1,
+        "requirements": [{"class": 1, "subject": 2, "periods_per_week": 5, "teacher": 3, "room": 4}],
+        "days": ["monday", ...],  # Optional: defaults to TIMETABLE_WORKING_DAYS
+        "replace": false,  # Optional: drop the classes' existing entries instead of keeping them
+        "time_budget": 10,  # Optional: solver seconds, capped at TIMETABLE_SOLVER_SECONDS
+        "dry_run": false  # Optional: solve without writing (or ?dry_run=1)
+    }
+    
+    The timetable is written only when every period could be placed;
+    otherwise the response lists what could not be placed and nothing
+    changes. With ?async=1 generation runs on a job worker and returns 202.
+    """
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated, HasFeaturePermissionFactory('education')]
+    
+    @role_required('admin', 'principal')
+    def post(self, request):
+        try:
+            profile = get_request_profile(request)
+            data = request.data
+            dry_run = str(data.get('dry_run', request.query_params.get('dry_run', ''))).lower() in ('1', 'true')
+            replace = str(data.get('replace', '')).lower() in ('1', 'true')
+            requirements = data.get('requirements') or []
+            days = data.get('days') or None
+            time_budget = data.get('time_budget')
+            
+            if not data.get('academic_year'):
+                return Response({'error': 'academic_year is required.'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                academic_year = AcademicYear.objects.get(id=data.get('academic_year'), tenant=profile.tenant)
+            except (AcademicYear.DoesNotExist, ValueError):
+                return Response({'error': 'Academic year not found.'}, status=status.HTTP_404_NOT_FOUND)
+            try:
+                time_budget = float(time_budget) if time_budget else None
+            except (TypeError, ValueError):
+                return Response({'error': 'time_budget must be a number of seconds.'}, status=status.HTTP_400_BAD_REQUEST)
+            if not isinstance(requirements, list) or (days is not None and not isinstance(days, list)):
+                return Response({'error': 'requirements and days must be lists.'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            if request.query_params.get('async') in ('1', 'true') and not dry_run:
+                job = enqueue('api.tasks.generate_timetable', {
+                    'academic_year_id': academic_year.id,
+                    'requirements': requirements,
+                    'days': days,
+                    'replace': replace,
+                    'time_budget': time_budget,
+                }, tenant=profile.tenant, created_by=profile)
+                return Response({
+                    'message': 'Timetable generation queued',
+                    'job_id': job.id,
+                    'status_url': reverse('job-detail', args=[job.id]),
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            try:
+                result = generate_timetable(profile.tenant, academic_year, requirements, days=days,
+                                            replace=replace, time_budget=time_budget, dry_run=dry_run)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            if not result['complete']:
+                return Response({
+                    'error': 'Could not place every period within the time budget. Nothing was written.',
+                    **result
+                }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            return Response(result, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+        except UserProfile.DoesNotExist:
+            return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error generating timetable: {str(e)}", exc_info=True)
+            return Response({
+                'error': f'Failed to generate timetable: {str(e)}',
+                'details': 'Please check server logs for more information.'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # Holiday Views
 class HolidayListCreateView(APIView):
     authentication_classes = [JWTAuthentication]
@@ -440,7 +526,7 @@ class HolidayListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             academic_year_id = request.query_params.get('academic_year')
             
             queryset = Holiday.objects.filter(tenant=profile.tenant)
@@ -455,7 +541,7 @@ class HolidayListCreateView(APIView):
     
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             serializer = HolidaySerializer(data=request.data)
             if serializer.is_valid():
                 serializer.save(tenant=profile.tenant)
@@ -471,7 +557,7 @@ class HolidayDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             holiday = Holiday.objects.get(id=pk, tenant=profile.tenant)
             serializer = HolidaySerializer(holiday)
             return Response(serializer.data)
@@ -480,7 +566,7 @@ class HolidayDetailView(APIView):
     
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             holiday = Holiday.objects.get(id=pk, tenant=profile.tenant)
             serializer = HolidaySerializer(holiday, data=request.data, partial=True)
             if serializer.is_valid():
@@ -492,7 +578,7 @@ class HolidayDetailView(APIView):
     
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             holiday = Holiday.objects.get(id=pk, tenant=profile.tenant)
             holiday.delete()
             return Response({'message': 'Holiday deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
@@ -507,7 +593,7 @@ class SubstituteTeacherListCreateView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             date_from = request.query_params.get('date_from')
             date_to = request.query_params.get('date_to')
             
@@ -526,7 +612,7 @@ class SubstituteTeacherListCreateView(APIView):
     
     def post(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             serializer = SubstituteTeacherSerializer(data=request.data)
             if serializer.is_valid():
                 serializer.save(tenant=profile.tenant)
@@ -542,7 +628,7 @@ class SubstituteTeacherDetailView(APIView):
     
     def get(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             substitute = SubstituteTeacher.objects.select_related('timetable__class_obj', 'timetable__period', 'timetable__subject', 'original_teacher__user', 'substitute_teacher__user').get(id=pk, tenant=profile.tenant)
             serializer = SubstituteTeacherSerializer(substitute)
             return Response(serializer.data)
@@ -551,7 +637,7 @@ class SubstituteTeacherDetailView(APIView):
     
     def put(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             substitute = SubstituteTeacher.objects.get(id=pk, tenant=profile.tenant)
             serializer = SubstituteTeacherSerializer(substitute, data=request.data, partial=True)
             if serializer.is_valid():
@@ -563,7 +649,7 @@ class SubstituteTeacherDetailView(APIView):
     
     def delete(self, request, pk):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             substitute = SubstituteTeacher.objects.get(id=pk, tenant=profile.tenant)
             substitute.delete()
             return Response({'message': 'Substitute assignment deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
@@ -571,6 +657,43 @@ class SubstituteTeacherDetailView(APIView):
             return Response({'error': 'Substitute assignment not found.'}, status=status.HTTP_404_NOT_FOUND)
 
 
+def _slot_params(request, *required):
+    """(academic_year id, day, period id) from the query string, or an error Response"""
+    params = [request.query_params.get(name) for name in required]
+    if not all(params):
+        names = ', '.join(required[:-1]) + f', and {required[-1]}'
+        return None, Response({'error': f'{names} parameters are required.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        academic_year_id = int(request.query_params['academic_year'])
+        period_id = int(request.query_params['period'])
+    except ValueError:
+        return None, Response({'error': 'academic_year and period must be ids.'}, status=status.HTTP_400_BAD_REQUEST)
+    return (academic_year_id, request.query_params['day'], period_id), None
+
+
+def _format_teacher(teacher, assigned_ids):
+    return {
+        'id': teacher.id,
+        'name': teacher.user.get_full_name() or teacher.user.username,
+        'username': teacher.user.username,
+        'email': teacher.user.email,
+        'role': teacher.role.name if teacher.role else None,
+        'is_assigned_to_class': teacher.id in assigned_ids,
+    }
+
+
+def _format_room(room):
+    return {
+        'id': room.id,
+        'name': room.name,
+        'room_number': room.room_number,
+        'room_type': room.room_type,
+        'room_type_display': room.get_room_type_display(),
+        'capacity': room.capacity,
+        'facilities': room.facilities
+    }
+
+
 class AvailableTeachersView(APIView):
     """Get available teachers for a specific time slot (day + period)"""
     authentication_classes = [JWTAuthentication]
@@ -578,90 +701,45 @@ class AvailableTeachersView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
-            academic_year_id = request.query_params.get('academic_year')
-            day = request.query_params.get('day')
-            period_id = request.query_params.get('period')
+            slot, error = _slot_params(request, 'academic_year', 'day', 'period')
+            if error:
+                return error
+            academic_year_id, day, period_id = slot
             class_id = request.query_params.get('class', '')  # Optional: filter by class assignment
             
-            if not all([academic_year_id, day, period_id]):
-                return Response({
-                    'error': 'academic_year, day, and period parameters are required.'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
             # Get all teachers (staff members) in the tenant
             all_teachers = UserProfile.objects.filter(
                 tenant=tenant
-            ).exclude(role__name='student').select_related('user')
+            ).exclude(role__name='student').select_related('user', 'role')
             
             # If class_id is provided, prefer teachers assigned to that class
+            assigned_ids = set()
             if class_id:
-                from education.models import Class
-                try:
-                    class_obj = Class.objects.get(id=class_id, tenant=tenant)
-                    assigned_teachers = all_teachers.filter(assigned_classes=class_obj)
-                except Class.DoesNotExist:
-                    assigned_teachers = all_teachers.none()
-            else:
-                assigned_teachers = all_teachers.none()
-            
-            # Find teachers who are already busy at this time slot
-            busy_teachers = Timetable.objects.filter(
-                tenant=tenant,
-                academic_year_id=academic_year_id,
-                day=day,
-                period_id=period_id,
-                is_active=True,
-                teacher__isnull=False
-            ).values_list('teacher_id', flat=True)
-            
-            # Get available teachers (not busy)
-            available_teachers = all_teachers.exclude(id__in=busy_teachers)
+                assigned_ids = set(all_teachers.filter(
+                    assigned_classes__id=class_id, assigned_classes__tenant=tenant
+                ).values_list('id', flat=True))
             
-            # Separate assigned vs other available teachers
-            assigned_available = available_teachers.filter(id__in=assigned_teachers.values_list('id', flat=True))
-            other_available = available_teachers.exclude(id__in=assigned_teachers.values_list('id', flat=True))
+            # Teachers already busy at this time slot, with the class they teach
+            busy = get_timetable_index(tenant.id, academic_year_id).busy_teachers(day, period_id)
             
-            # Format response
-            def format_teacher(teacher):
-                return {
-                    'id': teacher.id,
-                    'name': teacher.user.get_full_name() or teacher.user.username,
-                    'username': teacher.user.username,
-                    'email': teacher.user.email,
-                    'role': teacher.role.name if teacher.role else None,
-                    'is_assigned_to_class': assigned_teachers.filter(id=teacher.id).exists() if class_id else False
-                }
+            available = [t for t in all_teachers if t.id not in busy]
             
             result = {
-                'assigned_teachers': [format_teacher(t) for t in assigned_available],
-                'other_teachers': [format_teacher(t) for t in other_available],
+                'assigned_teachers': [_format_teacher(t, assigned_ids) for t in available if t.id in assigned_ids],
+                'other_teachers': [_format_teacher(t, assigned_ids) for t in available if t.id not in assigned_ids],
                 'busy_teachers': [
                     {
                         'id': t.id,
                         'name': t.user.get_full_name() or t.user.username,
-                        'busy_with': Timetable.objects.filter(
-                            tenant=tenant,
-                            academic_year_id=academic_year_id,
-                            day=day,
-                            period_id=period_id,
-                            teacher=t,
-                            is_active=True
-                        ).first().class_obj.name if Timetable.objects.filter(
-                            tenant=tenant,
-                            academic_year_id=academic_year_id,
-                            day=day,
-                            period_id=period_id,
-                            teacher=t,
-                            is_active=True
-                        ).exists() else None
+                        'busy_with': busy[t.id]
                     }
-                    for t in UserProfile.objects.filter(id__in=busy_teachers, tenant=tenant).select_related('user')
+                    for t in UserProfile.objects.filter(id__in=list(busy), tenant=tenant).select_related('user')
                 ],
-                'total_available': available_teachers.count(),
-                'total_busy': len(busy_teachers)
+                'total_available': len(available),
+                'total_busy': len(busy)
             }
             
             return Response(result)
@@ -676,19 +754,15 @@ class AvailableRoomsView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
-            academic_year_id = request.query_params.get('academic_year')
-            day = request.query_params.get('day')
-            period_id = request.query_params.get('period')
+            slot, error = _slot_params(request, 'academic_year', 'day', 'period')
+            if error:
+                return error
+            academic_year_id, day, period_id = slot
             room_type = request.query_params.get('room_type', '')  # Optional: filter by room type
             
-            if not all([academic_year_id, day, period_id]):
-                return Response({
-                    'error': 'academic_year, day, and period parameters are required.'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
             # Get all active rooms
             all_rooms = Room.objects.filter(tenant=tenant, is_active=True)
             
@@ -696,57 +770,23 @@ class AvailableRoomsView(APIView):
             if room_type:
                 all_rooms = all_rooms.filter(room_type=room_type)
             
-            # Find rooms that are already booked at this time slot
-            booked_room_ids = Timetable.objects.filter(
-                tenant=tenant,
-                academic_year_id=academic_year_id,
-                day=day,
-                period_id=period_id,
-                is_active=True,
-                room__isnull=False
-            ).values_list('room_id', flat=True)
+            # Rooms already booked at this time slot, with the class using them
+            booked = get_timetable_index(tenant.id, academic_year_id).busy_rooms(day, period_id)
             
-            # Get available rooms
-            available_rooms = all_rooms.exclude(id__in=booked_room_ids)
-            
-            # Format response
-            def format_room(room):
-                return {
-                    'id': room.id,
-                    'name': room.name,
-                    'room_number': room.room_number,
-                    'room_type': room.room_type,
-                    'room_type_display': room.get_room_type_display(),
-                    'capacity': room.capacity,
-                    'facilities': room.facilities
-                }
+            available_rooms = [r for r in all_rooms if r.id not in booked]
             
             result = {
-                'available_rooms': [format_room(r) for r in available_rooms],
+                'available_rooms': [_format_room(r) for r in available_rooms],
                 'booked_rooms': [
                     {
                         'id': r.id,
                         'name': r.name,
-                        'booked_by': Timetable.objects.filter(
-                            tenant=tenant,
-                            academic_year_id=academic_year_id,
-                            day=day,
-                            period_id=period_id,
-                            room=r,
-                            is_active=True
-                        ).first().class_obj.name if Timetable.objects.filter(
-                            tenant=tenant,
-                            academic_year_id=academic_year_id,
-                            day=day,
-                            period_id=period_id,
-                            room=r,
-                            is_active=True
-                        ).exists() else None
+                        'booked_by': booked[r.id]
                     }
-                    for r in Room.objects.filter(id__in=booked_room_ids, tenant=tenant)
+                    for r in Room.objects.filter(id__in=list(booked), tenant=tenant)
                 ],
-                'total_available': available_rooms.count(),
-                'total_booked': len(booked_room_ids)
+                'total_available': len(available_rooms),
+                'total_booked': len(booked)
             }
             
             return Response(result)
@@ -761,60 +801,39 @@ class TimetableSuggestionsView(APIView):
     
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             
-            academic_year_id = request.query_params.get('academic_year')
+            slot, error = _slot_params(request, 'academic_year', 'class', 'day', 'period')
+            if error:
+                return error
+            academic_year_id, day, period_id = slot
             class_id = request.query_params.get('class')
-            day = request.query_params.get('day')
-            period_id = request.query_params.get('period')
             subject_id = request.query_params.get('subject', '')  # Optional: for subject-specific suggestions
-            
-            if not all([academic_year_id, class_id, day, period_id]):
-                return Response({
-                    'error': 'academic_year, class, day, and period parameters are required.'
-                }, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                class_id = int(class_id)
+            except ValueError:
+                return Response({'error': 'class must be an id.'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Get available teachers
-            all_teachers = UserProfile.objects.filter(tenant=tenant).exclude(role__name='student').select_related('user')
+            all_teachers = UserProfile.objects.filter(tenant=tenant).exclude(role__name='student').select_related('user', 'role')
             
-            # Get teachers assigned to this class (preferred)
-            from education.models import Class
-            try:
-                class_obj = Class.objects.get(id=class_id, tenant=tenant)
-                assigned_teachers = all_teachers.filter(assigned_classes=class_obj)
-            except Class.DoesNotExist:
-                assigned_teachers = all_teachers.none()
-            
-            # Find busy teachers
-            busy_teachers = Timetable.objects.filter(
-                tenant=tenant,
-                academic_year_id=academic_year_id,
-                day=day,
-                period_id=period_id,
-                is_active=True,
-                teacher__isnull=False
-            ).exclude(class_obj_id=class_id).values_list('teacher_id', flat=True)
+            # Teachers assigned to this class (preferred)
+            assigned_ids = set(all_teachers.filter(
+                assigned_classes__id=class_id, assigned_classes__tenant=tenant
+            ).values_list('id', flat=True))
             
-            available_teachers = all_teachers.exclude(id__in=busy_teachers)
-            assigned_available = available_teachers.filter(id__in=assigned_teachers.values_list('id', flat=True))
-            other_available = available_teachers.exclude(id__in=assigned_teachers.values_list('id', flat=True))
+            # Busy teachers and booked rooms, ignoring this class's own entry for the slot
+            index = get_timetable_index(tenant.id, academic_year_id)
+            busy_teachers = index.busy_teachers(day, period_id, exclude_class=class_id)
+            booked_rooms = index.busy_rooms(day, period_id, exclude_class=class_id)
             
-            # Get available rooms
-            all_rooms = Room.objects.filter(tenant=tenant, is_active=True)
-            booked_rooms = Timetable.objects.filter(
-                tenant=tenant,
-                academic_year_id=academic_year_id,
-                day=day,
-                period_id=period_id,
-                is_active=True,
-                room__isnull=False
-            ).exclude(class_obj_id=class_id).values_list('room_id', flat=True)
-            
-            available_rooms = all_rooms.exclude(id__in=booked_rooms)
+            available_teachers = [t for t in all_teachers if t.id not in busy_teachers]
+            available_rooms = [r for r in Room.objects.filter(tenant=tenant, is_active=True) if r.id not in booked_rooms]
             
             # Get subject info if provided
             subject_info = None
+            taught_subject = set()
             if subject_id:
                 from education.models import Subject
                 try:
@@ -826,31 +845,24 @@ class TimetableSuggestionsView(APIView):
                         'has_practical': subject.has_practical,
                         'suggested_room_types': ['lab'] if subject.has_practical else ['classroom']
                     }
-                except Subject.DoesNotExist:
+                    # Teachers who have taught this subject before
+                    taught_subject = set(Timetable.objects.filter(
+                        tenant=tenant,
+                        subject=subject,
+                        is_active=True,
+                        teacher__isnull=False
+                    ).values_list('teacher_id', flat=True).distinct())
+                except (Subject.DoesNotExist, ValueError):
                     pass
             
             # Format teachers
             def format_teacher(teacher):
-                # Check if teacher has taught this subject before (if subject_id provided)
-                has_taught_subject = False
-                if subject_id:
-                    has_taught_subject = Timetable.objects.filter(
-                        tenant=tenant,
-                        teacher=teacher,
-                        subject_id=subject_id,
-                        is_active=True
-                    ).exists()
-                
+                has_taught_subject = teacher.id in taught_subject
                 return {
-                    'id': teacher.id,
-                    'name': teacher.user.get_full_name() or teacher.user.username,
-                    'username': teacher.user.username,
-                    'email': teacher.user.email,
-                    'role': teacher.role.name if teacher.role else None,
-                    'is_assigned_to_class': assigned_teachers.filter(id=teacher.id).exists(),
+                    **_format_teacher(teacher, assigned_ids),
                     'has_taught_subject': has_taught_subject,
                     'priority_score': (
-                        10 if assigned_teachers.filter(id=teacher.id).exists() else 0
+                        10 if teacher.id in assigned_ids else 0
                     ) + (5 if has_taught_subject else 0)
                 }
             
@@ -864,25 +876,19 @@ class TimetableSuggestionsView(APIView):
                     is_suitable = room.room_type in ['classroom', 'hall']
                 
                 return {
-                    'id': room.id,
-                    'name': room.name,
-                    'room_number': room.room_number,
-                    'room_type': room.room_type,
-                    'room_type_display': room.get_room_type_display(),
-                    'capacity': room.capacity,
-                    'facilities': room.facilities,
+                    **_format_room(room),
                     'is_suitable_for_subject': is_suitable,
                     'priority_score': 10 if is_suitable else 5
                 }
             
             # Sort by priority
             assigned_teachers_list = sorted(
-                [format_teacher(t) for t in assigned_available],
+                [format_teacher(t) for t in available_teachers if t.id in assigned_ids],
                 key=lambda x: x['priority_score'],
                 reverse=True
             )
             other_teachers_list = sorted(
-                [format_teacher(t) for t in other_available],
+                [format_teacher(t) for t in available_teachers if t.id not in assigned_ids],
                 key=lambda x: x['priority_score'],
                 reverse=True
             )
@@ -913,4 +919,3 @@ class TimetableSuggestionsView(APIView):
             return Response(result)
         except UserProfile.DoesNotExist:
             return Response({'error': 'User profile not found.'}, status=status.HTTP_404_NOT_FOUND)
-
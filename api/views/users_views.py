@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework import status, permissions
 from django.contrib.auth.models import User
 from api.models.user import UserProfile, Tenant, Role
+from api.utils.tenant_context import get_request_profile
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
@@ -61,7 +62,7 @@ class UserListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         tenant = profile.tenant
         users = UserProfile._default_manager.filter(tenant=tenant)
         # Filtering
@@ -96,7 +97,7 @@ class AddUserView(APIView):
     def post(self, request):
         logger.info(f"AddUserView: Request received. Data keys: {list(request.data.keys())}")
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             # Enforce user limit using utility function
             from api.utils.subscription_utils import validate_user_limit_before_adding
@@ -240,7 +241,7 @@ class RemoveUserView(APIView):
 
     @role_required('admin', 'principal')
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if profile.role.name != "admin":
             return Response({"error": "Only admins can remove users."}, status=status.HTTP_403_FORBIDDEN)
         username = request.data.get("username")
@@ -260,7 +261,7 @@ class InviteUserView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         if profile.role.name != "admin":
             return Response({"error": "Only admins can invite users."}, status=status.HTTP_403_FORBIDDEN)
         tenant = profile.tenant
@@ -376,7 +377,7 @@ class UserEditView(APIView):
     def _handle_edit(self, request):
         logger.info(f"UserEditView: Request received. Method: {request.method}, Data keys: {list(request.data.keys())}")
         logger.info(f"UserEditView: Request data: {request.data}")
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         tenant = profile.tenant
         data = request.data.copy()
         user_id = data.get('id') or data.get('user_id')
@@ -488,7 +489,7 @@ class DeleteUserView(APIView):
 
     @role_required('admin', 'principal')
     def delete(self, request, user_id):
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         tenant = profile.tenant
         
         try:
@@ -514,7 +515,7 @@ class RoleListView(APIView):
 
     def get(self, request):
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             industry = tenant.industry.lower() if tenant else 'education'
             
@@ -553,7 +554,7 @@ class CreateRolesView(APIView):
     def post(self, request):
         """Create default education roles if they don't exist"""
         try:
-            profile = UserProfile._default_manager.get(user=request.user)
+            profile = get_request_profile(request)
             tenant = profile.tenant
             industry = tenant.industry.lower() if tenant else 'education'
             
@@ -623,7 +624,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
 @permission_classes([IsAuthenticated])
 def user_me(request):
     try:
-        profile = UserProfile._default_manager.get(user=request.user)
+        profile = get_request_profile(request)
         tenant = profile.tenant
         # Determine module availability
         modules = {}
@@ -4,7 +4,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from api.models.user import UserProfile
+from api.utils.tenant_context import get_request_profile
 import requests
 
 
@@ -18,7 +18,7 @@ class WhatsAppSendView(APIView):
 		Requires env WHATSAPP_TOKEN and WHATSAPP_PHONE_ID
 		"""
 		try:
-			profile = UserProfile.objects.get(user=request.user)
+			profile = get_request_profile(request)
 			if not profile.role or profile.role.name not in ['admin', 'pharmacy_admin', 'retail_admin']:
 				return Response({'error': 'Admin access required'}, status=403)
 			to = request.data.get('to')
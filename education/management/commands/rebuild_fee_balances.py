@@ -0,0 +1,33 @@
+"""
+Django management command to rebuild the StudentFeeBalance ledger
+Run after bulk imports or data fixes that bypass model signals:
+python manage.py rebuild_fee_balances [--tenant ID]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models.user import Tenant
+from api.utils.fee_ledger import rebuild_fee_balances
+
+
+class Command(BaseCommand):
+    help = "Recompute every student's fee ledger rows from fee structures, payments and old balances"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help="Only rebuild this tenant's ledger")
+
+    def handle(self, *args, **options):
+        tenant = None
+        if options.get('tenant'):
+            try:
+                tenant = Tenant.objects.get(id=options['tenant'])
+            except Tenant.DoesNotExist:
+                raise CommandError(f"Tenant {options['tenant']} not found")
+
+        counts = rebuild_fee_balances(
+            tenant=tenant,
+            progress=lambda done, total: self.stdout.write(f"Processed {done} of {total} students"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Ledger rebuilt for {counts['students']} students: {counts['created']} created, "
+            f"{counts['updated']} updated, {counts['deleted']} deleted"
+        ))
@@ -0,0 +1,28 @@
+"""
+Django management command to refresh fee installment statuses and late fees
+Run this daily via cron: 0 1 * * * cd /path/to/backend && python manage.py sweep_installments
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models.user import Tenant
+from api.utils.fee_installments import sweep_installments
+
+
+class Command(BaseCommand):
+    help = "Move fee installments to PAID, PARTIAL, OVERDUE or PENDING and charge late fees"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help="Only sweep this tenant's installments")
+
+    def handle(self, *args, **options):
+        tenant = None
+        if options.get('tenant'):
+            try:
+                tenant = Tenant.objects.get(id=options['tenant'])
+            except Tenant.DoesNotExist:
+                raise CommandError(f"Tenant {options['tenant']} not found")
+
+        counts = sweep_installments(tenant=tenant)
+        for state in ('PAID', 'PARTIAL', 'OVERDUE', 'PENDING'):
+            self.stdout.write(f"Moved to {state}: {counts[state]}")
+        self.stdout.write(self.style.SUCCESS(f"Late fees charged: {counts['late_fees']}"))
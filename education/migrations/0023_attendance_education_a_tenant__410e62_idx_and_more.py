@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_notification_api_notific_user_id_d8a762_idx'),
+        ('education', '0022_alter_feepayment_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['tenant', 'date', 'student'], name='education_a_tenant__410e62_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'date'], name='education_a_student_2d133d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feeinstallment',
+            index=models.Index(fields=['tenant', 'status', 'due_date'], name='education_f_tenant__4e4ec9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feepayment',
+            index=models.Index(fields=['tenant', 'payment_date'], name='education_f_tenant__c32d2b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffattendance',
+            index=models.Index(fields=['tenant', 'date'], name='education_s_tenant__5b4fb0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['tenant', 'name'], name='education_s_tenant__4693b4_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated manually
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    """Keep the earliest mark per (tenant, date, student), which is what the views already read"""
+    Attendance = apps.get_model('education', 'Attendance')
+    duplicates = Attendance.objects.values('tenant_id', 'date', 'student_id').annotate(
+        first_id=Min('id'), marks=Count('id')
+    ).filter(marks__gt=1).order_by()
+    for row in duplicates.iterator():
+        Attendance.objects.filter(
+            tenant_id=row['tenant_id'], date=row['date'], student_id=row['student_id']
+        ).exclude(id=row['first_id']).delete()
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0023_attendance_education_a_tenant__410e62_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, noop),
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='education_a_tenant__410e62_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('tenant', 'date', 'student'), name='education_attendance_student_day_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-16 20:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_notification_api_notific_user_id_d8a762_idx'),
+        ('education', '0024_attendance_student_day_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentFeeBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.CharField(max_length=20)),
+                ('total_due', models.DecimalField(decimal_places=2, default=0, help_text="Fee structures of the student's class", max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_discount', models.DecimalField(decimal_places=2, default=0, help_text='Discounts given on payments', max_digits=12)),
+                ('carried_forward', models.DecimalField(decimal_places=2, default=0, help_text='Unsettled old balance recorded for this year', max_digits=12)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=0, help_text='due + carried forward - paid - discount', max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fee_balances', to='education.student')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.tenant')),
+            ],
+            options={
+                'ordering': ['student', 'academic_year'],
+                'unique_together': {('tenant', 'student', 'academic_year')},
+            },
+        ),
+    ]
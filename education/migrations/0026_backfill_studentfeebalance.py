@@ -0,0 +1,75 @@
+# Generated manually
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+MONEY_FIELDS = ['total_due', 'total_paid', 'total_discount', 'carried_forward', 'outstanding']
+ZERO = Decimal('0.00')
+
+
+def backfill_fee_balances(apps, schema_editor):
+    """
+    Fill the ledger for existing students so fee status reads are correct as
+    soon as the deploy's `migrate` finishes. Mirrors api.utils.fee_ledger with
+    the historical models, so later model changes cannot break this step.
+    """
+    Student = apps.get_model('education', 'Student')
+    FeeStructure = apps.get_model('education', 'FeeStructure')
+    FeePayment = apps.get_model('education', 'FeePayment')
+    OldBalance = apps.get_model('education', 'OldBalance')
+    StudentFeeBalance = apps.get_model('education', 'StudentFeeBalance')
+
+    # (tenant_id, student_id, academic_year) -> {field: amount}
+    totals = defaultdict(lambda: dict.fromkeys(MONEY_FIELDS, ZERO))
+
+    class_dues = defaultdict(list)
+    for row in FeeStructure.objects.values('tenant', 'class_obj', 'academic_year').annotate(
+        total=Sum('amount')
+    ).order_by():
+        class_dues[(row['tenant'], row['class_obj'])].append((row['academic_year'], row['total']))
+    for student_id, tenant_id, class_id in Student.objects.filter(
+        assigned_class__isnull=False
+    ).values_list('id', 'tenant_id', 'assigned_class_id').iterator():
+        for academic_year, total in class_dues.get((tenant_id, class_id), []):
+            totals[(tenant_id, student_id, academic_year)]['total_due'] += total
+
+    for row in FeePayment.objects.annotate(
+        year=Coalesce('academic_year', 'fee_structure__academic_year'),
+    ).values('tenant', 'student', 'year').annotate(
+        paid=Sum('amount_paid'), discount=Sum('discount_amount')
+    ).order_by():
+        entry = totals[(row['tenant'], row['student'], row['year'])]
+        entry['total_paid'] += row['paid'] or 0
+        entry['total_discount'] += row['discount'] or 0
+
+    for row in OldBalance.objects.filter(is_settled=False).values(
+        'tenant', 'student', 'academic_year'
+    ).annotate(total=Sum('balance_amount')).order_by():
+        totals[(row['tenant'], row['student'], row['academic_year'])]['carried_forward'] += row['total'] or 0
+
+    rows = []
+    for (tenant_id, student_id, academic_year), entry in totals.items():
+        entry['outstanding'] = (entry['total_due'] + entry['carried_forward']
+                                - entry['total_paid'] - entry['total_discount'])
+        rows.append(StudentFeeBalance(tenant_id=tenant_id, student_id=student_id,
+                                      academic_year=academic_year, **entry))
+    StudentFeeBalance.objects.bulk_create(rows, batch_size=500)
+
+
+def clear_fee_balances(apps, schema_editor):
+    apps.get_model('education', 'StudentFeeBalance').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0025_studentfeebalance'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_fee_balances, clear_fee_balances),
+    ]
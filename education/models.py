@@ -74,6 +74,9 @@ class Student(models.Model):
     class Meta:
         unique_together = ['upper_id', 'tenant']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'name']),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.upper_id:
@@ -187,6 +190,9 @@ class FeeInstallment(models.Model):
     class Meta:
         unique_together = ['tenant', 'student', 'fee_structure', 'installment_number']
         ordering = ['fee_structure', 'installment_number']
+        indexes = [
+            models.Index(fields=['tenant', 'status', 'due_date']),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.fee_structure.fee_type} Installment {self.installment_number}"
@@ -256,6 +262,11 @@ class FeePayment(models.Model):
     notes = models.TextField(blank=True)
     split_installments = models.JSONField(default=dict, blank=True, help_text="If payment covers multiple installments: {installment_id: amount}")
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['tenant', 'payment_date']),
+        ]
+
     def __str__(self):
         if self.installment:
             return f"{self.student.name} - {self.fee_structure.fee_type} Installment {self.installment.installment_number}: ₹{self.amount_paid}"
@@ -352,6 +363,16 @@ class Attendance(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     date = models.DateField()
     present = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            # One mark per student per day; bulk marking upserts on it
+            models.UniqueConstraint(fields=['tenant', 'date', 'student'], name='education_attendance_student_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['student', 'date']),
+        ]
+
     def __str__(self):
         return f"{self.student.name} - {self.date}"
 
@@ -548,137 +569,14 @@ class ReportCard(models.Model):
     
     def calculate_totals(self):
         """Auto-calculate total marks, percentage, and grade from marks entries"""
-        from django.db.models import Sum, Count
-        from django.db.models.functions import Coalesce
-        
-        # Get marks entries based on calculation scope
-        scope = self.tenant.percentage_calculation_scope if hasattr(self.tenant, 'percentage_calculation_scope') else 'TERM_WISE'
-        
-        if scope == 'ALL_TERMS':
-            # Get all marks entries for this student across all terms in the academic year
-            marks_entries = MarksEntry._default_manager.filter(
-                tenant=self.tenant,
-                student=self.student,
-                assessment__term__academic_year=self.academic_year
-            )
-        else:  # TERM_WISE (default)
-            # Get all marks entries for this student in this term only
-            marks_entries = MarksEntry._default_manager.filter(
-                tenant=self.tenant,
-                student=self.student,
-                assessment__term=self.term
-            )
-        
-        # Filter out excluded subjects if configured
-        excluded_subject_ids = self.tenant.percentage_excluded_subjects or []
-        if excluded_subject_ids:
-            marks_entries = marks_entries.exclude(assessment__subject_id__in=excluded_subject_ids)
-        
-        # Calculate totals
-        self.total_marks = marks_entries.aggregate(
-            total=Coalesce(Sum('marks_obtained'), 0)
-        )['total'] or 0
-        
-        self.max_total_marks = marks_entries.aggregate(
-            total=Coalesce(Sum('max_marks'), 0)
-        )['total'] or 0
-        
-        # Calculate percentage based on tenant's method
-        method = self.tenant.percentage_calculation_method if hasattr(self.tenant, 'percentage_calculation_method') else 'SIMPLE'
-        
-        if method == 'SUBJECT_WISE':
-            # Calculate percentage for each subject, then average
-            # Excluded subjects are already filtered out in marks_entries above
-            subject_percentages = []
-            subjects_in_term = marks_entries.values_list('assessment__subject_id', flat=True).distinct()
-            
-            for subject_id in subjects_in_term:
-                subject_entries = marks_entries.filter(assessment__subject_id=subject_id)
-                subject_obtained = subject_entries.aggregate(total=Coalesce(Sum('marks_obtained'), 0))['total'] or 0
-                subject_max = subject_entries.aggregate(total=Coalesce(Sum('max_marks'), 0))['total'] or 0
-                if subject_max > 0:
-                    subject_pct = (subject_obtained / subject_max) * 100
-                    subject_percentages.append(subject_pct)
-            
-            if subject_percentages:
-                self.percentage = sum(subject_percentages) / len(subject_percentages)
-            else:
-                self.percentage = 0
-                
-        elif method == 'WEIGHTED':
-            # Weighted calculation based on subject weightage
-            # Calculate weighted average: Sum(subject_percentage * subject_weightage) / Sum(subject_weightage)
-            # Excluded subjects are already filtered out in marks_entries above
-            from education.models import Subject
-            subject_weighted_sum = 0
-            total_weightage = 0
-            
-            subjects_in_term = marks_entries.values_list('assessment__subject_id', flat=True).distinct()
-            
-            for subject_id in subjects_in_term:
-                try:
-                    subject = Subject._default_manager.get(id=subject_id, tenant=self.tenant)
-                    subject_entries = marks_entries.filter(assessment__subject_id=subject_id)
-                    subject_obtained = subject_entries.aggregate(total=Coalesce(Sum('marks_obtained'), 0))['total'] or 0
-                    subject_max = subject_entries.aggregate(total=Coalesce(Sum('max_marks'), 0))['total'] or 0
-                    
-                    if subject_max > 0:
-                        subject_pct = (subject_obtained / subject_max) * 100
-                        subject_weightage = float(subject.weightage) if hasattr(subject, 'weightage') and subject.weightage else 100.0
-                        subject_weighted_sum += subject_pct * subject_weightage
-                        total_weightage += subject_weightage
-                except Subject.DoesNotExist:
-                    # Subject not found, skip it
-                    continue
-            
-            if total_weightage > 0:
-                self.percentage = subject_weighted_sum / total_weightage
-            else:
-                # Fallback to simple if no valid subjects with weightage
-                if self.max_total_marks > 0:
-                    self.percentage = (self.total_marks / self.max_total_marks) * 100
-                else:
-                    self.percentage = 0
-        else:  # SIMPLE (default)
-            # Simple: (Total Marks / Max Marks) × 100
-            if self.max_total_marks > 0:
-                self.percentage = (self.total_marks / self.max_total_marks) * 100
-            else:
-                self.percentage = 0
-        
-        # Apply rounding based on tenant settings
-        rounding = self.tenant.percentage_rounding if hasattr(self.tenant, 'percentage_rounding') else 2
-        self.percentage = round(float(self.percentage), rounding)
-        
-        # Calculate grade
-        pct = self.percentage
-        if pct >= 90:
-            self.grade = 'A+'
-        elif pct >= 80:
-            self.grade = 'A'
-        elif pct >= 70:
-            self.grade = 'B+'
-        elif pct >= 60:
-            self.grade = 'B'
-        elif pct >= 50:
-            self.grade = 'C+'
-        elif pct >= 40:
-            self.grade = 'C'
-        else:
-            self.grade = 'F'
-        
-        # Calculate attendance
-        attendances = Attendance._default_manager.filter(
-            tenant=self.tenant,
-            student=self.student,
-            date__gte=self.term.start_date,
-            date__lte=self.term.end_date
-        )
-        total_days = attendances.count()
-        self.days_present = attendances.filter(present=True).count()
-        self.days_absent = total_days - self.days_present
-        if total_days > 0:
-            self.attendance_percentage = (self.days_present / total_days) * 100
+        # One grouped marks query (with subject weightage) and one attendance
+        # query; the batch generator shares the same engine across a class
+        from api.utils.report_cards import apply_totals, attendance_totals, compute_scores, scoped_marks, subject_totals
+
+        marks_entries = scoped_marks(self.tenant, self.academic_year_id, self.term_id).filter(student_id=self.student_id)
+        subjects = subject_totals(marks_entries).get(self.student_id, [])
+        attendance = attendance_totals(self.tenant, self.term, [self.student_id]).get(self.student_id, (0, 0))
+        apply_totals(self, compute_scores(self.tenant, subjects), attendance)
         
         self.save()
     
@@ -696,6 +594,9 @@ class StaffAttendance(models.Model):
 
     class Meta:
         unique_together = ('staff', 'date', 'tenant')
+        indexes = [
+            models.Index(fields=['tenant', 'date']),
+        ]
 
     def __str__(self):
         return f"{self.staff} - {self.date}"  # Optionally add check-in/out info
@@ -758,6 +659,28 @@ class BalanceAdjustment(models.Model):
     def __str__(self):
         return f"{self.student.name} - {self.adjustment_type}: ₹{abs(self.amount)}"
 
+class StudentFeeBalance(models.Model):
+    """
+    Materialized fee ledger per student and academic year, kept current by
+    api.utils.fee_ledger (signals on fees, payments and old balances)
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='fee_balances')
+    academic_year = models.CharField(max_length=20)
+    total_due = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Fee structures of the student's class")
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_discount = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Discounts given on payments")
+    carried_forward = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Unsettled old balance recorded for this year")
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="due + carried forward - paid - discount")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['tenant', 'student', 'academic_year']
+        ordering = ['student', 'academic_year']
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.academic_year}: ₹{self.outstanding} outstanding"
+
 class StudentPromotion(models.Model):
     """Track student class promotions"""
     PROMOTION_TYPE_CHOICES = [
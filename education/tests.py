@@ -1,13 +1,59 @@
-from django.test import TestCase
+import io
+import random
+import tempfile
+import time as clock
+import zipfile
+from collections import Counter
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
 from django.urls import reverse
 from django.contrib.auth.models import User
+from api.models.jobs import Job
 from api.models.plan import Plan
 from api.models.user import UserProfile, Role, Tenant
-from education.models import FeeStructure, Student, Class
+from api.utils import promotions
+from api.utils.education_analytics import EducationAnalytics
+from api.utils.fee_installments import sweep_installments
+from api.utils.jobs import Worker
+from api.utils.seating import assign_seats, room_grid
+from api.utils.timetable_generator import solve_timetable
+from api.utils.timetable_index import build_timetable_index
+from api.views import exam_views
+from education.models import (
+    AcademicYear, Assessment, AssessmentType, Attendance, Class, Exam, ExamSchedule, FeeInstallment,
+    FeeInstallmentPlan, FeePayment, FeeStructure, HallTicket, Holiday, MarksEntry, OldBalance, Period,
+    ReportCard, Room, SeatingArrangement, Student, StudentFeeBalance, StudentPromotion, Subject, Term, Timetable,
+)
 
 class ERPTestBase(TestCase):
     def setUp(self):
+        # Cached tenant data outlives the rolled-back rows
+        cache.clear()
+
+    def create_school(self, name, username, role):
+        """Create a tenant on the education plan with one `role` user and authenticate the client as them"""
+        self.plan = Plan.objects.create(name="Edu", description="Education plan", storage_limit_mb=512, has_education=True)
+        self.tenant = Tenant.objects.create(name=name, industry="education", plan=self.plan)
+        self.user = User.objects.create_user(username=username, password="testpass")
+        self.profile = UserProfile.objects.create(user=self.user, tenant=self.tenant,
+                                                  role=Role.objects.create(name=role))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        return self.profile
+
+
+class EducationModuleTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
         self.tenant = Tenant.objects.create(name="Test School", industry="education")
         self.admin_role = Role.objects.create(name="admin")
         self.accountant_role = Role.objects.create(name="accountant")
@@ -25,7 +71,6 @@ class ERPTestBase(TestCase):
         self.student1 = Student.objects.create(name="Student 1", tenant=self.tenant, assigned_class=self.class1)
         self.fee_structure = FeeStructure.objects.create(name="Tuition", tenant=self.tenant, amount=1000)
 
-class EducationModuleTests(ERPTestBase):
     def test_admin_can_view_students(self):
         client = APIClient()
         client.force_authenticate(user=self.admin_user)
@@ -49,3 +94,1077 @@ class EducationModuleTests(ERPTestBase):
         client.force_authenticate(user=self.student_user)
         response = client.get(reverse('fee-structure-list'))
         self.assertEqual(response.status_code, 403)
+
+
+class EducationAnalyticsQueryTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.tenant = Tenant.objects.create(name="Analytics School", industry="education")
+        self.teacher_role = Role.objects.create(name="teacher")
+        self.receipts = 0
+
+    def add_class(self, index, students=3):
+        class_obj = Class.objects.create(name=f"Class {index}", tenant=self.tenant, order=index)
+        fee = FeeStructure.objects.create(tenant=self.tenant, class_obj=class_obj, fee_type='TUITION', amount=1000)
+        user = User.objects.create_user(username=f"teacher{index}", password="teachpass")
+        teacher = UserProfile.objects.create(user=user, tenant=self.tenant, role=self.teacher_role)
+        teacher.assigned_classes.add(class_obj)
+        for number in range(students):
+            student = Student.objects.create(
+                name=f"S{index}-{number}", tenant=self.tenant, assigned_class=class_obj,
+                admission_date=date(2024, 4, 1), gender='Female' if number % 2 else 'Male',
+            )
+            Attendance.objects.create(tenant=self.tenant, student=student, date=timezone.now().date(), present=number > 0)
+            self.receipts += 1
+            FeePayment.objects.create(tenant=self.tenant, student=student, fee_structure=fee,
+                                      amount_paid=250, receipt_number=f"R-{self.receipts}")
+        return class_obj
+
+    def dashboard(self):
+        analytics = EducationAnalytics(self.tenant)
+        return {
+            'overview': analytics.overview(),
+            'fees': analytics.fee_totals(),
+            'classes': analytics.class_analytics(),
+            'students': analytics.student_analytics(),
+            'teachers': analytics.teacher_analytics(),
+            'trends': analytics.monthly_fee_trends(),
+            'distributions': analytics.class_distributions(),
+        }
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.dashboard()
+        return len(queries.captured_queries)
+
+    def test_query_count_constant_in_classes(self):
+        for index in range(2):
+            self.add_class(index)
+        few = self.count_queries()
+        for index in range(2, 8):
+            self.add_class(index)
+        self.assertEqual(self.count_queries(), few)
+
+    def test_per_class_metrics(self):
+        class_obj = self.add_class(1, students=4)
+        self.add_class(2, students=2)
+        data = self.dashboard()
+        self.assertEqual(data['overview']['total_students'], 6)
+        self.assertEqual(data['overview']['total_teachers'], 2)
+        self.assertEqual(data['overview']['student_present_today'], 4)
+        first = next(row for row in data['classes'] if row['class_id'] == class_obj.id)
+        self.assertEqual(first['student_count'], 4)
+        self.assertEqual(first['fee_summary']['collected'], 1000.0)
+        self.assertEqual(first['fee_summary']['collection_percentage'], 100)
+        self.assertEqual(first['attendance_today'], {'present': 3, 'absent': 1, 'total': 4, 'percentage': 75.0})
+        self.assertEqual([teacher['name'] for teacher in first['teachers']], ['teacher1'])
+        gender, per_class, _ = data['distributions']
+        self.assertEqual((gender[0]['male'], gender[0]['female']), (2, 2))
+        self.assertEqual(per_class[1]['count'], 2)
+        self.assertEqual(data['teachers'][0]['students_taught'], 4)
+        self.assertEqual(data['teachers'][0]['attendance_records'], 4)
+        self.assertEqual(data['trends'][0]['amount'], 1500.0)
+
+
+class ClassAttendanceStatusTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.create_school("Status School", "statusteacher", "teacher")
+        self.url = reverse('education-class-attendance-status')
+
+    def add_class(self, index, students=3):
+        class_obj = Class.objects.create(name=f"Class {index}", tenant=self.tenant, order=index)
+        for number in range(students):
+            student = Student.objects.create(name=f"S{index}-{number}", tenant=self.tenant, assigned_class=class_obj,
+                                             admission_date=date(2024, 4, 1))
+            if number:
+                Attendance.objects.create(tenant=self.tenant, student=student, date=timezone.now().date(), present=number % 2 == 1)
+        return class_obj
+
+    def test_summary_and_class_status_use_constant_queries(self):
+        first = self.add_class(1, students=4)
+        self.client.get(self.url)  # warm the plan feature cache
+
+        def fetch(params=None):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, params or {})
+            self.assertEqual(response.status_code, 200)
+            return response.data, len(queries.captured_queries)
+
+        summary, summary_queries = fetch()
+        roster, roster_queries = fetch({'class_id': first.id})
+        self.assertEqual(summary, [{
+            'class_id': first.id, 'class_name': 'Class 1', 'total_students': 4,
+            'present_today': 2, 'absent_today': 1, 'attendance_percentage': 50.0,
+        }])
+        self.assertEqual(sorted(row['present'] for row in roster), [False, False, True, True])
+
+        for index in range(2, 6):
+            self.add_class(index, students=6)
+        Student.objects.create(name="Late joiner", tenant=self.tenant, assigned_class=first, admission_date=date(2024, 4, 1))
+        self.assertEqual(fetch()[1], summary_queries)
+        roster, queries = fetch({'class_id': first.id})
+        self.assertEqual(queries, roster_queries)
+        self.assertEqual(len(roster), 5)
+
+
+class AttendanceBulkMarkTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = self.create_school("Roster School", "rosterteacher", "teacher")
+        self.class_obj = Class.objects.create(name="Class 5", tenant=self.tenant)
+        self.other_class = Class.objects.create(name="Class 6", tenant=self.tenant)
+        self.teacher.assigned_classes.add(self.class_obj)
+        self.students = [
+            Student.objects.create(name=f"R{number}", tenant=self.tenant, assigned_class=self.class_obj,
+                                   admission_date=date(2024, 4, 1))
+            for number in range(30)
+        ]
+        self.outsider = Student.objects.create(name="Outsider", tenant=self.tenant, assigned_class=self.other_class,
+                                               admission_date=date(2024, 4, 1))
+        self.url = reverse('education-attendance-bulk')
+
+    def submit(self, students, present=lambda index: True, class_obj=None):
+        return self.client.post(self.url, {
+            'class_id': (class_obj or self.class_obj).id,
+            'date': '2025-06-02',
+            'records': [{'student': student.id, 'present': present(index)} for index, student in enumerate(students)],
+        }, format='json')
+
+    def test_roster_upsert_is_idempotent(self):
+        response = self.submit(self.students, present=lambda index: index % 3 != 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['saved'], response.data['present'], response.data['absent']), (30, 20, 10))
+
+        response = self.submit(self.students, present=lambda index: True)
+        self.assertEqual(response.status_code, 200)
+        marks = Attendance.objects.filter(tenant=self.tenant, date='2025-06-02')
+        self.assertEqual(marks.count(), 30)
+        self.assertEqual(marks.filter(present=True).count(), 30)
+
+    def test_query_count_independent_of_roster_size(self):
+        self.submit(self.students[:1])  # warm the plan feature cache
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.submit(self.students[:3]).status_code, 200)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.submit(self.students).status_code, 200)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_rejects_students_outside_class(self):
+        response = self.submit(self.students[:2] + [self.outsider])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['invalid_students'], [self.outsider.id])
+        # Teachers can only mark classes assigned to them
+        response = self.submit([self.outsider], class_obj=self.other_class)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_single_mark_updates_existing_record(self):
+        url = reverse('education-attendance')
+        payload = {'student': self.students[0].id, 'date': '2025-06-02', 'present': True}
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, 201)
+        payload['present'] = False
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, 200)
+        self.assertFalse(Attendance.objects.get(student=self.students[0]).present)
+
+    def test_moving_mark_onto_existing_day_is_rejected(self):
+        Attendance.objects.create(tenant=self.tenant, student=self.students[0], date='2025-06-02', present=True)
+        other = Attendance.objects.create(tenant=self.tenant, student=self.students[0], date='2025-06-03', present=False)
+        url = reverse('education-attendance-detail', args=[other.id])
+        response = self.client.put(url, {'date': '2025-06-02'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Attendance.objects.filter(student=self.students[0]).count(), 2)
+        self.assertEqual(self.client.put(url, {'present': True}, format='json').status_code, 200)
+
+
+class ReportCardBatchTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.create_school("Rank School", "rankadmin", "admin")
+        self.class_obj = Class.objects.create(name="Class 7", tenant=self.tenant)
+        self.year = AcademicYear.objects.create(tenant=self.tenant, name="2024-25",
+                                                start_date=date(2024, 4, 1), end_date=date(2025, 3, 31))
+        self.term = Term.objects.create(tenant=self.tenant, academic_year=self.year, name="Term 1", order=1,
+                                        start_date=date(2024, 4, 1), end_date=date(2024, 9, 30))
+        exam = AssessmentType.objects.create(tenant=self.tenant, name="Half-Yearly")
+        self.assessments = []
+        for name, weightage in (("Maths", 60), ("English", 40)):
+            subject = Subject.objects.create(tenant=self.tenant, class_obj=self.class_obj, name=name, weightage=weightage)
+            self.assessments.append(Assessment.objects.create(
+                tenant=self.tenant, subject=subject, term=self.term, assessment_type=exam,
+                name=f"{name} HY", date=date(2024, 9, 1), max_marks=100,
+            ))
+        self.students = []
+        self.url = reverse('education-reportcard-generate-class')
+
+    def add_student(self, maths, english, present_days=0):
+        student = Student.objects.create(name=f"Pupil {len(self.students)}", tenant=self.tenant,
+                                         assigned_class=self.class_obj, admission_date=date(2024, 4, 1))
+        for assessment, marks in zip(self.assessments, (maths, english)):
+            MarksEntry.objects.create(tenant=self.tenant, student=student, assessment=assessment,
+                                      marks_obtained=marks, max_marks=100)
+        for day in range(present_days + 1):
+            Attendance.objects.create(tenant=self.tenant, student=student, date=date(2024, 6, 1) + timedelta(days=day),
+                                      present=day < present_days)
+        self.students.append(student)
+        return student
+
+    def generate(self, **params):
+        payload = {'class_id': self.class_obj.id, 'academic_year_id': self.year.id, 'term_id': self.term.id}
+        return self.client.post(self.url + ('?async=1' if params.get('queued') else ''), payload, format='json')
+
+    def cards(self):
+        return {card.student_id: card for card in ReportCard.objects.filter(tenant=self.tenant, term=self.term)}
+
+    def test_generates_class_with_shared_ranks(self):
+        top = self.add_student(90, 80, present_days=3)
+        tied = [self.add_student(70, 60), self.add_student(60, 70)]
+        last = self.add_student(30, 40)
+        response = self.generate()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated']), (4, 0))
+        cards = self.cards()
+        self.assertEqual(float(cards[top.id].percentage), 85.0)
+        self.assertEqual(cards[top.id].grade, 'A')
+        self.assertEqual((cards[top.id].days_present, cards[top.id].days_absent), (3, 1))
+        self.assertEqual([cards[student.id].rank_in_class for student in tied], [2, 2])
+        self.assertEqual(cards[last.id].rank_in_class, 4)
+
+        cards[top.id].teacher_remarks = "Keep it up"
+        cards[top.id].save()
+        response = self.generate()
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 4))
+        self.assertEqual(self.cards()[top.id].teacher_remarks, "Keep it up")
+
+    def test_follows_tenant_percentage_method(self):
+        student = self.add_student(95, 35)
+        self.add_student(55, 85)
+        expected = {'SIMPLE': (65.0, 'B'), 'SUBJECT_WISE': (65.0, 'B'), 'WEIGHTED': (71.0, 'B+')}
+        for method, (percentage, grade) in expected.items():
+            self.tenant.percentage_calculation_method = method
+            self.tenant.save()
+            self.generate()
+            card = self.cards()[student.id]
+            self.assertEqual((float(card.percentage), card.grade), (percentage, grade))
+        self.tenant.percentage_excluded_subjects = [self.assessments[1].subject_id]
+        self.tenant.percentage_calculation_method = 'SIMPLE'
+        self.tenant.save()
+        self.generate()
+        card = self.cards()[student.id]
+        self.assertEqual((card.total_marks, float(card.percentage)), (95, 95.0))
+        self.assertEqual(card.rank_in_class, 1)
+
+    def test_single_card_matches_batch(self):
+        for maths, english in ((95, 35), (55, 85), (72, 64)):
+            self.add_student(maths, english, present_days=2)
+        for method in ('SIMPLE', 'SUBJECT_WISE', 'WEIGHTED'):
+            self.tenant.percentage_calculation_method = method
+            self.tenant.percentage_rounding = 1
+            self.tenant.save()
+            self.generate()
+            for card in ReportCard.objects.filter(tenant=self.tenant, term=self.term).select_related('tenant', 'student', 'term'):
+                batch = (card.total_marks, card.percentage, card.grade, card.days_present)
+                with CaptureQueriesContext(connection) as queries:
+                    card.calculate_totals()
+                # marks, attendance and the save, whatever the method
+                self.assertEqual(len(queries.captured_queries), 3)
+                card.refresh_from_db()
+                self.assertEqual((card.total_marks, card.percentage, card.grade, card.days_present), batch)
+
+    def test_single_generate_endpoint_ranks_class(self):
+        first, second = self.add_student(60, 60), self.add_student(90, 90)
+        url = reverse('education-reportcard-generate')
+        payload = {'academic_year_id': self.year.id, 'term_id': self.term.id}
+        self.assertEqual(self.client.post(url, dict(payload, student_id=first.id), format='json').status_code, 201)
+        response = self.client.post(url, dict(payload, student_id=second.id), format='json')
+        self.assertEqual((response.status_code, response.data['rank_in_class']), (201, 1))
+        self.assertEqual(self.cards()[first.id].rank_in_class, 2)
+
+    def test_query_count_independent_of_class_size(self):
+        for marks in (50, 60):
+            self.add_student(marks, marks)
+        self.generate()  # warm the plan feature cache
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.generate().status_code, 200)
+        for marks in range(20):
+            self.add_student(marks + 20, 90 - marks)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.generate().status_code, 200)
+        # Only inserting the new cards and writing the changed ranks is extra
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries) + 2)
+        with CaptureQueriesContext(connection) as again:
+            self.generate()
+        self.assertEqual(len(again.captured_queries), len(small.captured_queries))
+
+    def test_async_runs_as_job(self):
+        self.add_student(80, 80)
+        response = self.generate(queued=True)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Worker(concurrency=1, name='test').run_once(), 1)
+        job = Job.objects.get(id=response.data['job_id'])
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.result['created'], 1)
+        self.assertEqual(self.cards()[self.students[0].id].rank_in_class, 1)
+
+    def test_pdf_batch_zip_rendered_by_job(self):
+        for marks in (40, 90):
+            self.add_student(marks, marks)
+        self.generate()
+        url = reverse('education-reportcard-pdf-batch')
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media, REPORT_CARD_PDF_WORKERS=1):
+            response = self.client.post(url, {'academic_year_id': self.year.id, 'term_id': self.term.id}, format='json')
+            self.assertEqual((response.status_code, response.data['report_cards']), (202, 2))
+            Worker(concurrency=1, name='test').run_once()
+            job = Job.objects.get(id=response.data['job_id'])
+            self.assertEqual((job.status, job.progress, job.result['rendered'], job.result['failed']), ('succeeded', 100, 2, []))
+            download = self.client.get(reverse('job-download', args=[job.id]))
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(download.streaming_content)))
+            names = archive.namelist()
+            self.assertEqual(names, [f"Class_7/Pupil_{index}_{card.id}.pdf" for index, card in enumerate(
+                sorted(self.cards().values(), key=lambda card: card.student.name))])
+            self.assertTrue(archive.read(names[0]).startswith(b'%PDF'))
+
+
+class FeeInstallmentBulkTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.create_school("Instalment School", "feeaccountant", "accountant")
+        self.class_obj = Class.objects.create(name="Class 9", tenant=self.tenant)
+        self.fee = FeeStructure.objects.create(tenant=self.tenant, class_obj=self.class_obj, fee_type='TUITION',
+                                               amount=1000, academic_year='2025-26')
+        self.installment_plan = FeeInstallmentPlan.objects.create(tenant=self.tenant, fee_structure=self.fee,
+                                                                  name="Quarterly", number_of_installments=3)
+        self.students = [self.add_student() for _ in range(4)]
+        self.url = reverse('education-installments-generate-bulk')
+        self.start = (date.today() - timedelta(days=40)).isoformat()
+
+    def add_student(self):
+        return Student.objects.create(name="Fee payer", tenant=self.tenant, assigned_class=self.class_obj,
+                                      admission_date=date(2024, 4, 1))
+
+    def generate(self, queued=False, **extra):
+        payload = {'fee_structure_id': self.fee.id, 'installment_plan_id': self.installment_plan.id,
+                   'start_date': self.start, **extra}
+        return self.client.post(self.url + ('?async=1' if queued else ''), payload, format='json')
+
+    def test_generates_class_with_status_precomputed(self):
+        response = self.generate()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'students': 4, 'skipped': 0, 'created': 12})
+        rows = FeeInstallment.objects.filter(student=self.students[0]).order_by('installment_number')
+        self.assertEqual([row.due_amount for row in rows], [Decimal('333.33'), Decimal('333.33'), Decimal('333.34')])
+        self.assertEqual([row.status for row in rows], ['OVERDUE', 'OVERDUE', 'PENDING'])
+        self.assertEqual({row.academic_year for row in rows}, {'2025-26'})
+
+        self.students.append(self.add_student())
+        self.assertEqual(self.generate().data, {'students': 5, 'skipped': 4, 'created': 3})
+
+    def test_query_count_independent_of_class_size(self):
+        self.generate()  # warm the plan feature cache
+        FeeInstallment.objects.all().delete()
+        with CaptureQueriesContext(connection) as small:
+            self.generate()
+        FeeInstallment.objects.all().delete()
+        # 60 rows still fit one INSERT under SQLite's bind-parameter limit
+        for _ in range(16):
+            self.add_student()
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.generate().data['created'], 60)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_async_runs_as_job_and_validates_custom_plans(self):
+        response = self.generate(queued=True)
+        self.assertEqual(response.status_code, 202)
+        Worker(concurrency=1, name='test').run_once()
+        job = Job.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.status, job.progress, job.result['created']), ('succeeded', 100, 12))
+
+        self.installment_plan.installment_type = 'CUSTOM'
+        self.installment_plan.save()
+        response = self.generate(installments=[{'installment_number': 1, 'due_amount': 'lots', 'due_date': '2025-06-01'}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_single_student_generate(self):
+        response = self.client.post(reverse('education-installments-generate'), {
+            'student_id': self.students[0].id, 'fee_structure_id': self.fee.id,
+            'installment_plan_id': self.installment_plan.id, 'start_date': self.start,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['installment_number'] for row in response.data], [1, 2, 3])
+        self.assertEqual(FeeInstallment.objects.filter(status='OVERDUE').count(), 2)
+
+
+class FeeInstallmentSweepTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.create_school("Sweep School", "sweepaccountant", "accountant")
+        self.other = Tenant.objects.create(name="Other School", industry="education", plan=self.plan)
+        self.today = timezone.now().date()
+        self.past = self.today - timedelta(days=10)
+        self.future = self.today + timedelta(days=10)
+        # label -> (tenant, paid_amount, due_date, stored status)
+        rows = {
+            'overdue': (self.tenant, 0, self.past, 'PENDING'),
+            'partial': (self.tenant, 400, self.past, 'PENDING'),
+            'paid': (self.tenant, 1000, self.past, 'OVERDUE'),
+            'pending': (self.tenant, 0, self.future, 'OVERDUE'),
+            'current': (self.tenant, 0, self.future, 'PENDING'),
+            'other': (self.other, 0, self.past, 'PENDING'),
+        }
+        self.installments = {label: self.add_installment(*row) for label, row in rows.items()}
+
+    def add_installment(self, tenant, paid_amount, due_date, state):
+        class_obj = Class.objects.create(name=f"Class {Class.objects.count() + 1}", tenant=tenant)
+        student = Student.objects.create(name="Payer", tenant=tenant, assigned_class=class_obj,
+                                         admission_date=date(2024, 4, 1))
+        fee = FeeStructure.objects.create(tenant=tenant, class_obj=class_obj, fee_type='TUITION',
+                                          amount=1000, academic_year='2025-26')
+        return FeeInstallment.objects.create(tenant=tenant, student=student, fee_structure=fee, installment_number=1,
+                                             due_amount=1000, paid_amount=paid_amount, due_date=due_date, status=state)
+
+    def states(self):
+        for installment in self.installments.values():
+            installment.refresh_from_db()
+        return {label: installment.status for label, installment in self.installments.items()}
+
+    def test_sweep_matches_update_status_across_tenants(self):
+        with CaptureQueriesContext(connection) as queries:
+            counts = sweep_installments()
+        # savepoint + four status updates + release; no late fee configured
+        self.assertEqual(len(queries.captured_queries), 6)
+        self.assertEqual(counts, {'PAID': 1, 'PARTIAL': 1, 'OVERDUE': 2, 'PENDING': 1, 'late_fees': 0})
+        self.assertEqual(self.states(), {'overdue': 'OVERDUE', 'partial': 'PARTIAL', 'paid': 'PAID',
+                                         'pending': 'PENDING', 'current': 'PENDING', 'other': 'OVERDUE'})
+        self.assertEqual(self.installments['paid'].payment_date, self.today)
+
+        for installment in self.installments.values():
+            installment.update_status()
+        self.assertEqual(set(sweep_installments().values()), {0})
+
+    def test_late_fees_charged_once_after_grace_period(self):
+        waived = self.installments['other']
+        waived.late_fee = 5
+        waived.save()
+        with override_settings(FEE_LATE_FEE={'GRACE_DAYS': 5, 'FLAT': '50', 'PERCENT': '10', 'MAX': '120'}):
+            self.assertEqual(sweep_installments()['late_fees'], 2)
+            self.assertEqual(sweep_installments()['late_fees'], 0)
+        self.states()
+        fees = {label: installment.late_fee for label, installment in self.installments.items()}
+        # 50 + 10% of 1000 capped at 120; hand-entered fees and future or paid rows untouched
+        self.assertEqual(fees, {'overdue': Decimal('120.00'), 'partial': Decimal('120.00'), 'paid': 0,
+                                'pending': 0, 'current': 0, 'other': Decimal('5.00')})
+
+        with override_settings(FEE_LATE_FEE={'GRACE_DAYS': 30, 'PERCENT': '2.5'}):
+            self.installments['overdue'].late_fee = 0
+            self.installments['overdue'].save()
+            self.assertEqual(sweep_installments()['late_fees'], 0)
+
+    def test_command_and_overdue_endpoint(self):
+        call_command('sweep_installments', tenant=self.tenant.id, stdout=StringIO())
+        self.assertEqual(self.states()['other'], 'PENDING')
+
+        response = self.client.get(reverse('education-overdue-installments'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['id'] for row in response.data},
+                         {self.installments['overdue'].id, self.installments['partial'].id})
+
+
+class StudentFeeLedgerTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.create_school("Ledger School", "ledgeradmin", "admin")
+        self.class_obj = Class.objects.create(name="Class 6", tenant=self.tenant)
+        self.next_class = Class.objects.create(name="Class 7", tenant=self.tenant)
+        self.tuition = FeeStructure.objects.create(tenant=self.tenant, class_obj=self.class_obj, fee_type='TUITION',
+                                                   amount=1000, academic_year='2025-26')
+        FeeStructure.objects.create(tenant=self.tenant, class_obj=self.class_obj, fee_type='EXAM',
+                                    amount=200, academic_year='2025-26')
+        FeeStructure.objects.create(tenant=self.tenant, class_obj=self.next_class, fee_type='TUITION',
+                                    amount=1500, academic_year='2025-26')
+        self.students = [
+            Student.objects.create(name=f"Ledger {i}", tenant=self.tenant, assigned_class=self.class_obj,
+                                   admission_date=date(2024, 4, 1))
+            for i in range(3)
+        ]
+
+    def pay(self, student, amount, discount=0):
+        return FeePayment.objects.create(tenant=self.tenant, student=student, fee_structure=self.tuition,
+                                         amount_paid=amount, discount_amount=discount,
+                                         receipt_number=f"R-{student.id}-{FeePayment.objects.count()}")
+
+    def ledger(self, student):
+        return {row.academic_year: (row.total_due, row.total_paid, row.total_discount, row.carried_forward, row.outstanding)
+                for row in StudentFeeBalance.objects.filter(student=student)}
+
+    def test_signals_keep_ledger_current(self):
+        student = self.students[0]
+        self.assertEqual(self.ledger(student), {'2025-26': (1200, 0, 0, 0, 1200)})
+
+        payment = self.pay(student, 300, discount=50)
+        old = OldBalance.objects.create(tenant=self.tenant, student=student, academic_year='2024-25',
+                                        class_name='Class 5', balance_amount=400)
+        self.assertEqual(self.ledger(student), {'2025-26': (1200, 300, 50, 0, 850), '2024-25': (0, 0, 0, 400, 400)})
+
+        old.is_settled = True
+        old.save()
+        self.tuition.amount = 1100
+        self.tuition.save()
+        self.assertEqual(self.ledger(student), {'2025-26': (1300, 300, 50, 0, 950)})
+        self.assertEqual(self.ledger(self.students[1]), {'2025-26': (1300, 0, 0, 0, 1300)})
+
+        student.assigned_class = self.next_class
+        student.save()
+        payment.delete()
+        self.assertEqual(self.ledger(student), {'2025-26': (1500, 0, 0, 0, 1500)})
+
+        student.delete()
+        self.assertEqual(self.ledger(self.students[1]), {'2025-26': (1300, 0, 0, 0, 1300)})
+
+    def test_moving_fee_structure_refreshes_both_classes(self):
+        mover = Student.objects.create(name="Mover", tenant=self.tenant, assigned_class=self.next_class,
+                                       admission_date=self.students[0].admission_date)
+        fee = FeeStructure.objects.get(pk=self.tuition.pk)
+        fee.class_obj = self.next_class
+        fee.save()
+        self.assertEqual(self.ledger(self.students[0]), {'2025-26': (200, 0, 0, 0, 200)})
+        self.assertEqual(self.ledger(mover), {'2025-26': (2500, 0, 0, 0, 2500)})
+
+    def test_rebuild_command_restores_ledger(self):
+        self.pay(self.students[0], 700)
+        expected = [self.ledger(student) for student in self.students]
+        StudentFeeBalance.objects.all().delete()
+        StudentFeeBalance.objects.create(tenant=self.tenant, student=self.students[2], academic_year='2019-20')
+        call_command('rebuild_fee_balances', tenant=self.tenant.id, stdout=StringIO())
+        self.assertEqual([self.ledger(student) for student in self.students], expected)
+
+    def test_fee_status_summary_matches_breakdown(self):
+        student = self.students[0]
+        self.pay(student, 700)
+        # Last year's fee, paid before promotion, is outside the current class's structures
+        last_year = FeeStructure.objects.create(tenant=self.tenant, class_obj=self.next_class, fee_type='TUITION',
+                                                amount=900, academic_year='2024-25')
+        FeePayment.objects.create(tenant=self.tenant, student=student, fee_structure=last_year,
+                                  amount_paid=900, receipt_number="R-last-year")
+        summary = self.client.get(reverse('education-student-fee-status', args=[student.id])).data
+        self.assertEqual((summary['fee_summary']['total_due'], summary['fee_summary']['total_paid']), (1200, 700))
+        self.assertEqual(sum(row['paid_amount'] for row in summary['fee_breakdown']), 700)
+
+    def test_class_fee_summary_reads_come_from_ledger(self):
+        self.pay(self.students[0], 700)
+        response = self.client.get(reverse('education-student-fee-status', args=[self.students[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['fee_summary']['total_due'], response.data['fee_summary']['total_paid']), (1200, 700))
+        self.assertEqual([row['paid_amount'] for row in response.data['fee_breakdown']], [700, 0])
+
+        url = reverse('education-class-fee-summary', args=[self.class_obj.id])
+        with CaptureQueriesContext(connection) as small:
+            summary = self.client.get(url).data
+        self.assertEqual(summary['fee_collection_summary']['total_due'], 3600)
+        self.assertEqual(summary['fee_collection_summary']['total_collected'], 700)
+        for i in range(10):
+            self.pay(Student.objects.create(name=f"Extra {i}", tenant=self.tenant, assigned_class=self.class_obj,
+                                            admission_date=self.students[0].admission_date), 100)
+        with CaptureQueriesContext(connection) as large:
+            summary = self.client.get(url).data
+        self.assertEqual(summary['fee_collection_summary']['total_collected'], 1700)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_old_balance_summary_groups_in_sql(self):
+        for student, year, amount in [(self.students[0], '2023-24', 100), (self.students[0], '2024-25', 250),
+                                      (self.students[1], '2024-25', 50)]:
+            OldBalance.objects.create(tenant=self.tenant, student=student, academic_year=year,
+                                      class_name='Class 5', balance_amount=amount)
+        data = self.client.get(reverse('education-old-balance-summary')).data
+        self.assertEqual(data['total_outstanding'], 400.0)
+        self.assertEqual(data['total_students_with_balance'], 2)
+        self.assertEqual(data['by_academic_year']['2024-25'],
+                         {'total_amount': 300.0, 'student_count': 2, 'class_breakdown': {'Class 5': {'amount': 300.0, 'count': 2}}})
+        self.assertEqual(data['by_class']['Class 5'], {'total_amount': 400.0, 'student_count': 2,
+                                                       'years': {'2023-24': 100.0, '2024-25': 300.0}})
+
+
+class BulkPromotionTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.create_school("Promotion School", "promoadmin", "admin")
+        self.classes = [Class.objects.create(name=f"Grade {order}", tenant=self.tenant, order=order) for order in (1, 2, 3)]
+        self.from_year = AcademicYear.objects.create(tenant=self.tenant, name="2025-26", start_date=date(2025, 4, 1),
+                                                     end_date=date(2026, 3, 31))
+        self.to_year = AcademicYear.objects.create(tenant=self.tenant, name="2026-27", start_date=date(2026, 4, 1),
+                                                   end_date=date(2027, 3, 31))
+        self.students = [self.add_student(class_obj) for class_obj in self.classes for _ in range(2)]
+        self.url = reverse('education-bulk-promotion')
+
+    def add_student(self, class_obj):
+        return Student.objects.create(name=f"Pupil of {class_obj.name}", tenant=self.tenant, assigned_class=class_obj,
+                                      admission_date=date(2024, 4, 1))
+
+    def promote(self, query='', **extra):
+        payload = {'from_academic_year_id': self.from_year.id, 'to_academic_year_id': self.to_year.id,
+                   'promotion_date': '2026-04-01', **extra}
+        return self.client.post(self.url + query, payload, format='json')
+
+    def classes_of(self, students):
+        return [Student.objects.get(id=student.id).assigned_class.name for student in students]
+
+    def test_dry_run_previews_without_changes(self):
+        response = self.promote(dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['moves'], [
+            {'from_class': 'Grade 1', 'to_class': 'Grade 2', 'student_count': 2},
+            {'from_class': 'Grade 2', 'to_class': 'Grade 3', 'student_count': 2},
+        ])
+        self.assertEqual([row['reason'] for row in response.data['skipped_students']],
+                         ['No next class available for Grade 3'] * 2)
+        self.assertFalse(StudentPromotion.objects.exists())
+        self.assertEqual(self.classes_of(self.students[:2]), ['Grade 1', 'Grade 1'])
+
+    def test_promotes_school_with_history_and_is_idempotent(self):
+        FeeStructure.objects.create(tenant=self.tenant, class_obj=self.classes[1], fee_type='TUITION',
+                                    amount=900, academic_year='2026-27')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.promote()
+        self.assertEqual((response.data['promoted_count'], response.data['skipped_count']), (4, 2))
+        self.assertEqual(self.classes_of(self.students), ['Grade 2', 'Grade 2', 'Grade 3', 'Grade 3', 'Grade 3', 'Grade 3'])
+        history = StudentPromotion.objects.filter(student=self.students[0]).get()
+        self.assertEqual((history.from_class, history.to_class, history.promoted_by), (self.classes[0], self.classes[1], self.profile))
+        # Promoted students' fee ledger follows their new class
+        self.assertEqual(StudentFeeBalance.objects.get(student=self.students[0]).total_due, 900)
+        self.assertFalse(StudentFeeBalance.objects.filter(student=self.students[2]).exists())
+
+        for class_obj in self.classes[:2]:
+            for _ in range(5):
+                self.add_student(class_obj)
+        StudentPromotion.objects.all().delete()
+        Student.objects.filter(id__in=[s.id for s in self.students[:4]]).update(assigned_class=self.classes[0])
+        with CaptureQueriesContext(connection) as larger:
+            self.assertEqual(self.promote(from_class_id=self.classes[0].id).data['promoted_count'], 9)
+        self.assertLessEqual(len(larger.captured_queries), len(queries.captured_queries) + 1)
+
+        repeat = self.promote(from_class_id=self.classes[1].id).data
+        self.assertEqual(repeat['already_promoted_count'], 9)
+        self.assertEqual(repeat['promoted_count'], 5)
+
+    def test_failed_chunk_is_resumed_on_rerun(self):
+        calls = {'count': 0}
+        refresh = promotions.refresh_fee_balances
+
+        def failing_refresh(tenant_id, student_ids):
+            calls['count'] += 1
+            if calls['count'] == 2:
+                raise RuntimeError('database went away')
+            return refresh(tenant_id, student_ids)
+
+        with mock.patch.object(promotions, 'CHUNK_SIZE', 2), \
+                mock.patch.object(promotions, 'refresh_fee_balances', failing_refresh):
+            first = self.promote().data
+        self.assertEqual((first['promoted_count'], first['error_count']), (2, 2))
+        self.assertEqual(self.classes_of(self.students[:4]), ['Grade 2', 'Grade 2', 'Grade 2', 'Grade 2'])
+
+        second = self.promote(student_ids=[s.id for s in self.students[2:4]]).data
+        self.assertEqual((second['promoted_count'], second['error_count']), (2, 0))
+        self.assertEqual(self.classes_of(self.students[:4]), ['Grade 2', 'Grade 2', 'Grade 3', 'Grade 3'])
+
+    def test_ambiguous_order_skips_and_async_runs_as_job(self):
+        Class.objects.create(name="Grade 2B", tenant=self.tenant, order=2)
+        response = self.promote('?async=1')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['skipped_count'], 4)
+        Worker(concurrency=1, name='test').run_once()
+        job = Job.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.status, job.progress, job.result['promoted_count']), ('succeeded', 100, 2))
+        self.assertEqual(self.classes_of(self.students[:4]), ['Grade 1', 'Grade 1', 'Grade 3', 'Grade 3'])
+
+
+class HallTicketBulkTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.create_school("Exam School", "examadmin", "admin")
+        year = AcademicYear.objects.create(tenant=self.tenant, name="2025-26", start_date=date(2025, 4, 1),
+                                           end_date=date(2026, 3, 31))
+        self.exam = Exam.objects.create(tenant=self.tenant, name="Finals", exam_type='final', academic_year=year,
+                                        start_date=date(2026, 3, 2), end_date=date(2026, 3, 10))
+        self.senior = Class.objects.create(name="Class 10", tenant=self.tenant, order=10)
+        self.junior = Class.objects.create(name="Class 9", tenant=self.tenant, order=9)
+        subject = Subject.objects.create(tenant=self.tenant, name="Physics", class_obj=self.senior)
+        ExamSchedule.objects.create(tenant=self.tenant, exam=self.exam, class_obj=self.senior, subject=subject,
+                                    date=date(2026, 3, 2), start_time=time(9), end_time=time(12))
+        self.add_students(self.senior, ['Zara', 'Amit'])
+        self.add_students(self.junior, ['Maya'])
+        self.url = reverse('education-generate-hall-tickets')
+
+    def add_students(self, class_obj, names):
+        for name in names:
+            Student.objects.create(name=name, tenant=self.tenant, assigned_class=class_obj, admission_date=date(2024, 4, 1))
+
+    def generate(self, **extra):
+        return self.client.post(self.url, {'exam_id': self.exam.id, **extra}, format='json')
+
+    def numbers(self):
+        return list(HallTicket.objects.filter(exam=self.exam).order_by('ticket_number')
+                    .values_list('student__name', 'ticket_number'))
+
+    def test_sequential_numbers_in_class_order_with_one_insert(self):
+        self.generate()  # warm the plan feature cache
+        prefix = f"HTFIN-2025-E{self.exam.id}-"
+        self.assertEqual(self.numbers(), [('Maya', f"{prefix}00001"), ('Amit', f"{prefix}00002"), ('Zara', f"{prefix}00003")])
+
+        with CaptureQueriesContext(connection) as small:
+            repeat = self.generate().data
+        self.assertEqual((repeat['generated_count'], len(repeat['errors'])), (0, 3))
+
+        self.add_students(self.junior, [f"New {i}" for i in range(30)])
+        with CaptureQueriesContext(connection) as large:
+            response = self.generate(class_id=self.junior.id)
+        self.assertEqual(response.data['generated_count'], 30)
+        inserts = [q for q in large.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        # existing-ticket set, student list, exam lock, sequence scan, insert (+ savepoint pair)
+        self.assertLessEqual(len(large.captured_queries), len(small.captured_queries) + 5)
+        self.assertEqual(self.numbers()[-1][1], f"{prefix}00033")
+
+    def test_pdf_cached_and_prerendered_on_job(self):
+        response = self.generate(prerender_pdfs=True)
+        self.assertEqual(response.status_code, 201)
+        Worker(concurrency=1, name='test').run_once()
+        job = Job.objects.get(id=response.data['job_id'])
+        self.assertEqual((job.status, job.result['rendered'], job.result['failed']), ('succeeded', 3, []))
+
+        ticket = HallTicket.objects.get(student__name='Amit')
+        url = reverse('education-hall-ticket-pdf', args=[ticket.id])
+        with mock.patch.object(exam_views, 'render_hall_ticket_pdf', side_effect=exam_views.render_hall_ticket_pdf) as render:
+            first = self.client.get(url)
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(render.call_count, 0)
+        self.assertEqual((first.status_code, first['Content-Type'], again.status_code), (200, 'application/pdf', 304))
+        self.assertTrue(first.content.startswith(b'%PDF'))
+
+
+class SeatingAllocationTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.create_school("Seat School", "seatadmin", "admin")
+        year = AcademicYear.objects.create(tenant=self.tenant, name="2025-26", start_date=date(2025, 4, 1),
+                                           end_date=date(2026, 3, 31))
+        self.exam = Exam.objects.create(tenant=self.tenant, name="Finals", exam_type='final', academic_year=year,
+                                        start_date=date(2026, 3, 2), end_date=date(2026, 3, 10))
+        self.hall = Room.objects.create(tenant=self.tenant, name="Hall A", capacity=12)
+        self.annex = Room.objects.create(tenant=self.tenant, name="Hall B", capacity=12)
+        self.schedules = []
+        for order, subject_name in ((9, "Biology"), (10, "Physics")):
+            class_obj = Class.objects.create(name=f"Class {order}", tenant=self.tenant, order=order)
+            subject = Subject.objects.create(tenant=self.tenant, name=subject_name, class_obj=class_obj)
+            self.schedules.append(ExamSchedule.objects.create(
+                tenant=self.tenant, exam=self.exam, class_obj=class_obj, subject=subject, room=self.hall,
+                date=date(2026, 3, 2), start_time=time(9), end_time=time(12)))
+            for i in range(9):
+                Student.objects.create(name=f"{subject_name} {i}", tenant=self.tenant, assigned_class=class_obj,
+                                       admission_date=date(2024, 4, 1))
+
+    def allocate(self, **body):
+        return self.client.post(reverse('education-allocate-seats', args=[self.schedules[0].id]), body, format='json')
+
+    def test_classes_interleaved_across_rooms_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.allocate(schedule_ids=[self.schedules[1].id], room_ids=[self.hall.id, self.annex.id])
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['allocated_count'], response.data['adjacent_same_class']), (18, 0))
+        self.assertEqual([room['allocated'] for room in response.data['rooms']], [12, 6])
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('INSERT')]), 1)
+
+        seats = {
+            (seat.room_id, seat.row_number, seat.column_number): seat.exam_schedule_id
+            for seat in SeatingArrangement.objects.filter(tenant=self.tenant)
+        }
+        for (room_id, row, column), schedule_id in seats.items():
+            self.assertNotEqual(seats.get((room_id, row, column + 1)), schedule_id)
+            self.assertNotEqual(seats.get((room_id, row + 1, column)), schedule_id)
+        self.assertTrue(SeatingArrangement.objects.filter(room=self.hall, seat_number='B6').exists())
+
+        repeat = self.allocate(schedule_ids=[self.schedules[1].id], room_ids=[self.hall.id, self.annex.id])
+        self.assertEqual((repeat.data['allocated_count'], repeat.data['already_seated_count']), (0, 18))
+
+    def test_conflicting_rooms_skipped_and_capacity_checked(self):
+        other_class = Class.objects.create(name="Class 11", tenant=self.tenant, order=11)
+        ExamSchedule.objects.create(
+            tenant=self.tenant, exam=self.exam, class_obj=other_class, room=self.annex, date=self.schedules[0].date,
+            subject=Subject.objects.create(tenant=self.tenant, name="Chemistry", class_obj=other_class),
+            start_time=time(11), end_time=time(13))
+
+        response = self.allocate(schedule_ids=[self.schedules[1].id], room_ids=[self.hall.id, self.annex.id])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Not enough seats', response.data['error'])
+        self.assertFalse(SeatingArrangement.objects.exists())
+
+        self.hall.capacity = 18
+        self.hall.save()
+        response = self.allocate(schedule_ids=[self.schedules[1].id], room_ids=[self.hall.id, self.annex.id], dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room['room'] for room in response.data['room_conflicts']], ['Hall B'])
+        self.assertEqual((response.data['allocated_count'], response.data['adjacent_same_class']), (18, 0))
+        self.assertFalse(SeatingArrangement.objects.exists())
+
+        conflicts = self.client.get(reverse('education-exam-schedule-conflicts'), {'exam_id': self.exam.id}).data
+        # Both Hall A schedules overlap each other; Hall B has only one
+        self.assertEqual(conflicts['conflict_count'], 1)
+        self.assertEqual(conflicts['conflicts'][0]['room'], 'Hall A')
+
+    def test_kept_seats_without_grid_position_hold_their_seats(self):
+        first, second = Student.objects.filter(assigned_class=self.schedules[0].class_obj).order_by('id')[:2]
+        # No room means the schedule's own room; a free-text label still uses up a seat
+        SeatingArrangement.objects.create(tenant=self.tenant, exam_schedule=self.schedules[0], student=first,
+                                          seat_number='A1')
+        SeatingArrangement.objects.create(tenant=self.tenant, exam_schedule=self.schedules[0], student=second,
+                                          seat_number='Front desk', room=self.hall)
+        response = self.allocate(schedule_ids=[self.schedules[1].id], room_ids=[self.hall.id, self.annex.id])
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['allocated_count'], response.data['already_seated_count']), (16, 2))
+        self.assertEqual([room['allocated'] for room in response.data['rooms']], [10, 6])
+        self.assertFalse(SeatingArrangement.objects.filter(room=self.hall, seat_number='A1').exists())
+
+    def test_core_allocates_large_exam_quickly(self):
+        rng = random.Random(7)
+        candidates = [rng.randrange(12) for _ in range(5000)]
+        grids = [room_grid(rng.choice([48, 50, 60]), 6) for _ in range(100)]
+        started = clock.perf_counter()
+        placements, adjacent = assign_seats(candidates, grids)
+        self.assertLess(clock.perf_counter() - started, 1.0)
+        self.assertEqual(len(placements), 5000)
+        self.assertEqual(len({candidate for candidate, _, _, _ in placements}), 5000)
+        self.assertEqual(len({(room, row, column) for _, room, row, column in placements}), 5000)
+        self.assertEqual(adjacent, 0)
+
+
+class TimetableOccupancyIndexTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_school("Slot School", "slotadmin", "admin")
+        teacher_role = Role.objects.create(name="teacher")
+        self.year = AcademicYear.objects.create(tenant=self.tenant, name="2025-26", start_date=date(2025, 4, 1),
+                                                end_date=date(2026, 3, 31))
+        self.first = Period.objects.create(tenant=self.tenant, name="Period 1", order=1, start_time=time(9), end_time=time(10))
+        self.second = Period.objects.create(tenant=self.tenant, name="Period 2", order=2, start_time=time(10), end_time=time(11))
+        self.lab = Room.objects.create(tenant=self.tenant, name="Lab", room_type='lab', capacity=30)
+        self.room = Room.objects.create(tenant=self.tenant, name="Room 1", capacity=40)
+        self.classes, self.subjects = [], []
+        for order in (9, 10):
+            class_obj = Class.objects.create(name=f"Class {order}", tenant=self.tenant, order=order)
+            self.classes.append(class_obj)
+            self.subjects.append(Subject.objects.create(tenant=self.tenant, name="Science", class_obj=class_obj,
+                                                        has_practical=True))
+        self.teachers = []
+        for i in range(6):
+            user = User.objects.create_user(username=f"slotteacher{i}", password="pass")
+            self.teachers.append(UserProfile.objects.create(user=user, tenant=self.tenant, role=teacher_role))
+        self.teachers[0].assigned_classes.add(self.classes[0])
+        self.entry = Timetable.objects.create(
+            tenant=self.tenant, academic_year=self.year, class_obj=self.classes[0], day='monday', period=self.first,
+            subject=self.subjects[0], teacher=self.teachers[1], room=self.lab)
+
+    def slot(self, name, **extra):
+        return self.client.get(reverse(name), {'academic_year': self.year.id, 'day': 'monday',
+                                               'period': self.first.id, **extra})
+
+    def test_availability_from_index_in_constant_queries(self):
+        self.slot('education-available-teachers')  # warm the plan feature cache and the index
+        with CaptureQueriesContext(connection) as few:
+            response = self.slot('education-available-teachers', **{'class': self.classes[0].id})
+        self.assertEqual(response.data['busy_teachers'][0]['busy_with'], 'Class 9')
+        self.assertEqual([t['id'] for t in response.data['assigned_teachers']], [self.teachers[0].id])
+        self.assertTrue(response.data['assigned_teachers'][0]['is_assigned_to_class'])
+        self.assertEqual((response.data['total_available'], response.data['total_busy']), (6, 1))
+
+        for i in range(6, 16):
+            user = User.objects.create_user(username=f"slotteacher{i}", password="pass")
+            UserProfile.objects.create(user=user, tenant=self.tenant, role=self.teachers[0].role)
+        with CaptureQueriesContext(connection) as many:
+            response = self.slot('education-available-teachers', **{'class': self.classes[0].id})
+        self.assertEqual(response.data['total_available'], 16)
+        self.assertEqual(len(many.captured_queries), len(few.captured_queries))
+        self.assertFalse(any('education_timetable' in q['sql'] for q in many.captured_queries))
+
+        rooms = self.slot('education-available-rooms').data
+        self.assertEqual(([r['name'] for r in rooms['available_rooms']], rooms['booked_rooms'][0]['booked_by']),
+                         (['Room 1'], 'Class 9'))
+
+        suggestions = self.slot('education-timetable-suggestions', **{'class': self.classes[0].id,
+                                                                       'subject': self.subjects[0].id}).data
+        # The class's own entry does not block its teacher or room
+        self.assertEqual(suggestions['suggestions']['recommended_room']['name'], 'Lab')
+        recommended = suggestions['suggestions']['recommended_teacher']
+        self.assertEqual((recommended['id'], recommended['priority_score']), (self.teachers[0].id, 10))
+        taught = [t for t in suggestions['available_teachers']['others'] if t['id'] == self.teachers[1].id]
+        self.assertEqual(taught[0]['priority_score'], 5)
+
+    def test_writes_invalidate_index_and_reject_conflicts(self):
+        url = reverse('education-timetable')
+        entry = {'academic_year': self.year.id, 'class_obj': self.classes[1].id, 'day': 'monday',
+                 'period': self.first.id, 'subject': self.subjects[1].id}
+        self.assertEqual(self.slot('education-available-rooms').data['total_booked'], 1)
+
+        clash = self.client.post(url, {**entry, 'teacher': self.teachers[1].id}, format='json')
+        self.assertEqual((clash.status_code, clash.data['conflict_type']), (409, 'teacher'))
+        clash = self.client.post(url, {**entry, 'teacher': self.teachers[2].id, 'room': self.lab.id}, format='json')
+        self.assertEqual((clash.status_code, clash.data['conflict_type']), (409, 'room'))
+
+        created = self.client.post(url, {**entry, 'teacher': self.teachers[2].id, 'room': self.room.id}, format='json')
+        self.assertEqual(created.status_code, 201, created.data)
+        rooms = self.slot('education-available-rooms').data
+        self.assertEqual((rooms['total_available'], rooms['total_booked']), (0, 2))
+
+        # An entry does not conflict with itself, but moving onto a taken slot does
+        detail = reverse('education-timetable-detail', args=[self.entry.id])
+        self.assertEqual(self.client.put(detail, {'notes': 'Moved'}, format='json').status_code, 200)
+        moved = self.client.put(reverse('education-timetable-detail', args=[created.data['id']]),
+                                {'teacher': self.teachers[1].id}, format='json')
+        self.assertEqual(moved.status_code, 409)
+
+        self.client.delete(detail)
+        teachers = self.slot('education-available-teachers').data
+        self.assertEqual((teachers['total_busy'], teachers['busy_teachers'][0]['id']), (1, self.teachers[2].id))
+
+    def test_index_groups_entries_by_slot(self):
+        Timetable.objects.create(tenant=self.tenant, academic_year=self.year, class_obj=self.classes[1], day='monday',
+                                 period=self.first, subject=self.subjects[1], teacher=self.teachers[2], room=self.room)
+        index = build_timetable_index(self.tenant.id, self.year.id)
+        self.assertEqual(index.busy_teachers('monday', self.first.id),
+                         {self.teachers[1].id: 'Class 9', self.teachers[2].id: self.classes[1].name})
+        self.assertEqual(index.busy_rooms('monday', self.first.id, exclude_class=self.classes[1].id),
+                         {self.lab.id: 'Class 9'})
+        self.assertEqual(index.busy_teachers('monday', self.second.id), {})
+
+
+class TimetableGeneratorTests(ERPTestBase):
+    def setUp(self):
+        super().setUp()
+        self.create_school("Grid School", "gridadmin", "admin")
+        teacher_role = Role.objects.create(name="teacher")
+        self.year = AcademicYear.objects.create(tenant=self.tenant, name="2025-26", start_date=date(2025, 4, 1),
+                                                end_date=date(2026, 3, 31))
+        self.periods = [Period.objects.create(tenant=self.tenant, name=f"Period {i}", order=i,
+                                              start_time=time(8 + i), end_time=time(9 + i)) for i in range(1, 5)]
+        Period.objects.create(tenant=self.tenant, name="Lunch", order=9, start_time=time(13), end_time=time(14),
+                              is_break=True, break_type='lunch')
+        self.lab = Room.objects.create(tenant=self.tenant, name="Lab", room_type='lab', capacity=30)
+        self.teachers = []
+        for i in range(3):
+            user = User.objects.create_user(username=f"gridteacher{i}", password="pass")
+            self.teachers.append(UserProfile.objects.create(user=user, tenant=self.tenant, role=teacher_role))
+        self.classes, self.subjects = [], {}
+        for order in (8, 9, 10):
+            class_obj = Class.objects.create(name=f"Class {order}", tenant=self.tenant, order=order)
+            self.classes.append(class_obj)
+            for name in ("Maths", "Science", "English"):
+                self.subjects[(order, name)] = Subject.objects.create(tenant=self.tenant, name=name, class_obj=class_obj)
+        self.url = reverse('education-generate-timetable')
+
+    def requirements(self):
+        # 12 slots a week (3 days x 4 periods); each teacher and the lab are shared by every class
+        requirements = []
+        for class_obj in self.classes:
+            order = class_obj.order
+            requirements += [
+                {'class': class_obj.id, 'subject': self.subjects[(order, 'Maths')].id, 'periods_per_week': 3,
+                 'teacher': self.teachers[0].id},
+                {'class': class_obj.id, 'subject': self.subjects[(order, 'Science')].id, 'periods_per_week': 3,
+                 'teacher': self.teachers[1].id, 'room': self.lab.id},
+                {'class': class_obj.id, 'subject': self.subjects[(order, 'English')].id, 'periods_per_week': 4,
+                 'teacher': self.teachers[2].id},
+            ]
+        return requirements
+
+    def generate(self, **extra):
+        body = {'academic_year': self.year.id, 'days': ['monday', 'tuesday', 'wednesday'],
+                'requirements': self.requirements(), **extra}
+        return self.client.post(self.url, body, format='json')
+
+    def assert_conflict_free(self):
+        entries = list(Timetable.objects.filter(tenant=self.tenant, is_active=True).values(
+            'class_obj_id', 'subject_id', 'teacher_id', 'room_id', 'day', 'period_id'))
+        for field in ('class_obj_id', 'teacher_id', 'room_id'):
+            slots = Counter((entry[field], entry['day'], entry['period_id']) for entry in entries if entry[field])
+            self.assertEqual(max(slots.values()), 1, field)
+        per_day = Counter((entry['subject_id'], entry['day']) for entry in entries)
+        self.assertLessEqual(max(per_day.values()), 2)
+        return entries
+
+    def test_generates_conflict_free_timetable_in_one_insert(self):
+        other = Class.objects.create(name="Class 11", tenant=self.tenant, order=11)
+        fixed = Timetable.objects.create(
+            tenant=self.tenant, academic_year=self.year, class_obj=other, day='monday', period=self.periods[0],
+            subject=Subject.objects.create(tenant=self.tenant, name="Maths", class_obj=other), teacher=self.teachers[0])
+        Holiday.objects.create(tenant=self.tenant, academic_year=self.year, name="Founders Day", date=date(2025, 4, 7))
+
+        preview = self.generate(dry_run=True)
+        self.assertEqual((preview.status_code, preview.data.get('created_count')), (200, 0), preview.data)
+        self.assertEqual(Timetable.objects.count(), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.generate()
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created_count'], 30)
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('INSERT')]), 1)
+        entries = self.assert_conflict_free()
+        self.assertEqual(len(entries), 31)
+        self.assertFalse(any(entry['teacher_id'] == self.teachers[0].id and entry['day'] == 'monday'
+                             and entry['period_id'] == self.periods[0].id and entry['class_obj_id'] != other.id
+                             for entry in entries))
+        self.assertTrue(Timetable.objects.filter(id=fixed.id).exists())
+        # 2025-04-07 is a Monday
+        self.assertEqual(response.data['teaching_days']['monday'], response.data['teaching_days']['wednesday'] - 1)
+
+        # The occupancy index sees the bulk-created entries
+        busy = self.client.get(reverse('education-available-rooms'), {
+            'academic_year': self.year.id, 'day': 'monday', 'period': self.periods[1].id}).data
+        lab_used = Timetable.objects.filter(room=self.lab, day='monday', period=self.periods[1]).exists()
+        self.assertEqual(busy['total_booked'], int(lab_used))
+
+    def test_keeps_or_replaces_existing_entries_and_rejects_overload(self):
+        maths = self.subjects[(8, 'Maths')]
+        Timetable.objects.create(tenant=self.tenant, academic_year=self.year, class_obj=self.classes[0], day='tuesday',
+                                 period=self.periods[2], subject=maths, teacher=self.teachers[0])
+        response = self.generate()
+        self.assertEqual(response.status_code, 201, response.data)
+        report = next(row for row in response.data['requirements'] if row['class'] == 'Class 8' and row['subject'] == 'Maths')
+        self.assertEqual((report['placed'], report['kept']), (2, 1))
+        self.assertEqual(len(self.assert_conflict_free()), 30)
+
+        replaced = self.generate(replace=True)
+        self.assertEqual((replaced.status_code, replaced.data['created_count'], replaced.data['deleted_count']), (201, 30, 30))
+        self.assertEqual(len(self.assert_conflict_free()), 30)
+
+        overload = self.requirements()
+        overload[0]['periods_per_week'] = 6
+        response = self.client.post(self.url, {'academic_year': self.year.id, 'days': ['monday', 'tuesday', 'wednesday'],
+                                               'requirements': overload, 'replace': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Class 8 needs 13 periods', response.data['error'])
+        self.assertEqual(Timetable.objects.count(), 30)
+
+        queued = self.client.post(f"{self.url}?async=1", {'academic_year': self.year.id, 'days': ['monday', 'tuesday', 'wednesday'],
+                                                          'requirements': self.requirements(), 'replace': True}, format='json')
+        self.assertEqual(queued.status_code, 202)
+        Worker(concurrency=1, name='test').run_once()
+        job = Job.objects.get(id=queued.data['job_id'])
+        self.assertEqual((job.status, job.result['created_count']), ('succeeded', 30))
+
+    def test_solver_handles_forty_classes(self):
+        requirements, load = [], Counter()
+        for class_key in range(40):
+            for subject, count in enumerate([7, 7, 6, 6, 6, 6, 5, 5]):
+                teacher = min((t for t in range(56) if t % 8 == subject), key=lambda t: load[t])
+                load[teacher] += count
+                requirements.append((class_key, teacher, None, count))
+        started = clock.perf_counter()
+        solution = solve_timetable(requirements, 6, 8, per_day=2, time_budget=20)
+        self.assertLess(clock.perf_counter() - started, 10)
+        self.assertEqual(sum(solution['unplaced']), 0)
+        for position in (0, 1):
+            booked = Counter((requirement[position], slot)
+                             for requirement, slots in zip(requirements, solution['slots']) for slot in slots)
+            self.assertEqual(max(booked.values()), 1)
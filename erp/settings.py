@@ -62,6 +62,7 @@ INSTALLED_APPS = [
 
 # Build middleware list conditionally
 MIDDLEWARE = [
+    'api.middleware.request_metrics.RequestMetricsMiddleware',  # Outermost so latency covers the whole stack
     'corsheaders.middleware.CorsMiddleware',
 ]
 
@@ -85,6 +86,8 @@ MIDDLEWARE.extend([
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Optional: Uncomment to enable docs protection middleware
     # 'api.middleware.docs_security.DocsSecurityMiddleware',  # Protect Swagger/Redoc
+    # Optional: Uncomment to record API calls in AuditLog (buffered, see AUDIT_LOG_BUFFER)
+    # 'api.middleware.audit_logs.AuditLogMiddleware',
 ])
 
 ROOT_URLCONF = 'erp.urls'
@@ -194,7 +197,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # Page numbers by default; `?cursor=` switches a list to keyset pagination
+    'DEFAULT_PAGINATION_CLASS': 'api.utils.pagination.HybridPagination',
     'PAGE_SIZE': 10,
 }
 
@@ -231,6 +235,65 @@ SIMPLE_JWT = {
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
+# Audit log write-behind buffer (api.utils.audit_buffer)
+AUDIT_LOG_BUFFER = {
+    'CAPACITY': int(os.getenv('AUDIT_LOG_BUFFER_CAPACITY', '10000')),
+    'BATCH_SIZE': int(os.getenv('AUDIT_LOG_BATCH_SIZE', '500')),
+    'FLUSH_INTERVAL': float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', '2.0')),
+    'VIEW_SAMPLE_RATE': float(os.getenv('AUDIT_LOG_VIEW_SAMPLE_RATE', '1.0')),
+}
+
+# Visitor tracking: 'coalesced' batches writes (api.utils.visitor_tracker), 'immediate' writes per request
+VISITOR_TRACKING_MODE = os.getenv('VISITOR_TRACKING_MODE', 'coalesced')
+
+# Request metrics (api.utils.request_metrics), scraped from /metrics
+REQUEST_METRICS = {
+    'ENABLED': os.getenv('REQUEST_METRICS_ENABLED', 'True').lower() == 'true',
+    'RESPONSE_HEADERS': os.getenv('REQUEST_METRICS_HEADERS', str(DEBUG)).lower() == 'true',
+    'N_PLUS_ONE_THRESHOLD': int(os.getenv('N_PLUS_ONE_THRESHOLD', '10')),
+    'LOG_N_PLUS_ONE': True,
+}
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN', '')
+
+# Shared cache for the plan feature matrix, timetable index and PDF versions.
+# Every gunicorn worker must see the same cache so invalidations reach all of them:
+# set CACHE_REDIS_URL (requires the redis package) or use the database table
+# created by api migration 0035_create_cache_table.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', '')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'erp_cache',
+        }
+    }
+
+# Background jobs (api.utils.jobs), run by `python manage.py run_workers`
+# (the erp-backend-worker service in render.yaml, zenith-erp-worker.service.example).
+# JOB_QUEUE_EAGER=True runs jobs inline after commit when no worker is running.
+JOB_QUEUE = {
+    'TENANT_CONCURRENCY': int(os.getenv('JOB_TENANT_CONCURRENCY', '2')),
+    'MAX_ATTEMPTS': int(os.getenv('JOB_MAX_ATTEMPTS', '3')),
+    'BACKOFF_BASE': int(os.getenv('JOB_BACKOFF_BASE', '30')),
+    'BACKOFF_MAX': 3600,
+    'LEASE_TIMEOUT': int(os.getenv('JOB_LEASE_TIMEOUT', '900')),
+    'POLL_INTERVAL': float(os.getenv('JOB_POLL_INTERVAL', '1.0')),
+    'EAGER': os.getenv('JOB_QUEUE_EAGER', 'False').lower() == 'true',
+}
+
+# Rate limiting (api.utils.rate_limit)
+# Set RATE_LIMIT_REDIS_URL so all workers share one set of counters;
+# without it each worker process limits independently.
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', '')
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', '')
+
 # Email Configuration (Gmail SMTP)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -33,6 +33,12 @@ CACHES = {
     }
 }
 
+# Rate-limit counters are process-global and outlive each test's rollback
+MIDDLEWARE = [m for m in MIDDLEWARE if m != 'api.middleware.security.RateLimitMiddleware']
+
+# Write visitor tracking synchronously (no background flusher threads in tests)
+VISITOR_TRACKING_MODE = 'immediate'
+
 # Disable logging during tests
 LOGGING = {
     'version': 1,
@@ -10,6 +10,7 @@ from rest_framework.permissions import IsAuthenticated
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from api.admin_site import secure_admin_site
+from api.views.metrics_views import metrics_view
 
 # Only allow authenticated users to access API docs in production
 docs_permission = permissions.AllowAny if settings.DEBUG else IsAuthenticated
@@ -38,6 +39,8 @@ urlpatterns = [
     # Secure admin path (only accessible to superusers)
     path('secure-admin/', secure_admin_site.urls),
     path('api/', include('api.urls')),
+    # Prometheus metrics (per-route latency, query counts, N+1 flags)
+    path('metrics', metrics_view, name='metrics'),
     # Protected API documentation (requires authentication in production)
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
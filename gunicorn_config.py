@@ -40,3 +40,16 @@ tmp_upload_dir = None
 keyfile = None
 certfile = None
 
+
+def worker_exit(server, worker):
+    """Flush buffered audit log entries and visitor tracking before the worker process exits"""
+    try:
+        from api.utils.audit_buffer import shutdown_audit_buffer
+        shutdown_audit_buffer()
+    except Exception as e:
+        server.log.error(f"Audit log flush on worker exit failed: {e}")
+    try:
+        from api.utils.visitor_tracker import shutdown_visitor_tracker
+        shutdown_visitor_tracker()
+    except Exception as e:
+        server.log.error(f"Visitor tracking flush on worker exit failed: {e}")
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_notification_api_notific_user_id_d8a762_idx'),
+        ('hotel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['tenant', 'check_in'], name='hotel_booki_tenant__fffd88_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['tenant', 'status'], name='hotel_booki_tenant__ced699_idx'),
+        ),
+    ]
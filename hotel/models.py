@@ -61,6 +61,12 @@ class Booking(models.Model):
 	total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 	created_at = models.DateTimeField(auto_now_add=True)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['tenant', 'check_in']),
+			models.Index(fields=['tenant', 'status']),
+		]
+
 	def __str__(self):
 		return f"Booking {self.id} - Room {self.room.room_number}"
 
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_notification_api_notific_user_id_d8a762_idx'),
+        ('pharmacy', '0006_alter_sale_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicinebatch',
+            index=models.Index(fields=['tenant', 'expiry_date'], name='pharmacy_me_tenant__e9f19c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['tenant', 'sale_date'], name='pharmacy_sa_tenant__e8a43e_idx'),
+        ),
+    ]
@@ -70,6 +70,9 @@ class MedicineBatch(models.Model):
     
     class Meta:
         unique_together = ['medicine', 'batch_number', 'tenant']
+        indexes = [
+            models.Index(fields=['tenant', 'expiry_date']),
+        ]
     
     def __str__(self):
         return f"{self.medicine.name} - Batch {self.batch_number}"
@@ -202,6 +205,11 @@ class Sale(models.Model):
     sold_by = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, related_name='pharmacy_sales')
     notes = models.TextField(blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['tenant', 'sale_date']),
+        ]
+
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.total_amount}"
 
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_notification_api_notific_user_id_d8a762_idx'),
+        ('restaurant', '0002_order_customer_email_order_customer_phone_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['tenant', 'created_at'], name='restaurant__tenant__7eb201_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['tenant', 'status'], name='restaurant__tenant__0f74f3_idx'),
+        ),
+    ]
@@ -62,6 +62,12 @@ class Order(models.Model):
 	external_order_id = models.CharField(max_length=100, blank=True, null=True)  # For external API orders
 	notes = models.TextField(blank=True)  # Special instructions
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['tenant', 'created_at']),
+			models.Index(fields=['tenant', 'status']),
+		]
+
 	def __str__(self):
 		return f"Order {self.id}"
 
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_notification_api_notific_user_id_d8a762_idx'),
+        ('retail', '0007_alter_sale_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['tenant', 'sale_date'], name='retail_sale_tenant__4d967d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['tenant', 'payment_status'], name='retail_sale_tenant__73a6f2_idx'),
+        ),
+    ]
@@ -295,6 +295,12 @@ class Sale(models.Model):
     sold_by = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, related_name='retail_sales')
     notes = models.TextField(blank=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['tenant', 'sale_date']),
+            models.Index(fields=['tenant', 'payment_status']),
+        ]
+
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.customer.name}"
 
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-16 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_notification_api_notific_user_id_d8a762_idx'),
+        ('salon', '0004_appointment_payment_method_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['tenant', 'start_time'], name='salon_appoi_tenant__36fee5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['tenant', 'status'], name='salon_appoi_tenant__f8aafe_idx'),
+        ),
+    ]
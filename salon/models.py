@@ -78,6 +78,10 @@ class Appointment(models.Model):
 
 	class Meta:
 		ordering = ['-start_time', 'id']
+		indexes = [
+			models.Index(fields=['tenant', 'start_time']),
+			models.Index(fields=['tenant', 'status']),
+		]
 
 	def __str__(self):
 		return f"Appt {self.id} - {self.customer_name}"